@@ -1,11 +1,29 @@
 import os
+import datetime
 import zipfile
 import shutil
-import subprocess
 import re
 import concurrent.futures
+import queue
+import tempfile
+import threading
+import time
 from pathlib import Path
 
+import hatanaka
+import separador_constelacoes
+from catalogo_rinex import NOME_CATALOGO, atualizar_catalogo, regex_arquivo_obs
+from manifesto import Manifesto
+from orquestrador import Job, executar_jobs
+from separador_constelacoes import nome_constelacao, separar_constelacoes, separar_linhas
+
+# Índice de épocas das saídas (acesso por janela de tempo) e controle de qualidade; precisam do NumPy
+try:
+    import indice_rinex
+    import qc_rinex
+except ImportError:
+    indice_rinex = qc_rinex = None
+
 # MAX_ZIP_SIZE foi removida, pois usaremos o RTKLIB diretamente
 
 crx_path = r"C:\Users\berna\Documents\Faculdade\Projeto PUB GNSS\CRX2RNX.exe"
@@ -15,156 +33,631 @@ teqc_path = r"C:\Users\berna\Downloads\teqc_mingw_64\teqc.exe"
 def print_etapa(etapa):
     print(f"\n{'='*40}\n[ETAPA] {etapa}\n{'='*40}")
 
-def descompactar_zip(origem_path, pasta_destino_d_path):
+# Saídas da separação por constelação: nome da pasta/prefixo -> sistemas
+# (G=GPS, R=GLONASS, E=Galileo, C=BeiDou, J=QZSS, S=SBAS)
+CONSTELACOES_PADRAO = {
+    "GPS": "G",
+    "GLONASS": "R",
+    "GPS_GLONASS": "GR",
+}
+
+# Arquivos RINEX de observação (.22o ou .rnx vindos de .crx)
+regex_obs = re.compile(r".*(\.\d{2}o|\.rnx)$", re.IGNORECASE)
+
+# Arquivos Hatanaka aceitos dentro dos zips do RBMC (.d, .22d, .crx, .crx.gz)
+regex_hatanaka = re.compile(r".*(\.d|\.\d{2}d|\.crx|\.crx\.gz)$", re.IGNORECASE)
+
+# Zips internos maiores que isso saem da memória e vão para um arquivo temporário
+LIMITE_BUFFER_MEMORIA = 64 * 1024 * 1024
+TAMANHO_BLOCO = 1024 * 1024
+
+# Modo pipeline: quantos arquivos extraídos podem esperar pela conversão
+TAMANHO_FILA_PIPELINE = 8
+
+# Ferramentas registradas no manifesto: mudar a versão força o reprocessamento
+FERRAMENTA_EXTRACAO = "zipfile"
+FERRAMENTA_CONVERSAO = f"hatanaka.py {hatanaka.VERSAO}"
+FERRAMENTA_SEPARACAO = f"separador_constelacoes.py {separador_constelacoes.VERSAO}"
+FERRAMENTA_PIPELINE = f"{FERRAMENTA_CONVERSAO} + {FERRAMENTA_SEPARACAO}"
+FERRAMENTA_CRX2RNX = "CRX2RNX"
+
+# Limite de tempo (s) por execução dos programas externos (CRX2RNX e teqc)
+TIMEOUT_EXTERNO = 600
+
+def _nova_estatistica():
+    return {"lido": 0, "bufferizado": 0, "bufferizado_disco": 0, "escrito": 0, "arquivos": 0, "pulados": 0}
+
+def _somar_estatisticas(total, parcial):
+    for chave, valor in parcial.items():
+        total[chave] += valor
+
+def _hash_membro(membro):
+    """Identifica o conteúdo de um membro pelo CRC32 e tamanho do próprio zip, sem lê-lo."""
+    return f"crc32:{membro.CRC:08x}:{membro.file_size}"
+
+def _extrair_hatanaka(zip_ref, pasta_destino, estatisticas, membros=None, ao_extrair=None, pular=None):
+    """
+    Percorre os membros de um ZipFile aberto, gravando direto no destino apenas
+    os arquivos Hatanaka. Zips aninhados são lidos em um buffer (memória ou,
+    se forem grandes, arquivo temporário) e percorridos recursivamente.
+    `ao_extrair(caminho, membro)` é chamado a cada arquivo gravado e
+    `pular(membro)` permite ignorar membros já processados.
+    """
+    if membros is None:
+        membros = zip_ref.infolist()
+    for membro in membros:
+        if membro.is_dir():
+            continue
+        nome = os.path.basename(membro.filename)
+
+        if nome.lower().endswith('.zip'):
+            with tempfile.SpooledTemporaryFile(max_size=LIMITE_BUFFER_MEMORIA) as buffer:
+                with zip_ref.open(membro) as fonte:
+                    shutil.copyfileobj(fonte, buffer, TAMANHO_BLOCO)
+                estatisticas["lido"] += membro.compress_size
+                estatisticas["bufferizado"] += membro.file_size
+                if membro.file_size > LIMITE_BUFFER_MEMORIA:
+                    estatisticas["bufferizado_disco"] += membro.file_size
+                buffer.seek(0)
+                try:
+                    with zipfile.ZipFile(buffer, 'r') as zip_interno:
+                        _extrair_hatanaka(zip_interno, pasta_destino, estatisticas,
+                                          ao_extrair=ao_extrair, pular=pular)
+                except zipfile.BadZipFile:
+                    print(f"❌ ZIP inválido: {nome}")
+
+        elif regex_hatanaka.match(nome):
+            if pular and pular(membro):
+                estatisticas["pulados"] += 1
+                continue
+            with zip_ref.open(membro) as fonte, open(pasta_destino / nome, 'wb') as destino:
+                shutil.copyfileobj(fonte, destino, TAMANHO_BLOCO)
+            estatisticas["lido"] += membro.compress_size
+            estatisticas["escrito"] += membro.file_size
+            estatisticas["arquivos"] += 1
+            print(f"📁 Extraído: {nome} -> {pasta_destino.name}")
+            if ao_extrair:
+                ao_extrair(pasta_destino / nome, membro)
+
+def _processar_zip_externo(zip_path, nomes_membros, pasta_destino, ao_extrair=None, pular=None):
     """
-    Descompacta arquivos ZIP de origem.
-    Procura por zips aninhados, extrai tudo e move apenas os arquivos .d
-    para a pasta de destino final.
+    Função auxiliar para paralelismo da extração: cada tarefa abre seu próprio
+    handle do zip e trata apenas os membros recebidos.
+    """
+    estatisticas = _nova_estatistica()
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            membros = None
+            if nomes_membros is not None:
+                membros = [zip_ref.getinfo(n) for n in nomes_membros]
+            _extrair_hatanaka(zip_ref, pasta_destino, estatisticas, membros, ao_extrair, pular)
+    except zipfile.BadZipFile:
+        print(f"❌ ZIP inválido: {Path(zip_path).name}")
+    return estatisticas
+
+def _formatar_bytes(n):
+    for unidade in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.1f} {unidade}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+def _imprimir_estatisticas(total):
+    print(f"📊 E/S da extração ({total['arquivos']} arquivos Hatanaka, {total['pulados']} já processados):")
+    print(f"   Lido dos zips (todos níveis): {_formatar_bytes(total['lido'])}")
+    print(f"   Zips internos em buffer:     {_formatar_bytes(total['bufferizado'])} "
+          f"({_formatar_bytes(total['bufferizado_disco'])} em disco temporário)")
+    print(f"   Escrito no destino:          {_formatar_bytes(total['escrito'])}")
+
+def descompactar_zip(origem_path, pasta_destino_d_path, max_workers=None, ao_extrair=None, pular=None,
+                     manifesto=None, resumo=True):
+    """
+    Descompacta arquivos ZIP de origem em modo streaming.
+    Abre o zip principal (ou cada zip da pasta), lê os zips aninhados em
+    memória e grava apenas os arquivos Hatanaka (.d/.crx) no destino final,
+    sem copiar nem extrair o restante para o disco. Vários zips internos
+    são tratados ao mesmo tempo; `ao_extrair` recebe cada arquivo gravado.
+    Com `manifesto`, membros já extraídos e inalterados não são regravados.
+    Com `resumo=False`, as estatísticas de E/S não são impressas.
     """
     origem_path = Path(origem_path)
     pasta_destino_d_path = Path(pasta_destino_d_path)
-    
-    # Cria diretórios temporários na pasta base
-    temp_raiz = pasta_destino_d_path.parent / "TEMP_ZIPS"
-    temp_extraidos = pasta_destino_d_path.parent / "TEMP_EXTRAIDOS"
-    
-    os.makedirs(temp_raiz, exist_ok=True)
-    os.makedirs(temp_extraidos, exist_ok=True)
     os.makedirs(pasta_destino_d_path, exist_ok=True)
 
-    try:
-        if origem_path.is_file() and origem_path.suffix.lower() == ".zip":
-            print(f"🗃️ Extraindo pacote principal ZIP: {origem_path.name}")
+    if manifesto is not None:
+        callback = ao_extrair
+
+        def pular(membro):
+            nome = os.path.basename(membro.filename)
+            return manifesto.atualizado("extracao", nome, _hash_membro(membro), FERRAMENTA_EXTRACAO)
+
+        def ao_extrair(caminho, membro):
+            manifesto.registrar("extracao", caminho.name, _hash_membro(membro), FERRAMENTA_EXTRACAO, [caminho])
+            if callback:
+                callback(caminho, membro)
+
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+
+    # Cada tarefa é (zip no disco, membros a visitar ou None para todos)
+    tarefas = []
+    if origem_path.is_file() and origem_path.suffix.lower() == ".zip":
+        print(f"🗃️ Lendo pacote principal ZIP: {origem_path.name}")
+        try:
             with zipfile.ZipFile(origem_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_raiz)
-        elif origem_path.is_dir():
-            print(f"📂 Copiando arquivos ZIP da pasta: {origem_path}")
-            for arquivo in os.listdir(origem_path):
-                if arquivo.lower().endswith('.zip'):
-                    shutil.copy(origem_path / arquivo, temp_raiz / arquivo)
-        else:
-            print(f"❌ Erro: Caminho de origem não é um arquivo .zip ou diretório válido.")
-            return
+                membros = [m.filename for m in zip_ref.infolist() if not m.is_dir()]
+        except zipfile.BadZipFile:
+            print(f"❌ ZIP inválido: {origem_path.name}")
+            return None
+        # Um membro por tarefa: os zips internos são processados em paralelo
+        tarefas = [(origem_path, [nome]) for nome in membros]
+    elif origem_path.is_dir():
+        print(f"📂 Lendo arquivos ZIP da pasta: {origem_path}")
+        tarefas = [(origem_path / arquivo, None) for arquivo in sorted(os.listdir(origem_path))
+                   if arquivo.lower().endswith('.zip')]
+    else:
+        print(f"❌ Erro: Caminho de origem não é um arquivo .zip ou diretório válido.")
+        return None
 
-        # Extrai os zips individuais (que podem conter os arquivos .d)
-        for arquivo_zip in temp_raiz.glob('*.zip'):
-            print(f" extracting... {arquivo_zip.name}")
-            try:
-                with zipfile.ZipFile(arquivo_zip, 'r') as zip_ref:
-                    zip_ref.extractall(temp_extraidos)
-                print(f"✅ Descompactado: {arquivo_zip.name}")
-            except zipfile.BadZipFile:
-                print(f"❌ ZIP inválido: {arquivo_zip.name}")
-        
-        # Procura recursivamente por arquivos .d e move
-        regex_d = re.compile(r".*\.\d{2}d$", re.IGNORECASE)
-        for raiz, _, arquivos in os.walk(temp_extraidos):
-            for arquivo in arquivos:
-                if arquivo.lower().endswith('.d') or regex_d.match(arquivo):
-                    origem = Path(raiz) / arquivo
-                    destino = pasta_destino_d_path / arquivo
-                    shutil.move(origem, destino)
-                    print(f"📁 Movido: {arquivo} -> {pasta_destino_d_path.name}")
-    
-    finally:
-        # Limpa os diretórios temporários
-        shutil.rmtree(temp_raiz, ignore_errors=True)
-        shutil.rmtree(temp_extraidos, ignore_errors=True)
-        print("🧹 Limpeza temporária concluída.")
-
-def _processar_crx(arquivo_d_path, crx2rnx_path):
-    """Função auxiliar para paralelismo do CRX2RNX."""
-    comando = f'"{crx2rnx_path}" "{arquivo_d_path}"'
+    total = _nova_estatistica()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [executor.submit(_processar_zip_externo, zip_path, membros, pasta_destino_d_path, ao_extrair, pular)
+                   for zip_path, membros in tarefas]
+        for futuro in concurrent.futures.as_completed(futuros):
+            _somar_estatisticas(total, futuro.result())
+
+    if resumo:
+        _imprimir_estatisticas(total)
+    return total
+
+def descompactar_zips(origem, pasta_destino_d_path, ao_extrair=None, pular=None, manifesto=None):
+    """
+    Como descompactar_zip, mas `origem` também pode ser um iterável de zips que chegam
+    aos poucos (ex: baixador_rbmc.baixar_rbmc): cada zip é extraído assim que é entregue.
+    """
+    if isinstance(origem, (str, os.PathLike)):
+        return descompactar_zip(origem, pasta_destino_d_path, ao_extrair=ao_extrair, pular=pular,
+                                manifesto=manifesto)
+    total = _nova_estatistica()
+    for zip_path in origem:
+        parcial = descompactar_zip(zip_path, pasta_destino_d_path, ao_extrair=ao_extrair, pular=pular,
+                                   manifesto=manifesto, resumo=False)
+        if parcial:
+            _somar_estatisticas(total, parcial)
+    _imprimir_estatisticas(total)
+    return total
+
+def _processar_crx(arquivo_d_path):
+    """
+    Função auxiliar para paralelismo da conversão Hatanaka com o decodificador interno.
+    Retorna (mensagem, ferramenta usada ou None em caso de erro).
+    """
     try:
-        subprocess.run(comando, shell=True, check=True, cwd=arquivo_d_path.parent,
-                         capture_output=True, text=True)
-        nome_saida = arquivo_d_path.with_suffix("." + arquivo_d_path.suffix[1:3] + "o").name
-        return f"🔁 Convertido: {arquivo_d_path.name} → {nome_saida}"
-    except subprocess.CalledProcessError as e:
-        return f"❌ Erro ao converter: {arquivo_d_path.name}. (Verifique CRX2RNX e permissões)\n{e.stderr}"
-
-def converter_crx2rnx(pasta_d_path, crx2rnx_path):
-    """Converte arquivos .d para .o em paralelo."""
-    regex_d = re.compile(r".*\.\d{2}d$", re.IGNORECASE)
-    arquivos_d = [f for f in pasta_d_path.glob('*') if f.is_file() and regex_d.match(f.name)]
+        arquivo_o = hatanaka.crx2rnx(arquivo_d_path)
+        return f"🔁 Convertido: {arquivo_d_path.name} → {arquivo_o.name}", FERRAMENTA_CONVERSAO
+    except (ValueError, OSError, EOFError) as erro:
+        return f"❌ Erro ao converter: {arquivo_d_path.name}. O arquivo pode estar corrompido.\n{erro}", None
+
+def _mensagem_falha_externa(resultado, programa):
+    if resultado.timeout:
+        motivo = f"tempo limite de {TIMEOUT_EXTERNO} s excedido"
+    else:
+        motivo = f"código {resultado.codigo}"
+    return f"❌ Erro no {programa}: {resultado.job.nome} ({motivo}). Veja o log: {resultado.log}"
+
+def _converter_externo(pendentes, crx2rnx_path, pasta_logs, manifesto=None):
+    """
+    Converte com o CRX2RNX, pelo orquestrador assíncrono. Retorna [(arquivo, hash)] dos que falharam.
+    O CRX2RNX não lê gzip: os .crx.gz ficam para o decodificador interno.
+    """
+    falhas = [(arquivo_d, hash_entrada) for arquivo_d, hash_entrada in pendentes
+              if arquivo_d.suffix.lower() == '.gz']
+    externos = [(arquivo_d, hash_entrada) for arquivo_d, hash_entrada in pendentes
+                if arquivo_d.suffix.lower() != '.gz']
+
+    def concluir(resultado):
+        arquivo_d, hash_entrada = resultado.job.dados
+        arquivo_o = hatanaka.nome_rinex(arquivo_d)
+        if resultado.codigo != 0 or not arquivo_o.is_file():
+            print(_mensagem_falha_externa(resultado, "CRX2RNX"))
+            falhas.append((arquivo_d, hash_entrada))
+            return
+        print(f"🔁 Convertido (CRX2RNX): {arquivo_d.name} → {arquivo_o.name}")
+        if manifesto is not None:
+            manifesto.registrar("conversao", arquivo_d.name, hash_entrada, FERRAMENTA_CRX2RNX, [arquivo_o],
+                                caminho_entrada=arquivo_d)
+
+    # -f: sobrescreve o .o de uma conversão anterior em vez de perguntar
+    jobs = (Job(f"crx2rnx_{arquivo_d.name}", [crx2rnx_path, "-f", arquivo_d], cwd=arquivo_d.parent,
+                dados=(arquivo_d, hash_entrada))
+            for arquivo_d, hash_entrada in externos)
+    executar_jobs(jobs, pasta_logs, timeout=TIMEOUT_EXTERNO, ao_concluir=concluir)
+    return falhas
+
+def _converter_interno(pendentes, manifesto=None):
+    """Converte com o decodificador interno, um arquivo por processo. Retorna [(arquivo, hash)] dos que falharam."""
+    falhas = []
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        tarefas = {executor.submit(_processar_crx, arquivo_d): (arquivo_d, hash_entrada)
+                   for arquivo_d, hash_entrada in pendentes}
+
+        # Coleta os resultados à medida que ficam prontos
+        for futuro in concurrent.futures.as_completed(tarefas):
+            mensagem, ferramenta = futuro.result()
+            print(mensagem)
+            arquivo_d, hash_entrada = tarefas[futuro]
+            if not ferramenta:
+                falhas.append((arquivo_d, hash_entrada))
+            elif manifesto is not None:
+                manifesto.registrar("conversao", arquivo_d.name, hash_entrada, ferramenta,
+                                    [hatanaka.nome_rinex(arquivo_d)], caminho_entrada=arquivo_d)
+    return falhas
+
+def _filtrar_pendentes(manifesto, etapa, arquivos, ferramenta, parametros=None):
+    """
+    Separa os arquivos que ainda precisam ser processados. `ferramenta` pode ser uma tupla de
+    ferramentas equivalentes (qualquer uma vale). Retorna [(arquivo, hash)] e o total pulado.
+    """
+    if manifesto is None:
+        return [(arquivo, None) for arquivo in arquivos], 0
+    ferramentas = (ferramenta,) if isinstance(ferramenta, str) else ferramenta
+    pendentes = []
+    for arquivo in arquivos:
+        hash_entrada = manifesto.hash_arquivo(etapa, arquivo)
+        if not any(manifesto.atualizado(etapa, arquivo.name, hash_entrada, f, parametros) for f in ferramentas):
+            pendentes.append((arquivo, hash_entrada))
+    return pendentes, len(arquivos) - len(pendentes)
+
+def converter_crx2rnx(pasta_d_path, crx2rnx_path=None, manifesto=None):
+    """
+    Converte arquivos Hatanaka (.d/.crx) para RINEX (.o/.rnx) em paralelo.
+    Com `manifesto`, só converte arquivos novos ou alterados.
+    """
+    arquivos_d = [f for f in pasta_d_path.glob('*') if f.is_file() and regex_hatanaka.match(f.name)]
     
     if not arquivos_d:
         print("❌ Nenhum arquivo .d válido (ex: .22d) encontrado para conversão.")
         return
 
-    print(f"Iniciando conversão de {len(arquivos_d)} arquivos Hatanaka...")
-    
-    # Usa ProcessPoolExecutor para rodar várias instâncias do CRX2RNX ao mesmo tempo
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        # Cria uma "tarefa" para cada arquivo, passando o caminho do CRX2RNX
-        tarefas = {executor.submit(_processar_crx, arquivo_d, crx2rnx_path): arquivo_d for arquivo_d in arquivos_d}
-        
-        # Coleta os resultados à medida que ficam prontos
-        for futuro in concurrent.futures.as_completed(tarefas):
-            print(futuro.result())
+    pendentes, pulados = _filtrar_pendentes(manifesto, "conversao", arquivos_d,
+                                            (FERRAMENTA_CRX2RNX, FERRAMENTA_CONVERSAO))
+    if pulados:
+        print(f"⏭️ {pulados} arquivos já convertidos (manifesto), pulando.")
+    print(f"Iniciando conversão de {len(pendentes)} arquivos Hatanaka...")
+
+    # Com o NumPy, o decodificador interno é o padrão e o CRX2RNX fica para os arquivos em que ele falhar.
+    # Sem o NumPy, o interno é cerca de 6x mais lento que o CRX2RNX (ver README), que passa a ir primeiro.
+    if crx2rnx_path and not hatanaka.VETORIZADO:
+        falhas = _converter_externo(pendentes, crx2rnx_path, pasta_d_path.parent / "logs", manifesto)
+        if falhas:
+            print(f"🔁 Convertendo {len(falhas)} arquivos com o decodificador interno...")
+            _converter_interno(falhas, manifesto)
+        return
+    falhas = _converter_interno(pendentes, manifesto)
+    if falhas and crx2rnx_path:
+        print(f"🔁 Convertendo {len(falhas)} arquivos com o CRX2RNX...")
+        _converter_externo(falhas, crx2rnx_path, pasta_d_path.parent / "logs", manifesto)
+
+def _saidas_separacao(pasta_saida_path, constelacoes, nome_o, compactar=False):
+    """
+    Caminho de saída de cada constelação: <pasta>/<NOME>/<NOME>_<arquivo .o>.
+    Com `compactar`, a saída é Hatanaka + gzip: <NOME>_<arquivo>.22d.gz (ou .crx.gz).
+    """
+    if compactar:
+        nome_o = hatanaka.nome_crinex(nome_o).name + ".gz"
+    return {pasta_saida_path / nome / f"{nome}_{nome_o}": sistemas
+            for nome, sistemas in constelacoes.items()}
+
+def _parametros_separacao(constelacoes, compactar):
+    # Registrado no manifesto: mudar a compressão força a separação de novo
+    return {"constelacoes": constelacoes, "compactar": True} if compactar else constelacoes
+
+def _indexar_saidas(saidas):
+    """
+    Grava o índice de épocas (.idx.npz) ao lado de cada arquivo separado, se o NumPy estiver disponível.
+    Nas saídas compactadas, o índice aponta para o texto RINEX decodificado.
+    """
+    if indice_rinex is None:
+        return
+    for saida in saidas:
+        try:
+            indice_rinex.indexar(saida)
+        except (ValueError, OSError) as erro:
+            print(f"⚠️ Índice de épocas não gerado para {Path(saida).name}: {erro}")
+
+def _temporario_teqc(saida):
+    return saida.with_name(saida.name + ".tmp")
+
+def _apagar(caminhos):
+    for caminho in caminhos:
+        caminho.unlink(missing_ok=True)
+
+def _separar_externo(falhas, teqc_path, pasta_saida_path, constelacoes, pasta_logs, manifesto=None,
+                     compactar=False):
+    """
+    Separa com o teqc os arquivos que o separador interno não leu, pelo orquestrador
+    assíncrono (um job por constelação, com a saída padrão indo para <saida>.tmp).
+    As saídas só recebem o nome final quando todas as constelações do arquivo dão certo;
+    senão, os .tmp são apagados. Com `compactar`, cada saída do teqc é convertida para
+    Hatanaka + gzip no fim.
+    """
+    print(f"🛰️  Tentando {len(falhas)} arquivos com o teqc...")
+
+    def gerar_jobs():
+        for arquivo_o, hash_entrada in falhas:
+            # O teqc só grava RINEX comum: a compressão vem depois, quando todas as constelações derem certo
+            for saida, sistemas in _saidas_separacao(pasta_saida_path, constelacoes, arquivo_o.name).items():
+                # O teqc exclui sistemas: -G GPS, -R GLONASS, -E Galileo, -C BeiDou, -J QZSS, -S SBAS
+                exclusoes = [f"-{s}" for s in "GRECJS" if s not in sistemas]
+                yield Job(f"teqc_{saida.name}", [teqc_path] + exclusoes + [arquivo_o],
+                          stdout=_temporario_teqc(saida), dados=(arquivo_o, hash_entrada))
 
-def _processar_teqc(arquivo_o_path, teqc_path, gps_dir, glonass_dir, gps_glonass_dir):
-    """Função auxiliar para paralelismo do TEQC."""
+    def concluir(resultado):
+        if resultado.codigo != 0:
+            print(_mensagem_falha_externa(resultado, "TEQC"))
+
+    resultados = executar_jobs(gerar_jobs(), pasta_logs, timeout=TIMEOUT_EXTERNO, ao_concluir=concluir)
+
+    # Um arquivo só conta como separado se todas as suas constelações deram certo
+    codigos = {}
+    for resultado in resultados:
+        codigos.setdefault(resultado.job.dados, []).append(resultado.codigo)
+    for (arquivo_o, hash_entrada), lista in codigos.items():
+        saidas = _saidas_separacao(pasta_saida_path, constelacoes, arquivo_o.name)
+        temporarios = [_temporario_teqc(saida) for saida in saidas]
+        if any(codigo != 0 for codigo in lista):
+            _apagar(temporarios)
+            continue
+        if compactar:
+            compactadas = _saidas_separacao(pasta_saida_path, constelacoes, arquivo_o.name, compactar)
+            try:
+                for temporario, compactada in zip(temporarios, compactadas):
+                    hatanaka.rnx2crx(temporario, compactada)
+            except (ValueError, OSError) as erro:
+                print(f"❌ Erro ao compactar a saída do TEQC: {arquivo_o.name}\n{erro}")
+                _apagar(list(compactadas))
+                continue
+            finally:
+                _apagar(temporarios)
+            saidas = compactadas
+        else:
+            for temporario, saida in zip(temporarios, saidas):
+                os.replace(temporario, saida)
+        print(f"🛰️  Processado TEQC: {arquivo_o.name}")
+        _indexar_saidas(saidas)
+        if manifesto is not None:
+            manifesto.registrar("separacao", arquivo_o.name, hash_entrada, "teqc", list(saidas),
+                                parametros=_parametros_separacao(constelacoes, compactar),
+                                caminho_entrada=arquivo_o)
+
+def _processar_separacao(arquivo_o_path, pasta_saida_path, constelacoes, compactar=False):
+    """
+    Função auxiliar para paralelismo da separação: uma leitura grava todas as constelações.
+    Retorna (mensagem, ferramenta usada ou None em caso de erro).
+    """
+    arquivo = arquivo_o_path.name
+    saidas = _saidas_separacao(pasta_saida_path, constelacoes, arquivo, compactar)
     try:
-        arquivo = arquivo_o_path.name
-        gps_saida = gps_dir / f"GPS_{arquivo}"
-        glonass_saida = glonass_dir / f"GLONASS_{arquivo}"
-        gps_glonass_saida = gps_glonass_dir / f"GPS_GLONASS_{arquivo}"
-
-        # -R = GPS, -E = Galileo/BeiDou/QZSS (excluir)
-        subprocess.run(f'"{teqc_path}" -R -E "{arquivo_o_path}" > "{gps_saida}"', shell=True, check=True)
-        # -G = GLONASS
-        subprocess.run(f'"{teqc_path}" -G -E "{arquivo_o_path}" > "{glonass_saida}"', shell=True, check=True)
-        # Padrão (GPS+GLONASS)
-        subprocess.run(f'"{teqc_path}" -E "{arquivo_o_path}" > "{gps_glonass_saida}"', shell=True, check=True)
-        
-        return f"🛰️  Processado TEQC: {arquivo}"
-    except subprocess.CalledProcessError as e:
-        return f"❌ Erro no TEQC: {arquivo_o_path.name}. O arquivo pode estar corrompido.\n{e}"
-
-def separar_teqc(pasta_d_path, pasta_saida_path, teqc_path):
-    """Separa arquivos .o por constelação em paralelo."""
-    gps_dir = pasta_saida_path / "GPS"
-    glonass_dir = pasta_saida_path / "GLONASS"
-    gps_glonass_dir = pasta_saida_path / "GPS_GLONASS"
-    os.makedirs(gps_dir, exist_ok=True)
-    os.makedirs(glonass_dir, exist_ok=True)
-    os.makedirs(gps_glonass_dir, exist_ok=True)
-
-    regex_o = re.compile(r".*\.\d{2}o$", re.IGNORECASE)
-    arquivos_o = [f for f in pasta_d_path.glob('*') if regex_o.match(f.name)]
+        separar_constelacoes(arquivo_o_path, saidas)
+        _indexar_saidas(saidas)
+        return f"🛰️  Separado: {arquivo} ({', '.join(constelacoes)})", FERRAMENTA_SEPARACAO
+    except (ValueError, OSError) as erro:
+        return f"❌ Erro na separação: {arquivo}. O arquivo pode estar corrompido.\n{erro}", None
+
+def separar_teqc(pasta_d_path, pasta_saida_path, teqc_path=None, constelacoes=None, manifesto=None,
+                 compactar=False):
+    """
+    Separa arquivos .o/.rnx por constelação em paralelo.
+    `constelacoes` mapeia o nome da pasta/prefixo para os sistemas incluídos
+    (padrão: GPS, GLONASS e GPS_GLONASS); ex: {"GALILEO_BEIDOU": "EC"}.
+    Com `compactar`, as saídas são gravadas direto em Hatanaka + gzip (.22d.gz / .crx.gz).
+    Com `manifesto`, só separa arquivos novos ou alterados.
+    """
+    if constelacoes is None:
+        constelacoes = CONSTELACOES_PADRAO
+    for nome in constelacoes:
+        os.makedirs(pasta_saida_path / nome, exist_ok=True)
+
+    arquivos_o = [f for f in pasta_d_path.glob('*') if regex_obs.match(f.name)]
     
     if not arquivos_o:
         print("❌ Nenhum arquivo .o encontrado para processamento de satélite!")
         return
     
-    print(f"Iniciando separação por satélite de {len(arquivos_o)} arquivos...")
+    parametros = _parametros_separacao(constelacoes, compactar)
+    pendentes, pulados = _filtrar_pendentes(manifesto, "separacao", arquivos_o, FERRAMENTA_SEPARACAO, parametros)
+    if pulados:
+        print(f"⏭️ {pulados} arquivos já separados (manifesto), pulando.")
+    print(f"Iniciando separação por satélite de {len(pendentes)} arquivos...")
 
+    falhas = []
     with concurrent.futures.ProcessPoolExecutor() as executor:
-        tarefas = {executor.submit(_processar_teqc, arquivo_o, teqc_path, gps_dir, glonass_dir, gps_glonass_dir): arquivo_o for arquivo_o in arquivos_o}
+        tarefas = {executor.submit(_processar_separacao, arquivo_o, pasta_saida_path, constelacoes, compactar):
+                   (arquivo_o, hash_entrada) for arquivo_o, hash_entrada in pendentes}
         
         for futuro in concurrent.futures.as_completed(tarefas):
-            print(futuro.result())
+            mensagem, ferramenta = futuro.result()
+            print(mensagem)
+            arquivo_o, hash_entrada = tarefas[futuro]
+            if not ferramenta:
+                falhas.append((arquivo_o, hash_entrada))
+            elif manifesto is not None:
+                saidas = _saidas_separacao(pasta_saida_path, constelacoes, arquivo_o.name, compactar)
+                manifesto.registrar("separacao", arquivo_o.name, hash_entrada, ferramenta, list(saidas),
+                                    parametros=parametros, caminho_entrada=arquivo_o)
+
+    # O teqc, se configurado, fica só como alternativa para os arquivos que falharam (RINEX 2)
+    if falhas and teqc_path:
+        _separar_externo(falhas, teqc_path, pasta_saida_path, constelacoes, pasta_saida_path.parent / "logs",
+                         manifesto, compactar)
+
+def _processar_dia(arquivo_d_path, pasta_saida_path, constelacoes, compactar=False):
+    """
+    Função auxiliar do modo pipeline: decodifica o Hatanaka direto para o separador
+    (sem gravar o .o) e apaga o arquivo .d consumido.
+    Retorna (mensagem, ferramenta usada ou None em caso de erro).
+    """
+    nome_o = hatanaka.nome_rinex(arquivo_d_path).name
+    saidas = _saidas_separacao(pasta_saida_path, constelacoes, nome_o, compactar)
+    try:
+        with hatanaka.abrir_crinex(arquivo_d_path) as leitor:
+            separar_linhas(leitor.linhas(), saidas, arquivo_d_path.name)
+    except (ValueError, OSError, EOFError) as erro:
+        return f"❌ Erro no pipeline: {arquivo_d_path.name} (mantido para conferência)\n{erro}", None
+    _indexar_saidas(saidas)
+    os.remove(arquivo_d_path)
+    return f"🛰️  Convertido e separado: {arquivo_d_path.name} → {nome_o}", FERRAMENTA_PIPELINE
+
+def processar_pipeline(origem_path, pasta_d_path, pasta_saida_path, constelacoes=None, max_workers=None,
+                       manifesto=None, compactar=False):
+    """
+    Modo pipeline: cada estação-dia passa por extração, decodificação e separação
+    assim que fica pronta, sem esperar as demais. `origem_path` pode ser um zip, uma pasta
+    ou um iterável de zips (ex: os downloads da RBMC, processados enquanto os outros baixam). A extração alimenta uma fila
+    limitada e a conversão/separação roda em processos, com no máximo
+    2 arquivos por núcleo em andamento. Os intermediários são apagados ao serem consumidos.
+    Com `manifesto`, membros do zip já processados e inalterados nem são extraídos.
+    Com `compactar`, as saídas são gravadas em Hatanaka + gzip.
+    """
+    if constelacoes is None:
+        constelacoes = CONSTELACOES_PADRAO
+    for nome in constelacoes:
+        os.makedirs(pasta_saida_path / nome, exist_ok=True)
+    parametros = _parametros_separacao(constelacoes, compactar)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    fila = queue.Queue(maxsize=TAMANHO_FILA_PIPELINE)
+
+    pular = None
+    if manifesto is not None:
+        def pular(membro):
+            nome = os.path.basename(membro.filename)
+            return manifesto.atualizado("pipeline", nome, _hash_membro(membro), FERRAMENTA_PIPELINE, parametros)
+
+    def extrair():
+        try:
+            # fila.put bloqueia quando a fila está cheia: a extração espera a conversão
+            descompactar_zips(origem_path, pasta_d_path, pular=pular,
+                              ao_extrair=lambda caminho, membro: fila.put((caminho, _hash_membro(membro))))
+        finally:
+            fila.put(None)
+
+    extrator = threading.Thread(target=extrair, daemon=True)
+    extrator.start()
+
+    def concluir(futuro):
+        mensagem, ferramenta = futuro.result()
+        print(mensagem)
+        arquivo_d, hash_entrada = tarefas.pop(futuro)
+        if manifesto is not None and ferramenta:
+            saidas = _saidas_separacao(pasta_saida_path, constelacoes, hatanaka.nome_rinex(arquivo_d).name,
+                                       compactar)
+            manifesto.registrar("pipeline", arquivo_d.name, hash_entrada, ferramenta, list(saidas),
+                                parametros=parametros)
+
+    tarefas = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            item = fila.get()
+            if item is None:
+                break
+            if len(tarefas) >= 2 * max_workers:
+                prontos, _ = concurrent.futures.wait(tarefas, return_when=concurrent.futures.FIRST_COMPLETED)
+                for futuro in prontos:
+                    concluir(futuro)
+            arquivo_d, hash_entrada = item
+            tarefas[executor.submit(_processar_dia, arquivo_d, pasta_saida_path, constelacoes, compactar)] = item
+
+        for futuro in concurrent.futures.as_completed(list(tarefas)):
+            concluir(futuro)
+    extrator.join()
+
+def controle_qualidade(pasta_saida_path, constelacoes=None):
+    """
+    Roda o QC (qc_rinex) nos arquivos separados de cada constelação e grava a tabela
+    qc_rinex.csv em cada pasta; o script de PPP usa essa tabela para pular ou marcar arquivos.
+    """
+    if qc_rinex is None:
+        print("⚠️ NumPy não instalado: controle de qualidade não executado.")
+        return
+    if constelacoes is None:
+        constelacoes = CONSTELACOES_PADRAO
+    for nome in constelacoes:
+        pasta = pasta_saida_path / nome
+        # Inclui as saídas compactadas (.22d.gz / .crx.gz), que o leitor decodifica em memória
+        arquivos = [f for f in pasta.glob('*') if regex_arquivo_obs.match(f.name)]
+        if not arquivos:
+            continue
+        metricas = qc_rinex.qc_arquivos(arquivos, pasta / qc_rinex.NOME_TABELA)
+        reprovados = [f.name for f in arquivos if qc_rinex.avaliar(metricas.get(f.name, {}))]
+        print(f"🔎 QC {nome}: {len(arquivos)} arquivos, {len(reprovados)} reprovados (ver {qc_rinex.NOME_TABELA})")
+        for arquivo in sorted(reprovados):
+            print(f"   ⚠️ {arquivo}: {'; '.join(qc_rinex.avaliar(metricas[arquivo]))}")
+
+class MonitorDisco(threading.Thread):
+    """Mede periodicamente o espaço ocupado por uma pasta e guarda o pico."""
+
+    def __init__(self, pasta, intervalo=0.5):
+        super().__init__(daemon=True)
+        self.pasta = Path(pasta)
+        self.intervalo = intervalo
+        self.pico = 0
+        self._parar = threading.Event()
+
+    def _medir(self):
+        total = 0
+        for raiz, _, arquivos in os.walk(self.pasta):
+            for arquivo in arquivos:
+                try:
+                    total += os.path.getsize(os.path.join(raiz, arquivo))
+                except OSError:
+                    pass  # arquivo apagado durante a medição
+        self.pico = max(self.pico, total)
+
+    def run(self):
+        self._medir()
+        while not self._parar.wait(self.intervalo):
+            self._medir()
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+        self._medir()
+        return self.pico
 
 # --- FUNÇÃO 'compactar_por_lote' REMOVIDA ---
 
 def main():
     print("🔧 PROCESSAMENTO GNSS - SCRIPT OTIMIZADO (PARA RTKLIB)")
     
-    origem_zip = input("📂 Caminho do .ZIP do IBGE ou pasta com zips: ").strip().strip('"')
+    origem_zip = input("📂 Caminho do .ZIP do IBGE ou pasta com zips (Enter = baixar da RBMC): ").strip().strip('"')
+    estacoes = None
+    if not origem_zip:
+        estacoes = [e.strip().upper() for e in input("📡 Estações RBMC (ex: POLI,SPJA): ").split(',') if e.strip()]
+        data_inicial = datetime.datetime.strptime(input("🗓️ Data inicial (DD/MM/AAAA): ").strip(), "%d/%m/%Y").date()
+        data_final = datetime.datetime.strptime(input("🗓️ Data final (DD/MM/AAAA): ").strip(), "%d/%m/%Y").date()
     pasta_base = input("📁 Caminho onde deseja salvar os dados processados: ").strip().strip('"')
     mes_ano = input("🗓️ Informe o mês e ano (ex: NOV_22): ").strip().strip('"').upper()
+    sistemas = input("🛰️ Constelações a separar (Enter = GPS, GLONASS e GPS+GLONASS; ex: G,R,GR,EC; "
+                     "0 = não separar): ").strip().upper()
+
+    # Sem separação, o PPP roda cada constelação sobre o arquivo original (pos1-navsys no 2RTKlib-PPP.py)
+    separar = sistemas != "0"
+    constelacoes = CONSTELACOES_PADRAO
+    if sistemas and separar:
+        constelacoes = {nome_constelacao(s.strip()): s.strip() for s in sistemas.split(',') if s.strip()}
 
     # Validação dos executáveis
-    CAMINHO_CRX2RNX = Path(crx_path)
-    CAMINHO_TEQC = Path(teqc_path)
-    
-    if not CAMINHO_CRX2RNX.is_file():
-        print(f"❌ Erro: CRX2RNX.exe não encontrado em '{CAMINHO_CRX2RNX}'")
-        return
-    if not CAMINHO_TEQC.is_file():
-        print(f"❌ Erro: teqc.exe não encontrado em '{CAMINHO_TEQC}'")
-        return
+    # CRX2RNX e teqc são opcionais. O CRX2RNX (caminho acima ou no PATH) converte quando existe, com o
+    # decodificador em Python como alternativa; a separação é feita em Python e só recorre ao teqc em caso de falha
+    CAMINHO_CRX2RNX = Path(crx_path) if Path(crx_path).is_file() else shutil.which("CRX2RNX") or shutil.which("crx2rnx")
+    CAMINHO_TEQC = Path(teqc_path) if Path(teqc_path).is_file() else None
+
+    modo_pipeline = compactar = False
+    if separar:
+        modo_pipeline = input("⚡ Usar modo pipeline (cada arquivo segue direto para conversão e separação)? [s/N]: ").strip().lower() == 's'
+        compactar = input("🗜️ Gravar os arquivos separados compactados (Hatanaka + gzip)? [S/n]: ").strip().lower() != 'n'
 
     # Usa Pathlib para gerenciar pastas
     pasta_final = Path(pasta_base) / mes_ano
@@ -174,16 +667,57 @@ def main():
     pasta_sep = pasta_final / "2 - Dados separados por satélite (Prontos para RTKLIB)"
     # --- pasta_zip FOI REMOVIDA ---
 
-    print_etapa("1/3 - Descompactando e separando arquivos .d")
-    descompactar_zip(origem_zip, pasta_d)
+    if estacoes:
+        # Download da RBMC: cada zip segue para a extração assim que termina de baixar.
+        # Importado só aqui: o download usa o tqdm, que o processamento de zips locais dispensa
+        from baixador_rbmc import baixar_rbmc
+        origem_zip = baixar_rbmc(estacoes, data_inicial, data_final, pasta_final / "0 - Zips RBMC")
+
+    # Manifesto incremental: reexecuções só processam arquivos novos ou alterados
+    manifesto = Manifesto(pasta_final)
+
+    inicio = time.perf_counter()
+    monitor = MonitorDisco(pasta_final)
+    monitor.start()
+
+    if not separar:
+        # Os arquivos Hatanaka ficam como estão: QC, catálogo e PPP leem o .d direto, sem .o nem cópias por constelação
+        print_etapa("1/1 - Descompactando arquivos .d (sem separação por satélite)")
+        descompactar_zips(origem_zip, pasta_d, manifesto=manifesto)
+        pasta_sep = pasta_d
+    elif modo_pipeline:
+        print_etapa("PIPELINE - Extração → Hatanaka → Separação por satélite [EM PARALELO]")
+        processar_pipeline(origem_zip, pasta_d, pasta_sep, constelacoes, manifesto=manifesto, compactar=compactar)
+    else:
+        print_etapa("1/3 - Descompactando e separando arquivos .d")
+        descompactar_zips(origem_zip, pasta_d, manifesto=manifesto)
+
+        print_etapa("2/3 - Convertendo Hatanaka (.d) p/ RINEX (.o) [EM PARALELO]")
+        converter_crx2rnx(pasta_d, CAMINHO_CRX2RNX, manifesto)
+
+        print_etapa("3/3 - Separando arquivos por satélite [EM PARALELO]")
+        separar_teqc(pasta_d, pasta_sep, CAMINHO_TEQC, constelacoes, manifesto, compactar)
+
+    print_etapa("QC - Controle de qualidade dos arquivos separados [EM PARALELO]")
+    if separar:
+        controle_qualidade(pasta_sep, constelacoes)
+    else:
+        controle_qualidade(pasta_final, {pasta_d.name: None})
 
-    print_etapa("2/3 - Convertendo Hatanaka (.d) p/ RINEX (.o) [EM PARALELO]")
-    converter_crx2rnx(pasta_d, CAMINHO_CRX2RNX)
+    # Catálogo de cabeçalhos de todos os meses/estações (consultado pelo script de PPP)
+    catalogo = Path(pasta_base) / NOME_CATALOGO
+    lidos, inalterados, removidos = atualizar_catalogo(catalogo, [pasta_sep])
+    print(f"🗂️ Catálogo atualizado: {lidos} novos/alterados, {inalterados} sem mudança, {removidos} removidos ({catalogo})")
 
-    print_etapa("3/3 - Separando arquivos por satélite (TEQC) [EM PARALELO]")
-    separar_teqc(pasta_d, pasta_sep, CAMINHO_TEQC)
+    pico_disco = monitor.parar()
+    manifesto.compactar()
+    duracao = time.perf_counter() - inicio
 
     print_etapa("🎉 FINALIZAÇÃO")
+    print(f"⏱️ Tempo total ({'pipeline' if modo_pipeline else 'por etapas'}): {duracao:.1f} s")
+    if not separar:
+        print("🛰️ Sem separação: informe as constelações (ex: G,R,GR) no 2RTKlib-PPP.py")
+    print(f"💾 Pico de uso de disco em {pasta_final.name}: {_formatar_bytes(pico_disco)}")
     print(f"Processamento concluído! Seus arquivos RINEX estão prontos para o RTKLIB em:")
     print(f"{pasta_sep}")
 
@@ -1,148 +1,234 @@
 import os
-import ftplib
 import datetime
 import gnsscal
-import gzip
+import re
 import shutil
+import urllib.error
+import urllib.parse
+import concurrent.futures
 from pathlib import Path
 from tqdm import tqdm
 
-# Configurações do Servidor FTP do GFZ (Geralmente aberto/anônimo)
-FTP_HOST = "ftp.gfz-potsdam.de"
-FTP_BASE_PATH = "/GNSS/products"  # Caminho base dos produtos
+from cache_listagens import NOME_CACHE, CacheListagens
+from conexoes_ftp import ERROS_CONEXAO, PoolFTP
+from conexoes_http import ERROS_CONEXAO_HTTP, PoolHTTP
+from deposito_produtos import DepositoProdutos, chave_produto, ligar_arquivo
+from resolvedor_produtos import (ESPELHOS, candidatos, invalidar_listagem, local_espelho, resolver, sondar_espelhos,
+                                 url_arquivo)
+from transferencias import baixar_arquivo_ftp, baixar_arquivo_http
 
-def descompactar_z_gz(caminho_arquivo):
-    """Descompacta arquivos .Z ou .gz para que o RTKLIB possa ler."""
-    caminho_arquivo = Path(caminho_arquivo)
-    # Remove a extensão de compressão para o nome final
-    caminho_final = caminho_arquivo.with_suffix('')
-    
-    print(f"   🔓 Descompactando: {caminho_arquivo.name}...")
-    
-    try:
-        # Tenta usar gzip (funciona para .gz e muitas vezes para .Z modernos)
-        with gzip.open(caminho_arquivo, 'rb') as f_in:
-            with open(caminho_final, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        
-        # Remove o arquivo compactado original para economizar espaço
-        os.remove(caminho_arquivo)
-        return caminho_final
-    except Exception as e:
-        print(f"   ⚠️ Falha ao descompactar automaticamente (pode ser necessário 7zip): {e}")
-        return caminho_arquivo
-
-def baixar_arquivo_ftp(ftp, pasta_remota, nome_arquivo, pasta_local):
-    """Baixa um arquivo específico do FTP com barra de progresso."""
-    caminho_local = Path(pasta_local) / nome_arquivo
-    
-    try:
-        tamanho_arquivo = ftp.size(f"{pasta_remota}/{nome_arquivo}")
-    except:
-        tamanho_arquivo = 0
+# Servidores dos produtos (GFZ, IGN, BKG...): ver resolvedor_produtos.ESPELHOS
+# Tipos de produto baixados para cada dia (órbitas e relógios)
+TIPOS_PRODUTO = ("sp3", "clk")
 
-    print(f"   ⬇️ Baixando: {nome_arquivo}")
-    
-    with open(caminho_local, 'wb') as f:
-        with tqdm(total=tamanho_arquivo, unit='B', unit_scale=True, desc=nome_arquivo, leave=False) as pbar:
-            def callback(data):
-                f.write(data)
-                pbar.update(len(data))
-            
+# Cache das listagens das pastas de semana (compartilhado entre projetos/pastas de saída)
+ARQUIVO_CACHE_LISTAGENS = Path.home() / ".gnss" / NOME_CACHE
+
+# Semanas com pelo menos esta idade já têm os produtos finais publicados (latência do IGS
+# de ~2 semanas): a listagem delas fica no cache para sempre
+SEMANAS_PRODUTO_FINAL = 3
+
+def nome_local(nome_arquivo):
+    """
+    Nome do produto descompactado na pasta de saída, com a extensão que o RTKLIB e o script de PPP
+    procuram: IGS0OPSFIN_..._ORB.SP3.gz -> IGS0OPSFIN_..._ORB.sp3, igs22342.clk_30s.Z -> igs22342_30s.clk.
+    """
+    base = Path(nome_arquivo).with_suffix('').name
+    base = re.sub(r"\.([A-Za-z0-9]+)_(\w+)$", r"_\2.\1", base)
+    raiz, _, extensao = base.rpartition('.')
+    return f"{raiz}.{extensao.lower()}"
+
+def agrupar_por_semana(data_inicial, data_final):
+    """Todos os dias do intervalo (inclusive) agrupados por semana GPS: {semana: [(data, dia_semana), ...]}."""
+    semanas = {}
+    data = data_inicial
+    while data <= data_final:
+        semana_gps, dia_semana = gnsscal.date2gpswd(data)
+        semanas.setdefault(semana_gps, []).append((data, dia_semana))
+        data += datetime.timedelta(days=1)
+    return semanas
+
+def _semana_final(semana_gps):
+    semana_atual, _ = gnsscal.date2gpswd(datetime.date.today())
+    return semana_gps <= semana_atual - SEMANAS_PRODUTO_FINAL
+
+def _melhores_candidatos(semana_gps, dias, tipos):
+    """Melhor candidato de cada dia e tipo da semana: a sondagem termina quando todos aparecem."""
+    return {candidatos(semana_gps, dia_semana, tipo)[0].nome for _, dia_semana in dias for tipo in tipos}
+
+def _baixar_de(espelho, pools, semana_gps, nome, pasta, tamanho):
+    """Baixa (descompactando) um arquivo da pasta da semana de um espelho FTP ou HTTP."""
+    esquema, host, porta, pasta_remota = local_espelho(espelho, semana_gps)
+    if esquema == "ftp":
+        return pools[(host, porta)].executar(baixar_arquivo_ftp, pasta_remota, nome, pasta, False, tamanho, None, True)
+    caminho_remoto = urllib.parse.urlsplit(url_arquivo(espelho, semana_gps, nome)).path
+    return pools[(host, porta)].executar(baixar_arquivo_http, caminho_remoto, nome, pasta, False, tamanho, None, True)
+
+def _baixar_produto(pools, cache, deposito, semana_gps, resolucao, pasta_saida):
+    """
+    Baixa um produto resolvido, descompactando durante a transferência (só o arquivo descompactado
+    vai para o disco), e guarda no depósito local. Tenta as fontes na ordem em que os espelhos
+    responderam; se uma falhar, passa para a próxima. Com `pasta_saida`, o produto também aparece lá.
+    """
+    # Baixa em uma pasta temporária do próprio depósito: a entrada no depósito é só um os.replace
+    temporaria = deposito.pasta_temporaria()
+    erro = None
+    try:
+        for espelho, tamanho in resolucao.fontes:
             try:
-                ftp.retrbinary(f"RETR {pasta_remota}/{nome_arquivo}", callback)
-                return caminho_local
-            except ftplib.error_perm as e:
-                print(f"   ❌ Erro: Arquivo não encontrado no servidor: {e}")
-                f.close()
-                os.remove(caminho_local)
-                return None
-
-def buscar_e_baixar_produtos(data_alvo, pasta_saida):
+                download = _baixar_de(espelho, pools, semana_gps, resolucao.nome, temporaria, tamanho)
+            except ERROS_CONEXAO + ERROS_CONEXAO_HTTP + (ValueError,) as e:
+                # Falha neste espelho; tamanho diferente do listado pode ser arquivo republicado
+                erro = e
+                invalidar_listagem(cache, espelho, semana_gps)
+                continue
+            if download:
+                caminho = deposito.inserir(download.caminho, mover=True)
+                if pasta_saida:
+                    return ligar_arquivo(caminho, pasta_saida / nome_local(resolucao.nome))
+                return caminho
+            # A listagem dizia que o arquivo existia: está velha, na próxima execução lista de novo
+            invalidar_listagem(cache, espelho, semana_gps)
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+    if erro:
+        raise erro
+    return None
+
+def _do_deposito(deposito, semana_gps, dia_semana, tipo):
+    """Melhor produto do dia já presente no depósito (quando nenhum espelho respondeu), ou None."""
+    for candidato in candidatos(semana_gps, dia_semana, tipo):
+        caminho = deposito.obter(chave_produto(candidato.nome))
+        if caminho:
+            return candidato, caminho
+    return None
+
+def baixar_intervalo(data_inicial, data_final, pasta_saida=None, max_conexoes=None, arquivo_cache=None,
+                     deposito=None, espelhos=None, tipos=TIPOS_PRODUTO):
     """
-    Lógica principal:
-    1. Converte Data -> Semana GPS
-    2. Conecta no FTP
-    3. Tenta achar arquivos SP3 e CLK (nomes curtos ou longos)
+    Baixa os produtos (órbitas SP3 e relógios CLK) de todos os dias entre `data_inicial` e `data_final`.
+    Para cada dia e tipo procura o melhor produto disponível (final, rápido, ultrarrápido; nomes
+    longos e curtos, ver resolvedor_produtos) em todos os espelhos ao mesmo tempo: a pasta de cada
+    semana é listada em paralelo nos espelhos e o arquivo vem do primeiro que respondeu com ele
+    (os outros ficam como alternativa). Os arquivos são baixados em paralelo por pools de conexões
+    FTP reaproveitadas (limite por host em conexoes.CONEXOES_POR_HOST; reconecta se cair).
+    As listagens (nomes, tamanhos e datas) vêm do cache em `arquivo_cache` quando possível.
+    Os produtos ficam no depósito local (deposito_produtos.DepositoProdutos, padrão ~/.gnss/produtos)
+    e os que já estão lá não são baixados de novo: o servidor só é contatado para transferir dados.
+    Os arquivos são descompactados durante a transferência e conferidos (tamanho/SHA-256) antes
+    de entrarem no depósito. Com `pasta_saida`, os produtos do intervalo também são colocados
+    nessa pasta (hard link, sem ocupar espaço). Retorna a lista de arquivos baixados.
     """
-    pasta_saida = Path(pasta_saida)
-    os.makedirs(pasta_saida, exist_ok=True)
+    if pasta_saida:
+        pasta_saida = Path(pasta_saida)
+        os.makedirs(pasta_saida, exist_ok=True)
+    deposito = deposito or DepositoProdutos()
+    espelhos = espelhos or ESPELHOS
 
     # 1. Cálculos de Tempo
-    semana_gps, dia_semana = gnsscal.date2gpswd(data_alvo)
-    print(f"\n🌍 Processando Data: {data_alvo} | Semana GPS: {semana_gps} | Dia: {dia_semana}")
+    semanas = agrupar_por_semana(data_inicial, data_final)
+    total_dias = sum(len(dias) for dias in semanas.values())
+    print(f"\n🌍 Processando {total_dias} dias ({data_inicial} a {data_final}) | "
+          f"Semanas GPS: {min(semanas)} a {max(semanas)}")
 
-    # 2. Conexão FTP
-    try:
-        ftp = ftplib.FTP(FTP_HOST)
-        ftp.login() # Login anônimo
-        print(f"   ✅ Conectado a {FTP_HOST}")
-    except Exception as e:
-        print(f"   ❌ Falha na conexão FTP: {e}")
-        return
+    baixados = []
+    cache = CacheListagens(arquivo_cache or ARQUIVO_CACHE_LISTAGENS)
+    # 2. Conexões FTP (login anônimo) ou HTTP (keep-alive), um pool por servidor, reaproveitadas
+    # por todos os downloads. As conexões só são abertas quando usadas: com tudo no cache, nenhuma é aberta.
+    pools = {}
+    for espelho in espelhos:
+        esquema, host, porta, _ = local_espelho(espelho, 0)
+        if (host, porta) not in pools:
+            pools[(host, porta)] = (PoolFTP(host, max_conexoes=max_conexoes, porta=porta) if esquema == "ftp" else
+                                    PoolHTTP(host, esquema, porta, max_conexoes=max_conexoes))
+    vagas = sum(pool.max_conexoes for pool in pools.values())
+    with concurrent.futures.ThreadPoolExecutor(max_workers=vagas) as executor, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=min(len(semanas), 4)) as por_semana:
+        respostas = dict(zip(semanas, por_semana.map(
+            lambda semana: sondar_espelhos(espelhos, semana, pools, cache, executor, _semana_final(semana),
+                                           _melhores_candidatos(semana, semanas[semana], tipos)),
+            semanas)))
+        listagens = sum(len(lista) for lista in respostas.values())
+        do_cache = sum(1 for lista in respostas.values() for _, _, em_cache in lista if em_cache)
+        print(f"   🗂️ Listagens: {do_cache} do cache, {listagens - do_cache} sondadas em "
+              f"{', '.join(e.nome for e in espelhos)}")
 
-    # Caminho da semana: /GNSS/products/{semana}
-    pasta_remota = f"{FTP_BASE_PATH}/{semana_gps}"
-    
-    try:
-        ftp.cwd(pasta_remota)
-    except:
-        print(f"   ❌ Pasta da semana {semana_gps} não encontrada no servidor.")
-        ftp.quit()
-        return
+        # 3. Um download por produto resolvido; dias da mesma semana usam as mesmas listagens
+        tarefas = {}
+        presentes = 0
+        for semana_gps, dias in semanas.items():
+            for data, dia_semana in dias:
+                for tipo in tipos:
+                    resolucao = resolver(semana_gps, dia_semana, tipo, respostas[semana_gps])
+                    if resolucao is None:
+                        no_deposito = _do_deposito(deposito, semana_gps, dia_semana, tipo)
+                        if no_deposito is None:
+                            print(f"   ⚠️ Nenhum produto {tipo} para {data} nos espelhos.")
+                            continue
+                        nome, caminho = no_deposito[0].nome, no_deposito[1]
+                    else:
+                        nome, caminho = resolucao.nome, deposito.obter(chave_produto(resolucao.nome))
+                    if caminho:
+                        presentes += 1  # já baixado antes (neste ou em outro projeto)
+                        if pasta_saida:
+                            ligar_arquivo(caminho, pasta_saida / nome_local(nome))
+                        continue
+                    if resolucao.solucao != "FIN":
+                        print(f"   ℹ️ {data}: produto {tipo} final indisponível, usando {resolucao.nome}")
+                    tarefas[executor.submit(_baixar_produto, pools, cache, deposito, semana_gps, resolucao,
+                                            pasta_saida)] = resolucao.nome
 
-    # 3. Definir nomes de arquivos para procurar
-    # O RTKLIB gosta de nomes curtos: igsWWWD.sp3
-    # O Servidor pode ter nomes longos: IGS0OPSFIN...
-    
-    # Tentativa 1: Nomes Curtos (Padrão Antigo - Mais compatível com scripts simples)
-    arquivos_alvo = [
-        f"igs{semana_gps}{dia_semana}.sp3.Z",       # Órbita
-        f"igs{semana_gps}{dia_semana}.clk_30s.Z",   # Relógio 30s (Melhor)
-        f"igs{semana_gps}{dia_semana}.clk.Z"        # Relógio 5min (Fallback)
-    ]
-
-    # Listar arquivos na pasta para ver o que tem
-    arquivos_no_servidor = []
-    try:
-        arquivos_no_servidor = ftp.nlst()
-    except:
-        pass
-
-    for alvo in arquivos_alvo:
-        # Verifica se o arquivo curto existe direto
-        if alvo in arquivos_no_servidor:
-            arquivo_baixado = baixar_arquivo_ftp(ftp, pasta_remota, alvo, pasta_saida)
-            if arquivo_baixado:
-                descompactar_z_gz(arquivo_baixado)
-        else:
-            # Se não achou o curto, tenta achar o Longo equivalente
-            # Lógica simplificada: Procura algo que tenha o dia do ano ou semana
-            # (Isso é complexo de fazer perfeito, então focamos no .Z padrão que o GFZ mantém)
-            print(f"   ⚠️ Arquivo {alvo} não encontrado explicitamente.")
-
-    ftp.quit()
-    print("   ✅ Download da data finalizado.")
+        with tqdm(total=len(tarefas), unit='arq', desc="Produtos", disable=not tarefas) as pbar:
+            for futuro in concurrent.futures.as_completed(tarefas):
+                try:
+                    arquivo = futuro.result()
+                except ERROS_CONEXAO + ERROS_CONEXAO_HTTP + (ValueError,) as e:
+                    tqdm.write(f"   ❌ Falha no download de {tarefas[futuro]}: {e}")
+                else:
+                    if arquivo:
+                        baixados.append(arquivo)
+                pbar.update(1)
+
+    for pool in pools.values():
+        pool.fechar()
+    if presentes:
+        print(f"   ⏭️ {presentes} arquivos já estavam no depósito local ({deposito.raiz}), pulando.")
+    print(f"   ✅ Download finalizado: {len(baixados)} de {len(tarefas)} arquivos "
+          f"({sum(p.abertas for p in pools.values())} conexões abertas, "
+          f"{sum(p.reconexoes for p in pools.values())} reconexões).")
+    return baixados
 
 def main():
-    print("🛰️ DOWNLOADER DE PRODUTOS IGS (GFZ FTP)")
+    print("🛰️ DOWNLOADER DE PRODUTOS IGS (espelhos FTP/HTTP)")
     
-    pasta_destino = input("📂 Pasta para salvar os produtos (ex: C:\\GNSS\\PRODUTOS): ").strip().strip('"')
+    # Os produtos sempre ficam no depósito local (~/.gnss/produtos), lido direto pelo script de PPP;
+    # a pasta só é necessária para usar os arquivos fora desses scripts
+    pasta_destino = input("📂 Pasta para salvar os produtos (ex: C:\\GNSS\\PRODUTOS, Enter = só no depósito local): ").strip().strip('"')
     
-    # Modo de entrada: Data única ou Intervalo? Vamos fazer simples por enquanto.
-    data_str = input("🗓️ Data do levantamento (DD/MM/AAAA): ").strip()
+    # Modo de entrada: Data única ou Intervalo (os dias são agrupados por semana GPS)
+    data_str = input("🗓️ Data do levantamento ou data inicial (DD/MM/AAAA): ").strip()
+    data_final_str = input("🗓️ Data final (DD/MM/AAAA, Enter = só um dia): ").strip()
     
     try:
         dia, mes, ano = map(int, data_str.split('/'))
         data_alvo = datetime.date(ano, mes, dia)
-        
-        buscar_e_baixar_produtos(data_alvo, pasta_destino)
-        
-        print(f"\n🎉 Arquivos prontos em: {pasta_destino}")
-        print("DICA: Aponte esta pasta no script de processamento PPP anterior.")
-        
+        data_final = data_alvo
+        if data_final_str:
+            dia, mes, ano = map(int, data_final_str.split('/'))
+            data_final = datetime.date(ano, mes, dia)
     except ValueError:
         print("❌ Formato de data inválido.")
+        return
+    if data_final < data_alvo:
+        print("❌ A data final é anterior à data inicial.")
+        return
+    
+    deposito = DepositoProdutos()
+    baixar_intervalo(data_alvo, data_final, pasta_destino or None, deposito=deposito)
+    
+    print(f"\n🎉 Arquivos prontos em: {pasta_destino or deposito.raiz}")
+    print(f"🗄️ Depósito local: {deposito.ocupado() / 1024 ** 2:.0f} MB de {deposito.orcamento / 1024 ** 2:.0f} MB")
+    print("DICA: No script de PPP, deixe a pasta de produtos em branco para usar o depósito local.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
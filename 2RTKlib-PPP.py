@@ -1,52 +1,497 @@
+import datetime
+import gzip
+import math
 import os
-import subprocess
+import re
+import shutil
+import tempfile
+import sys
+import threading
+import time
+from collections import namedtuple
 from pathlib import Path
-import concurrent.futures
 
-def processar_ppp_rtklib(arquivo_obs, pasta_produtos, config_file, rnx2rtkp_path, pasta_saida):
+import hatanaka
+import motor_librtk
+from cache_antex import OPCOES_ANTEX, CacheAntex, antena_rinex
+from cache_solucoes import CacheSolucoes, opcoes_efetivas
+from catalogo_rinex import consultar_texto, ler_metadados, regex_arquivo_obs
+from deposito_produtos import DepositoProdutos
+from indice_produtos import IndiceProdutos
+from motor_librtk import CHAVE_ROVER, CODIGO_PARCIAL, estacao_rinex, localizar_librtk, modelo_rover
+from orquestrador import CODIGO_FALHA_PREPARACAO, Job, concorrencia_recursos, executar_lote
+from separador_constelacoes import nome_constelacao
+from varredura_ppp import (NOME_TABELA_VARIANTE, confs_constelacoes, escrever_conf, gravar_resultados, ler_grade,
+                           variantes)
+
+# Controle de qualidade antes do PPP (precisa do NumPy)
+try:
+    import qc_rinex
+except ImportError:
+    qc_rinex = None
+
+# Limite de tempo (s) de cada execução do rnx2rtkp; um arquivo travado não segura o lote
+# (um grupo do motor librtk tem esse limite por estação)
+TIMEOUT_PPP = 1800
+# Execuções de cada arquivo em falhas transitórias (tempo esgotado, processo morto) e espera (s) antes de repetir
+TENTATIVAS_PPP = 2
+ESPERA_PPP = 5.0
+# Memória reservada por rnx2rtkp em andamento (bytes): limita quantos rodam juntos em máquinas com pouca RAM
+MEMORIA_PPP = 512 * 1024 ** 2
+NOME_RELATORIO = "relatorio_ppp.csv"
+# Subpasta de RESULTADOS_PPP com uma pasta por variante da varredura de configurações
+PASTA_VARREDURA = "VARREDURA"
+# ANTEX reduzido do lote e o .conf base que aponta para ele, em RESULTADOS_PPP
+NOME_ANTEX_LOTE = "antex_lote.atx"
+NOME_CONF_ANTEX = "ppp_antex.conf"
+
+# Tamanho aproximado do RINEX descompactado em relação ao Hatanaka e ao gzip (para estimar o custo)
+FATOR_HATANAKA = 3
+FATOR_GZIP = 4
+
+# Observações compactadas (Hatanaka e/ou gzip) só são descompactadas durante a execução
+# do rnx2rtkp, de preferência em memória (tmpfs /dev/shm no Linux); senão na pasta temporária padrão
+PASTA_TEMPORARIA = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+# Espaço (bytes) dos RINEX descompactados ao mesmo tempo no lote: limita o tamanho dos grupos do motor
+# librtk, que descompacta as observações de todas as estações do grupo antes do postpos
+ORCAMENTO_DESCOMPACTADOS = 2 * 1024 ** 3
+
+# Data no nome padrão dos arquivos: RINEX 2 (ssssDDDf.YYo/d, com prefixo GPS_ etc.) e RINEX 3 (início e duração)
+regex_dia_rinex2 = re.compile(r"(?:^|_)[a-z0-9]{4}(\d{3})[a-z0-9]\.(\d{2})[od](?:\.gz)?$", re.IGNORECASE)
+regex_periodo_rinex3 = re.compile(r"_(\d{4})(\d{3})(\d{2})(\d{2})_(\d{2})([MHD])_", re.IGNORECASE)
+MINUTOS_PERIODO = {"M": 1, "H": 60, "D": 1440}
+
+# Uma execução do lote: configuração (variante, constelação, .conf), observação, comando do rnx2rtkp,
+# .pos e a EntradaCompartilhada da observação compactada (ou None)
+Execucao = namedtuple('Execucao', 'variante constelacao obs conf comando pos entrada')
+
+def entrada_compactada(arquivo_obs):
+    """Arquivo Hatanaka (.22d, .crx) e/ou gzip, que o rnx2rtkp não lê direto."""
+    return hatanaka.eh_crinex(arquivo_obs) or Path(arquivo_obs).suffix.lower() == ".gz"
+
+def nome_descompactado(arquivo_obs):
+    """Nome do RINEX descompactado: GPS_POLI3050.22d.gz -> GPS_POLI3050.22o, POLI3050.22o.gz -> POLI3050.22o."""
+    if hatanaka.eh_crinex(arquivo_obs):
+        return hatanaka.nome_rinex(arquivo_obs).name
+    return Path(arquivo_obs).with_suffix('').name
+
+def descompactar_obs(arquivo_obs, destino):
+    """Grava em `destino` o RINEX de observação de um arquivo compactado (Hatanaka e/ou gzip)."""
+    if hatanaka.eh_crinex(arquivo_obs):
+        return hatanaka.crx2rnx(arquivo_obs, destino)
+    with gzip.open(arquivo_obs, 'rb') as origem, open(destino, 'wb') as saida:
+        shutil.copyfileobj(origem, saida)
+    return Path(destino)
+
+def periodo_observacao(arquivo_obs):
+    """
+    (primeiro dia, último dia) da observação (datetime.date): pelo nome padrão do arquivo
+    (POLI3050.22o, GPS_POLI3050.22d.gz, POLI00BRA_R_20223050000_01D_30S_MO.crx) ou, se não der, pelo cabeçalho.
     """
-    Executa o rnx2rtkp (RTKLIB) em modo PPP para um arquivo de observação.
+    nome = Path(arquivo_obs).name
+    rinex3 = regex_periodo_rinex3.search(nome)
+    if rinex3:
+        ano, doy, hora, minuto, duracao, unidade = rinex3.groups()
+        inicio = (datetime.datetime(int(ano), 1, 1) + datetime.timedelta(days=int(doy) - 1, hours=int(hora),
+                                                                          minutes=int(minuto)))
+        fim = inicio + datetime.timedelta(minutes=int(duracao) * MINUTOS_PERIODO[unidade.upper()]) \
+            - datetime.timedelta(seconds=1)
+        return inicio.date(), fim.date()
+    rinex2 = regex_dia_rinex2.search(nome)
+    if rinex2:
+        doy, ano = int(rinex2.group(1)), int(rinex2.group(2))
+        data = datetime.date(ano + (1900 if ano >= 80 else 2000), 1, 1) + datetime.timedelta(days=doy - 1)
+        return data, data
+    metadados = ler_metadados(arquivo_obs)
+    if not metadados["primeira"]:
+        raise ValueError(f"Sem data da primeira época em {nome}")
+    primeira = datetime.date.fromisoformat(metadados["primeira"][:10])
+    ultima = datetime.date.fromisoformat(metadados["ultima"][:10]) if metadados["ultima"] else primeira
+    return primeira, ultima
+
+def custo_estimado(arquivo_obs):
     """
+    Custo relativo do PPP de um arquivo: tamanho estimado (bytes) do RINEX descompactado, pelo
+    tamanho em disco e pelos fatores FATOR_GZIP/FATOR_HATANAKA. Cresce com o número de registros
+    de satélite (épocas × satélites); o cabeçalho (INTERVAL) não é lido, para não abrir cada arquivo.
+    """
+    arquivo_obs = Path(arquivo_obs)
+    tamanho = arquivo_obs.stat().st_size
+    if arquivo_obs.suffix.lower() == ".gz":
+        tamanho *= FATOR_GZIP
+    if hatanaka.eh_crinex(arquivo_obs):
+        tamanho *= FATOR_HATANAKA
+    return tamanho
+
+def indice_produtos(pasta_produtos, deposito=None):
+    """Índice dos produtos do lote, do depósito local (se informado) ou da pasta de produtos."""
+    if deposito is not None:
+        return IndiceProdutos.do_deposito(deposito)
+    return IndiceProdutos.da_pasta(pasta_produtos)
+
+def montar_comando_ppp(arquivo_obs, pasta_produtos, config_file, rnx2rtkp_path, pasta_saida, entrada=None,
+                       deposito=None, indice=None):
+    """
+    Monta o comando do rnx2rtkp para um arquivo de observação.
+    `entrada` é o arquivo que o rnx2rtkp lê de fato (ex: a cópia descompactada); padrão: o próprio arquivo.
+    Só entram os produtos dos dias da observação e dos vizinhos, escolhidos em `indice`
+    (indice_produtos.IndiceProdutos, montado uma vez para o lote); sem ele, o índice é montado
+    a partir de `deposito` (deposito_produtos.DepositoProdutos) ou de `pasta_produtos`.
+    Retorna (comando, arquivo .pos) ou (None, mensagem) se faltarem produtos.
+    """
+    arquivo_obs = Path(arquivo_obs)
+    pasta_produtos = Path(pasta_produtos) if pasta_produtos else None
+    pasta_saida = Path(pasta_saida)
+    
+    # Define o nome do arquivo de saída (.pos); GPS_POLI3050.22d.gz -> GPS_POLI3050.pos, como o .22o
+    if entrada_compactada(arquivo_obs):
+        arquivo_obs_rinex = arquivo_obs.with_name(nome_descompactado(arquivo_obs))
+    else:
+        arquivo_obs_rinex = arquivo_obs
+    arquivo_pos = pasta_saida / arquivo_obs_rinex.with_suffix('.pos').name
+    
+    # Órbitas (.sp3) e relógios (.clk) só dos dias que o arquivo cobre, mais o dia anterior e o seguinte:
+    # o rnx2rtkp lê todos os produtos que recebe, então passar a pasta inteira custa tempo e memória
+    if indice is None:
+        indice = indice_produtos(pasta_produtos, deposito)
     try:
-        arquivo_obs = Path(arquivo_obs)
-        pasta_produtos = Path(pasta_produtos)
-        pasta_saida = Path(pasta_saida)
-        
-        # Define o nome do arquivo de saída (.pos)
-        arquivo_pos = pasta_saida / arquivo_obs.with_suffix('.pos').name
-        
-        # Encontra arquivos .sp3 (órbitas) e .clk (relógios) na pasta de produtos
-        # DICA: O RTKLIB é inteligente. Se você passar vários arquivos .sp3/.clk, 
-        # ele usa apenas os que correspondem ao horário do arquivo .o.
-        arquivos_sp3 = list(pasta_produtos.glob("*.sp3")) + list(pasta_produtos.glob("*.eph"))
-        arquivos_clk = list(pasta_produtos.glob("*.clk"))
-        
-        if not arquivos_sp3 or not arquivos_clk:
-            return f"⚠️ Pulei {arquivo_obs.name}: Faltam arquivos .sp3 ou .clk na pasta de produtos."
-
-        # Monta o comando do RTKLIB
-        # rnx2rtkp -k config.conf -o saida.pos obs.o orbita.sp3 relogio.clk
-        cmd = [
-            str(rnx2rtkp_path),
-            '-k', str(config_file),
-            '-o', str(arquivo_pos),
-            str(arquivo_obs)
-        ]
-        
-        # Adiciona todos os arquivos de produto ao comando
-        cmd.extend([str(p) for p in arquivos_sp3])
-        cmd.extend([str(p) for p in arquivos_clk])
-
-        # Executa o comando (sem shell=True para segurança e melhor manuseio de lista)
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode == 0:
-            return f"✅ PPP Sucesso: {arquivo_pos.name}"
+        arquivos_sp3, arquivos_clk = indice.selecionar(*periodo_observacao(arquivo_obs))
+    except (OSError, ValueError, EOFError, StopIteration) as erro:
+        return None, f"⚠️ Pulei {arquivo_obs.name}: não foi possível ler a data ({erro})."
+    
+    if not arquivos_sp3 or not arquivos_clk:
+        origem = "no depósito local (rode o 2BAIXAR-PRODUTOS.py)" if deposito is not None else "na pasta de produtos"
+        return None, f"⚠️ Pulei {arquivo_obs.name}: Faltam arquivos .sp3 ou .clk do dia {origem}."
+
+    # Monta o comando do RTKLIB
+    # rnx2rtkp -k config.conf -o saida.pos obs.o orbita.sp3 relogio.clk
+    cmd = [
+        str(rnx2rtkp_path),
+        '-k', str(config_file),
+        '-o', str(arquivo_pos),
+        str(entrada or arquivo_obs)
+    ]
+    
+    # Adiciona todos os arquivos de produto ao comando
+    cmd.extend([str(p) for p in arquivos_sp3])
+    cmd.extend([str(p) for p in arquivos_clk])
+    return cmd, arquivo_pos
+
+def pos_constelacao(arquivo_pos, constelacao):
+    """.pos de uma constelação sobre o arquivo original: POLI3050.pos -> GPS_POLI3050.pos, como nos separados."""
+    if not constelacao:
+        return Path(arquivo_pos)
+    return Path(arquivo_pos).with_name(f"{constelacao}_{Path(arquivo_pos).name}")
+
+def comando_configuracao(cmd, config_file, arquivo_pos):
+    """O mesmo comando (entrada e produtos) com outro .conf e outro .pos."""
+    # cmd = [rnx2rtkp, '-k', conf, '-o', pos, observação, produtos...]
+    return cmd[:2] + [str(config_file), '-o', str(arquivo_pos)] + cmd[5:]
+
+def chave_solucao(cache, arquivo_obs, cmd, config_file, rnx2rtkp_path):
+    """Chave da solução no cache_solucoes: os produtos são os argumentos depois do arquivo de observação."""
+    # cmd = [rnx2rtkp, '-k', conf, '-o', pos, observação, produtos...]
+    return cache.chave(arquivo_obs, cmd[6:], config_file, rnx2rtkp_path)
+
+def filtrar_qc(arquivos_obs, modo, limites=None):
+    """
+    Aplica o controle de qualidade (qc_rinex) antes do PPP. Usa a tabela qc_rinex.csv
+    da pasta de cada arquivo (calcula o que faltar). `modo`: 'pular' tira os reprovados do lote,
+    'marcar' só avisa. `limites` segue o formato de qc_rinex.LIMITES_PADRAO.
+    Retorna a lista de arquivos a processar.
+    """
+    if qc_rinex is None:
+        print("⚠️ NumPy não instalado: controle de qualidade desligado.")
+        return arquivos_obs
+    por_pasta = {}
+    for obs in arquivos_obs:
+        por_pasta.setdefault(obs.parent, []).append(obs)
+    metricas = {pasta: qc_rinex.qc_arquivos(lista, pasta / qc_rinex.NOME_TABELA) for pasta, lista in por_pasta.items()}
+    aprovados = []
+    for obs in arquivos_obs:
+        motivos = qc_rinex.avaliar(metricas[obs.parent].get(obs.name, {}), limites)
+        if not motivos:
+            aprovados.append(obs)
+        elif modo == 'pular':
+            print(f"⏭️ Pulei {obs.name} (QC reprovado): {'; '.join(motivos)}")
         else:
-            return f"❌ Erro no RTKLIB para {arquivo_obs.name}:\n{result.stderr}"
+            print(f"⚠️ QC reprovado, processando mesmo assim: {obs.name}: {'; '.join(motivos)}")
+            aprovados.append(obs)
+    return aprovados
+
+class EntradaCompartilhada:
+    """
+    Observação compactada descompactada uma única vez para todos os jobs do mesmo arquivo
+    (ex: as variantes de uma varredura) e apagada quando o último deles termina.
+    """
 
-    except Exception as e:
-        return f"💥 Erro de execução: {e}"
+    def __init__(self, arquivo_obs, entrada):
+        self.arquivo_obs = arquivo_obs
+        self.entrada = entrada
+        self.jobs = 0
+        self._trava = threading.Lock()
+
+    def preparar(self):
+        with self._trava:
+            if self.entrada.exists():
+                return
+            os.makedirs(self.entrada.parent, exist_ok=True)
+            # Descompacta com outro nome e renomeia: um job nunca vê o arquivo pela metade
+            temporario = self.entrada.with_name(self.entrada.name + ".tmp")
+            descompactar_obs(self.arquivo_obs, temporario)
+            os.replace(temporario, self.entrada)
+
+    def liberar(self):
+        """Chamado quando um job termina de vez (depois das novas tentativas)."""
+        self.jobs -= 1
+        if self.jobs <= 0:
+            # A pasta é de todos os arquivos da mesma origem: só este sai
+            self.entrada.unlink(missing_ok=True)
+
+def chave_grupo_librtk(execucao):
+    """
+    Chave das execuções que o motor librtk roda em um único postpos: mesma configuração, mesmos produtos
+    (mesmo dia) e mesmos caminhos de entrada e saída a menos do nome da estação.
+    None se a execução fica com o rnx2rtkp (arquivo fora do nome padrão).
+    """
+    entrada = Path(execucao.comando[5])
+    estacao = estacao_rinex(entrada.name)
+    # '%' nos caminhos seria lido pelo RTKLIB como palavra-chave (%r, %Y...)
+    if estacao is None or estacao not in execucao.pos.name or any('%' in arg for arg in execucao.comando[4:]):
+        return None
+    return (modelo_rover(entrada, estacao), modelo_rover(execucao.pos, estacao), str(execucao.conf),
+            tuple(execucao.comando[6:]))
+
+def grupos_librtk(execucoes, tamanho, orcamento=None):
+    """
+    Junta as execuções que o motor librtk roda em um único postpos (ver chave_grupo_librtk). Os grupos têm
+    no máximo `tamanho` execuções e, com `orcamento` (bytes), as observações compactadas de um grupo cabem
+    nele depois de descompactadas (um grupo tem pelo menos uma execução).
+    Retorna (grupos, execuções avulsas, que ficam com o rnx2rtkp).
+    """
+    por_chave = {}
+    avulsas = []
+    for execucao in execucoes:
+        chave = chave_grupo_librtk(execucao)
+        if chave is None:
+            avulsas.append(execucao)
+        else:
+            por_chave.setdefault(chave, []).append(execucao)
+    grupos = []
+    for lista in por_chave.values():
+        grupo, ocupado = [], 0
+        for execucao in lista:
+            tamanho_descompactado = custo_estimado(execucao.obs) if execucao.entrada is not None else 0
+            if grupo and (len(grupo) >= tamanho
+                          or (orcamento is not None and ocupado + tamanho_descompactado > orcamento)):
+                grupos.append(grupo)
+                grupo, ocupado = [], 0
+            grupo.append(execucao)
+            ocupado += tamanho_descompactado
+        grupos.append(grupo)
+    return grupos, avulsas
+
+def job_librtk(numero, grupo, librtk):
+    """Job do orquestrador que roda o grupo em um processo de trabalho do motor_librtk."""
+    primeira = grupo[0]
+    estacoes = [estacao_rinex(Path(execucao.comando[5]).name) for execucao in grupo]
+    entrada = modelo_rover(primeira.comando[5], estacoes[0])
+    cmd = ([sys.executable, motor_librtk.__file__, '-l', librtk, '-k', str(primeira.conf),
+            '-o', str(modelo_rover(primeira.pos, estacoes[0])), '-r', ' '.join(estacoes), str(entrada)]
+           + primeira.comando[6:])
+
+    def preparar():
+        for execucao in grupo:
+            # Sem .pos de execuções anteriores: a solução de cada estação é conferida pelo arquivo
+            execucao.pos.unlink(missing_ok=True)
+            if execucao.entrada is not None:
+                execucao.entrada.preparar()
+
+    nome = '_'.join(["librtk", f"{numero:03d}"] + [n for n in (primeira.variante, primeira.constelacao) if n]
+                    + [entrada.name.replace(CHAVE_ROVER, "")])
+    # O postpos processa as estações uma depois da outra: o tempo limite cresce com o grupo
+    return Job(nome, cmd, dados=(True, grupo), custo=sum(custo_estimado(execucao.obs) for execucao in grupo),
+               antes=preparar, timeout=TIMEOUT_PPP * len(grupo))
+
+def rodar_lote(arquivos_o, configuracoes, path_produtos, deposito, indice, path_rnx2rtkp, pasta_lote, cache,
+               librtk=None):
+    """
+    Roda o PPP de cada arquivo de observação com cada configuração
+    [(variante ou None, constelação ou None, .conf, pasta de saída)]; com constelação, o .pos ganha o
+    prefixo dela (GPS_POLI3050.pos). Os produtos de cada arquivo são escolhidos uma vez e cada observação
+    compactada é descompactada uma vez para todas as configurações. Soluções que já estão no `cache`
+    são copiadas sem rodar. Logs e relatório ficam em `pasta_lote`.
+    Com `librtk` (biblioteca do RTKLIB, ver motor_librtk), as estações do mesmo dia e configuração
+    rodam juntas em um único postpos; o rnx2rtkp fica para os arquivos fora do nome padrão.
+    Retorna {(variante, constelação, arquivo de observação): .pos} das soluções prontas.
+    """
+    pasta_lote = Path(pasta_lote)
+    # Entradas compactadas: descompactadas logo antes do primeiro job do arquivo e apagadas depois do último;
+    # as configurações do mesmo arquivo têm o mesmo custo e rodam juntas, então poucas existem ao mesmo tempo
+    concorrencia = concorrencia_recursos(MEMORIA_PPP)
+    pasta_temp = Path(tempfile.mkdtemp(prefix="ppp_", dir=PASTA_TEMPORARIA))
+    if any(entrada_compactada(obs) for obs in arquivos_o):
+        print(f"🗜️ Arquivos compactados serão descompactados temporariamente em {pasta_temp}")
+    
+    # Soluções já calculadas com as mesmas entradas (observação, produtos, .conf e rnx2rtkp/librtk) são copiadas
+    prontos = {}
+    chaves = {}
+    reaproveitados = 0
+
+    # Os comandos são montados antes de começar (o índice de produtos torna isso barato),
+    # para que o lote rode do arquivo mais caro para o mais barato
+    execucoes = []
+    pastas_entrada = {}
+    for obs in arquivos_o:
+        compartilhada = None
+        if entrada_compactada(obs):
+            # Uma subpasta por pasta de origem: arquivos de meses diferentes podem ter o mesmo nome,
+            # e as estações do mesmo dia ficam na mesma pasta (um único caminho com %r no motor librtk)
+            pasta = pastas_entrada.setdefault(obs.parent, pasta_temp / str(len(pastas_entrada)))
+            compartilhada = EntradaCompartilhada(obs, pasta / nome_descompactado(obs))
+        comando = None
+        for variante, constelacao, conf, pasta_saida in configuracoes:
+            if comando is None:
+                comando, arquivo_pos = montar_comando_ppp(obs, path_produtos, conf, path_rnx2rtkp, pasta_saida,
+                                                          compartilhada and compartilhada.entrada, deposito, indice)
+                if comando is None:
+                    print(arquivo_pos)
+                    break
+            # Mesmos produtos e entrada para todas as configurações: só o .conf e o .pos mudam
+            arquivo_pos = pos_constelacao(Path(pasta_saida) / Path(comando[4]).name, constelacao)
+            cmd = comando_configuracao(comando, conf, arquivo_pos)
+            execucao = Execucao(variante, constelacao, obs, conf, cmd, arquivo_pos, compartilhada)
+            # A chave leva o executável que de fato vai rodar: os arquivos fora do nome padrão
+            # ficam com o rnx2rtkp mesmo com o motor librtk
+            executavel = librtk if librtk and chave_grupo_librtk(execucao) is not None else path_rnx2rtkp
+            chave = chave_solucao(cache, obs, cmd, conf, executavel)
+            if cache.restaurar(chave, arquivo_pos):
+                print(f"♻️ PPP reaproveitado do cache: {arquivo_pos.name}" + (f" ({variante})" if variante else ""))
+                reaproveitados += 1
+                prontos[(variante, constelacao, obs)] = arquivo_pos
+                continue
+            chaves[(variante, constelacao, obs)] = chave
+            if compartilhada is not None:
+                compartilhada.jobs += 1
+            execucoes.append(execucao)
+
+    # Motor librtk: grupos pequenos o bastante para ocupar todos os núcleos e para que os grupos em
+    # andamento não descompactem mais que ORCAMENTO_DESCOMPACTADOS ao mesmo tempo
+    grupos, avulsas = [], execucoes
+    if librtk:
+        grupos, avulsas = grupos_librtk(execucoes, max(1, math.ceil(len(execucoes) / concorrencia)),
+                                        ORCAMENTO_DESCOMPACTADOS // concorrencia)
+    jobs = [job_librtk(numero, grupo, librtk) for numero, grupo in enumerate(grupos, start=1)]
+    for execucao in avulsas:
+        nome = '_'.join(["rnx2rtkp"] + [n for n in (execucao.variante, execucao.constelacao) if n]
+                        + [execucao.obs.name])
+        preparar = execucao.entrada.preparar if execucao.entrada is not None else None
+        jobs.append(Job(nome, execucao.comando, dados=(False, [execucao]), custo=custo_estimado(execucao.obs),
+                        antes=preparar, timeout=TIMEOUT_PPP))
+    calculadas = 0
+
+    def concluir(resultado):
+        nonlocal calculadas
+        motor, grupo = resultado.job.dados
+        repeticoes = f", {resultado.tentativas} tentativas" if resultado.tentativas > 1 else ""
+        for execucao in grupo:
+            if execucao.entrada is not None:
+                execucao.entrada.liberar()
+            chave = (execucao.variante, execucao.constelacao, execucao.obs)
+            # No motor, o código parcial indica que só algumas estações do grupo tiveram solução
+            parcial = motor and resultado.codigo == CODIGO_PARCIAL
+            if resultado.codigo == 0 or (parcial and execucao.pos.is_file() and execucao.pos.stat().st_size):
+                calculadas += 1
+                cache.guardar(chaves[chave], execucao.pos)
+                prontos[chave] = execucao.pos
+                rotulo = f"{execucao.variante}, " if execucao.variante else ""
+                print(f"✅ PPP Sucesso: {execucao.pos.name} ({rotulo}{resultado.duracao:.1f} s{repeticoes})")
+            elif resultado.timeout:
+                print(f"⏰ Tempo limite ({resultado.job.timeout} s{repeticoes}) no RTKLIB para {execucao.obs.name} "
+                      f"({resultado.job.nome}). Veja o log: {resultado.log}")
+            elif resultado.codigo == CODIGO_FALHA_PREPARACAO:
+                print(f"❌ Falha ao preparar a entrada de {execucao.obs.name} (arquivo corrompido?). "
+                      f"Veja o log: {resultado.log}")
+            else:
+                print(f"❌ Erro no RTKLIB para {execucao.obs.name} ({resultado.job.nome}, código "
+                      f"{resultado.codigo}{repeticoes}). Veja o log: {resultado.log}")
+
+    # Processamento Paralelo (PPP consome CPU, cuidado com muitos núcleos): um rnx2rtkp por núcleo,
+    # limitado pela memória livre, do arquivo maior para o menor; cada um com log próprio em <pasta>/logs
+    # e tempo limite próprio (o de um grupo do motor librtk cresce com o número de estações)
+    relatorio = pasta_lote / NOME_RELATORIO
+    inicio = time.perf_counter()
+    try:
+        resultados = executar_lote(jobs, pasta_lote / "logs", max_concorrencia=concorrencia,
+                                   timeout=TIMEOUT_PPP, tentativas=TENTATIVAS_PPP, espera=ESPERA_PPP,
+                                   ao_concluir=concluir, relatorio=relatorio)
+    finally:
+        shutil.rmtree(pasta_temp, ignore_errors=True)
+        cache.salvar_hashes()
+    duracao = time.perf_counter() - inicio
+
+    total = reaproveitados + len(execucoes)
+    if total:
+        print(f"\n♻️ Cache de soluções: {reaproveitados}/{total} reaproveitados ({reaproveitados / total:.0%}; "
+              f"{cache.ocupado() / 1024 ** 2:.0f} MB de {cache.orcamento / 1024 ** 2:.0f} MB)")
+
+    if resultados:
+        ocupado = sum(r.duracao for r in resultados)
+        mais_longo = max(resultados, key=lambda r: r.duracao)
+        picos = [r.memoria for r in resultados if r.memoria]
+        processos = f"{len(grupos)} grupos no librtk, {len(avulsas)} rnx2rtkp" if librtk else "rnx2rtkp"
+        print(f"📊 {calculadas}/{len(execucoes)} soluções calculadas em {duracao:.1f} s ({processos}; "
+              f"{concorrencia} em paralelo, ocupação {ocupado / (duracao * concorrencia):.0%})")
+        print(f"   Mais longo: {mais_longo.job.nome} ({mais_longo.duracao:.1f} s)")
+        if picos:
+            print(f"   Pico de memória de um processo: {max(picos) / 1024 ** 2:.0f} MB")
+        print(f"   Relatório por execução: {relatorio}")
+    return prontos
+
+def preparar_antex(path_config, path_antex, arquivos_obs, path_saida):
+    """
+    .conf base do lote com o ANTEX reduzido (cache_antex): só os satélites válidos nas datas das observações
+    e as antenas dos cabeçalhos delas. Sem `path_antex`, usa o ANTEX citado no .conf; sem nenhum, o próprio .conf.
+    """
+    opcoes = opcoes_efetivas(path_config)
+    if not path_antex:
+        path_antex = next((opcoes[opcao] for opcao in OPCOES_ANTEX if Path(opcoes.get(opcao, "")).is_file()), None)
+    if not path_antex:
+        return path_config
+    datas = []
+    for arquivo_obs in arquivos_obs:
+        try:
+            datas += periodo_observacao(arquivo_obs)
+        except ValueError as erro:
+            print(f"⚠️ {erro}")
+    if not datas:
+        return path_config
+    antenas = set(filter(None, (antena_rinex(arquivo_obs) for arquivo_obs in arquivos_obs)))
+    subconjunto = CacheAntex().subconjunto(path_antex, min(datas), max(datas), antenas,
+                                           Path(path_saida) / NOME_ANTEX_LOTE)
+    print(f"📡 ANTEX do lote: {subconjunto.satelites} satélites e {subconjunto.receptores} antenas de receptor "
+          f"({subconjunto.caminho})")
+    for antena in subconjunto.sem_calibracao:
+        print(f"⚠️ Antena sem calibração no ANTEX: {antena}")
+    novas = {opcao: str(subconjunto.caminho) for opcao in OPCOES_ANTEX}
+    # Sem tipo de antena no .conf, o RTKLIB usa o do cabeçalho de cada observação ("*")
+    if not opcoes.get("ant1-anttype"):
+        novas["ant1-anttype"] = "*"
+    return escrever_conf(path_config, novas, Path(path_saida) / NOME_CONF_ANTEX)
+
+def preparar_varredura(path_config, grade, pasta_varredura, constelacoes=None):
+    """
+    Escreve o .conf de cada variante da grade em <pasta_varredura>/vNN/ (um por constelação, se houver).
+    Retorna (variantes, configurações).
+    """
+    lista = variantes(grade)
+    configuracoes = []
+    for variante in lista:
+        pasta = Path(pasta_varredura) / variante.nome
+        os.makedirs(pasta, exist_ok=True)
+        for constelacao, conf in confs_constelacoes(path_config, constelacoes, pasta, variante.opcoes):
+            configuracoes.append((variante.nome, constelacao, conf, pasta))
+    return lista, configuracoes
 
 def main():
     print("🌍 AUTOMÇÃO DE PPP COM RTKLIB (Python Wrapper)")
@@ -55,14 +500,39 @@ def main():
     # Caminho para o executável rnx2rtkp.exe
     path_rnx2rtkp = input("Caminho do rnx2rtkp.exe: ").strip().strip('"')
     
-    # Pasta onde estão seus arquivos RINEX .o (gerados no script anterior)
-    path_rinex_obs = input("Pasta com arquivos RINEX (.o): ").strip().strip('"')
+    # Pasta onde estão seus arquivos RINEX .o ou .22d.gz (gerados no script anterior)
+    # ou o catálogo catalogo_rinex.sqlite (seleção por estação, constelação e período)
+    path_rinex_obs = input("Pasta com arquivos RINEX (.o/.22d.gz) ou catálogo (.sqlite): ").strip().strip('"')
+    consulta = None
+    if path_rinex_obs.lower().endswith(".sqlite"):
+        consulta = input("Consulta ao catálogo (ex: POLI, GPS, 2023-03-01..2023-06-30): ").strip()
     
-    # Pasta onde você salvou os arquivos .sp3 e .clk baixados do IGS
-    path_produtos = input("Pasta com produtos IGS (.sp3/.clk): ").strip().strip('"')
+    # Pasta onde você salvou os arquivos .sp3 e .clk baixados do IGS; em branco, os produtos
+    # de cada dia vêm do depósito local (~/.gnss/produtos) preenchido pelo 2BAIXAR-PRODUTOS.py
+    path_produtos = input("Pasta com produtos IGS (.sp3/.clk) (Enter = depósito local): ").strip().strip('"')
+    deposito = None if path_produtos else DepositoProdutos()
     
     # Arquivo de configuração .conf
     path_config = input("Caminho do arquivo ppp_static.conf: ").strip().strip('"')
+
+    # ANTEX completo (ex: igs20.atx): o PPP recebe só as antenas do lote, lidas de um índice (~/.gnss/antex)
+    path_antex = input("Arquivo ANTEX (ex: igs20.atx) (Enter = o do .conf, se houver): ").strip().strip('"')
+
+    # Varredura: cada combinação de valores vira um .conf (a partir do base) e roda em todos os arquivos
+    texto_grade = input("Varredura de opções do .conf (ex: pos1-elmask=10,15; pos1-tropo=saas,est-ztd) "
+                        "(Enter = sem varredura): ").strip()
+    grade = ler_grade(texto_grade) if texto_grade else None
+
+    # Constelações: cada arquivo roda uma vez por constelação (pos1-navsys), sem os arquivos separados pelo teqc
+    sistemas = input("Constelações no PPP sobre o arquivo original (ex: G,R,GR) "
+                     "(Enter = as do .conf / arquivos já separados): ").strip().upper()
+    constelacoes = None
+    if sistemas:
+        constelacoes = {nome_constelacao(s.strip()): s.strip() for s in sistemas.split(',') if s.strip()}
+    
+    # Controle de qualidade: arquivos reprovados podem ser pulados ou só marcados
+    opcao_qc = input("Controle de qualidade antes do PPP? [p]ular reprovados / [m]arcar / Enter = sem QC: ").strip().lower()
+    modo_qc = {'p': 'pular', 'm': 'marcar'}.get(opcao_qc[:1])
     
     # Pasta para salvar os resultados
     path_saida = os.path.join(os.path.dirname(path_rinex_obs), "RESULTADOS_PPP")
@@ -70,29 +540,48 @@ def main():
     
     # --- PROCESSAMENTO ---
     path_rinex_obs = Path(path_rinex_obs)
-    arquivos_o = list(path_rinex_obs.glob("*.o")) # ou *.XXo se não tiver renomeado
+    if consulta is not None:
+        arquivos_o = consultar_texto(path_rinex_obs, consulta)
+    else:
+        # .22o/.rnx e também os compactados pelo script anterior (.22d.gz / .crx.gz)
+        arquivos_o = sorted(f for f in path_rinex_obs.glob("*") if regex_arquivo_obs.match(f.name))
     
     if not arquivos_o:
         print("Nenhum arquivo de observação encontrado.")
         return
 
-    print(f"Iniciando PPP para {len(arquivos_o)} arquivos...")
-    
-    # Processamento Paralelo (PPP consome CPU, cuidado com muitos núcleos)
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        tarefas = {
-            executor.submit(
-                processar_ppp_rtklib, 
-                obs, 
-                path_produtos, 
-                path_config, 
-                path_rnx2rtkp, 
-                path_saida
-            ): obs for obs in arquivos_o
-        }
-        
-        for futuro in concurrent.futures.as_completed(tarefas):
-            print(futuro.result())
+    if modo_qc:
+        arquivos_o = filtrar_qc(arquivos_o, modo_qc)
+
+    # O .conf base passa a apontar para o ANTEX reduzido; as variantes e constelações partem dele
+    path_config = preparar_antex(path_config, path_antex, arquivos_o, path_saida)
+
+    # Índice dos produtos montado uma única vez: cada job recebe só os do seu dia e dos vizinhos
+    indice = indice_produtos(path_produtos, deposito)
+    print(f"🗂️ Índice de produtos: {len(indice)} arquivos")
+    cache = CacheSolucoes()
+
+    # Motor em processo (RTKLIB como biblioteca, variável RTKLIB_LIB); sem a biblioteca, o rnx2rtkp
+    librtk = localizar_librtk()
+    if librtk:
+        print(f"⚙️ Motor librtk: {librtk} (estações do mesmo dia em um único postpos)")
+
+    if grade:
+        pasta_varredura = Path(path_saida) / PASTA_VARREDURA
+        lista, configuracoes = preparar_varredura(path_config, grade, pasta_varredura, constelacoes)
+        print(f"Iniciando varredura: {len(arquivos_o)} arquivos × {len(configuracoes)} configurações...")
+        prontos = rodar_lote(arquivos_o, configuracoes, path_produtos, deposito, indice, path_rnx2rtkp,
+                             pasta_varredura, cache, librtk)
+        tabela = gravar_resultados(lista, arquivos_o, prontos, pasta_varredura, constelacoes)
+        print(f"\n📋 Resultados por variante em {pasta_varredura}/vNN/{NOME_TABELA_VARIANTE}; resumo: {tabela}")
+    else:
+        # Os .conf de cada constelação (ppp_GPS.conf...) ficam junto dos resultados
+        configuracoes = [(None, constelacao, conf, Path(path_saida))
+                         for constelacao, conf in confs_constelacoes(path_config, constelacoes, path_saida)]
+        print(f"Iniciando PPP para {len(arquivos_o)} arquivos"
+              + (f" × {len(configuracoes)} constelações..." if constelacoes else "..."))
+        rodar_lote(arquivos_o, configuracoes, path_produtos, deposito, indice, path_rnx2rtkp, path_saida, cache,
+                   librtk)
 
     print(f"\n🏁 Processamento finalizado. Verifique a pasta: {path_saida}")
 
@@ -0,0 +1,115 @@
+import concurrent.futures
+import datetime
+import os
+import urllib.parse
+import zipfile
+from collections import namedtuple
+from pathlib import Path
+
+from conexoes_ftp import ERROS_CONEXAO, PoolFTP
+from conexoes_http import ERROS_CONEXAO_HTTP, PoolHTTP
+from transferencias import baixar_arquivo_ftp, baixar_arquivo_http
+
+# Download automático dos dados diários da RBMC (IBGE) por lista de estações e período.
+# Os arquivos (um .zip por estação-dia, com o Hatanaka dentro) são baixados em paralelo
+# por um pool de conexões reaproveitadas (HTTP keep-alive ou FTP), com novas tentativas
+# se a conexão cair e retomada dos downloads interrompidos (.part). Cada zip é entregue
+# ao chamador assim que fica pronto, para seguir direto para a extração/conversão.
+
+# Arquivo diário de uma estação: {estacao} em minúsculas, {ano} com 4 dígitos, {doy} dia do ano
+URL_RBMC = ("https://geoftp.ibge.gov.br/informacoes_sobre_posicionamento_geodesico/rbmc/dados/"
+            "{ano}/{doy:03d}/{estacao}{doy:03d}1.zip")
+
+ArquivoRBMC = namedtuple('ArquivoRBMC', 'estacao data url nome')
+
+
+def arquivos_rbmc(estacoes, data_inicial, data_final, modelo=URL_RBMC):
+    """Arquivos diários de cada estação no período (datas inclusive), dia a dia."""
+    arquivos = []
+    data = data_inicial
+    while data <= data_final:
+        doy = data.timetuple().tm_yday
+        for estacao in estacoes:
+            url = modelo.format(ano=data.year, doy=doy, estacao=estacao.lower())
+            arquivos.append(ArquivoRBMC(estacao.upper(), data, url, url.rsplit('/', 1)[-1]))
+        data += datetime.timedelta(days=1)
+    return arquivos
+
+
+def _pool(url, pools, max_conexoes):
+    partes = urllib.parse.urlsplit(url)
+    chave = (partes.scheme, partes.hostname, partes.port)
+    if chave not in pools:
+        if partes.scheme == "ftp":
+            pools[chave] = PoolFTP(partes.hostname, max_conexoes=max_conexoes, porta=partes.port or 21)
+        else:
+            pools[chave] = PoolHTTP(partes.hostname, partes.scheme, partes.port, max_conexoes=max_conexoes)
+    return pools[chave], partes.path
+
+
+def _baixar(arquivo, pool, caminho_remoto, pasta):
+    """Baixa um zip (com retomada) e confere se ele abre. Retorna o caminho ou None se não existir."""
+    if isinstance(pool, PoolHTTP):
+        download = pool.executar(baixar_arquivo_http, caminho_remoto, arquivo.nome, pasta, False)
+    else:
+        pasta_remota, nome = caminho_remoto.rsplit('/', 1)
+        download = pool.executar(baixar_arquivo_ftp, pasta_remota, nome, pasta, False)
+    if download is None:
+        return None
+    if not zipfile.is_zipfile(download.caminho):
+        os.remove(download.caminho)
+        raise ValueError(f"{arquivo.nome} baixado não é um ZIP válido")
+    return download.caminho
+
+
+def baixar_rbmc(estacoes, data_inicial, data_final, pasta_zips, max_conexoes=None, modelo=URL_RBMC):
+    """
+    Baixa os zips diários das estações no período para `pasta_zips`, em paralelo.
+    Gerador: entrega o caminho de cada zip assim que ele fica pronto (os que já estavam
+    na pasta vêm primeiro), enquanto os demais continuam baixando.
+    """
+    pasta_zips = Path(pasta_zips)
+    os.makedirs(pasta_zips, exist_ok=True)
+    arquivos = arquivos_rbmc(estacoes, data_inicial, data_final, modelo)
+    print(f"📡 RBMC: {len(arquivos)} arquivos ({len(estacoes)} estações, {data_inicial} a {data_final})")
+
+    pendentes = []
+    presentes = 0
+    for arquivo in arquivos:
+        caminho = pasta_zips / arquivo.nome
+        if caminho.exists() and zipfile.is_zipfile(caminho):
+            presentes += 1
+            yield caminho
+        else:
+            pendentes.append(arquivo)
+
+    pools = {}
+    locais = [_pool(arquivo.url, pools, max_conexoes) for arquivo in pendentes]
+    baixados, ausentes, falhas = 0, [], []
+    vagas = sum(pool.max_conexoes for pool in pools.values()) or 1
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=vagas) as executor:
+            tarefas = {executor.submit(_baixar, arquivo, pool, caminho_remoto, pasta_zips): arquivo
+                       for arquivo, (pool, caminho_remoto) in zip(pendentes, locais)}
+            for futuro in concurrent.futures.as_completed(tarefas):
+                arquivo = tarefas[futuro]
+                try:
+                    caminho = futuro.result()
+                except ERROS_CONEXAO + ERROS_CONEXAO_HTTP + (ValueError,) as erro:
+                    print(f"❌ RBMC: falha no download de {arquivo.nome}: {erro}")
+                    falhas.append(arquivo)
+                    continue
+                if caminho is None:
+                    ausentes.append(arquivo)
+                    continue
+                baixados += 1
+                print(f"📥 Baixado: {arquivo.nome} ({arquivo.estacao}, {arquivo.data})")
+                yield caminho
+    finally:
+        for pool in pools.values():
+            pool.fechar()
+
+    print(f"📡 RBMC: {baixados} baixados, {presentes} já estavam na pasta, {len(ausentes)} inexistentes "
+          f"no servidor, {len(falhas)} com falha")
+    for arquivo in ausentes:
+        print(f"   ⚠️ Sem dados: {arquivo.estacao} em {arquivo.data}")
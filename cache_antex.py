@@ -0,0 +1,203 @@
+import datetime
+import os
+import sqlite3
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+from manifesto import hash_conteudo
+from rinex import abrir_texto, ler_cabecalho, rotulo
+
+# Cache do ANTEX (calibração das antenas de satélites e receptores, ex: igs20.atx) para o PPP.
+# O arquivo completo tem dezenas de MB e o rnx2rtkp o leria inteiro a cada execução. Aqui ele é lido
+# uma única vez: cada antena (bloco START OF ANTENNA ... END OF ANTENNA) vai para um índice SQLite
+# com tipo, número de série/PRN e validade, e o texto do bloco compactado. Para cada lote de PPP
+# é gravado um ANTEX pequeno, só com os satélites válidos nas datas do lote e as antenas de
+# receptor que aparecem nos cabeçalhos das observações.
+
+PASTA_ANTEX = Path.home() / ".gnss" / "antex"
+NOME_INDICE = "antex.sqlite"
+
+# Opções do .conf que recebem o ANTEX: as do RTKLIB (satélites e receptor) e a file-antex do ppp-static.conf
+OPCOES_ANTEX = ("file-satantfile", "file-rcvantfile", "file-antex")
+
+# Radome das antenas sem radome informado; o RTKLIB também recorre a ele quando falta a calibração com radome
+RADOME_PADRAO = "NONE"
+
+# Resultado de um subconjunto: arquivo gravado, número de satélites e de antenas de receptor incluídos
+# e as antenas dos cabeçalhos que não têm calibração no ANTEX
+SubconjuntoAntex = namedtuple('SubconjuntoAntex', 'caminho satelites receptores sem_calibracao')
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS arquivos (
+    sha256    TEXT PRIMARY KEY,
+    cabecalho BLOB
+);
+CREATE TABLE IF NOT EXISTS lidos (
+    caminho  TEXT PRIMARY KEY,
+    tamanho  INTEGER,
+    mtime_ns INTEGER,
+    sha256   TEXT
+);
+CREATE TABLE IF NOT EXISTS antenas (
+    sha256     TEXT,
+    ordem      INTEGER,
+    tipo       TEXT,
+    serie      TEXT,
+    valido_de  TEXT,
+    valido_ate TEXT,
+    bloco      BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_tipo ON antenas (sha256, tipo);
+CREATE INDEX IF NOT EXISTS idx_serie ON antenas (sha256, serie);
+"""
+
+
+def tipo_antena(campo):
+    """Modelo e radome do campo de 20 colunas do ANTEX/RINEX: 'TRM59800.00     ' -> 'TRM59800.00 NONE'."""
+    modelo = campo[:16].strip()
+    radome = campo[16:20].strip() or RADOME_PADRAO
+    return f"{modelo} {radome}"
+
+
+def antena_rinex(caminho):
+    """Tipo normalizado da antena (ANT # / TYPE) no cabeçalho de um RINEX/CRINEX, ou None."""
+    with abrir_texto(caminho) as arquivo:
+        for linha in ler_cabecalho(arquivo):
+            if rotulo(linha) == "ANT # / TYPE" and linha[20:40].strip():
+                return tipo_antena(linha[20:40])
+    return None
+
+
+def _data(linha):
+    """Data dos rótulos VALID FROM / VALID UNTIL em ISO 8601 (comparável como texto)."""
+    ano, mes, dia, hora, minuto, segundo = linha[:43].split()
+    return datetime.datetime(int(ano), int(mes), int(dia), int(hora), int(minuto),
+                             int(float(segundo))).isoformat()
+
+
+def ler_antex(caminho):
+    """
+    Lê um arquivo ANTEX (.atx ou .atx.gz). Retorna (linhas do cabeçalho,
+    [(tipo, série ou PRN, válido de, válido até, texto do bloco)]) na ordem do arquivo.
+    """
+    antenas = []
+    with abrir_texto(caminho) as arquivo:
+        cabecalho = ler_cabecalho(arquivo)
+        bloco = None
+        for linha in arquivo:
+            linha = linha.rstrip('\r\n')
+            r = rotulo(linha)
+            if r == "START OF ANTENNA":
+                bloco, tipo, serie, valido_de, valido_ate = [], "", "", None, None
+            if bloco is None:
+                continue
+            bloco.append(linha)
+            if r == "TYPE / SERIAL NO":
+                tipo, serie = tipo_antena(linha[:20]), linha[20:40].strip()
+            elif r == "VALID FROM":
+                valido_de = _data(linha)
+            elif r == "VALID UNTIL":
+                valido_ate = _data(linha)
+            elif r == "END OF ANTENNA":
+                antenas.append((tipo, serie, valido_de, valido_ate, '\n'.join(bloco) + '\n'))
+                bloco = None
+    return cabecalho, antenas
+
+
+class CacheAntex:
+    """
+    Antenas dos arquivos ANTEX já lidos, em `raiz`/antex.sqlite.
+    Uso: cache.subconjunto(igs20.atx, data_inicial, data_final, antenas, destino) -> SubconjuntoAntex.
+    """
+
+    def __init__(self, raiz=PASTA_ANTEX):
+        self.raiz = Path(raiz)
+        os.makedirs(self.raiz, exist_ok=True)
+        with self._indice() as conexao:
+            conexao.executescript(_ESQUEMA)
+
+    @contextmanager
+    def _indice(self):
+        """Conexão ao índice; grava (commit) ao sair sem erro e sempre fecha."""
+        conexao = sqlite3.connect(self.raiz / NOME_INDICE, timeout=60)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def indexar(self, caminho):
+        """
+        Garante o ANTEX no índice e retorna o hash dele. O arquivo só é relido se tamanho ou data
+        de modificação mudarem, e só é indexado de novo se o conteúdo mudar.
+        """
+        caminho = Path(caminho).resolve()
+        info = caminho.stat()
+        with self._indice() as conexao:
+            lido = conexao.execute("SELECT tamanho, mtime_ns, sha256 FROM lidos WHERE caminho = ?",
+                                   (str(caminho),)).fetchone()
+        if lido and lido[:2] == (info.st_size, info.st_mtime_ns):
+            return lido[2]
+
+        sha256 = hash_conteudo(caminho)
+        with self._indice() as conexao:
+            novo = conexao.execute("SELECT 1 FROM arquivos WHERE sha256 = ?", (sha256,)).fetchone() is None
+        if novo:
+            cabecalho, antenas = ler_antex(caminho)
+            print(f"🛰️ ANTEX indexado: {len(antenas)} antenas de {caminho.name}")
+        with self._indice() as conexao:
+            if novo:
+                conexao.execute("INSERT INTO arquivos VALUES (?, ?)",
+                                (sha256, zlib.compress('\n'.join(cabecalho).encode() + b'\n')))
+                conexao.executemany("INSERT INTO antenas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    [(sha256, ordem, tipo, serie, valido_de, valido_ate, zlib.compress(bloco.encode()))
+                                     for ordem, (tipo, serie, valido_de, valido_ate, bloco) in enumerate(antenas)])
+            conexao.execute("INSERT OR REPLACE INTO lidos VALUES (?, ?, ?, ?)",
+                            (str(caminho), info.st_size, info.st_mtime_ns, sha256))
+            if lido and lido[2] != sha256:
+                # Versão anterior do mesmo arquivo: sai do índice se nenhum outro caminho a usa
+                if conexao.execute("SELECT 1 FROM lidos WHERE sha256 = ?", (lido[2],)).fetchone() is None:
+                    conexao.execute("DELETE FROM antenas WHERE sha256 = ?", (lido[2],))
+                    conexao.execute("DELETE FROM arquivos WHERE sha256 = ?", (lido[2],))
+        return sha256
+
+    def subconjunto(self, caminho, data_inicial, data_final, antenas, destino):
+        """
+        Grava em `destino` um ANTEX só com os satélites válidos entre `data_inicial` e `data_final`
+        (datetime.date) e as antenas de receptor em `antenas` (tipos normalizados, ver tipo_antena),
+        cada uma também sem radome (NONE), como o RTKLIB procura. Retorna um SubconjuntoAntex.
+        """
+        sha256 = self.indexar(caminho)
+        inicio = datetime.datetime.combine(data_inicial, datetime.time()).isoformat()
+        fim = datetime.datetime.combine(data_final, datetime.time.max).isoformat()
+        tipos = set(antenas) | {f"{antena.rsplit(' ', 1)[0]} {RADOME_PADRAO}" for antena in antenas}
+        with self._indice() as conexao:
+            cabecalho = zlib.decompress(conexao.execute("SELECT cabecalho FROM arquivos WHERE sha256 = ?",
+                                                        (sha256,)).fetchone()[0])
+            # Satélites: a série é o PRN (G01, R24...), com a validade de cada bloco/satélite
+            satelites = conexao.execute(
+                "SELECT ordem, bloco FROM antenas WHERE sha256 = ? AND serie GLOB '[A-Z][0-9][0-9]' "
+                "AND (valido_de IS NULL OR valido_de <= ?) AND (valido_ate IS NULL OR valido_ate >= ?)",
+                (sha256, fim, inicio)).fetchall()
+            # Receptores: só as calibrações por tipo (série em branco), não as individuais
+            marcadores = ', '.join('?' * len(tipos))
+            receptores = conexao.execute(
+                f"SELECT ordem, bloco, tipo FROM antenas WHERE sha256 = ? AND serie = '' AND tipo IN ({marcadores})",
+                (sha256, *sorted(tipos))).fetchall() if tipos else []
+
+        calibradas = {tipo for _, _, tipo in receptores}
+        sem_calibracao = sorted(antena for antena in antenas
+                                if antena not in calibradas
+                                and f"{antena.rsplit(' ', 1)[0]} {RADOME_PADRAO}" not in calibradas)
+
+        destino = Path(destino)
+        os.makedirs(destino.parent, exist_ok=True)
+        temporario = destino.with_name(destino.name + ".tmp")
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(cabecalho)
+            for _, bloco, *_ in sorted(satelites + receptores):
+                arquivo.write(zlib.decompress(bloco))
+        os.replace(temporario, destino)
+        return SubconjuntoAntex(destino, len(satelites), len(receptores), sem_calibracao)
@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Cache persistente de listagens de pastas remotas (ex: pastas de semana GPS no FTP de produtos).
+# Guarda, por (host, pasta), o nome, o tamanho e a data de modificação de cada arquivo, para que
+# o downloader decida o que baixar sem consultar o servidor (sem NLST e sem SIZE por arquivo).
+# Listagens comuns vencem depois de `ttl` segundos; listagens marcadas como permanentes
+# (ex: semanas antigas, cujos produtos finais não mudam mais) nunca vencem.
+
+NOME_CACHE = "cache_listagens.json"
+TTL_PADRAO = 6 * 3600
+
+
+class CacheListagens:
+    """Listagens em um arquivo JSON: {"host:pasta": {"lido_em", "permanente", "arquivos": {nome: [tamanho, mtime]}}}."""
+
+    def __init__(self, arquivo, ttl=TTL_PADRAO):
+        self.arquivo = Path(arquivo)
+        self.ttl = ttl
+        self._trava = threading.Lock()
+        self._dados = self._carregar()
+
+    def _carregar(self):
+        try:
+            with open(self.arquivo, encoding='utf-8') as entrada:
+                return json.load(entrada)
+        except (OSError, ValueError):
+            return {}
+
+    def _salvar(self):
+        os.makedirs(self.arquivo.parent, exist_ok=True)
+        temporario = self.arquivo.with_name(self.arquivo.name + ".tmp")
+        with open(temporario, 'w', encoding='utf-8') as saida:
+            json.dump(self._dados, saida)
+        # Troca atômica: outro processo nunca lê um JSON pela metade
+        os.replace(temporario, self.arquivo)
+
+    @staticmethod
+    def _chave(host, pasta):
+        return f"{host}:{pasta}"
+
+    def obter(self, host, pasta):
+        """Arquivos da pasta {nome: (tamanho, mtime)} ou None se não houver listagem válida no cache."""
+        with self._trava:
+            registro = self._dados.get(self._chave(host, pasta))
+        if registro is None:
+            return None
+        if not registro["permanente"] and time.time() - registro["lido_em"] > self.ttl:
+            return None
+        return {nome: tuple(info) for nome, info in registro["arquivos"].items()}
+
+    def guardar(self, host, pasta, arquivos, permanente=False):
+        """Guarda a listagem {nome: (tamanho, mtime)}; tamanho/mtime podem ser None se o servidor não informar."""
+        with self._trava:
+            self._dados[self._chave(host, pasta)] = {
+                "lido_em": time.time(),
+                "permanente": permanente,
+                "arquivos": {nome: list(info) for nome, info in arquivos.items()},
+            }
+            self._salvar()
+
+    def invalidar(self, host, pasta):
+        """Descarta a listagem (ex: o servidor não tinha um arquivo que o cache dizia existir)."""
+        with self._trava:
+            if self._dados.pop(self._chave(host, pasta), None) is not None:
+                self._salvar()
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from manifesto import hash_conteudo
+
+# Cache de soluções PPP endereçado por conteúdo, compartilhado entre projetos.
+# A chave de uma solução é o SHA-256 de tudo o que muda o resultado do rnx2rtkp: o arquivo
+# de observação, os produtos exatos passados na linha de comando, as opções efetivas do .conf
+# (sem comentários e espaços; arquivos citados nas opções file-* entram pelo conteúdo) e o
+# próprio executável. Uma reexecução sem mudanças copia o .pos/.stat guardado em vez de rodar de novo.
+# Como no depósito de produtos, um índice SQLite guarda o tamanho e o último uso de cada solução:
+# quando o cache passa do orçamento de disco, as soluções usadas há mais tempo são removidas (LRU).
+
+PASTA_SOLUCOES = Path.home() / ".gnss" / "solucoes_ppp"
+NOME_HASHES = "hashes.json"
+NOME_INDICE = "indice.sqlite"
+ORCAMENTO_PADRAO = 2 * 1024 ** 3  # bytes
+# Nome dos arquivos dentro da pasta de cada solução: solucao.pos, solucao.pos.stat...
+NOME_SOLUCAO = "solucao.pos"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS solucoes (
+    chave    TEXT PRIMARY KEY,
+    tamanho  INTEGER,
+    inserido REAL,
+    usado    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_usado ON solucoes (usado);
+"""
+
+
+def opcoes_efetivas(config_file):
+    """Opções do .conf como o RTKLIB as lê: {opção: valor}, sem comentários (#) nem espaços."""
+    opcoes = {}
+    with open(config_file, encoding='utf-8', errors='replace') as arquivo:
+        for linha in arquivo:
+            linha = linha.split('#', 1)[0].strip()
+            if '=' not in linha:
+                continue
+            opcao, valor = linha.split('=', 1)
+            opcoes[opcao.strip()] = valor.strip()
+    return opcoes
+
+
+class CacheSolucoes:
+    """
+    Soluções guardadas em `raiz`/ab/<chave>/ com orçamento de disco em bytes.
+    Uso: chave = cache.chave(obs, produtos, conf, rnx2rtkp); cache.restaurar(chave, arquivo_pos) -> True
+    se havia solução; cache.guardar(chave, arquivo_pos) após rodar.
+    """
+
+    def __init__(self, raiz=PASTA_SOLUCOES, orcamento=ORCAMENTO_PADRAO):
+        self.raiz = Path(raiz)
+        self.orcamento = orcamento
+        self._trava = threading.Lock()
+        os.makedirs(self.raiz / "tmp", exist_ok=True)
+        novo = not (self.raiz / NOME_INDICE).exists()
+        with self._indice() as conexao:
+            conexao.executescript(_ESQUEMA)
+            if novo:
+                # Cache de antes do índice: as soluções entram com a data de modificação como último uso
+                for pasta in self.raiz.glob("??/*"):
+                    if (pasta / NOME_SOLUCAO).is_file():
+                        usado = (pasta / NOME_SOLUCAO).stat().st_mtime
+                        conexao.execute("INSERT OR REPLACE INTO solucoes VALUES (?, ?, ?, ?)",
+                                        (pasta.name, _tamanho_pasta(pasta), usado, usado))
+        self._hashes = {}
+        self._hashes_alterados = False
+        caminho_hashes = self.raiz / NOME_HASHES
+        if caminho_hashes.is_file():
+            try:
+                with open(caminho_hashes, encoding='utf-8') as arquivo:
+                    self._hashes = json.load(arquivo)
+            except ValueError:
+                self._hashes = {}  # arquivo cortado: os hashes são recalculados
+
+    def hash_arquivo(self, caminho):
+        """SHA-256 do arquivo, reaproveitado enquanto tamanho e data de modificação não mudarem."""
+        caminho = Path(caminho).resolve()
+        info = caminho.stat()
+        guardado = self._hashes.get(str(caminho))
+        if guardado and guardado[:2] == [info.st_size, info.st_mtime_ns]:
+            return guardado[2]
+        valor = hash_conteudo(caminho)
+        self._hashes[str(caminho)] = [info.st_size, info.st_mtime_ns, valor]
+        self._hashes_alterados = True
+        return valor
+
+    def salvar_hashes(self):
+        """Grava os hashes calculados nesta execução (chamar no fim do lote)."""
+        if not self._hashes_alterados:
+            return
+        temporario = self.raiz / "tmp" / NOME_HASHES
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self._hashes, arquivo)
+        os.replace(temporario, self.raiz / NOME_HASHES)
+        self._hashes_alterados = False
+
+    def _hash_executavel(self, rnx2rtkp_path):
+        executavel = Path(rnx2rtkp_path)
+        if not executavel.is_file():
+            encontrado = shutil.which(str(rnx2rtkp_path))
+            if encontrado is None:
+                return str(rnx2rtkp_path)
+            executavel = Path(encontrado)
+        return self.hash_arquivo(executavel)
+
+    def chave(self, arquivo_obs, produtos, config_file, rnx2rtkp_path):
+        """Chave (SHA-256 hex) da solução de `arquivo_obs` com estes produtos, configuração e executável."""
+        opcoes = opcoes_efetivas(config_file)
+        arquivos_conf = {opcao: self.hash_arquivo(valor) for opcao, valor in opcoes.items()
+                         if opcao.startswith("file-") and valor and Path(valor).is_file()}
+        partes = {
+            "obs": self.hash_arquivo(arquivo_obs),
+            "produtos": [self.hash_arquivo(produto) for produto in produtos],
+            "conf": opcoes,
+            "arquivos_conf": arquivos_conf,
+            "rnx2rtkp": self._hash_executavel(rnx2rtkp_path),
+        }
+        return hashlib.sha256(json.dumps(partes, sort_keys=True).encode()).hexdigest()
+
+    @contextmanager
+    def _indice(self):
+        """Conexão ao índice; grava (commit) ao sair sem erro e sempre fecha."""
+        conexao = sqlite3.connect(self.raiz / NOME_INDICE, timeout=60)
+        conexao.row_factory = sqlite3.Row
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def _pasta(self, chave):
+        return self.raiz / chave[:2] / chave
+
+    def restaurar(self, chave, arquivo_pos):
+        """
+        Copia a solução guardada para `arquivo_pos` (e .stat etc. ao lado) e marca o uso, para o LRU.
+        False se não houver.
+        """
+        pasta = self._pasta(chave)
+        if not (pasta / NOME_SOLUCAO).is_file():
+            return False
+        arquivo_pos = Path(arquivo_pos)
+        os.makedirs(arquivo_pos.parent, exist_ok=True)
+        # Cópia, não hard link: o rnx2rtkp regrava o .pos no lugar e estragaria a solução guardada
+        try:
+            for guardado in pasta.iterdir():
+                copia = arquivo_pos.with_name(arquivo_pos.name + guardado.name[len(NOME_SOLUCAO):])
+                shutil.copyfile(guardado, copia)
+        except FileNotFoundError:
+            return False  # removida (LRU) por outra execução durante a cópia
+        agora = time.time()
+        with self._trava, self._indice() as conexao:
+            if not conexao.execute("UPDATE solucoes SET usado = ? WHERE chave = ?", (agora, chave)).rowcount:
+                # Guardada por fora do índice (ex: pasta copiada de outra máquina)
+                conexao.execute("INSERT INTO solucoes VALUES (?, ?, ?, ?)", (chave, _tamanho_pasta(pasta), agora, agora))
+        return True
+
+    def guardar(self, chave, arquivo_pos):
+        """Guarda o .pos (e os arquivos <nome>.pos.* gerados junto) de uma execução bem-sucedida."""
+        arquivo_pos = Path(arquivo_pos)
+        if not arquivo_pos.is_file():
+            return False
+        saidas = [arquivo_pos] + sorted(arquivo_pos.parent.glob(arquivo_pos.name + ".*"))
+        temporario = Path(tempfile.mkdtemp(dir=self.raiz / "tmp"))
+        for saida in saidas:
+            shutil.copyfile(saida, temporario / (NOME_SOLUCAO + saida.name[len(arquivo_pos.name):]))
+        destino = self._pasta(chave)
+        os.makedirs(destino.parent, exist_ok=True)
+        try:
+            # A pasta inteira entra de uma vez: uma solução nunca aparece pela metade
+            os.replace(temporario, destino)
+        except OSError:
+            # Outra execução já guardou a mesma solução
+            shutil.rmtree(temporario, ignore_errors=True)
+            if not (destino / NOME_SOLUCAO).is_file():
+                return False
+        agora = time.time()
+        with self._trava, self._indice() as conexao:
+            conexao.execute("INSERT OR REPLACE INTO solucoes VALUES (?, ?, ?, ?)",
+                            (chave, _tamanho_pasta(destino), agora, agora))
+        self.liberar_espaco()
+        return True
+
+    def ocupado(self):
+        """Bytes ocupados pelas soluções do cache."""
+        with self._indice() as conexao:
+            return conexao.execute("SELECT SUM(tamanho) FROM solucoes").fetchone()[0] or 0
+
+    def liberar_espaco(self, orcamento=None):
+        """Remove as soluções usadas há mais tempo até o cache caber no orçamento. Retorna quantas saíram."""
+        orcamento = self.orcamento if orcamento is None else orcamento
+        saem = []
+        with self._trava, self._indice() as conexao:
+            ocupado = conexao.execute("SELECT SUM(tamanho) FROM solucoes").fetchone()[0] or 0
+            if ocupado <= orcamento:
+                return 0
+            for linha in conexao.execute("SELECT chave, tamanho FROM solucoes ORDER BY usado").fetchall():
+                if ocupado <= orcamento:
+                    break
+                conexao.execute("DELETE FROM solucoes WHERE chave = ?", (linha["chave"],))
+                saem.append(linha["chave"])
+                ocupado -= linha["tamanho"]
+        for chave in saem:
+            shutil.rmtree(self._pasta(chave), ignore_errors=True)
+        return len(saem)
+
+
+def _tamanho_pasta(pasta):
+    return sum(arquivo.stat().st_size for arquivo in Path(pasta).iterdir())
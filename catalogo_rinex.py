@@ -0,0 +1,302 @@
+import os
+import re
+import sqlite3
+from collections import deque
+from pathlib import Path
+
+import hatanaka
+from rinex import abrir_texto, ler_cabecalho, rotulo, tipos_observacao, versao_rinex
+from separador_constelacoes import SISTEMAS
+
+# Catálogo persistente (SQLite) dos arquivos RINEX de observação, montado só a partir
+# dos cabeçalhos: estação, receptor, antena, intervalo, primeira/última época,
+# sistemas, posição aproximada e caminho. A atualização é incremental (só relê
+# arquivos novos ou alterados) e as consultas substituem as buscas por pastas, ex:
+#   consultar_texto(banco, "POLI, GPS, 2023-03-01..2023-06-30")
+
+NOME_CATALOGO = "catalogo_rinex.sqlite"
+
+# RINEX (.22o, .rnx) e Compact RINEX (.22d, .crx), com ou sem .gz
+regex_arquivo_obs = re.compile(r".*(\.\d{2}[od]|\.rnx|\.crx)(\.gz)?$", re.IGNORECASE)
+
+regex_epoca_2 = re.compile(r"^ (\d\d) ([ \d]\d) ([ \d]\d) ([ \d]\d) ([ \d]\d) ([ \d]\d\.\d{7})  ([016])")
+regex_epoca_3 = re.compile(r"^> (\d{4}) (\d\d) (\d\d) (\d\d) (\d\d) ([ \d]\d\.\d{7})  ([016])")
+
+# Épocas lidas para descobrir os sistemas de um RINEX 2 misto sem PRN / # OF OBS
+EPOCAS_AMOSTRA = 100
+# Bytes do fim do arquivo lidos para achar a última época (sem TIME OF LAST OBS)
+TAMANHO_CAUDA = 256 * 1024
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS arquivos (
+    caminho   TEXT PRIMARY KEY,
+    estacao   TEXT,
+    marcador  TEXT,
+    receptor  TEXT,
+    antena    TEXT,
+    versao    REAL,
+    intervalo REAL,
+    primeira  TEXT,
+    ultima    TEXT,
+    sistemas  TEXT,
+    x REAL, y REAL, z REAL,
+    tamanho   INTEGER,
+    mtime_ns  INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_estacao_data ON arquivos (estacao, primeira);
+CREATE INDEX IF NOT EXISTS idx_data ON arquivos (primeira, ultima);
+"""
+
+
+def conectar(banco):
+    """Abre (ou cria) o catálogo."""
+    conexao = sqlite3.connect(banco)
+    conexao.row_factory = sqlite3.Row
+    conexao.executescript(_ESQUEMA)
+    return conexao
+
+
+def _tempo(campos):
+    """'YYYY-MM-DD HH:MM:SS' a partir de (ano, mês, dia, hora, minuto, segundos)."""
+    ano, mes, dia, hora, minuto, segundos = campos
+    ano = int(ano)
+    if ano < 100:
+        ano += 2000 if ano < 80 else 1900
+    return f"{ano:04d}-{int(mes):02d}-{int(dia):02d} {int(hora):02d}:{int(minuto):02d}:{int(float(segundos)):02d}"
+
+
+def _tempo_epoca(linha, versao):
+    """Instante de uma linha de época de observação (flag 0, 1 ou 6), ou None."""
+    regex = regex_epoca_2 if versao == 2 else regex_epoca_3
+    encontrado = regex.match(linha)
+    return _tempo(encontrado.groups()[:6]) if encontrado else None
+
+
+def _sistemas_cabecalho(cabecalho, versao):
+    """Sistemas declarados no cabeçalho (ou None se só der para saber olhando as épocas)."""
+    if versao != 2:
+        return set(tipos_observacao(cabecalho)) - {''}
+    prns = {linha[3:4] or 'G' for linha in cabecalho if rotulo(linha) == "PRN / # OF OBS" and linha[3:6].strip()}
+    if prns:
+        return {'G' if s == ' ' else s for s in prns}
+    for linha in cabecalho:
+        if rotulo(linha) == "RINEX VERSION / TYPE":
+            sistema = linha[40:41].strip() or 'G'
+            return None if sistema == 'M' else {sistema}
+    return None
+
+
+def _sats_epocas_rinex_2(linhas, ntipos):
+    """Gera (linha de época, satélites) de um RINEX 2, pulando as observações."""
+    linhas_por_sat = max((ntipos + 4) // 5, 1)
+    for linha in linhas:
+        linha = linha.rstrip('\r\n')
+        if not linha.strip():
+            continue
+        n = int(linha[29:32])
+        if linha[28:29] in ('2', '3', '4', '5'):
+            for _ in range(n):
+                next(linhas)
+            continue
+        sats = linha[32:68].rstrip()
+        for _ in range((n - 1) // 12):
+            sats += next(linhas).rstrip('\r\n')[32:68].rstrip()
+        for _ in range(n * linhas_por_sat):
+            next(linhas)
+        yield linha, [sats[3 * i:3 * i + 3] for i in range(n)]
+
+
+def _sats_epocas_rinex_3(linhas):
+    """Gera (linha de época, satélites) de um RINEX 3, lendo o ID no início de cada registro."""
+    for linha in linhas:
+        if not linha.startswith('>'):
+            continue
+        n = int(linha[32:35])
+        registros = [next(linhas) for _ in range(n)]
+        if linha[31:32] not in ('2', '3', '4', '5'):
+            yield linha, [r[:3] for r in registros]
+
+
+def _ultima_epoca_cauda(caminho, versao):
+    """Última época de um arquivo RINEX sem compressão, lendo só o fim do arquivo."""
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(max(os.path.getsize(caminho) - TAMANHO_CAUDA, 0))
+        cauda = arquivo.read().decode('ascii', 'replace').splitlines()
+    for linha in reversed(cauda):
+        tempo = _tempo_epoca(linha, versao)
+        if tempo:
+            return tempo
+    return None
+
+
+def _sistema(sat):
+    return 'G' if sat[0] == ' ' else sat[0]
+
+
+def ler_metadados(caminho):
+    """Lê o cabeçalho (e, se preciso, as linhas de época) de um RINEX/CRINEX. Retorna um dict da tabela."""
+    caminho = Path(caminho)
+    with abrir_texto(caminho) as arquivo:
+        primeira_linha = next(arquivo, '')
+    compacto = rotulo(primeira_linha) == "CRINEX VERS   / TYPE"
+
+    with abrir_texto(caminho) as arquivo:
+        if compacto:
+            leitor = hatanaka.LeitorCRINEX(arquivo)
+            cabecalho, versao = leitor.cabecalho, leitor.versao
+            epocas = leitor.linhas_epoca()
+        else:
+            cabecalho = ler_cabecalho(arquivo)
+            versao = versao_rinex(cabecalho)
+            epocas = None
+
+        dados = {"caminho": str(caminho.resolve()), "versao": None, "intervalo": None,
+                 "primeira": None, "ultima": None, "x": None, "y": None, "z": None,
+                 "marcador": "", "receptor": "", "antena": ""}
+        for linha in cabecalho:
+            r = rotulo(linha)
+            if r == "RINEX VERSION / TYPE":
+                dados["versao"] = float(linha[:9])
+            elif r == "MARKER NAME":
+                dados["marcador"] = linha[:60].strip()
+            elif r == "REC # / TYPE / VERS":
+                dados["receptor"] = linha[20:40].strip()
+            elif r == "ANT # / TYPE":
+                dados["antena"] = linha[20:40].strip()
+            elif r == "INTERVAL" and linha[:10].strip():
+                dados["intervalo"] = float(linha[:10])
+            elif r == "APPROX POSITION XYZ":
+                dados["x"], dados["y"], dados["z"] = (float(linha[14 * i:14 * i + 14]) for i in range(3))
+            elif r == "TIME OF FIRST OBS":
+                dados["primeira"] = _tempo(linha[:43].split())
+            elif r == "TIME OF LAST OBS":
+                dados["ultima"] = _tempo(linha[:43].split())
+
+        sistemas = _sistemas_cabecalho(cabecalho, versao)
+        pos_sats = 41 if versao != 2 else 32
+        if compacto and (sistemas is None or dados["ultima"] is None or dados["primeira"] is None):
+            # CRINEX: as linhas de época trazem todos os satélites; percorre só elas
+            vistos = set()
+            for linha in epocas:
+                tempo = _tempo_epoca(linha, versao)
+                if tempo:
+                    dados["primeira"] = dados["primeira"] or tempo
+                    dados["ultima"] = tempo
+                    if sistemas is None:
+                        vistos.update(_sistema(linha[i:i + 3]) for i in range(pos_sats, len(linha), 3))
+            sistemas = sistemas if sistemas is not None else vistos
+        elif not compacto and (sistemas is None or dados["primeira"] is None):
+            vistos = set()
+            if versao == 2:
+                amostra = _sats_epocas_rinex_2(arquivo, len(tipos_observacao(cabecalho).get('', [])))
+            else:
+                amostra = _sats_epocas_rinex_3(arquivo)
+            for i, (linha, sats) in enumerate(amostra):
+                dados["primeira"] = dados["primeira"] or _tempo_epoca(linha, versao)
+                vistos.update(_sistema(s) for s in sats)
+                if i >= EPOCAS_AMOSTRA:
+                    break
+            sistemas = sistemas if sistemas is not None else vistos
+
+    if not compacto and dados["ultima"] is None and caminho.suffix.lower() != ".gz":
+        dados["ultima"] = _ultima_epoca_cauda(caminho, versao)
+    elif not compacto and dados["ultima"] is None:
+        with abrir_texto(caminho) as arquivo:
+            ultimas = deque((l for l in arquivo if _tempo_epoca(l, versao)), maxlen=1)
+        dados["ultima"] = _tempo_epoca(ultimas[0], versao) if ultimas else None
+
+    dados["sistemas"] = ''.join(sorted(sistemas or ()))
+    nome = dados["marcador"] or caminho.name
+    dados["estacao"] = nome.split()[0][:4].upper() if nome.split() else ""
+    return dados
+
+
+def atualizar_catalogo(banco, pastas):
+    """
+    Varre as pastas (recursivamente) e atualiza o catálogo: só lê arquivos novos ou com
+    tamanho/data alterados e remove os que sumiram. Retorna (lidos, inalterados, removidos).
+    """
+    conexao = conectar(banco)
+    pastas = [Path(p).resolve() for p in pastas]
+    conhecidos = {linha["caminho"]: (linha["tamanho"], linha["mtime_ns"])
+                  for linha in conexao.execute("SELECT caminho, tamanho, mtime_ns FROM arquivos")}
+    encontrados = set()
+    lidos = inalterados = 0
+    for pasta in pastas:
+        for caminho in pasta.rglob('*'):
+            if not caminho.is_file() or not regex_arquivo_obs.match(caminho.name):
+                continue
+            chave = str(caminho)
+            encontrados.add(chave)
+            info = caminho.stat()
+            if conhecidos.get(chave) == (info.st_size, info.st_mtime_ns):
+                inalterados += 1
+                continue
+            try:
+                dados = ler_metadados(caminho)
+            except (ValueError, OSError, EOFError, StopIteration) as erro:
+                print(f"⚠️ Catálogo: não foi possível ler {caminho.name}: {erro}")
+                continue
+            dados.update(caminho=chave, tamanho=info.st_size, mtime_ns=info.st_mtime_ns)
+            conexao.execute(f"INSERT OR REPLACE INTO arquivos ({', '.join(dados)}) "
+                            f"VALUES ({', '.join('?' * len(dados))})", list(dados.values()))
+            lidos += 1
+
+    # Remove do catálogo os arquivos que sumiram das pastas varridas
+    removidos = [c for c in conhecidos if c not in encontrados
+                 and any(Path(c).is_relative_to(p) for p in pastas)]
+    conexao.executemany("DELETE FROM arquivos WHERE caminho = ?", [(c,) for c in removidos])
+    conexao.commit()
+    conexao.close()
+    return lidos, inalterados, len(removidos)
+
+
+def consultar(banco, estacao=None, sistemas=None, inicio=None, fim=None):
+    """
+    Arquivos do catálogo que atendem aos filtros (todos opcionais):
+    estacao ('POLI'), sistemas ('G', 'GR', ...), período (datas 'AAAA-MM-DD', inclusive).
+    O filtro de sistemas pega os arquivos que contêm todos os sistemas pedidos: 'G' também
+    devolve os arquivos mistos GPS+GLONASS ainda não separados.
+    Retorna a lista de linhas (sqlite3.Row) ordenada por estação e data.
+    """
+    condicoes, parametros = [], []
+    if estacao:
+        condicoes.append("estacao = ?")
+        parametros.append(estacao.upper())
+    for sistema in sorted(set((sistemas or '').upper())):
+        condicoes.append("sistemas LIKE ?")
+        parametros.append(f"%{sistema}%")
+    if inicio:
+        condicoes.append("ultima >= ?")
+        parametros.append(str(inicio))
+    if fim:
+        condicoes.append("primeira <= ?")
+        parametros.append(f"{fim} 23:59:59" if len(str(fim)) == 10 else str(fim))
+    sql = "SELECT * FROM arquivos"
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    conexao = conectar(banco)
+    try:
+        return conexao.execute(sql + " ORDER BY estacao, primeira, caminho", parametros).fetchall()
+    finally:
+        conexao.close()
+
+
+def consultar_texto(banco, texto):
+    """
+    Consulta no formato "ESTAÇÃO, CONSTELAÇÃO, INÍCIO..FIM" (partes opcionais, em qualquer ordem),
+    ex: "POLI, GPS, 2023-03-01..2023-06-30" ou "GPS_GLONASS, 2023-03-01". Retorna os caminhos.
+    """
+    nomes = {nome.upper(): sistema for sistema, nome in SISTEMAS.items()}
+    filtros = {}
+    for parte in (p.strip() for p in texto.split(',')):
+        if not parte:
+            continue
+        if re.match(r"^\d{4}-\d\d-\d\d", parte):
+            inicio, _, fim = parte.partition('..')
+            filtros["inicio"], filtros["fim"] = inicio.strip(), (fim or inicio).strip()
+        elif all(nome in nomes for nome in parte.upper().split('_')):
+            filtros["sistemas"] = ''.join(nomes[nome] for nome in parte.upper().split('_'))
+        else:
+            filtros["estacao"] = parte
+    return [Path(linha["caminho"]) for linha in consultar(banco, **filtros)]
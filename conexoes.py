@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Base dos pools de conexões reaproveitáveis para downloads em paralelo (conexoes_ftp.PoolFTP,
+# conexoes_http.PoolHTTP). Cada conexão é aberta uma única vez e volta para o pool depois do uso,
+# evitando repetir conexão + login a cada arquivo. O número de conexões simultâneas por host é
+# limitado (servidores públicos recusam muitas conexões do mesmo IP) e uma conexão que cair no
+# meio do caminho é trocada por uma nova.
+
+# Conexões simultâneas permitidas por host (os demais usam CONEXOES_PADRAO)
+CONEXOES_POR_HOST = {
+    "ftp.gfz-potsdam.de": 4,
+    "gdc.cddis.eosdis.nasa.gov": 4,
+    "igs.ign.fr": 4,
+    "geoftp.ibge.gov.br": 4,
+}
+CONEXOES_PADRAO = 2
+
+TENTATIVAS = 3
+
+
+class PoolConexoes:
+    """
+    Conexões a um host, reaproveitadas entre threads.
+    Uso: pool.executar(funcao, *args) chama funcao(conexao, *args) com uma conexão livre.
+    Cada protocolo define _conectar/_descartar e os erros abaixo.
+    """
+
+    # Erros que derrubam a conexão (tenta de novo com outra) e erros em que ela continua boa
+    erros_reconexao = (OSError,)
+    erros_reaproveitar = ()
+
+    def __init__(self, host, porta, max_conexoes=None, timeout=None):
+        self.host = host
+        self.porta = porta
+        self.max_conexoes = max_conexoes or CONEXOES_POR_HOST.get(host, CONEXOES_PADRAO)
+        self.timeout = timeout
+        self.abertas = 0      # conexões abertas no total (estatística)
+        self.reconexoes = 0   # tentativas repetidas por queda de conexão
+        self._livres = []
+        self._vagas = threading.BoundedSemaphore(self.max_conexoes)
+        self._trava = threading.Lock()
+
+    def _conectar(self):
+        """Abre uma conexão nova (pronta para uso, ex: já logada)."""
+        raise NotImplementedError
+
+    def _descartar(self, conexao):
+        """Fecha uma conexão que saiu do pool."""
+        raise NotImplementedError
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão (espera se o limite do host já estiver em uso)."""
+        with self._vagas:
+            with self._trava:
+                conexao = self._livres.pop() if self._livres else None
+            if conexao is None:
+                conexao = self._conectar()
+                with self._trava:
+                    self.abertas += 1
+            reaproveitar = False
+            try:
+                yield conexao
+                reaproveitar = True
+            except self.erros_reaproveitar:
+                reaproveitar = True
+                raise
+            finally:
+                if reaproveitar:
+                    with self._trava:
+                        self._livres.append(conexao)
+                else:
+                    self._descartar(conexao)
+
+    def executar(self, funcao, *args):
+        """
+        Chama funcao(conexao, *args) com uma conexão do pool e retorna o resultado.
+        Se a conexão cair, descarta-a, abre outra e tenta de novo (até TENTATIVAS vezes).
+        """
+        for tentativa in range(1, TENTATIVAS + 1):
+            try:
+                with self.conexao() as conexao:
+                    return funcao(conexao, *args)
+            except self.erros_reconexao:
+                if tentativa == TENTATIVAS:
+                    raise
+                with self._trava:
+                    self.reconexoes += 1
+                time.sleep(tentativa)
+
+    def fechar(self):
+        with self._trava:
+            livres, self._livres = self._livres, []
+        for conexao in livres:
+            self._descartar(conexao)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, erro, rastro):
+        self.fechar()
@@ -0,0 +1,68 @@
+import ftplib
+import posixpath
+
+from conexoes import PoolConexoes
+
+# Pool de conexões FTP reaproveitáveis para downloads em paralelo (ver conexoes.PoolConexoes).
+# Cada conexão é aberta e logada uma única vez e volta para o pool depois do uso,
+# evitando repetir conexão + login + cwd a cada arquivo.
+
+TIMEOUT_FTP = 60
+
+# Erros em que vale reconectar e tentar de novo (conexão caiu, timeout, servidor ocupado).
+# ftplib.error_perm (arquivo inexistente, sem permissão) não entra: a conexão continua boa.
+ERROS_CONEXAO = (OSError, EOFError, ftplib.error_temp, ftplib.error_reply, ftplib.error_proto)
+
+
+def _fechar(ftp):
+    try:
+        ftp.quit()
+    except (OSError, EOFError, ftplib.Error):
+        ftp.close()
+
+
+def listar_pasta(ftp, pasta_remota):
+    """
+    {nome: (tamanho, data de modificação)} dos arquivos de uma pasta, em uma única ida ao servidor (MLSD).
+    Servidores sem MLSD caem no NLST, só com os nomes.
+    Caminho absoluto (sem cwd): a conexão do pool não guarda estado entre arquivos.
+    """
+    try:
+        return {nome: (int(fatos['size']) if 'size' in fatos else None, fatos.get('modify'))
+                for nome, fatos in ftp.mlsd(pasta_remota, facts=['type', 'size', 'modify'])
+                if fatos.get('type', 'file') == 'file'}
+    except ftplib.error_perm as erro:
+        # 500/502: comando MLSD não suportado; 550 (pasta inexistente) sobe
+        if not str(erro).startswith(('500', '502')):
+            raise
+    # Alguns servidores devolvem o caminho completo no NLST, outros só o nome.
+    return {posixpath.basename(nome): (None, None) for nome in ftp.nlst(pasta_remota)}
+
+
+class PoolFTP(PoolConexoes):
+    """
+    Conexões logadas a um host FTP, reaproveitadas entre threads.
+    Uso: pool.executar(funcao, *args) chama funcao(ftp, *args) com uma conexão livre.
+    """
+
+    erros_reconexao = ERROS_CONEXAO
+    # Arquivo inexistente ou sem permissão: a conexão continua boa
+    erros_reaproveitar = (ftplib.error_perm,)
+
+    def __init__(self, host, usuario='anonymous', senha='', max_conexoes=None, timeout=TIMEOUT_FTP, porta=21):
+        super().__init__(host, porta, max_conexoes=max_conexoes, timeout=timeout)
+        self.usuario = usuario
+        self.senha = senha
+
+    def _conectar(self):
+        ftp = ftplib.FTP(timeout=self.timeout)
+        try:
+            ftp.connect(self.host, self.porta)
+            ftp.login(self.usuario, self.senha)
+        except BaseException:
+            ftp.close()
+            raise
+        return ftp
+
+    def _descartar(self, ftp):
+        _fechar(ftp)
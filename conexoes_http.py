@@ -0,0 +1,29 @@
+import http.client
+
+from conexoes import PoolConexoes
+
+# Pool de conexões HTTP(S) persistentes (keep-alive), com a mesma interface do conexoes_ftp.PoolFTP
+# (ver conexoes.PoolConexoes): pool.executar(funcao, *args) chama funcao(conexao, *args) com um
+# http.client.HTTPConnection livre, respeitando o limite de conexões por host e trocando a conexão se ela cair.
+
+TIMEOUT_HTTP = 60
+
+ERROS_CONEXAO_HTTP = (OSError, http.client.HTTPException)
+
+
+class PoolHTTP(PoolConexoes):
+    """Conexões keep-alive a um host HTTP ou HTTPS, reaproveitadas entre threads."""
+
+    erros_reconexao = ERROS_CONEXAO_HTTP
+
+    def __init__(self, host, esquema="https", porta=None, max_conexoes=None, timeout=TIMEOUT_HTTP):
+        super().__init__(host, porta or (443 if esquema == "https" else 80), max_conexoes=max_conexoes,
+                         timeout=timeout)
+        self.esquema = esquema
+
+    def _conectar(self):
+        classe = http.client.HTTPSConnection if self.esquema == "https" else http.client.HTTPConnection
+        return classe(self.host, self.porta, timeout=self.timeout)
+
+    def _descartar(self, conexao):
+        conexao.close()
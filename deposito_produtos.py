@@ -0,0 +1,235 @@
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+import gnsscal
+
+# Depósito local de produtos IGS (órbitas, relógios...) compartilhado entre projetos.
+# Cada produto é identificado por (centro de análise, tipo, semana GPS, dia, amostragem)
+# e o arquivo (já descompactado) é guardado pelo SHA-256 do conteúdo em objetos/ab/<sha256>.<ext>.
+# Um índice SQLite liga as chaves aos objetos e guarda o último uso de cada produto: quando
+# o depósito passa do orçamento de disco, os produtos usados há mais tempo são removidos (LRU).
+# Assim o downloader não baixa de novo o que já está no depósito e o PPP lê os produtos dele.
+
+PASTA_DEPOSITO = Path.home() / ".gnss" / "produtos"
+NOME_INDICE = "indice.sqlite"
+ORCAMENTO_PADRAO = 5 * 1024 ** 3  # bytes
+
+ChaveProduto = namedtuple('ChaveProduto', 'centro tipo semana dia amostragem')
+
+# Nomes curtos (igsWWWWD.sp3, igsWWWWD.clk_30s ou, como o downloader grava, igsWWWWD_30s.clk, iguWWWWD_HH.sp3)
+# e longos (IGS0OPSFIN_20223050000_01D_15M_ORB.SP3)
+regex_nome_curto = re.compile(r"^([a-z0-9]{3})(\d{4})(\d)(?:_\d\d)?(?:_(\d+[smhd]))?\.(sp3|clk|eph|erp)"
+                              r"(?:_(\d+[smhd]))?$", re.IGNORECASE)
+regex_nome_longo = re.compile(r"^([A-Z0-9]{3})\d[A-Z0-9]{3}([A-Z]{3})_(\d{4})(\d{3})\d{4}_\w{3}_(\d{2}[SMHD])_"
+                              r"([A-Z]{3})\.([A-Z0-9]{3})$", re.IGNORECASE)
+
+# Amostragem padrão dos nomes curtos, que não a informam
+AMOSTRAGEM_CURTO = {"sp3": "15M", "eph": "15M", "clk": "05M", "erp": "01D"}
+# Conteúdo dos nomes longos -> tipo (extensão usada pelo RTKLIB)
+TIPO_LONGO = {"ORB": "sp3", "CLK": "clk", "ERP": "erp"}
+# Centro dos nomes longos: as soluções rápida/ultrarrápida do IGS têm a mesma chave dos nomes
+# curtos (igr, igu); nos demais centros a solução entra no nome (ex: codrap)
+CENTRO_LONGO = {("IGS", "FIN"): "igs", ("IGS", "RAP"): "igr", ("IGS", "ULT"): "igu"}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS produtos (
+    centro     TEXT,
+    tipo       TEXT,
+    semana     INTEGER,
+    dia        INTEGER,
+    amostragem TEXT,
+    sha256     TEXT,
+    nome       TEXT,
+    tamanho    INTEGER,
+    inserido   REAL,
+    usado      REAL,
+    PRIMARY KEY (centro, tipo, semana, dia, amostragem)
+);
+CREATE INDEX IF NOT EXISTS idx_usado ON produtos (usado);
+CREATE INDEX IF NOT EXISTS idx_sha256 ON produtos (sha256);
+"""
+
+
+def chave_produto(nome):
+    """ChaveProduto a partir do nome do arquivo (com ou sem .Z/.gz), ou None se o nome não for reconhecido."""
+    nome = re.sub(r"\.(Z|gz)$", "", Path(nome).name, flags=re.IGNORECASE)
+    curto = regex_nome_curto.match(nome)
+    if curto:
+        centro, semana, dia, amostragem_local, tipo, amostragem = curto.groups()
+        amostragem = amostragem or amostragem_local
+        tipo = tipo.lower()
+        amostragem = amostragem.upper().zfill(3) if amostragem else AMOSTRAGEM_CURTO[tipo]
+        return ChaveProduto(centro.lower(), tipo, int(semana), int(dia), amostragem)
+    longo = regex_nome_longo.match(nome)
+    if longo:
+        centro, solucao, ano, doy, amostragem, conteudo, _ = (g.upper() for g in longo.groups())
+        semana, dia = gnsscal.yrdoy2gpswd(int(ano), int(doy))
+        tipo = TIPO_LONGO.get(conteudo, conteudo.lower())
+        centro = CENTRO_LONGO.get((centro, solucao), centro.lower() + ("" if solucao == "FIN" else solucao.lower()))
+        return ChaveProduto(centro, tipo, semana, dia, amostragem)
+    return None
+
+
+def _sha256_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def ligar_arquivo(origem, destino):
+    """Coloca `origem` em `destino` por hard link (sem ocupar espaço) ou, se não der, por cópia."""
+    destino = Path(destino)
+    if destino.exists():
+        destino.unlink()
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
+    return destino
+
+
+class DepositoProdutos:
+    """
+    Depósito de produtos em `raiz` com orçamento de disco em bytes.
+    Uso: deposito.obter(chave) -> caminho ou None; deposito.inserir(arquivo) -> caminho no depósito.
+    """
+
+    def __init__(self, raiz=PASTA_DEPOSITO, orcamento=ORCAMENTO_PADRAO):
+        self.raiz = Path(raiz)
+        self.orcamento = orcamento
+        self._trava = threading.Lock()
+        os.makedirs(self.raiz / "objetos", exist_ok=True)
+        os.makedirs(self.raiz / "tmp", exist_ok=True)
+        with self._indice() as conexao:
+            conexao.executescript(_ESQUEMA)
+
+    @contextmanager
+    def _indice(self):
+        """Conexão ao índice; grava (commit) ao sair sem erro e sempre fecha."""
+        conexao = sqlite3.connect(self.raiz / NOME_INDICE, timeout=60)
+        conexao.row_factory = sqlite3.Row
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def _caminho_objeto(self, sha256, tipo):
+        return self.raiz / "objetos" / sha256[:2] / f"{sha256}.{tipo}"
+
+    def pasta_temporaria(self):
+        """Pasta nova dentro do depósito (mesmo disco): arquivos baixados nela entram por os.replace."""
+        return Path(tempfile.mkdtemp(dir=self.raiz / "tmp"))
+
+    def obter(self, chave):
+        """Caminho do produto no depósito (e marca o uso, para o LRU) ou None se não estiver lá."""
+        with self._trava, self._indice() as conexao:
+            linha = conexao.execute("SELECT sha256, tipo FROM produtos WHERE centro = ? AND tipo = ? AND semana = ? "
+                                    "AND dia = ? AND amostragem = ?", tuple(chave)).fetchone()
+            if linha is None:
+                return None
+            caminho = self._caminho_objeto(linha["sha256"], linha["tipo"])
+            if not caminho.exists():
+                # Objeto apagado por fora do depósito: esquece a chave
+                conexao.execute("DELETE FROM produtos WHERE centro = ? AND tipo = ? AND semana = ? AND dia = ? "
+                                "AND amostragem = ?", tuple(chave))
+                return None
+            conexao.execute("UPDATE produtos SET usado = ? WHERE centro = ? AND tipo = ? AND semana = ? AND dia = ? "
+                            "AND amostragem = ?", (time.time(),) + tuple(chave))
+        return caminho
+
+    def inserir(self, arquivo, chave=None, mover=False):
+        """
+        Guarda um produto descompactado (chave deduzida do nome se não informada).
+        O objeto entra no depósito por os.replace (nunca aparece pela metade) e só então
+        o índice aponta para ele. Com `mover=True` o arquivo de origem é movido em vez de copiado.
+        Retorna o caminho no depósito.
+        """
+        arquivo = Path(arquivo)
+        chave = chave or chave_produto(arquivo.name)
+        if chave is None:
+            raise ValueError(f"Nome de produto não reconhecido: {arquivo.name}")
+        sha256 = _sha256_arquivo(arquivo)
+        destino = self._caminho_objeto(sha256, chave.tipo)
+        os.makedirs(destino.parent, exist_ok=True)
+        if mover and arquivo.stat().st_dev == self.raiz.stat().st_dev:
+            os.replace(arquivo, destino)
+        else:
+            temporario = self.pasta_temporaria() / arquivo.name
+            shutil.copyfile(arquivo, temporario)
+            os.replace(temporario, destino)
+            os.rmdir(temporario.parent)
+            if mover:
+                os.remove(arquivo)
+        agora = time.time()
+        with self._trava, self._indice() as conexao:
+            anterior = conexao.execute("SELECT sha256 FROM produtos WHERE centro = ? AND tipo = ? AND semana = ? "
+                                       "AND dia = ? AND amostragem = ?", tuple(chave)).fetchone()
+            conexao.execute("INSERT OR REPLACE INTO produtos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            tuple(chave) + (sha256, arquivo.name, destino.stat().st_size, agora, agora))
+            if anterior:
+                # Produto substituído por uma versão nova: o objeto antigo pode ter ficado sem uso
+                self._apagar_sem_uso(conexao, [(anterior["sha256"], chave.tipo)])
+        self.liberar_espaco()
+        return destino
+
+    def _apagar_sem_uso(self, conexao, objetos):
+        """Apaga os objetos [(sha256, tipo)] que nenhuma chave do índice usa mais."""
+        for sha256, tipo in objetos:
+            if conexao.execute("SELECT 1 FROM produtos WHERE sha256 = ?", (sha256,)).fetchone() is None:
+                self._caminho_objeto(sha256, tipo).unlink(missing_ok=True)
+
+    def ocupado(self):
+        """Bytes ocupados pelos objetos do depósito."""
+        with self._indice() as conexao:
+            linha = conexao.execute("SELECT SUM(tamanho) FROM (SELECT DISTINCT sha256, tamanho FROM produtos)").fetchone()
+        return linha[0] or 0
+
+    def liberar_espaco(self, orcamento=None):
+        """Remove os produtos usados há mais tempo até o depósito caber no orçamento. Retorna quantos saíram."""
+        orcamento = self.orcamento if orcamento is None else orcamento
+        removidos = 0
+        with self._trava, self._indice() as conexao:
+            ocupado = conexao.execute("SELECT SUM(tamanho) FROM (SELECT DISTINCT sha256, tamanho FROM produtos)"
+                                      ).fetchone()[0] or 0
+            if ocupado <= orcamento:
+                return 0
+            # Objeto compartilhado por várias chaves só libera espaço quando a última sai
+            saem = []
+            for linha in conexao.execute("SELECT sha256, MAX(tipo) AS tipo, MAX(usado) AS usado, "
+                                         "MAX(tamanho) AS tamanho FROM produtos GROUP BY sha256 ORDER BY usado"
+                                         ).fetchall():
+                if ocupado <= orcamento:
+                    break
+                removidos += conexao.execute("DELETE FROM produtos WHERE sha256 = ?", (linha["sha256"],)).rowcount
+                saem.append((linha["sha256"], linha["tipo"]))
+                ocupado -= linha["tamanho"]
+            self._apagar_sem_uso(conexao, saem)
+        return removidos
+
+    def chaves(self, tipos=("sp3", "clk")):
+        """Chaves de todos os produtos dos tipos pedidos (sem marcar o uso)."""
+        with self._indice() as conexao:
+            linhas = conexao.execute(f"SELECT centro, tipo, semana, dia, amostragem FROM produtos "
+                                     f"WHERE tipo IN ({', '.join('?' * len(tipos))})", tuple(tipos)).fetchall()
+        return [ChaveProduto(*linha) for linha in linhas]
+
+    def produtos_do_dia(self, semana, dia, tipos=("sp3", "clk")):
+        """Caminhos de todos os produtos do depósito para um dia (marcando o uso)."""
+        with self._indice() as conexao:
+            linhas = conexao.execute(f"SELECT centro, tipo, semana, dia, amostragem FROM produtos WHERE semana = ? "
+                                     f"AND dia = ? AND tipo IN ({', '.join('?' * len(tipos))}) "
+                                     f"ORDER BY centro, tipo, amostragem", (semana, dia) + tuple(tipos)).fetchall()
+        caminhos = (self.obter(ChaveProduto(*linha)) for linha in linhas)
+        return [caminho for caminho in caminhos if caminho]
@@ -0,0 +1,169 @@
+import zlib
+
+# Descompactação incremental dos produtos IGS (.Z do compress do Unix e .gz).
+# Os dados são entregues aos pedaços (ex: direto do callback do retrbinary do FTP)
+# e a saída descompactada sai na mesma passada, sem arquivo compactado intermediário
+# e sem programas externos (7zip, gzip, uncompress). O formato é reconhecido pelos
+# dois primeiros bytes, não pela extensão: há servidores com arquivos gzip chamados .Z.
+
+ASSINATURA_LZW = b"\x1f\x9d"
+ASSINATURA_GZIP = b"\x1f\x8b"
+
+BITS_INICIAIS = 9
+CODIGO_LIMPAR = 256
+
+
+class DescompactadorLZW:
+    """
+    Decodificador LZW do formato do compress (.Z), alimentado aos pedaços.
+    Os códigos vêm em grupos de `bits` bytes (8 códigos por grupo); quando a largura
+    dos códigos muda ou a tabela é limpa, o resto do grupo atual é descartado, como no ncompress.
+    """
+
+    def __init__(self):
+        self._pendente = bytearray()
+        self._cabecalho = False
+        self._bits = BITS_INICIAIS
+        self._max_bits = 16
+        self._modo_bloco = True
+        self._tabela = None
+        self._anterior = None
+
+    def _ler_cabecalho(self):
+        if self._pendente[:2] != ASSINATURA_LZW:
+            raise ValueError("Não é um arquivo .Z (compress)")
+        opcoes = self._pendente[2]
+        self._max_bits = opcoes & 0x1f
+        self._modo_bloco = bool(opcoes & 0x80)
+        if not BITS_INICIAIS <= self._max_bits <= 16:
+            raise ValueError(f"Arquivo .Z com {self._max_bits} bits, não suportado")
+        del self._pendente[:3]
+        self._limpar()
+        self._cabecalho = True
+
+    def _limpar(self):
+        self._tabela = [bytes((i,)) for i in range(256)]
+        if self._modo_bloco:
+            self._tabela.append(b"")  # posição do código de limpeza
+        self._bits = BITS_INICIAIS
+        self._anterior = None
+
+    def _decodificar_grupo(self, grupo, saida):
+        """Decodifica os códigos de um grupo (bytes); para no fim do grupo ou se a largura mudar."""
+        bits = self._bits
+        valor = int.from_bytes(grupo, 'little')
+        mascara = (1 << bits) - 1
+        tabela = self._tabela
+        limite_tabela = 1 << self._max_bits
+        anterior = self._anterior
+        for _ in range(len(grupo) * 8 // bits):
+            codigo = valor & mascara
+            valor >>= bits
+            if codigo == CODIGO_LIMPAR and self._modo_bloco:
+                self._limpar()
+                return
+            if codigo < len(tabela):
+                entrada = tabela[codigo]
+            elif codigo == len(tabela) and anterior is not None:
+                entrada = anterior + anterior[:1]  # caso KwKwK: código criado agora
+            else:
+                raise ValueError("Arquivo .Z corrompido (código LZW inválido)")
+            saida += entrada
+            if anterior is not None and len(tabela) < limite_tabela:
+                tabela.append(anterior + entrada[:1])
+            anterior = entrada
+            self._anterior = anterior
+            # Tabela cheia para a largura atual: os próximos códigos têm um bit a mais (novo grupo)
+            if len(tabela) > mascara and bits < self._max_bits:
+                self._bits = bits + 1
+                return
+
+    def descompactar(self, dados):
+        """Recebe mais bytes do .Z e retorna os bytes descompactados disponíveis."""
+        self._pendente += dados
+        if not self._cabecalho:
+            if len(self._pendente) < 3:
+                return b""
+            self._ler_cabecalho()
+        saida = bytearray()
+        inicio = 0
+        while len(self._pendente) - inicio >= self._bits:
+            fim = inicio + self._bits
+            self._decodificar_grupo(self._pendente[inicio:fim], saida)
+            inicio = fim
+        del self._pendente[:inicio]
+        return bytes(saida)
+
+    def finalizar(self):
+        """Decodifica o último grupo (incompleto) do arquivo."""
+        if not self._cabecalho:
+            if self._pendente:
+                raise ValueError("Arquivo .Z truncado")
+            return b""
+        saida = bytearray()
+        if self._pendente:
+            self._decodificar_grupo(bytes(self._pendente), saida)
+            self._pendente.clear()
+        return bytes(saida)
+
+
+class DescompactadorGzip:
+    """Gzip incremental (zlib), aceitando vários membros concatenados."""
+
+    def __init__(self):
+        self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def descompactar(self, dados):
+        saida = self._zlib.decompress(dados)
+        # Membro terminou e há outro em seguida: continua com um novo decompressobj
+        while self._zlib.eof and self._zlib.unused_data:
+            resto = self._zlib.unused_data
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            saida += self._zlib.decompress(resto)
+        return saida
+
+    def finalizar(self):
+        saida = self._zlib.flush()
+        if not self._zlib.eof:
+            raise ValueError("Arquivo .gz truncado")
+        return saida
+
+
+class Descompactador:
+    """
+    Descompactador de .Z ou .gz reconhecido pelos primeiros bytes.
+    Uso: saida.write(d.descompactar(pedaco)) para cada pedaço e saida.write(d.finalizar()) no fim.
+    """
+
+    def __init__(self):
+        self._inicio = b""
+        self._real = None
+
+    def descompactar(self, dados):
+        if self._real is None:
+            self._inicio += dados
+            if len(self._inicio) < 2:
+                return b""
+            if self._inicio[:2] == ASSINATURA_LZW:
+                self._real = DescompactadorLZW()
+            elif self._inicio[:2] == ASSINATURA_GZIP:
+                self._real = DescompactadorGzip()
+            else:
+                raise ValueError("Formato desconhecido (esperado .Z ou .gz)")
+            dados, self._inicio = self._inicio, b""
+        return self._real.descompactar(dados)
+
+    def finalizar(self):
+        if self._real is None:
+            raise ValueError("Arquivo compactado vazio ou truncado")
+        return self._real.finalizar()
+
+
+def descompactar_arquivo(origem, destino, tamanho_bloco=1024 * 1024):
+    """Descompacta um arquivo .Z ou .gz inteiro de `origem` para `destino`."""
+    descompactador = Descompactador()
+    with open(origem, 'rb') as entrada, open(destino, 'wb') as saida:
+        for bloco in iter(lambda: entrada.read(tamanho_bloco), b""):
+            saida.write(descompactador.descompactar(bloco))
+        saida.write(descompactador.finalizar())
+    return destino
@@ -0,0 +1,1168 @@
+import gzip
+import math
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+
+from rinex import abrir_texto, ler_cabecalho, rotulo, tipos_observacao, versao_rinex
+
+# Com o NumPy, as observações são decodificadas de forma vetorizada (ver _DecodificadorVetorizado)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Decodificador Compact RINEX (Hatanaka) -> RINEX, e o codificador no sentido
+# inverso (RINEX -> CRINEX) no fim do arquivo.
+# Segue o formato do RNX2CRX/CRX2RNX (Hatanaka, 2008): CRINEX 1.0 para RINEX 2
+# e CRINEX 3.0 para RINEX 3. A saída é idêntica à do CRX2RNX/RNX2CRX originais.
+# A decodificação época a época (LeitorCRINEX.epocas) é Python puro; a conversão de
+# arquivos inteiros (crx2rnx, LeitorCRINEX.blocos) usa o NumPy quando ele existe.
+
+# Uma época decodificada.
+#   linha:      linha de época no formato CRINEX (satélites na mesma linha, sem relógio)
+#   flag:       flag de evento da época ('0'..'6')
+#   satelites:  lista de IDs ('G01', 'R05', ...)
+#   relogio:    offset do relógio do receptor em inteiro (1e-9 s no RINEX 2, 1e-12 s no RINEX 3) ou None
+#   valores:    por satélite, lista de observações em milésimos (int) ou None quando ausente
+#   flags:      por satélite, string com LLI/SSI (2 caracteres por tipo de observação)
+#   especiais:  linhas de registro especial (épocas com flag 2-5)
+Epoca = namedtuple('Epoca', 'linha flag satelites relogio valores flags especiais')
+
+VERSAO = "1.0"
+
+regex_crinex_2 = re.compile(r"(\.\d{2})d$", re.IGNORECASE)
+
+# Decodificação de arquivos inteiros vetorizada (NumPy disponível)
+VETORIZADO = np is not None
+
+# Registros de satélite decodificados por vez no caminho vetorizado (limita a memória temporária)
+TAMANHO_BLOCO_REGISTROS = 50_000
+
+# Épocas por bloco de texto quando o NumPy não está disponível
+TAMANHO_BLOCO_EPOCAS = 500
+
+
+def _repor_texto(antigo, novo):
+    """Desfaz a diferença de texto do CRINEX: ' ' mantém o caractere, '&' vira espaço."""
+    if not novo:
+        return antigo
+    if len(antigo) < len(novo):
+        antigo = antigo.ljust(len(novo))
+    saida = ''.join([a if c == ' ' else (' ' if c == '&' else c) for a, c in zip(antigo, novo)])
+    return saida + antigo[len(novo):]
+
+
+def _integrar(arco, campo):
+    """
+    Recupera o valor de um campo diferenciado. O arco guarda [ordem, diferenças],
+    onde diferenças[k] é a diferença de ordem k na época anterior.
+    """
+    ordem, dif = arco
+    valor = int(campo)
+    if ordem == 3 and len(dif) == 4:
+        # Caso mais comum (ordem 3 já estabelecida), desenrolado
+        d2 = dif[2] + valor
+        d1 = dif[1] + d2
+        d0 = dif[0] + d1
+        dif[0], dif[1], dif[2], dif[3] = d0, d1, d2, valor
+        return d0
+    if len(dif) <= ordem:
+        dif.append(valor)
+    else:
+        dif[-1] = valor
+    for k in range(len(dif) - 2, -1, -1):
+        dif[k] += dif[k + 1]
+    return dif[0]
+
+
+def _formatar(valor, casas, largura):
+    """Formata um inteiro em unidades de 10**-casas como o CRX2RNX (sem zero antes do ponto)."""
+    sinal = ''
+    if valor < 0:
+        sinal = '-'
+        valor = -valor
+    inteiro, fracao = divmod(valor, 10 ** casas)
+    texto = f"{sinal}{inteiro if inteiro else ''}.{fracao:0{casas}d}"
+    return texto.rjust(largura)
+
+
+def _formatar_obs(valor):
+    if -1000 < valor < 1000:
+        return _formatar(valor, 3, 14)
+    # Divisão correta em ponto flutuante: exata até 3 casas para valores F14.3
+    return '%14.3f' % (valor / 1000)
+
+
+def _campos_obs(valores, flags):
+    """Campos RINEX de 16 colunas (F14.3 + LLI + SSI); dado ausente sai em branco, sem flags."""
+    flags = flags.ljust(2 * len(valores))
+    return ['                ' if valor is None else _formatar_obs(valor) + flags[2 * j:2 * j + 2]
+            for j, valor in enumerate(valores)]
+
+
+def _relogio(campo, arco, linha_epoca):
+    """Offset do relógio de uma época e o arco atualizado (linha vazia = sem relógio nesta época)."""
+    if not campo:
+        return None, None
+    p = campo.find('&')
+    if p > 0:
+        arco = [int(campo[:p]), [int(campo[p + 1:])]]
+        return arco[1][0], arco
+    if arco is None:
+        raise ValueError(f"Relógio sem inicialização de arco: {linha_epoca}")
+    return _integrar(arco, campo), arco
+
+
+def _limpar_flags(flags, valores):
+    flags = list(flags.ljust(2 * len(valores)))
+    for j, valor in enumerate(valores):
+        if valor is None:
+            flags[2 * j] = flags[2 * j + 1] = ' '
+    return ''.join(flags)
+
+
+class LeitorCRINEX:
+    """
+    Lê um Compact RINEX a partir de um iterador de linhas de texto.
+    O cabeçalho RINEX fica em `cabecalho`; as épocas saem de `epocas()`.
+    """
+
+    def __init__(self, linhas):
+        self._linhas = iter(linhas)
+        primeira = next(self._linhas, '').rstrip('\r\n')
+        if rotulo(primeira) != "CRINEX VERS   / TYPE":
+            raise ValueError("Arquivo não é Compact RINEX (falta CRINEX VERS / TYPE).")
+        self.versao_crinex = primeira[:3]
+        if self.versao_crinex not in ("1.0", "3.0"):
+            raise ValueError(f"Versão CRINEX não suportada: {self.versao_crinex}")
+        next(self._linhas)  # CRINEX PROG / DATE
+
+        self.cabecalho = ler_cabecalho(self._linhas)
+        self.versao = versao_rinex(self.cabecalho)
+        self.tipos = tipos_observacao(self.cabecalho)
+
+    def _proxima(self):
+        linha = next(self._linhas, None)
+        if linha is None:
+            raise ValueError("Arquivo CRINEX truncado no meio de uma época.")
+        return linha.rstrip('\r\n')
+
+    def epocas(self):
+        """Gera as épocas decodificadas (namedtuple Epoca), uma por vez."""
+        v3 = self.versao_crinex == "3.0"
+        marca_inicio = '>' if v3 else '&'
+        pos_flag, pos_n, pos_sats = (31, 32, 41) if v3 else (28, 29, 32)
+        tipos = self.tipos
+        ntipos_v2 = len(tipos.get('', []))
+
+        linha_anterior = ''
+        arco_relogio = None
+        estado = {}
+
+        for linha in self._linhas:
+            linha = linha.rstrip('\r\n')
+            if not linha:
+                continue
+            if linha[0] == marca_inicio:
+                linha_epoca = _repor_texto('', linha)
+            else:
+                linha_epoca = _repor_texto(linha_anterior, linha)
+            flag = linha_epoca[pos_flag:pos_flag + 1]
+            n = int(linha_epoca[pos_n:pos_n + 3])
+
+            if flag in ('2', '3', '4', '5'):
+                especiais = [self._proxima() for _ in range(n)]
+                # Após um registro especial o RNX2CRX reinicia todos os arcos
+                linha_anterior = ''
+                arco_relogio = None
+                estado = {}
+                yield Epoca(linha_epoca.rstrip(), flag, [], None, [], [], especiais)
+                continue
+            linha_anterior = linha_epoca
+
+            relogio, arco_relogio = _relogio(self._proxima(), arco_relogio, linha_epoca)
+
+            satelites = [linha_epoca[pos_sats + 3 * i:pos_sats + 3 * i + 3] for i in range(n)]
+            valores_epoca = []
+            flags_epoca = []
+            novo_estado = {}
+            for sat in satelites:
+                ntipos = len(tipos.get(sat[0], ())) if v3 else ntipos_v2
+                arcos, flags_anteriores = estado.get(sat) or ([None] * ntipos, '')
+                campos = self._proxima().split(' ', ntipos)
+                valores = [None] * ntipos
+                for j in range(ntipos):
+                    c = campos[j] if j < len(campos) else ''
+                    if not c:
+                        arcos[j] = None
+                        continue
+                    p = c.find('&')
+                    if p > 0:
+                        arcos[j] = [int(c[:p]), [int(c[p + 1:])]]
+                        valores[j] = arcos[j][1][0]
+                    elif arcos[j] is None:
+                        raise ValueError(f"Dado sem inicialização de arco ({sat}): {linha_epoca}")
+                    else:
+                        valores[j] = _integrar(arcos[j], c)
+                if len(campos) > ntipos:
+                    flags = _repor_texto(flags_anteriores, campos[ntipos])
+                else:
+                    flags = flags_anteriores
+                if None in valores:
+                    # Flags de dado ausente são zeradas também no estado
+                    flags = _limpar_flags(flags, valores)
+                novo_estado[sat] = (arcos, flags)
+                valores_epoca.append(valores)
+                flags_epoca.append(flags)
+            estado = novo_estado
+
+            yield Epoca(linha_epoca.rstrip(), flag, satelites, relogio,
+                        valores_epoca, flags_epoca, [])
+
+    def linhas_epoca(self):
+        """
+        Gera só as linhas de época (formato CRINEX, satélites na mesma linha), pulando as
+        observações sem decodificá-las. Serve para inventariar épocas e satélites rapidamente.
+        """
+        marca_inicio = '>' if self.versao_crinex == "3.0" else '&'
+        pos_flag, pos_n = (31, 32) if self.versao_crinex == "3.0" else (28, 29)
+        linha_anterior = ''
+        for linha in self._linhas:
+            linha = linha.rstrip('\r\n')
+            if not linha:
+                continue
+            linha_epoca = _repor_texto('' if linha[0] == marca_inicio else linha_anterior, linha)
+            n = int(linha_epoca[pos_n:pos_n + 3])
+            if linha_epoca[pos_flag:pos_flag + 1] in ('2', '3', '4', '5'):
+                linha_anterior = ''
+                for _ in range(n):
+                    self._proxima()
+            else:
+                linha_anterior = linha_epoca
+                for _ in range(n + 1):  # relógio + um registro por satélite
+                    self._proxima()
+            yield linha_epoca.rstrip()
+
+    def linhas(self):
+        """Gera todas as linhas do RINEX decodificado (cabeçalho e épocas), sem quebra de linha."""
+        yield from self.cabecalho
+        for bloco in self.blocos():
+            yield from bloco[:-1].split('\n')
+
+    def blocos(self):
+        """
+        Gera as épocas do RINEX decodificado (sem o cabeçalho) em blocos de texto, cada linha
+        terminada em quebra de linha. Com o NumPy, as observações são decodificadas de forma
+        vetorizada, TAMANHO_BLOCO_REGISTROS registros de satélite por vez; sem ele, por epocas().
+        """
+        if VETORIZADO:
+            yield from self._blocos_vetorizados()
+            return
+        linhas = []
+        for k, epoca in enumerate(self.epocas(), 1):
+            linhas.extend(self.linhas_rinex(epoca))
+            if k % TAMANHO_BLOCO_EPOCAS == 0:
+                yield '\n'.join(linhas) + '\n'
+                linhas = []
+        if linhas:
+            yield '\n'.join(linhas) + '\n'
+
+    def _blocos_vetorizados(self):
+        """
+        Percorre as linhas de época em Python (decodifica a linha e o relógio) e junta os registros
+        de satélite sem decodificá-los; a cada bloco, _DecodificadorVetorizado decodifica todos de uma vez.
+        """
+        v3 = self.versao_crinex == "3.0"
+        marca_inicio = '>' if v3 else '&'
+        pos_flag, pos_n, pos_sats = (31, 32, 41) if v3 else (28, 29, 32)
+        decodificador = _DecodificadorVetorizado(self)
+
+        epocas = []       # (texto das linhas de época, linha CRINEX da época, contador, nº de registros)
+        registros = []    # linhas CRINEX de dados, um satélite por linha
+        satelites = []
+        # Contador das épocas de dados: um evento pula um número, e nenhum arco atravessa a lacuna
+        contador = 0
+        linha_anterior = ''
+        arco_relogio = None
+
+        for linha in self._linhas:
+            linha = linha.rstrip('\r\n')
+            if not linha:
+                continue
+            linha_epoca = _repor_texto('' if linha[0] == marca_inicio else linha_anterior, linha)
+            flag = linha_epoca[pos_flag:pos_flag + 1]
+            n = int(linha_epoca[pos_n:pos_n + 3])
+
+            if flag in ('2', '3', '4', '5'):
+                especiais = [self._proxima() for _ in range(n)]
+                linha_anterior = ''
+                arco_relogio = None
+                contador += 1
+                epocas.append(('\n'.join([linha_epoca.rstrip()] + especiais) + '\n', linha_epoca, contador, 0))
+                contador += 1
+                continue
+            linha_anterior = linha_epoca
+
+            relogio, arco_relogio = _relogio(self._proxima(), arco_relogio, linha_epoca)
+            sats = [linha_epoca[pos_sats + 3 * i:pos_sats + 3 * i + 3] for i in range(n)]
+            dados = list(islice(self._linhas, n))
+            if len(dados) < n:
+                raise ValueError("Arquivo CRINEX truncado no meio de uma época.")
+            registros.extend(dados)
+            satelites.extend(sats)
+            texto = '\n'.join(self._linhas_epoca_rinex(linha_epoca.rstrip(), sats, relogio)) + '\n'
+            epocas.append((texto, linha_epoca, contador, n))
+            contador += 1
+
+            if len(registros) >= TAMANHO_BLOCO_REGISTROS:
+                yield decodificador.bloco(epocas, registros, satelites, contador)
+                epocas, registros, satelites = [], [], []
+        if epocas:
+            yield decodificador.bloco(epocas, registros, satelites, contador)
+
+    def _linhas_epoca_rinex(self, linha, satelites, relogio):
+        """Linha(s) de época RINEX de uma época de dados, com o offset do relógio."""
+        if self.versao_crinex == "3.0":
+            linha = linha[:35]
+            if relogio is not None:
+                linha = linha.ljust(41) + _formatar(relogio, 12, 15)
+            return [linha.rstrip()]
+
+        # RINEX 2: até 12 satélites por linha de época
+        sats = ''.join(satelites)
+        linha = linha[:32] + sats[:36]
+        if relogio is not None:
+            linha = linha.ljust(68) + _formatar(relogio, 9, 12)
+        saida = [linha.rstrip()]
+        for i in range(36, len(sats), 36):
+            saida.append(' ' * 32 + sats[i:i + 36])
+        return saida
+
+    def linhas_rinex(self, epoca):
+        """Converte uma época decodificada nas linhas RINEX correspondentes."""
+        if epoca.flag in ('2', '3', '4', '5'):
+            return [epoca.linha] + epoca.especiais
+
+        saida = self._linhas_epoca_rinex(epoca.linha, epoca.satelites, epoca.relogio)
+        if self.versao_crinex == "3.0":
+            for sat, valores, flags in zip(epoca.satelites, epoca.valores, epoca.flags):
+                saida.append((sat + ''.join(_campos_obs(valores, flags))).rstrip())
+            return saida
+
+        # RINEX 2: 5 observações por linha
+        for valores, flags in zip(epoca.valores, epoca.flags):
+            campos = _campos_obs(valores, flags)
+            for inicio in range(0, max(len(campos), 1), 5):
+                saida.append(''.join(campos[inicio:inicio + 5]).rstrip())
+        return saida
+
+
+# ---------------------------------------------------------------------------
+# Decodificação vetorizada (NumPy)
+# ---------------------------------------------------------------------------
+# Cada campo (satélite, tipo) é uma sequência de arcos: "m&v" inicia um arco de ordem m com o valor v
+# e os campos seguintes são diferenças de ordem min(k, m) na k-ésima época do arco. Com zeros antes
+# do início, a diferença de ordem m do valor é conhecida em todas as épocas do arco; o valor sai de
+# m somas acumuladas (np.cumsum) por arco. Os registros são ordenados por satélite e época, e cada
+# tipo de observação vira uma sequência contínua de campos.
+
+_ESPACO = 32
+_E_COMERCIAL = 38
+_MENOS = 45
+_PONTO = 46
+_ZERO = 48
+
+if np is not None:
+    # Os três dígitos ASCII de 0 a 999 e as potências de 10 (formatação F14.3)
+    _TRES_DIGITOS = np.frombuffer(''.join(f"{i:03d}" for i in range(1000)).encode(), dtype=np.uint8).reshape(1000, 3)
+    _POTENCIAS_10 = 10 ** np.arange(11, dtype=np.int64)
+    # Por número de dígitos da parte inteira, o que subtrair de cada coluna de '0' para virar espaço
+    _ZEROS_A_ESQUERDA = np.where(np.arange(10) < 10 - np.arange(11)[:, None], _ZERO - _ESPACO, 0).astype(np.uint8)
+
+# Diferenças com tantos dígitos não cabem em int64 (nenhum RINEX F14.3 chega perto)
+LARGURA_MAXIMA_CAMPO = 19
+
+
+def _bytes_linhas(linhas):
+    """Bytes das linhas juntas e o início e comprimento (sem \\r\\n finais) de cada uma."""
+    comprimentos = np.fromiter(map(len, linhas), dtype=np.int64, count=len(linhas))
+    buf = np.frombuffer(('\n'.join(linhas) + '\n').encode('ascii', errors='replace'), dtype=np.uint8)
+    inicios = np.zeros(len(linhas), dtype=np.int64)
+    np.cumsum(comprimentos[:-1] + 1, out=inicios[1:])
+    for _ in range(2):  # linhas lidas de arquivo ainda têm o \n (e talvez o \r)
+        final = buf[np.maximum(inicios + comprimentos - 1, 0)]
+        comprimentos -= (comprimentos > 0) & ((final == 10) | (final == 13))
+    return buf, inicios, comprimentos
+
+
+def _dividir_campos(buf, inicios, comprimentos, ntipos, largura):
+    """
+    Divide cada linha como linha.split(' ', ntipos): início e comprimento de cada campo
+    [registro, tipo] (0 = vazio) e início e comprimento do texto de flags (-1 = sem flags).
+    """
+    n = len(inicios)
+    finais = inicios + comprimentos
+    espacos = np.flatnonzero(buf == _ESPACO)
+    linha = np.searchsorted(inicios, espacos, side='right') - 1
+    dentro = espacos < finais[linha]
+    espacos, linha = espacos[dentro], linha[dentro]
+    ordem = np.arange(len(espacos)) - np.searchsorted(espacos, inicios)[linha]
+    separador = ordem < ntipos[linha]
+    espacos, linha, ordem = espacos[separador], linha[separador], ordem[separador]
+    nseparadores = np.bincount(linha, minlength=n)
+
+    # limites[:, k] = separador antes do campo k (k = 0: antes do início da linha)
+    limites = np.empty((n, largura + 1), dtype=np.int64)
+    limites[:, 0] = inicios - 1
+    limites[:, 1:] = finais[:, None]
+    limites[linha, ordem + 1] = espacos
+    tipo = np.arange(largura)
+    existe = (tipo <= nseparadores[:, None]) & (tipo < ntipos[:, None])
+    campo_inicio = limites[:, :-1] + 1
+    campo_comprimento = np.where(existe, limites[:, 1:] - campo_inicio, 0)
+
+    flags_inicio = limites[np.arange(n), ntipos] + 1
+    flags_comprimento = np.where(nseparadores == ntipos, finais - flags_inicio, -1)
+    return campo_inicio, campo_comprimento, flags_inicio, flags_comprimento
+
+
+def _caracteres(buf, inicios, comprimentos, largura):
+    """Matriz uint8 (n, largura) com os caracteres de cada trecho, completada com espaços."""
+    m = np.full((len(inicios), largura), _ESPACO, dtype=np.uint8)
+    com_texto = np.flatnonzero(comprimentos > 0)
+    if len(com_texto) and largura:
+        colunas = np.arange(largura)
+        dentro = colunas < comprimentos[com_texto, None]
+        posicoes = np.where(dentro, inicios[com_texto, None] + colunas, 0)
+        m[com_texto] = np.where(dentro, buf[posicoes], _ESPACO)
+    return m
+
+
+def _numeros_crinex(buf, inicios, comprimentos):
+    """
+    Decodifica campos não vazios ('123', '-45', '3&12345'). Retorna (valor, ordem do arco),
+    com ordem -1 nos campos sem '&' (diferenças). Os inícios de arco são poucos e vão pelo int().
+    """
+    n = len(inicios)
+    valor = np.zeros(n, dtype=np.int64)
+    ordem = np.full(n, -1, dtype=np.int64)
+    if not n:
+        return valor, ordem
+    deslocamentos = np.zeros(n, dtype=np.int64)
+    np.cumsum(comprimentos[:-1], out=deslocamentos[1:])
+    posicoes = np.arange(int(comprimentos.sum())) + np.repeat(inicios - deslocamentos, comprimentos)
+    c = buf[posicoes]
+
+    def invalido(i):
+        texto = bytes(buf[inicios[i]:inicios[i] + comprimentos[i]]).decode('ascii', errors='replace')
+        return ValueError(f"Campo CRINEX inválido: {texto!r}")
+
+    inicios_arco = np.unique(np.searchsorted(deslocamentos, np.flatnonzero(c == _E_COMERCIAL), side='right') - 1)
+    for i in inicios_arco.tolist():
+        texto = bytes(buf[inicios[i]:inicios[i] + comprimentos[i]]).decode('ascii', errors='replace')
+        p = texto.find('&')
+        if p <= 0:
+            raise invalido(i)
+        try:
+            ordem[i] = int(texto[:p])
+            valor[i] = int(texto[p + 1:])
+        except (ValueError, OverflowError):
+            raise invalido(i) from None
+
+    # Diferenças: dígitos com um '-' opcional no início
+    digito = (c >= _ZERO) & (c <= _ZERO + 9)
+    primeiro = np.zeros(len(c), dtype=bool)
+    primeiro[deslocamentos] = True
+    ruins = np.zeros(n + 1, dtype=bool)
+    ruins[np.searchsorted(deslocamentos, np.flatnonzero(~digito & ~((c == _MENOS) & primeiro)), side='right') - 1] = True
+    digitos = np.add.reduceat(digito, deslocamentos)
+    ruins[:n] |= (digitos == 0) | (digitos >= LARGURA_MAXIMA_CAMPO)
+    ruins[inicios_arco] = False
+    if ruins[:n].any():
+        raise invalido(int(np.flatnonzero(ruins[:n])[0]))
+    expoente = np.repeat(deslocamentos + comprimentos - 1, comprimentos) - np.arange(len(c))
+    potencias = 10 ** np.arange(LARGURA_MAXIMA_CAMPO, dtype=np.int64)
+    parcelas = np.where(digito, c.astype(np.int64) - _ZERO, 0) * potencias[np.minimum(expoente, LARGURA_MAXIMA_CAMPO - 1)]
+    diferencas = np.add.reduceat(parcelas, deslocamentos)
+    diferencas[c[deslocamentos] == _MENOS] *= -1
+    return np.where(ordem < 0, diferencas, valor), ordem
+
+
+def _somas_por_arco(valores, inicio_arco):
+    """Soma acumulada que recomeça em cada início de arco (estouro de int64 se cancela na subtração)."""
+    soma = np.cumsum(valores)
+    inicios = np.flatnonzero(inicio_arco)
+    base = soma[inicios] - valores[inicios]
+    return soma - np.repeat(base, np.diff(np.append(inicios, len(valores))))
+
+
+def _integrar_arcos(campos, conhecido, inicio_arco, ordem_arco):
+    """
+    Valores de campos em sequência (um arco após o outro), como _integrar época a época.
+    `conhecido`: o campo já é o valor (histórico de um arco vindo do bloco anterior).
+    `ordem_arco`: ordem do arco de cada campo. Retorna (valores, posição de cada campo no arco).
+    """
+    arco = np.cumsum(inicio_arco) - 1
+    posicao = np.arange(len(campos)) - np.flatnonzero(inicio_arco)[arco]
+    valores = campos.copy()
+
+    # Início do arco (ordem < m): o campo é a diferença de ordem `posicao`; recupera o valor
+    ordem_maxima = int(ordem_arco.max(initial=0))
+    for p in range(1, ordem_maxima):
+        i = np.flatnonzero((posicao == p) & (ordem_arco > p) & ~conhecido)
+        for k in range(1, p + 1):
+            valores[i] += (-1) ** (k + 1) * math.comb(p, k) * valores[i - k]
+
+    # Diferença de ordem m com zeros antes do arco, e as m somas acumuladas
+    diferencas = campos.copy()
+    for m in np.unique(ordem_arco):
+        m = int(m)
+        mesma_ordem = ordem_arco == m
+        for p in range(m):
+            i = np.flatnonzero(mesma_ordem & (posicao == p))
+            diferencas[i] = valores[i]
+            for k in range(1, p + 1):
+                diferencas[i] += (-1) ** k * math.comb(m, k) * valores[i - k]
+        if m:
+            i = np.flatnonzero(mesma_ordem)
+            soma = diferencas[i]
+            for _ in range(m):
+                soma = _somas_por_arco(soma, inicio_arco[i])
+            valores[i] = soma
+    return valores, posicao
+
+
+def _formatar_f14_3(valores):
+    """
+    Campos F14.3 (n, 14) uint8 de inteiros em milésimos, como _formatar_obs, e a máscara
+    dos valores que não cabem em 14 colunas (esses ficam para _formatar_obs).
+    """
+    m = np.empty((len(valores), 14), dtype=np.uint8)
+    inteiro, fracao = np.divmod(np.abs(valores), 1000)
+    digitos = np.searchsorted(_POTENCIAS_10, inteiro, side='right')
+    negativo = valores < 0
+    fora = (digitos + negativo) > 10
+    digitos[fora] = 0
+    inteiro[fora] = 0
+    m[:, 11:] = np.take(_TRES_DIGITOS, fracao, axis=0)
+    m[:, 10] = _PONTO
+    for coluna in (7, 4, 1):
+        m[:, coluna:coluna + 3] = np.take(_TRES_DIGITOS, inteiro % 1000, axis=0)
+        inteiro //= 1000
+    m[:, 0] = _ZERO + inteiro
+    # Zeros à esquerda viram espaço ('0' - 16), inclusive antes do ponto quando |valor| < 1, como o CRX2RNX
+    m[:, :10] -= np.take(_ZEROS_A_ESQUERDA, digitos, axis=0)
+    m[np.flatnonzero(negativo), 9 - digitos[negativo]] = _MENOS
+    return m, fora
+
+
+def _texto_linhas(m):
+    """Texto das linhas da matriz (n, largura), sem espaços finais, e a posição final de cada uma."""
+    n, largura = m.shape
+    preenchido = m != _ESPACO
+    comprimentos = np.where(preenchido.any(axis=1), largura - preenchido[:, ::-1].argmax(axis=1), 0)
+    saida = np.empty((n, largura + 1), dtype=np.uint8)
+    saida[:, :largura] = m
+    saida[np.arange(n), comprimentos] = 10
+    texto = saida[np.arange(largura + 1) <= comprimentos[:, None]].tobytes().decode('ascii')
+    return texto, np.cumsum(comprimentos + 1)
+
+
+class _DecodificadorVetorizado:
+    """
+    Decodifica os registros de satélite de um LeitorCRINEX em blocos, com a mesma saída de epocas().
+    Entre um bloco e o seguinte guarda, para os satélites da última época, o fim de cada arco
+    (os últimos valores necessários para continuar as diferenças) e as flags LLI/SSI.
+    """
+
+    def __init__(self, leitor):
+        self.v3 = leitor.versao_crinex == "3.0"
+        self.ntipos = {sistema: len(tipos) for sistema, tipos in leitor.tipos.items()}
+        if not self.v3:
+            self.ntipos = {'': self.ntipos.get('', 0)}
+        self.largura = max(self.ntipos.values(), default=0)
+        self.estado = {}  # sat -> (contador da época, [(ordem, [valores]) ou None por tipo], flags)
+
+    def _historico(self):
+        """Registros virtuais com o fim dos arcos do bloco anterior, antes dos registros do bloco."""
+        largura = self.largura
+        satelites, contadores, campos, conhecidos, ordens, flags = [], [], [], [], [], []
+        for sat, (contador, arcos, texto_flags) in self.estado.items():
+            linhas = max([len(arco[1]) for arco in arcos if arco] + [1])
+            campo = np.zeros((linhas, largura), dtype=np.int64)
+            conhecido = np.zeros((linhas, largura), dtype=bool)
+            ordem = np.full((linhas, largura), -1, dtype=np.int64)
+            for j, arco in enumerate(arcos):
+                if arco:
+                    m, valores = arco
+                    campo[linhas - len(valores):, j] = valores
+                    conhecido[linhas - len(valores):, j] = True
+                    ordem[linhas - len(valores), j] = m
+            satelites += [sat] * linhas
+            contadores += range(contador - linhas + 1, contador + 1)
+            campos.append(campo)
+            conhecidos.append(conhecido)
+            ordens.append(ordem)
+            flags.append(texto_flags.ljust(2 * largura)[:2 * largura])
+        if not satelites:
+            return [], np.zeros(0, np.int64), np.zeros((0, largura), np.int64), np.zeros((0, largura), bool), \
+                np.zeros((0, largura), np.int64), []
+        return (satelites, np.array(contadores, dtype=np.int64), np.concatenate(campos),
+                np.concatenate(conhecidos), np.concatenate(ordens), flags)
+
+    def bloco(self, epocas, registros, satelites, contador_final):
+        """
+        Texto RINEX das épocas do bloco. `epocas`: (texto das linhas de época, linha CRINEX,
+        contador, nº de registros); `registros`/`satelites`: linha CRINEX e satélite de cada registro.
+        `contador_final` é o contador da próxima época (a última época de dados tem contador_final - 1).
+        """
+        n = len(registros)
+        largura = self.largura
+        epoca_registro = np.repeat(np.arange(len(epocas)), [e[3] for e in epocas])
+        contadores = np.array([e[2] for e in epocas], dtype=np.int64)[epoca_registro]
+        texto_sats = ''.join(satelites)
+        if len(texto_sats) != 3 * n:
+            texto_sats = ''.join(sat.ljust(3) for sat in satelites)
+        sats = np.frombuffer(texto_sats.encode('ascii', errors='replace'), dtype=np.uint8).reshape(n, 3)
+        if self.v3:
+            tabela = np.zeros(256, dtype=np.int64)
+            for sistema, quantidade in self.ntipos.items():
+                if len(sistema) == 1 and ord(sistema) < 256:
+                    tabela[ord(sistema)] = quantidade
+            ntipos = tabela[sats[:, 0]]
+        else:
+            ntipos = np.full(n, self.ntipos[''], dtype=np.int64)
+
+        buf, inicios, comprimentos = _bytes_linhas(registros)
+        campo_inicio, campo_comprimento, flags_inicio, flags_comprimento = _dividir_campos(
+            buf, inicios, comprimentos, ntipos, largura)
+        vazio = campo_comprimento == 0
+        campos = np.zeros((n, largura), dtype=np.int64)
+        ordens = np.full((n, largura), -1, dtype=np.int64)
+        campos[~vazio], ordens[~vazio] = _numeros_crinex(buf, campo_inicio[~vazio], campo_comprimento[~vazio])
+
+        # Flags: ' ' mantém a anterior, '&' vira espaço; dado ausente zera as flags do tipo
+        diferenca = _caracteres(buf, flags_inicio, np.maximum(flags_comprimento, 0), 2 * largura)
+        evento_flag = diferenca != _ESPACO
+        valor_flag = np.where(diferenca == _E_COMERCIAL, _ESPACO, diferenca).astype(np.uint8)
+        ausente = np.repeat(vazio, 2, axis=1)
+        evento_flag |= ausente
+        valor_flag[ausente] = _ESPACO
+
+        # Registros virtuais do bloco anterior, depois ordenação por satélite e época
+        h_sats, h_contadores, h_campos, h_conhecidos, h_ordens, h_flags = self._historico()
+        nh = len(h_sats)
+        todos_sats = np.array(satelites + h_sats, dtype='<U3')
+        contadores = np.concatenate((contadores, h_contadores))
+        campos = np.concatenate((campos, h_campos))
+        conhecido = np.concatenate((np.zeros((n, largura), dtype=bool), h_conhecidos))
+        ordens = np.concatenate((ordens, h_ordens))
+        vazio = np.concatenate((vazio, ~h_conhecidos))
+        evento_flag = np.concatenate((evento_flag, np.zeros((nh, 2 * largura), dtype=bool)))
+        valor_flag = np.concatenate((valor_flag, np.full((nh, 2 * largura), _ESPACO, dtype=np.uint8)))
+        if nh:
+            # A última linha virtual de cada satélite carrega as flags do bloco anterior
+            ultima = np.flatnonzero(np.append(todos_sats[n + 1:] != todos_sats[n:-1], True)) + n
+            evento_flag[ultima] = True
+            valor_flag[ultima] = np.frombuffer(''.join(h_flags).encode('ascii'), dtype=np.uint8).reshape(-1, 2 * largura)
+
+        codigos = np.unique(todos_sats, return_inverse=True)[1]
+        ordem = np.lexsort((contadores, codigos))
+        codigos, contadores = codigos[ordem], contadores[ordem]
+        # Mesmo satélite na época de dados anterior: arcos e flags continuam
+        continua = np.zeros(len(ordem), dtype=bool)
+        continua[1:] = (codigos[1:] == codigos[:-1]) & (contadores[1:] == contadores[:-1] + 1)
+
+        # Um tipo de observação por vez (ordem de coluna), os registros de cada satélite em sequência
+        def em_sequencia(matriz):
+            return matriz[ordem].T.ravel()
+        presente = em_sequencia(~vazio)
+        conhecido_seq = em_sequencia(conhecido)
+        ordem_seq = em_sequencia(ordens)
+        continua_seq = np.tile(continua, largura)
+        anterior_presente = np.zeros_like(presente)
+        anterior_presente[1:] = presente[:-1] & continua_seq[1:]
+        anterior_conhecido = np.zeros_like(presente)
+        anterior_conhecido[1:] = conhecido_seq[:-1] & continua_seq[1:]
+
+        diferenca = presente & ~conhecido_seq & (ordem_seq < 0)
+        sem_arco = diferenca & ~anterior_presente
+        if sem_arco.any():
+            registro = ordem[int(np.flatnonzero(sem_arco)[0]) % len(ordem)]
+            linha_epoca = epocas[epoca_registro[registro]][1] if registro < n else ''
+            raise ValueError(f"Dado sem inicialização de arco ({todos_sats[registro]}): {linha_epoca}")
+        inicio_arco = (presente & ~conhecido_seq & (ordem_seq >= 0)) | (conhecido_seq & ~anterior_conhecido)
+
+        indices = np.flatnonzero(presente)
+        inicio = inicio_arco[indices]
+        ordem_arco = ordem_seq[indices][np.flatnonzero(inicio)][np.cumsum(inicio) - 1]
+        valores, posicao = _integrar_arcos(em_sequencia(campos)[indices], conhecido_seq[indices], inicio,
+                                           ordem_arco)
+
+        valores_seq = np.zeros(len(presente), dtype=np.int64)
+        valores_seq[indices] = valores
+        valores_ordenados = valores_seq.reshape(largura, -1).T
+
+        # Flags: a última alteração de cada caractere desde que o satélite apareceu
+        evento_flag, valor_flag = evento_flag[ordem], valor_flag[ordem]
+        evento_flag[~continua] = True
+        ultimo = np.where(evento_flag, np.arange(len(ordem))[:, None], 0)
+        np.maximum.accumulate(ultimo, axis=0, out=ultimo)
+        flags_ordenadas = np.take_along_axis(valor_flag, ultimo, axis=0)
+
+        self._guardar_estado(contador_final - 1, todos_sats, ordem, contadores, n, indices, valores, posicao,
+                             ordem_arco, flags_ordenadas, ntipos)
+
+        # De volta à ordem do arquivo, só os registros reais
+        desfazer = np.empty_like(ordem)
+        desfazer[ordem] = np.arange(len(ordem))
+        reais = desfazer[:n]
+        texto, finais = self._formatar(sats, valores_ordenados[reais], vazio[:n], flags_ordenadas[reais])
+
+        saida = []
+        finais = finais.tolist()
+        inicio = registro = 0
+        for texto_epoca, _, _, quantidade in epocas:
+            saida.append(texto_epoca)
+            if quantidade:
+                registro += quantidade
+                fim = finais[registro - 1]
+                saida.append(texto[inicio:fim])
+                inicio = fim
+        return ''.join(saida)
+
+    def _guardar_estado(self, contador, sats, ordem, contadores, n, indices, valores, posicao, ordem_arco,
+                        flags, ntipos):
+        """Fim dos arcos e flags dos satélites da última época de dados, para o próximo bloco."""
+        largura = self.largura
+        total = len(ordem)
+        na_sequencia = np.full(total * largura, -1, dtype=np.int64)
+        na_sequencia[indices] = np.arange(len(indices))
+        self.estado = {}
+        for r in np.flatnonzero((contadores == contador) & (ordem < n)).tolist():
+            arcos = []
+            for j in range(int(ntipos[ordem[r]])):
+                i = int(na_sequencia[j * total + r])
+                if i < 0:
+                    arcos.append(None)
+                    continue
+                m = int(ordem_arco[i])
+                k = min(int(posicao[i]) + 1, max(m, 1))
+                arcos.append((m, valores[i - k + 1:i + 1].tolist()))
+            self.estado[str(sats[ordem[r]])] = (contador, arcos, flags[r].tobytes().decode('ascii'))
+
+    def _formatar(self, sats, valores, vazio, flags):
+        """
+        Linhas RINEX dos registros (F14.3 + LLI + SSI por tipo; dado ausente em branco).
+        `sats`: IDs dos satélites (n, 3) uint8. Retorna o texto e a posição final de cada registro.
+        """
+        n, largura = valores.shape
+        campos = np.empty((n, largura, 16), dtype=np.uint8)
+        numeros, fora = _formatar_f14_3(valores.ravel())
+        campos[:, :, :14] = numeros.reshape(n, largura, 14)
+        campos[:, :, 14:] = flags.reshape(n, largura, 2)
+        campos[vazio] = _ESPACO
+        if self.v3:
+            texto, finais = _texto_linhas(np.concatenate((sats, campos.reshape(n, 16 * largura)), axis=1))
+        else:
+            # RINEX 2: 5 observações por linha (uma linha vazia se não houver tipos)
+            por_registro = max((largura + 4) // 5, 1)
+            linhas = np.full((n, por_registro * 5, 16), _ESPACO, dtype=np.uint8)
+            linhas[:, :largura] = campos
+            texto, finais = _texto_linhas(linhas.reshape(n * por_registro, 80))
+            finais = finais[por_registro - 1::por_registro]
+
+        fora = np.flatnonzero((fora.reshape(n, largura) & ~vazio).any(axis=1))
+        if not len(fora):
+            return texto, finais
+        # Valores que não cabem em F14.3 (só em arquivos fora do padrão): esses registros vão pelo Python
+        inicios = np.concatenate(([0], finais[:-1])).tolist()
+        registros = [texto[a:b] for a, b in zip(inicios, finais.tolist())]
+        for r in fora.tolist():
+            campos = _campos_obs([None if v else int(x) for x, v in zip(valores[r], vazio[r])],
+                                 flags[r].tobytes().decode('ascii'))
+            if self.v3:
+                registros[r] = (sats[r].tobytes().decode('ascii') + ''.join(campos)).rstrip() + '\n'
+            else:
+                registros[r] = ''.join(''.join(campos[i:i + 5]).rstrip() + '\n' for i in range(0, max(largura, 1), 5))
+        finais = np.cumsum([len(registro) for registro in registros])
+        return ''.join(registros), finais
+
+
+@contextmanager
+def abrir_crinex(caminho):
+    """Abre um arquivo CRINEX (.YYd, .crx ou .crx.gz) e entrega um LeitorCRINEX."""
+    with abrir_texto(caminho) as arquivo:
+        yield LeitorCRINEX(arquivo)
+
+
+def nome_rinex(caminho):
+    """Nome do RINEX de saída: .22d -> .22o, .crx(.gz) -> .rnx, .d -> .o"""
+    caminho = Path(caminho)
+    nome = caminho.name
+    if nome.lower().endswith('.gz'):
+        nome = nome[:-3]
+    if regex_crinex_2.search(nome):
+        sufixo = 'o' if nome[-1] == 'd' else 'O'
+        nome = nome[:-1] + sufixo
+    elif nome.lower().endswith('.crx'):
+        nome = nome[:-4] + ('.rnx' if nome[-3:] == 'crx' else '.RNX')
+    elif nome.lower().endswith('.d'):
+        nome = nome[:-1] + 'o'
+    else:
+        nome = nome + '.rnx'
+    return caminho.with_name(nome)
+
+
+def crx2rnx(origem, destino=None):
+    """
+    Converte um arquivo Compact RINEX em RINEX sem usar o CRX2RNX externo.
+    Retorna o caminho do arquivo gerado.
+    """
+    origem = Path(origem)
+    destino = Path(destino) if destino else nome_rinex(origem)
+    with abrir_crinex(origem) as leitor, open(destino, 'w', encoding='ascii') as saida:
+        saida.write('\n'.join(leitor.cabecalho) + '\n')
+        for bloco in leitor.blocos():
+            saida.write(bloco)
+    return destino
+
+
+# ---------------------------------------------------------------------------
+# Codificador RINEX -> Compact RINEX (mesmo algoritmo do RNX2CRX 4.x)
+# ---------------------------------------------------------------------------
+
+ORDEM_ARCO = 3
+
+# Diferença (milésimos) acima da qual o RNX2CRX reinicia o arco (salto de ciclo grande)
+LIMITE_SALTO = 100000
+
+regex_rinex_2 = re.compile(r"(\.\d{2})o$", re.IGNORECASE)
+
+
+def _diferenca_texto(antigo, novo):
+    """Inverso de _repor_texto: ' ' onde o caractere não mudou, '&' onde virou espaço."""
+    saida = [' ' if a == c else ('&' if c == ' ' else c) for a, c in zip(antigo, novo)]
+    saida.extend(' ' if a == ' ' else '&' for a in antigo[len(novo):])
+    saida.append(novo[len(antigo):])
+    return ''.join(saida)
+
+
+def _partes(valor, casas):
+    """Divide um inteiro em (parte alta, últimas `casas` casas), com o mesmo sinal, como o RNX2CRX."""
+    sinal = -1 if valor < 0 else 1
+    alta, baixa = divmod(abs(valor), 10 ** casas)
+    return sinal * alta, sinal * baixa
+
+
+def _ler_relogio(campo):
+    """Offset do relógio do receptor (F12.9 no RINEX 2, F15.12 no RINEX 3) em inteiro, sem o ponto."""
+    if campo[2:3] != '.':
+        raise ValueError(f"Offset de relógio inválido: {campo!r}")
+    try:
+        return int(campo[:2] + campo[3:])
+    except ValueError:
+        raise ValueError(f"Offset de relógio inválido: {campo!r}") from None
+
+
+class CodificadorCRINEX:
+    """
+    Grava Compact RINEX a partir do texto RINEX recebido aos poucos, como um arquivo:
+    write() aceita linhas (ou blocos de linhas) e cada época é codificada assim que chega inteira.
+    `saida` é um arquivo aberto em modo texto (pode ser gzip.open(..., 'wt')); com `fechar`,
+    close() fecha também o arquivo.
+    """
+
+    def __init__(self, saida, fechar=False):
+        self.saida = saida
+        self._fechar = fechar
+        self._resto = ''
+        self._cabecalho = True
+        self._versao = None
+        self._ntipos = {}
+        self._bloco = []
+        self._faltam = 0
+        self._linha_anterior = '&'
+        self._relogio = None      # [ordem, diferenças] do arco do relógio
+        self._estado = {}         # sat -> (arcos, flags) da época anterior
+
+    # -- entrada -----------------------------------------------------------
+
+    def write(self, texto):
+        linhas = (self._resto + texto).split('\n')
+        self._resto = linhas.pop()
+        for linha in linhas:
+            self._linha(linha.rstrip('\r').rstrip(' '))
+        return len(texto)
+
+    def close(self):
+        try:
+            if self._resto.strip():
+                self._linha(self._resto.rstrip('\r').rstrip(' '))
+            self._resto = ''
+            if self._bloco or self._cabecalho:
+                raise ValueError("RINEX truncado no meio de uma época.")
+        finally:
+            if self._fechar:
+                self.saida.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, erro, rastro):
+        if tipo is None:
+            self.close()
+        elif self._fechar:
+            self.saida.close()
+
+    # -- cabeçalho ---------------------------------------------------------
+
+    def _linha(self, linha):
+        if self._cabecalho:
+            self._linha_cabecalho(linha)
+        elif self._bloco:
+            self._bloco.append(linha)
+            self._faltam -= 1
+            if not self._faltam:
+                self._codificar_bloco()
+        elif linha and linha != '\x1a':
+            self._bloco = [linha]
+            self._faltam = self._linhas_da_epoca(linha)
+            if not self._faltam:
+                self._codificar_bloco()
+
+    def _linha_cabecalho(self, linha):
+        r = rotulo(linha)
+        if self._versao is None:
+            if r != "RINEX VERSION / TYPE" or linha[20:21] != 'O':
+                raise ValueError("Arquivo não é RINEX de observação (falta RINEX VERSION / TYPE).")
+            self._versao = int(float(linha[:9]))
+            if self._versao not in (2, 3, 4):
+                raise ValueError(f"Versão RINEX não suportada: {linha[:9].strip()}")
+            versao_crinex = "1.0" if self._versao == 2 else "3.0"
+            programa = f"hatanaka.py {VERSAO}"
+            data = datetime.now(timezone.utc).strftime("%d-%b-%y %H:%M")
+            self.saida.write(f"{versao_crinex:<20s}{'COMPACT RINEX FORMAT':<40s}CRINEX VERS   / TYPE\n"
+                             f"{programa:<40s}{data:<20s}CRINEX PROG / DATE\n")
+        self.saida.write(linha + '\n')
+        self._contar_tipos(linha)
+        if r == "END OF HEADER":
+            self._cabecalho = False
+
+    def _contar_tipos(self, linha):
+        r = rotulo(linha)
+        if r == "# / TYPES OF OBSERV" and linha[5:6] != ' ':
+            self._ntipos[''] = int(linha[:6])
+        elif r == "SYS / # / OBS TYPES" and linha[:1] != ' ':
+            self._ntipos[linha[0]] = int(linha[3:6])
+
+    # -- épocas ------------------------------------------------------------
+
+    def _linhas_da_epoca(self, linha):
+        """Quantas linhas ainda faltam para completar a época iniciada em `linha`."""
+        if self._versao == 2:
+            if len(linha) < 29 or linha[0] != ' ' or linha[27] != ' ' or not linha[28].isdigit():
+                raise ValueError(f"Linha de época RINEX inválida: {linha!r}")
+            flag, n = int(linha[28]), int(linha[29:32] or 0)
+            if flag > 1:
+                return n
+            return (n - 1) // 12 + n * max((self._ntipos.get('', 0) + 4) // 5, 1) if n else 0
+        if linha[0] != '>':
+            raise ValueError(f"Linha de época RINEX inválida: {linha!r}")
+        return int(linha[32:35] or 0)
+
+    def _reiniciar(self):
+        self._linha_anterior = '&'
+        self._relogio = None
+        self._estado = {}
+
+    def _codificar_bloco(self):
+        bloco, self._bloco = self._bloco, []
+        linha = bloco[0]
+        v2 = self._versao == 2
+        flag = int(linha[28] if v2 else (linha[31:32].strip() or 0))
+
+        if flag > 1:
+            # Registro especial: sai sem diferenças e reinicia todos os arcos
+            self.saida.write('\n'.join([('&' + linha[1:]) if v2 else linha] + bloco[1:]) + '\n')
+            for especial in bloco[1:]:
+                self._contar_tipos(especial)
+            self._reiniciar()
+            return
+
+        n = int(linha[29:32] if v2 else linha[32:35])
+        if v2:
+            pos_relogio, pos_sats = 68, 32
+            dados = bloco[1 + (n - 1) // 12:] if n else []
+            sats = linha[32:68]
+            for continuacao in bloco[1:1 + (n - 1) // 12 if n else 1]:
+                sats = sats.ljust(len(sats) + (-len(sats)) % 36)
+                sats += continuacao[32:] if continuacao[2:3] == ' ' else continuacao
+            sats = sats[:3 * n].ljust(3 * n)
+            por_sat = max((self._ntipos.get('', 0) + 4) // 5, 1)
+            registros = [dados[por_sat * i:por_sat * (i + 1)] for i in range(n)]
+        else:
+            pos_relogio, pos_sats = 41, 41
+            sats = ''.join(d[:3] for d in bloco[1:])
+            registros = [[d] for d in bloco[1:]]
+        nova = linha.ljust(pos_sats)[:pos_sats] + sats
+
+        # Relógio do receptor: ordem 0 inicia o arco ("3&valor"), depois só diferenças
+        if len(linha) > pos_relogio:
+            valor = _ler_relogio(linha[pos_relogio:])
+            if self._relogio is None:
+                self._relogio = [0, [valor]]
+            else:
+                ordem, anteriores = self._relogio
+                ordem = min(ordem + 1, ORDEM_ARCO)
+                atuais = [valor]
+                for k in range(ordem):
+                    atuais.append(atuais[k] - anteriores[k])
+                self._relogio = [ordem, atuais]
+            ordem, atuais = self._relogio
+            relogio = (f"{ORDEM_ARCO}&" if ordem == 0 else '') + str(atuais[ordem])
+        else:
+            self._relogio = None
+            relogio = ''
+
+        saida = [_diferenca_texto(self._linha_anterior, nova).rstrip(' '), relogio]
+        novo_estado = {}
+        for i in range(n):
+            sat = sats[3 * i:3 * i + 3]
+            ntipos = self._ntipos.get('' if v2 else sat[0])
+            if ntipos is None:
+                raise ValueError(f"Sistema '{sat[0]}' sem SYS / # / OBS TYPES no cabeçalho: {linha!r}")
+            valores, flags = self._ler_registro(registros[i], ntipos, v2)
+            anterior = self._estado.get(sat)
+            arcos = []
+            campos = []
+            for j, valor in enumerate(valores):
+                if valor is None:
+                    arcos.append(None)
+                    campos.append('')
+                    if anterior is not None and v2:
+                        # CRINEX 1.0: campo vazio zera as flags anteriores, sem '&'
+                        f = anterior[1]
+                        anterior = (anterior[0], f[:2 * j] + '  ' + f[2 * j + 2:])
+                    continue
+                arco_anterior = anterior[0][j] if anterior is not None and j < len(anterior[0]) else None
+                arco = self._diferenciar(valor, arco_anterior)
+                arcos.append(arco)
+                ordem, altas, baixas = arco
+                texto = str(altas[ordem] * 100000 + baixas[ordem])
+                campos.append(f"{ORDEM_ARCO}&{texto}" if ordem == 0 else texto)
+            registro = ' '.join(campos) + ' '
+            if anterior is None and not v2:
+                # CRINEX 3.0: satélite novo leva todas as flags, espaços como '&'
+                registro += flags.replace(' ', '&')
+            else:
+                registro = (registro + _diferenca_texto(anterior[1] if anterior else '', flags)).rstrip(' ')
+            saida.append(registro)
+            novo_estado[sat] = (arcos, flags)
+
+        self._estado = novo_estado
+        self._linha_anterior = nova
+        self.saida.write('\n'.join(saida) + '\n')
+
+    @staticmethod
+    def _diferenciar(valor, anterior):
+        """Arco [ordem, partes altas, partes baixas] de um campo, diferenciado contra a época anterior."""
+        alta, baixa = _partes(valor, 5)
+        if anterior is None:
+            return [0, [alta], [baixa]]
+        ordem = min(anterior[0] + 1, ORDEM_ARCO)
+        altas, baixas = [alta], [baixa]
+        for k in range(ordem):
+            altas.append(altas[k] - anterior[1][k])
+            baixas.append(baixas[k] - anterior[2][k])
+        if abs(altas[ordem]) > LIMITE_SALTO:
+            return [0, [alta], [baixa]]
+        return [ordem, altas, baixas]
+
+    @staticmethod
+    def _ler_registro(linhas, ntipos, v2):
+        """Observações (milésimos ou None) e flags LLI/SSI de um satélite."""
+        valores = []
+        flags = []
+        por_linha = 5 if v2 else max(ntipos, 1)
+        for k, inicio in enumerate(range(0, max(ntipos, 1), por_linha)):
+            linha = linhas[k] if k < len(linhas) else ''
+            if not v2:
+                linha = linha[3:]
+            ncampos = min(ntipos - inicio, por_linha)
+            if len(linha) > 16 * ncampos:
+                raise ValueError(f"Mais observações que o número de tipos do cabeçalho: {linha!r}")
+            linha = linha.ljust(16 * ncampos)
+            for j in range(ncampos):
+                campo = linha[16 * j:16 * j + 16]
+                if campo[10] == '.':
+                    try:
+                        valores.append(int(campo[:10] + campo[11:14]))
+                    except ValueError:
+                        raise ValueError(f"Observação inválida: {campo!r}") from None
+                elif not campo[:14].strip():
+                    if v2 and campo[14:16] != '  ':
+                        raise ValueError(f"Flag em observação vazia: {campo!r}")
+                    valores.append(None)
+                else:
+                    raise ValueError(f"Observação inválida: {campo!r}")
+                flags.append(campo[14:16])
+        return valores, ''.join(flags)
+
+
+def nome_crinex(caminho):
+    """Nome do CRINEX de saída: .22o -> .22d, .rnx -> .crx (mantém o resto do nome)."""
+    caminho = Path(caminho)
+    nome = caminho.name
+    if regex_rinex_2.search(nome):
+        nome = nome[:-1] + ('d' if nome[-1] == 'o' else 'D')
+    elif nome.lower().endswith('.rnx'):
+        nome = nome[:-4] + ('.crx' if nome[-3:] == 'rnx' else '.CRX')
+    else:
+        nome = nome + '.crx'
+    return caminho.with_name(nome)
+
+
+def eh_crinex(caminho):
+    """Pelo nome: .YYd, .crx (com ou sem .gz)."""
+    nome = Path(caminho).name
+    if nome.lower().endswith('.gz'):
+        nome = nome[:-3]
+    return bool(regex_crinex_2.search(nome)) or nome.lower().endswith('.crx')
+
+
+def gravar_crinex(caminho, gz=None):
+    """
+    Abre um arquivo para gravar Compact RINEX a partir de texto RINEX: retorna um
+    CodificadorCRINEX que se usa como arquivo (write/close ou with). Termina em .gz -> CRINEX + gzip;
+    `gz` força a escolha (ex: arquivo temporário com outro nome).
+    """
+    caminho = Path(caminho)
+    if gz is None:
+        gz = caminho.suffix.lower() == '.gz'
+    if gz:
+        arquivo = gzip.open(caminho, 'wt', encoding='ascii', newline='\n', compresslevel=6)
+    else:
+        arquivo = open(caminho, 'w', encoding='ascii', newline='\n')
+    return CodificadorCRINEX(arquivo, fechar=True)
+
+
+def rnx2crx(origem, destino=None, gz=False):
+    """
+    Converte um RINEX de observação (texto ou .gz) em Compact RINEX sem usar o RNX2CRX externo.
+    Sem `destino`, usa nome_crinex (+ .gz se `gz`). Retorna o caminho do arquivo gerado.
+    """
+    origem = Path(origem)
+    if destino is None:
+        destino = nome_crinex(nome_rinex(origem) if origem.suffix.lower() == '.gz' else origem)
+        if gz:
+            destino = destino.with_name(destino.name + '.gz')
+    destino = Path(destino)
+    with abrir_texto(origem) as entrada, gravar_crinex(destino) as saida:
+        for linha in entrada:
+            saida.write(linha)
+    return destino
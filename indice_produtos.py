@@ -0,0 +1,107 @@
+import datetime
+from pathlib import Path
+
+import gnsscal
+
+from deposito_produtos import chave_produto
+
+# Índice dos produtos IGS (órbitas e relógios) por semana GPS e dia, montado uma vez por execução do PPP.
+# Cada arquivo de observação recebe só os produtos dos seus dias e dos dias vizinhos (a interpolação
+# das órbitas perto da meia-noite usa as épocas do dia anterior/seguinte), em vez de todos os
+# .sp3/.clk da pasta: com um ano de produtos, cada rnx2rtkp leria centenas de arquivos.
+# Quando há mais de uma solução para o mesmo dia fica só a melhor (final > rápida > ultrarrápida).
+
+TIPOS_ORBITA = ("sp3", "eph")
+TIPOS_RELOGIO = ("clk",)
+
+# Dias antes e depois do período da observação incluídos para a interpolação nas bordas
+DIAS_VIZINHOS = 1
+
+_SEGUNDOS = {"S": 1, "M": 60, "H": 3600, "D": 86400}
+
+
+def _preferencia(chave):
+    """Ordem de escolha entre produtos do mesmo dia: solução, centro IGS, centro e amostragem mais fina."""
+    if chave.centro == "igr" or chave.centro.endswith("rap"):
+        solucao = 1
+    elif chave.centro == "igu" or chave.centro.endswith("ult"):
+        solucao = 2
+    else:
+        solucao = 0
+    amostragem = int(chave.amostragem[:-1]) * _SEGUNDOS.get(chave.amostragem[-1].upper(), 1)
+    return solucao, not chave.centro.startswith("ig"), chave.centro, amostragem
+
+
+class IndiceProdutos:
+    """
+    Produtos por (semana GPS, dia), de uma pasta (IndiceProdutos.da_pasta) ou do depósito local
+    (IndiceProdutos.do_deposito). Uso: orbitas, relogios = indice.selecionar(data_inicial, data_final).
+    """
+
+    def __init__(self, deposito=None):
+        self._deposito = deposito
+        self._dias = {}
+        # Arquivos com nome fora do padrão IGS (dia desconhecido): entram em todas as seleções
+        self.sem_data = []
+
+    def _adicionar(self, chave, caminho):
+        self._dias.setdefault((chave.semana, chave.dia), []).append((chave, caminho))
+
+    @classmethod
+    def da_pasta(cls, pasta):
+        indice = cls()
+        for caminho in sorted(Path(pasta).iterdir()):
+            tipo = caminho.suffix.lower().lstrip('.')
+            if tipo not in TIPOS_ORBITA + TIPOS_RELOGIO:
+                continue
+            chave = chave_produto(caminho.name)
+            if chave is None:
+                indice.sem_data.append(caminho)
+            else:
+                indice._adicionar(chave, caminho)
+        if indice.sem_data:
+            print(f"⚠️ {len(indice.sem_data)} produtos com nome fora do padrão IGS serão usados em todos os arquivos")
+        return indice
+
+    @classmethod
+    def do_deposito(cls, deposito):
+        """Índice das chaves do depósito; os caminhos só são pedidos (e o uso marcado) na seleção."""
+        indice = cls(deposito)
+        for chave in deposito.chaves(TIPOS_ORBITA + TIPOS_RELOGIO):
+            indice._adicionar(chave, None)
+        return indice
+
+    def __len__(self):
+        return sum(len(produtos) for produtos in self._dias.values()) + len(self.sem_data)
+
+    def _melhor(self, semana, dia, tipos):
+        for chave, caminho in sorted(self._dias.get((semana, dia), []), key=lambda item: _preferencia(item[0])):
+            if chave.tipo not in tipos:
+                continue
+            if caminho is None:
+                caminho = self._deposito.obter(chave)
+            if caminho is not None:
+                return caminho
+        return None
+
+    def selecionar(self, data_inicial, data_final=None):
+        """
+        (órbitas, relógios) para observações de `data_inicial` a `data_final` (datetime.date),
+        com os dias vizinhos quando existirem. Listas vazias se faltar órbita ou relógio
+        em algum dos dias observados.
+        """
+        data_final = data_final or data_inicial
+        orbitas, relogios = [], []
+        data = data_inicial - datetime.timedelta(days=DIAS_VIZINHOS)
+        while data <= data_final + datetime.timedelta(days=DIAS_VIZINHOS):
+            semana, dia = gnsscal.date2gpswd(data)
+            orbita = self._melhor(semana, dia, TIPOS_ORBITA)
+            relogio = self._melhor(semana, dia, TIPOS_RELOGIO)
+            if data_inicial <= data <= data_final and (orbita is None or relogio is None) and not self.sem_data:
+                return [], []
+            orbitas += [orbita] if orbita else []
+            relogios += [relogio] if relogio else []
+            data += datetime.timedelta(days=1)
+        orbitas += [p for p in self.sem_data if p.suffix.lower().lstrip('.') in TIPOS_ORBITA]
+        relogios += [p for p in self.sem_data if p.suffix.lower().lstrip('.') in TIPOS_RELOGIO]
+        return orbitas, relogios
@@ -0,0 +1,93 @@
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from leitor_rinex import _abrir_bytes, _estrutura, _ler, _percorrer, _tempos
+
+# Índice de épocas de arquivos RINEX de observação para acesso aleatório.
+# Guarda, para cada época de observação, o instante, o byte onde começa a linha
+# de época e o número de satélites. Com ele, uma janela de tempo (ex: 10:00-12:00)
+# é lida direto do arquivo mapeado em memória, sem percorrer o resto.
+# O índice fica ao lado do arquivo: POLI3050.22o -> POLI3050.22o.idx.npz
+# Arquivos compactados (.gz, Hatanaka) também são indexados: os deslocamentos se referem ao
+# texto RINEX decodificado, e a leitura decodifica o arquivo em memória (como ler_rinex_obs)
+# antes de interpretar só as épocas da janela.
+
+SUFIXO_INDICE = ".idx.npz"
+
+# tempo: datetime64[ns] por época; deslocamento: byte da linha de época;
+# satelites: satélites na época; fim_cabecalho/tamanho: limites do arquivo (decodificado) em bytes
+Indice = namedtuple('Indice', 'tempo deslocamento satelites fim_cabecalho tamanho')
+
+
+def caminho_indice(caminho):
+    caminho = Path(caminho)
+    return caminho.with_name(caminho.name + SUFIXO_INDICE)
+
+
+def construir_indice(caminho):
+    """Percorre as linhas de época de um RINEX de observação e monta o Indice (sem salvar)."""
+    bruto = _abrir_bytes(caminho)
+    buf = np.frombuffer(bruto, dtype=np.uint8)
+    fim_cabecalho, _, versao, _, linhas_por_sat = _estrutura(bruto)
+    inicios, comprimentos, linhas_epoca, _, quantidades = _percorrer(
+        bruto, buf, fim_cabecalho, len(buf), versao, linhas_por_sat, Path(caminho).name)
+    tempo = _tempos(buf, inicios[linhas_epoca], comprimentos[linhas_epoca], versao)
+    return Indice(tempo, inicios[linhas_epoca], quantidades.astype(np.int16), fim_cabecalho, len(buf))
+
+
+def indexar(caminho):
+    """Monta e salva o índice ao lado do arquivo. Retorna o caminho do índice."""
+    caminho = Path(caminho)
+    indice = construir_indice(caminho)
+    info = caminho.stat()
+    destino = caminho_indice(caminho)
+    with open(destino, 'wb') as arquivo:
+        np.savez(arquivo, tempo=indice.tempo, deslocamento=indice.deslocamento, satelites=indice.satelites,
+                 limites=np.array([indice.fim_cabecalho, indice.tamanho, info.st_size, info.st_mtime_ns]))
+    return destino
+
+
+def carregar_indice(caminho):
+    """Lê o índice salvo; se não existir ou o arquivo mudou desde então, monta um novo."""
+    caminho = Path(caminho)
+    destino = caminho_indice(caminho)
+    if destino.is_file():
+        info = caminho.stat()
+        with np.load(destino, allow_pickle=False) as dados:
+            fim_cabecalho, tamanho, tamanho_arquivo, mtime_ns = dados['limites'].tolist()
+            if (tamanho_arquivo, mtime_ns) == (info.st_size, info.st_mtime_ns):
+                return Indice(dados['tempo'], dados['deslocamento'], dados['satelites'], fim_cabecalho, tamanho)
+    indexar(caminho)
+    return carregar_indice(caminho)
+
+
+def _faixa_bytes(indice, inicio, fim):
+    """Bytes [a, b) com as épocas entre `inicio` e `fim` (inclusive); eventos no meio vêm junto."""
+    a = 0 if inicio is None else np.searchsorted(indice.tempo, np.datetime64(inicio, 'ns'), side='left')
+    b = len(indice.tempo) if fim is None else np.searchsorted(indice.tempo, np.datetime64(fim, 'ns'), side='right')
+    byte_a = indice.deslocamento[a] if a < len(indice.tempo) else indice.tamanho
+    byte_b = indice.deslocamento[b] if b < len(indice.tempo) else indice.tamanho
+    return int(byte_a), int(max(byte_a, byte_b))
+
+
+def ler_intervalo(caminho, inicio=None, fim=None, tipos=None, sistemas=None):
+    """
+    Lê só as épocas entre `inicio` e `fim` (ex: '2022-11-01T10:00', '2022-11-01T12:00')
+    usando o índice. Retorna Observacoes, como leitor_rinex.ler_rinex_obs.
+    """
+    indice = carregar_indice(caminho)
+    byte_a, byte_b = _faixa_bytes(indice, inicio, fim)
+    return _ler(_abrir_bytes(caminho), tipos, sistemas, Path(caminho).name, byte_a, byte_b)
+
+
+def extrair_intervalo(caminho, inicio, fim, destino):
+    """Grava um novo RINEX com o cabeçalho original e só as épocas entre `inicio` e `fim`."""
+    indice = carregar_indice(caminho)
+    byte_a, byte_b = _faixa_bytes(indice, inicio, fim)
+    bruto = _abrir_bytes(caminho)
+    with open(destino, 'wb') as saida:
+        saida.write(bruto[:indice.fim_cabecalho])
+        saida.write(bruto[byte_a:byte_b])
+    return Path(destino)
@@ -0,0 +1,322 @@
+import gzip
+import mmap
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from hatanaka import LeitorCRINEX
+from rinex import FIM_CABECALHO, ler_cabecalho, tipos_observacao, versao_rinex
+
+# Leitor colunar de RINEX de observação (2.11 e 3.x) com NumPy.
+# O arquivo é lido como um bloco de bytes; só as linhas de época são percorridas
+# em Python (uma vez por época). Os campos de observação (F14.3 + LLI + SSI) são
+# decodificados de forma vetorizada, em blocos de registros, direto das colunas fixas.
+# Compact RINEX (Hatanaka, .22d/.crx, com ou sem .gz) é decodificado antes, em memória.
+#
+# Memória do resultado: épocas x satélites x tipos x (8 + 2) bytes. Para limitar,
+# escolha os tipos (`tipos=['C1C', 'L1C']`) e/ou sistemas (`sistemas='G'`).
+
+# Observações lidas de um arquivo.
+#   versao:     versão RINEX (2 ou 3)
+#   cabecalho:  linhas do cabeçalho
+#   tempo:      instante de cada época (datetime64[ns], escala de tempo do arquivo)
+#   flags:      flag de cada época (0 ok, 1 falha de energia; eventos 2-6 não entram)
+#   satelites:  IDs dos satélites ('G01', 'R05', ...), ordenados
+#   tipos:      tipos de observação (colunas do último eixo)
+#   valores:    float64 [época, satélite, tipo]; NaN = sem observação
+#   lli, ssi:   int8 [época, satélite, tipo]; 0 quando em branco
+Observacoes = namedtuple('Observacoes', 'versao cabecalho tempo flags satelites tipos valores lli ssi')
+
+# Registros decodificados por vez (limita a memória temporária)
+TAMANHO_BLOCO_REGISTROS = 200_000
+
+_ESPACO = 32
+_EVENTOS = (b'2', b'3', b'4', b'5')
+_POTENCIAS = 10 ** np.arange(19, dtype=np.int64)
+# Peso de cada coluna de um campo F14.3 (a coluna 11 é o ponto decimal)
+_PESOS_F14_3 = np.array([10.0 ** (12 - c) for c in range(10)] + [0.0, 100.0, 10.0, 1.0])
+
+
+def _decodificar_crinex(bruto):
+    """Decodifica um Compact RINEX inteiro para os bytes do RINEX correspondente."""
+    leitor = LeitorCRINEX(iter(bytes(bruto).decode('ascii', errors='replace').splitlines()))
+    return ('\n'.join(leitor.cabecalho) + '\n' + ''.join(leitor.blocos())).encode('ascii', errors='replace')
+
+
+def _abrir_bytes(caminho):
+    """
+    Conteúdo do arquivo como bytes (.gz ou CRINEX, decodificados em memória)
+    ou mmap somente leitura (RINEX comum).
+    """
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == ".gz":
+        with gzip.open(caminho, 'rb') as arquivo:
+            bruto = arquivo.read()
+    else:
+        with open(caminho, 'rb') as arquivo:
+            if caminho.stat().st_size == 0:
+                return b''
+            bruto = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+    if bruto[60:80].rstrip() == b"CRINEX VERS   / TYPE":
+        return _decodificar_crinex(bruto)
+    return bruto
+
+
+def _fim_cabecalho(bruto):
+    """Byte logo após a linha END OF HEADER."""
+    pos = bruto.find(FIM_CABECALHO.encode())
+    if pos < 0:
+        raise ValueError("Cabeçalho RINEX sem END OF HEADER.")
+    fim = bruto.find(b'\n', pos)
+    return len(bruto) if fim < 0 else fim + 1
+
+
+def _linhas(buf, inicio, fim, bloco=64 * 1024 * 1024):
+    """Início e comprimento (sem \\r\\n) de cada linha entre os bytes `inicio` e `fim`."""
+    if fim <= inicio:
+        vazio = np.zeros(0, dtype=np.int64)
+        return vazio, vazio
+    quebras = [np.flatnonzero(buf[p:min(p + bloco, fim)] == 10) + p for p in range(inicio, fim, bloco)]
+    quebras = np.concatenate(quebras)
+    if not len(quebras) or quebras[-1] != fim - 1:
+        quebras = np.append(quebras, fim)  # última linha sem quebra
+    inicios = np.concatenate(([inicio], quebras[:-1] + 1)).astype(np.int64)
+    finais = quebras.astype(np.int64)
+    cr = (finais > inicios) & (buf[np.maximum(finais - 1, 0)] == 13)
+    return inicios, finais - inicios - cr
+
+
+def _matriz(buf, inicios, comprimentos, largura):
+    """Matriz uint8 (n, largura) com os caracteres a partir de `inicios`; espaço além do fim da linha."""
+    colunas = np.arange(largura)
+    dentro = colunas < comprimentos[:, None]
+    indices = np.where(dentro, inicios[:, None] + colunas, 0)
+    return np.where(dentro, buf[indices], _ESPACO).astype(np.uint8)
+
+
+def _decompor_numeros(m):
+    """
+    Decodifica números de largura fixa (uma linha da matriz por número).
+    Retorna (inteiro com todos os dígitos, casas decimais, negativo, vazio).
+    """
+    d = m.astype(np.int64) - 48
+    digito = (d >= 0) & (d <= 9)
+    expoente = np.cumsum(digito[:, ::-1], axis=1)[:, ::-1] - 1
+    inteiro = np.where(digito, d * _POTENCIAS[np.clip(expoente, 0, 18)], 0).sum(axis=1)
+    ponto = m == 46
+    pos_ponto = np.where(ponto.any(axis=1), ponto.argmax(axis=1), m.shape[1])
+    decimais = (digito & (np.arange(m.shape[1]) > pos_ponto[:, None])).sum(axis=1)
+    negativo = (m == 45).any(axis=1)
+    vazio = ~digito.any(axis=1)
+    return inteiro, decimais, negativo, vazio
+
+
+def _numeros_f14_3(m):
+    """
+    Valores dos campos de observação (F14.3). Caminho rápido para o ponto na coluna 11:
+    os dígitos viram um inteiro exato por produto com pesos 10^k; os demais campos
+    (formatação fora do padrão) passam pela decodificação genérica.
+    """
+    d = m.astype(np.int16) - 48
+    digito = (d >= 0) & (d <= 9)
+    inteiro = np.where(digito, d, 0).astype(np.float64) @ _PESOS_F14_3
+    # Divisão de inteiro exato por potência de 10: mesmo arredondamento do float('...')
+    valores = inteiro / 1000.0
+    valores[(m == 45).any(axis=1)] *= -1
+    vazio = ~digito.any(axis=1)
+    valores[vazio] = np.nan
+    fora_do_padrao = np.flatnonzero(~vazio & (m[:, 10] != 46))
+    if len(fora_do_padrao):
+        valores[fora_do_padrao] = _numeros(m[fora_do_padrao])
+    return valores
+
+
+def _numeros(m):
+    """Valores float64 de campos numéricos de largura fixa (NaN quando em branco)."""
+    inteiro, decimais, negativo, vazio = _decompor_numeros(m)
+    valores = inteiro / (10.0 ** decimais)
+    valores[negativo] *= -1
+    valores[vazio] = np.nan
+    return valores
+
+
+def _inteiros(m):
+    inteiro, _, negativo, _ = _decompor_numeros(m)
+    return np.where(negativo, -inteiro, inteiro)
+
+
+def _digitos(coluna):
+    """LLI/SSI: dígito da coluna ou 0 quando em branco."""
+    valores = coluna.astype(np.int8) - 48
+    return np.where((valores >= 0) & (valores <= 9), valores, 0).astype(np.int8)
+
+
+def _tempos(buf, inicios, comprimentos, versao):
+    """Instantes (datetime64[ns]) das linhas de época."""
+    if versao == 2:
+        m = _matriz(buf, inicios, comprimentos, 26)
+        ano = _inteiros(m[:, 1:3])
+        ano = ano + np.where(ano < 80, 2000, 1900)
+        campos = [m[:, 4:6], m[:, 7:9], m[:, 10:12], m[:, 13:15]]
+        segundos = m[:, 15:26]
+    else:
+        m = _matriz(buf, inicios, comprimentos, 29)
+        ano = _inteiros(m[:, 2:6])
+        campos = [m[:, 7:9], m[:, 10:12], m[:, 13:15], m[:, 16:18]]
+        segundos = m[:, 18:29]
+    mes, dia, hora, minuto = (_inteiros(c) for c in campos)
+    inteiro, decimais, _, _ = _decompor_numeros(segundos)
+    nanossegundos = inteiro * _POTENCIAS[np.clip(9 - decimais, 0, 18)]
+
+    tempo = (ano - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (mes - 1).astype('timedelta64[M]')
+    tempo = tempo.astype('datetime64[D]') + (dia - 1).astype('timedelta64[D]')
+    return (tempo.astype('datetime64[ns]') + (hora * 3600 + minuto * 60).astype('timedelta64[s]')
+            + nanossegundos.astype('timedelta64[ns]'))
+
+
+def _epocas(bruto, inicios, comprimentos, versao, linhas_por_sat):
+    """
+    Percorre só as linhas de época (pulando os dados pela contagem de satélites).
+    Retorna (índice da linha de cada época de observação, flag, número de satélites).
+    """
+    v3 = versao != 2
+    pos_flag, pos_n = (31, 32) if v3 else (28, 29)
+    epocas, flags, quantidades = [], [], []
+    i = 0
+    total = len(inicios)
+    inicios_lista = inicios.tolist()
+    comprimentos_lista = comprimentos.tolist()
+    while i < total:
+        comprimento = comprimentos_lista[i]
+        if comprimento == 0:
+            i += 1
+            continue
+        linha = bruto[inicios_lista[i]:inicios_lista[i] + comprimento]
+        if v3 and linha[:1] != b'>':
+            raise ValueError(f"Linha de época inválida (linha {i + 1} dos dados): {linha[:40]!r}")
+        flag = linha[pos_flag:pos_flag + 1]
+        try:
+            n = int(linha[pos_n:pos_n + 3])
+        except ValueError:
+            raise ValueError(f"Linha de época inválida (linha {i + 1} dos dados): {linha[:40]!r}") from None
+        if flag in _EVENTOS:
+            i += 1 + n
+            continue
+        continuacao = 0 if v3 or n == 0 else (n - 1) // 12
+        proxima = i + 1 + continuacao + n * linhas_por_sat
+        if proxima > total:
+            raise ValueError("RINEX truncado no meio de uma época.")
+        if flag != b'6':  # flag 6 = registro de perdas de ciclo, não é observação
+            epocas.append(i)
+            flags.append(int(flag) if flag.strip() else 0)
+            quantidades.append(n)
+        i = proxima
+    return (np.array(epocas, dtype=np.int64), np.array(flags, dtype=np.int8),
+            np.array(quantidades, dtype=np.int64))
+
+
+def _tipos_selecionados(tipos_por_sistema, tipos):
+    """Lista única de tipos (ordem do cabeçalho), filtrada por `tipos` se informado."""
+    uniao = []
+    for lista in tipos_por_sistema.values():
+        uniao.extend(t for t in lista if t not in uniao)
+    if tipos is not None:
+        uniao = [t for t in tipos if t in uniao]
+    return uniao
+
+
+def ler_rinex_obs(caminho, tipos=None, sistemas=None):
+    """
+    Lê um RINEX de observação (.YYo, .rnx ou .gz) em arrays NumPy (ver Observacoes).
+    `tipos` limita os tipos de observação lidos (ex: ['C1', 'L1'] ou ['C1C', 'L1C']);
+    `sistemas` limita os sistemas (ex: 'GR').
+    """
+    # O mmap é liberado quando deixa de ser referenciado (os arrays do resultado são cópias)
+    return _ler(_abrir_bytes(caminho), tipos, sistemas, Path(caminho).name)
+
+
+def _estrutura(bruto):
+    """Cabeçalho do arquivo: (fim do cabeçalho em bytes, linhas, versão, tipos por sistema, linhas por satélite)."""
+    fim_cabecalho = _fim_cabecalho(bruto)
+    cabecalho = ler_cabecalho(bytes(bruto[:fim_cabecalho]).decode('ascii', 'replace').splitlines())
+    versao = versao_rinex(cabecalho)
+    tipos_por_sistema = tipos_observacao(cabecalho)
+    if versao == 2:
+        linhas_por_sat = max((len(tipos_por_sistema.get('', [])) + 4) // 5, 1)
+    else:
+        linhas_por_sat = 1
+    return fim_cabecalho, cabecalho, versao, tipos_por_sistema, linhas_por_sat
+
+
+def _percorrer(bruto, buf, inicio, fim, versao, linhas_por_sat, nome):
+    """Linhas e épocas de observação entre os bytes `inicio` e `fim` (ver _linhas e _epocas)."""
+    inicios, comprimentos = _linhas(buf, inicio, fim)
+    try:
+        linhas_epoca, flags, quantidades = _epocas(bruto, inicios, comprimentos, versao, linhas_por_sat)
+    except ValueError as erro:
+        raise ValueError(f"RINEX corrompido: {nome}. {erro}") from erro
+    return inicios, comprimentos, linhas_epoca, flags, quantidades
+
+
+def _ler(bruto, tipos, sistemas, nome, inicio_dados=None, fim_dados=None):
+    """Decodifica as épocas entre os bytes `inicio_dados` e `fim_dados` (padrão: o arquivo todo)."""
+    buf = np.frombuffer(bruto, dtype=np.uint8)
+    fim_cabecalho, cabecalho, versao, tipos_por_sistema, linhas_por_sat = _estrutura(bruto)
+    tipos_saida = _tipos_selecionados(tipos_por_sistema, tipos)
+    coluna_tipo = {t: j for j, t in enumerate(tipos_saida)}
+
+    inicio_dados = fim_cabecalho if inicio_dados is None else inicio_dados
+    fim_dados = len(buf) if fim_dados is None else fim_dados
+    inicios, comprimentos, linhas_epoca, flags, quantidades = _percorrer(
+        bruto, buf, inicio_dados, fim_dados, versao, linhas_por_sat, nome)
+    tempo = _tempos(buf, inicios[linhas_epoca], comprimentos[linhas_epoca], versao)
+
+    # Um registro por (época, satélite): época, posição k na lista e linha de dados
+    epoca_reg = np.repeat(np.arange(len(linhas_epoca)), quantidades)
+    k = np.arange(len(epoca_reg)) - np.repeat(np.cumsum(quantidades) - quantidades, quantidades)
+    if versao == 2:
+        linha_sat = linhas_epoca[epoca_reg] + k // 12
+        ids = _matriz(buf, inicios[linha_sat] + 32 + 3 * (k % 12), np.full(len(k), 3), 3)
+        ids[ids[:, 0] == _ESPACO, 0] = ord('G')  # sistema em branco = GPS
+        continuacao = np.where(quantidades > 0, (quantidades - 1) // 12, 0)
+        linha_dados = linhas_epoca[epoca_reg] + 1 + continuacao[epoca_reg] + k * linhas_por_sat
+    else:
+        linha_dados = linhas_epoca[epoca_reg] + 1 + k
+        ids = _matriz(buf, inicios[linha_dados], comprimentos[linha_dados], 3)
+        ids[ids[:, 1] == _ESPACO, 1] = ord('0')  # 'G 1' -> 'G01'
+
+    if sistemas is not None:
+        manter = np.isin(ids[:, 0], np.frombuffer(sistemas.encode(), dtype=np.uint8))
+        epoca_reg, linha_dados, ids = epoca_reg[manter], linha_dados[manter], ids[manter]
+    satelites, sat_reg = np.unique(ids.view('S3').ravel(), return_inverse=True)
+    sat_reg = sat_reg.ravel()
+
+    forma = (len(linhas_epoca), len(satelites), len(tipos_saida))
+    valores = np.full(forma, np.nan)
+    lli = np.zeros(forma, dtype=np.int8)
+    ssi = np.zeros(forma, dtype=np.int8)
+
+    for sistema, lista in tipos_por_sistema.items():
+        # No RINEX 3 cada sistema tem a própria lista de tipos
+        if versao == 2:
+            registros = np.arange(len(ids))
+        else:
+            registros = np.flatnonzero(ids[:, 0] == ord(sistema))
+        for inicio in range(0, len(registros), TAMANHO_BLOCO_REGISTROS):
+            r = registros[inicio:inicio + TAMANHO_BLOCO_REGISTROS]
+            e, s, linha_reg = epoca_reg[r], sat_reg[r], linha_dados[r]
+            for j, tipo in enumerate(lista):
+                if tipo not in coluna_tipo:
+                    continue
+                if versao == 2:
+                    linha, coluna = linha_reg + j // 5, 16 * (j % 5)
+                else:
+                    linha, coluna = linha_reg, 3 + 16 * j
+                m = _matriz(buf, inicios[linha] + coluna, comprimentos[linha] - coluna, 16)
+                t = coluna_tipo[tipo]
+                valores[e, s, t] = _numeros_f14_3(m[:, :14])
+                lli[e, s, t] = _digitos(m[:, 14])
+                ssi[e, s, t] = _digitos(m[:, 15])
+
+    return Observacoes(versao, cabecalho, tempo, flags, satelites.astype(str), tipos_saida, valores, lli, ssi)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Manifesto incremental do processamento RBMC (JSON lines, um registro por linha).
+# Cada registro descreve uma entrada de uma etapa (extração, conversão, separação
+# ou pipeline): hash do conteúdo, ferramenta/versão usada e arquivos gerados.
+# Ao carregar, vale o último registro de cada (etapa, entrada).
+
+NOME_MANIFESTO = "manifesto_rbmc.jsonl"
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def hash_conteudo(caminho):
+    """SHA-256 do conteúdo de um arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+            h.update(bloco)
+    return "sha256:" + h.hexdigest()
+
+
+class Manifesto:
+    """Manifesto persistente guardado em `pasta` (normalmente a pasta_final do mês)."""
+
+    def __init__(self, pasta):
+        self.pasta = Path(pasta)
+        self.caminho = self.pasta / NOME_MANIFESTO
+        self.registros = {}
+        self._lock = threading.Lock()
+        if self.caminho.is_file():
+            with open(self.caminho, 'r', encoding='utf-8') as arquivo:
+                for linha in arquivo:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue  # linha cortada por uma execução interrompida
+                    self.registros[(registro["etapa"], registro["entrada"])] = registro
+
+    def _relativo(self, caminho):
+        try:
+            return Path(caminho).resolve().relative_to(self.pasta.resolve()).as_posix()
+        except ValueError:
+            return str(Path(caminho).resolve())
+
+    def _absoluto(self, caminho):
+        return self.pasta / caminho
+
+    def hash_arquivo(self, etapa, caminho):
+        """
+        Hash do arquivo de entrada de uma etapa. Se tamanho e data de modificação
+        batem com o registro anterior, reaproveita o hash sem ler o arquivo.
+        """
+        caminho = Path(caminho)
+        info = caminho.stat()
+        registro = self.registros.get((etapa, caminho.name))
+        if registro and registro.get("tamanho") == info.st_size and registro.get("mtime_ns") == info.st_mtime_ns:
+            return registro["hash"]
+        return hash_conteudo(caminho)
+
+    def atualizado(self, etapa, entrada, hash_entrada, ferramenta, parametros=None):
+        """True se a entrada já foi processada com o mesmo conteúdo, ferramenta e parâmetros e as saídas existem."""
+        registro = self.registros.get((etapa, entrada))
+        if not registro:
+            return False
+        if (registro["hash"], registro["ferramenta"], registro.get("parametros")) != (hash_entrada, ferramenta, parametros):
+            return False
+        return all(self._absoluto(saida).exists() for saida in registro["saidas"])
+
+    def registrar(self, etapa, entrada, hash_entrada, ferramenta, saidas, parametros=None, caminho_entrada=None):
+        """Acrescenta (ou substitui) o registro de uma entrada e grava no arquivo na hora."""
+        registro = {
+            "etapa": etapa,
+            "entrada": entrada,
+            "hash": hash_entrada,
+            "ferramenta": ferramenta,
+            "parametros": parametros,
+            "saidas": [self._relativo(s) for s in saidas],
+            "data": datetime.now().isoformat(timespec='seconds'),
+        }
+        if caminho_entrada is not None and Path(caminho_entrada).exists():
+            info = Path(caminho_entrada).stat()
+            registro["tamanho"] = info.st_size
+            registro["mtime_ns"] = info.st_mtime_ns
+        with self._lock:
+            self.registros[(etapa, entrada)] = registro
+            os.makedirs(self.pasta, exist_ok=True)
+            with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    def compactar(self):
+        """Reescreve o manifesto só com o último registro de cada entrada."""
+        with self._lock:
+            temporario = self.caminho.with_suffix('.tmp')
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                for registro in self.registros.values():
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            os.replace(temporario, self.caminho)
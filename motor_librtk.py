@@ -0,0 +1,152 @@
+import argparse
+import ctypes
+import ctypes.util
+import os
+import re
+import sys
+from pathlib import Path
+
+# Motor de PPP com o RTKLIB carregado como biblioteca compartilhada (librtk.so / rtklib.dll) via ctypes.
+# O rnx2rtkp lê e interpola de novo os produtos (.sp3/.clk) e o ANTEX a cada arquivo de observação;
+# aqui uma única chamada do postpos processa todas as estações do mesmo dia (a palavra-chave %r do
+# RTKLIB troca o nome da estação nos caminhos), lendo os produtos uma vez por grupo. Cada grupo roda
+# em um processo de trabalho próprio (python motor_librtk.py ...), lançado pelo orquestrador como o
+# rnx2rtkp: o postpos guarda o estado em variáveis globais e não pode rodar duas vezes ao mesmo tempo
+# no mesmo processo. Sem a biblioteca, o script de PPP continua com o rnx2rtkp.
+#
+# A biblioteca é compilada a partir do código do RTKLIB (2.4.3 ou demo5), junto com o rnx2rtkp.c,
+# que fornece as funções de mensagem (showmsg, settspan, settime) que a biblioteca espera do programa:
+#   gcc -shared -fPIC -O3 -DENAGLO -DENAGAL -DENACMP -DNFREQ=3 -o librtk.so \
+#       src/*.c src/rcv/*.c app/.../rnx2rtkp/rnx2rtkp.c -lm -lpthread
+
+# Caminho da biblioteca; sem ela, procura uma biblioteca "rtk" ou "rtklib" instalada no sistema
+VARIAVEL_BIBLIOTECA = "RTKLIB_LIB"
+NOMES_BIBLIOTECA = ("rtk", "rtklib")
+
+# Os structs de opções (prcopt_t, solopt_t, filopt_t) são blocos opacos: só o RTKLIB os preenche
+# (getsysopts) e lê (postpos), e o tamanho deles muda entre versões e opções de compilação
+TAMANHO_OPCOES = 1024 ** 2
+TAMANHO_CAMINHO = 1024
+
+# Palavra-chave do RTKLIB trocada pelo nome de cada estação (rover) nos caminhos do postpos
+CHAVE_ROVER = "%r"
+
+# Código de saída do processo de trabalho quando só parte das estações teve solução
+CODIGO_PARCIAL = 2
+
+# Estação no nome padrão: RINEX 3 (SSSSMRCCC_R_AAAADDDHHMM_...) e RINEX 2 (ssssDDDf.YYo, com prefixo GPS_ etc.)
+regex_estacao_rinex3 = re.compile(r"([a-z0-9]{4}\d{2}[a-z]{3})_[RSU]_\d{11}_", re.IGNORECASE)
+regex_estacao_rinex2 = re.compile(r"([a-z0-9]{4})\d{3}[a-z0-9]\.\d{2}o$", re.IGNORECASE)
+
+
+class GTime(ctypes.Structure):
+    """gtime_t do RTKLIB: segundos inteiros (time_t) e fração de segundo."""
+    _fields_ = [("time", ctypes.c_int64), ("sec", ctypes.c_double)]
+
+
+class Librtk:
+    """RTKLIB carregado via ctypes. Uso: Librtk(caminho).postpos(conf, entradas, saida, estacoes)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.lib = ctypes.CDLL(str(caminho))
+        self.lib.resetsysopts.argtypes = []
+        self.lib.resetsysopts.restype = None
+        self.lib.loadopts.argtypes = [ctypes.c_char_p, ctypes.c_void_p]
+        self.lib.loadopts.restype = ctypes.c_int
+        self.lib.getsysopts.argtypes = [ctypes.c_void_p] * 3
+        self.lib.getsysopts.restype = None
+        self.lib.postpos.argtypes = [GTime, GTime, ctypes.c_double, ctypes.c_double,
+                                     ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p,
+                                     ctypes.POINTER(ctypes.c_char_p), ctypes.c_int,
+                                     ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p]
+        self.lib.postpos.restype = ctypes.c_int
+        # Tabela das opções do .conf (opt_t sysopts[]), que o loadopts preenche
+        self._sysopts = ctypes.addressof(ctypes.c_char.in_dll(self.lib, "sysopts"))
+
+    def opcoes(self, config_file):
+        """(prcopt, solopt, filopt) do .conf, como o rnx2rtkp -k: padrões do RTKLIB e as opções do arquivo."""
+        self.lib.resetsysopts()
+        if not self.lib.loadopts(os.fsencode(str(config_file)), self._sysopts):
+            raise ValueError(f"O RTKLIB não conseguiu ler {config_file}")
+        blocos = [ctypes.create_string_buffer(TAMANHO_OPCOES) for _ in range(3)]
+        self.lib.getsysopts(*blocos)
+        return blocos
+
+    def postpos(self, config_file, entradas, saida, estacoes):
+        """
+        Roda o postpos de todas as `estacoes` em uma chamada. `entradas`: a observação com %r no nome
+        (ex: /pasta/%r3050.22o) e os produtos; `saida`: o .pos com %r. Retorna o status do RTKLIB (0 = ok).
+        """
+        prcopt, solopt, filopt = self.opcoes(config_file)
+        arquivos = (ctypes.c_char_p * len(entradas))(*[os.fsencode(str(entrada)) for entrada in entradas])
+        # O postpos recebe o .pos como char* e pode escrever nele
+        arquivo_saida = ctypes.create_string_buffer(os.fsencode(str(saida)), TAMANHO_CAMINHO)
+        return self.lib.postpos(GTime(), GTime(), 0.0, 0.0, prcopt, solopt, filopt, arquivos, len(entradas),
+                                arquivo_saida, ' '.join(estacoes).encode(), b"")
+
+
+def localizar_librtk(caminho=None):
+    """
+    Biblioteca do RTKLIB a usar: `caminho`, a variável RTKLIB_LIB ou uma instalada no sistema,
+    desde que carregue e tenha o postpos. None se não houver (o PPP usa o rnx2rtkp).
+    """
+    pedido = caminho or os.environ.get(VARIAVEL_BIBLIOTECA)
+    candidatos = [pedido] + [ctypes.util.find_library(nome) for nome in NOMES_BIBLIOTECA]
+    for candidato in filter(None, candidatos):
+        try:
+            Librtk(candidato)
+        except (OSError, AttributeError, ValueError) as erro:
+            if candidato == pedido:
+                print(f"⚠️ Biblioteca do RTKLIB inválida ({candidato}): {erro}. Usando o rnx2rtkp.")
+            continue
+        return str(candidato)
+    return None
+
+
+def estacao_rinex(nome):
+    """Estação no nome padrão: POLI3050.22o -> POLI, GPS_poli3050.22o -> poli, POLI00BRA_R_2022... -> POLI00BRA."""
+    encontrado = regex_estacao_rinex3.search(nome) or regex_estacao_rinex2.search(nome)
+    return encontrado.group(1) if encontrado else None
+
+
+def modelo_rover(caminho, estacao):
+    """Caminho com a estação trocada pela palavra-chave do RTKLIB: /p/GPS_POLI3050.pos -> /p/GPS_%r3050.pos."""
+    caminho = Path(caminho)
+    # A estação é a última ocorrência: os prefixos (GPS_...) vêm antes dela
+    i = caminho.name.rfind(estacao)
+    return caminho.with_name(caminho.name[:i] + CHAVE_ROVER + caminho.name[i + len(estacao):])
+
+
+def main(argumentos=None):
+    """Processo de trabalho: motor_librtk.py -l lib -k conf -o %r3050.pos -r "POLI SPJA" %r3050.22o produtos..."""
+    parser = argparse.ArgumentParser(description="PPP de várias estações em um único postpos do RTKLIB (librtk)")
+    parser.add_argument('-l', dest='biblioteca', required=True, help="librtk.so / rtklib.dll")
+    parser.add_argument('-k', dest='conf', required=True, help=".conf do RTKLIB")
+    parser.add_argument('-o', dest='saida', required=True, help=".pos com %%r no lugar da estação")
+    parser.add_argument('-r', dest='estacoes', required=True, help="estações separadas por espaço")
+    parser.add_argument('entradas', nargs='+', help="observação com %%r no lugar da estação e os produtos")
+    args = parser.parse_args(argumentos)
+
+    estacoes = args.estacoes.split()
+    try:
+        status = Librtk(args.biblioteca).postpos(args.conf, args.entradas, args.saida, estacoes)
+    except (OSError, AttributeError, ValueError) as erro:
+        print(f"❌ librtk: {erro}")
+        return 1
+    if status:
+        print(f"❌ postpos terminou com status {status}")
+        return 1
+    faltando = 0
+    for estacao in estacoes:
+        arquivo_pos = Path(args.saida.replace(CHAVE_ROVER, estacao))
+        if arquivo_pos.is_file() and arquivo_pos.stat().st_size:
+            print(f"✅ {estacao}: {arquivo_pos}")
+        else:
+            faltando += 1
+            print(f"❌ {estacao}: sem solução")
+    return CODIGO_PARCIAL if faltando else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import asyncio
+import csv
+import os
+import re
+import signal
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# Memória dos processos fora do Linux (Windows/macOS); sem ele, o pico de memória fica em branco
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Orquestrador assíncrono de programas externos (CRX2RNX, teqc, rnx2rtkp).
+# Cada job roda direto com asyncio.create_subprocess_exec, sem shell e sem
+# um processo Python intermediário. Os jobs são consumidos aos poucos de um
+# iterador (no máximo `max_concorrencia` em andamento), cada um com timeout
+# próprio e stdout/stderr gravados em um arquivo de log por job.
+# Para lotes grandes (PPP), executar_lote roda os jobs mais caros primeiro, dimensiona a
+# concorrência pelos núcleos e pela memória livre, repete falhas transitórias e grava um
+# relatório com a duração e o pico de memória de cada job.
+
+# Um job a executar.
+#   nome:     identificação (também nomeia o arquivo de log)
+#   comando:  lista de argumentos, ex: [rnx2rtkp, '-k', conf, ...]
+#   cwd:      pasta de trabalho (opcional)
+#   stdout:   arquivo que recebe a saída padrão (opcional; senão vai para o log)
+#   dados:    qualquer informação do chamador, devolvida no Resultado
+#   antes:    função sem argumentos chamada (em uma thread) logo antes de iniciar o processo,
+#             ex: descompactar a entrada; se falhar, o job termina com CODIGO_FALHA_PREPARACAO
+#   depois:   função sem argumentos chamada ao final, mesmo em caso de erro, ex: apagar temporários
+#   custo:    estimativa relativa do tempo de execução (executar_lote roda os mais caros primeiro)
+#   timeout:  tempo limite (s) deste job; sem ele, vale o `timeout` do lote
+# Como antes/depois rodam só para os jobs em andamento, no máximo `max_concorrencia`
+# preparações (ex: arquivos descompactados) existem ao mesmo tempo.
+Job = namedtuple('Job', 'nome comando cwd stdout dados antes depois custo timeout', defaults=(None,) * 7)
+
+# Resultado de um job: codigo é None quando o job estourou o timeout e negativo (-sinal) quando o
+# processo foi morto por um sinal, além dos códigos próprios do orquestrador abaixo.
+# tentativas: execuções feitas (executar_lote repete falhas transitórias);
+# memoria: pico de memória residente do processo em bytes (None se não foi possível medir).
+Resultado = namedtuple('Resultado', 'job codigo duracao log timeout tentativas memoria', defaults=(1, None))
+
+# Códigos do orquestrador, fora da faixa dos sinais: a preparação (Job.antes) falhou, ex: .gz corrompido;
+# o executável não pôde ser iniciado (inexistente ou sem permissão)
+CODIGO_FALHA_PREPARACAO = -1000
+CODIGO_FALHA_INICIO = -1001
+
+# Intervalo (s) entre as leituras da memória dos processos em andamento
+INTERVALO_MEMORIA = 0.5
+# Fração da memória disponível que os jobs de um lote podem ocupar juntos
+FRACAO_MEMORIA = 0.8
+
+COLUNAS_RELATORIO = ["job", "custo", "situacao", "codigo", "tentativas", "duracao_s", "pico_memoria_mb", "log"]
+
+_regex_nome_log = re.compile(r'[^\w.-]+')
+
+
+def _caminho_log(pasta_logs, nome):
+    return Path(pasta_logs) / (_regex_nome_log.sub('_', nome) + '.log')
+
+
+def _memoria_processo(pid):
+    """Pico de memória residente (bytes) de um processo em andamento, ou None."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for linha in status:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    if psutil is not None:
+        try:
+            memoria = psutil.Process(pid).memory_info()
+        except psutil.Error:
+            return None
+        return getattr(memoria, 'peak_wset', memoria.rss)
+    return None
+
+
+def memoria_disponivel():
+    """Memória disponível no sistema (bytes), ou None se não for possível saber."""
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for linha in meminfo:
+                if linha.startswith("MemAvailable:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    return None
+
+
+def concorrencia_recursos(memoria_por_job=None, max_concorrencia=None):
+    """
+    Quantos jobs rodar ao mesmo tempo: um por núcleo disponível para o processo,
+    limitado por `max_concorrencia` e pela memória livre (`memoria_por_job` em bytes).
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        nucleos = len(os.sched_getaffinity(0))
+    else:
+        nucleos = os.cpu_count() or 1
+    concorrencia = min(max_concorrencia or nucleos, nucleos)
+    disponivel = memoria_disponivel() if memoria_por_job else None
+    if disponivel:
+        concorrencia = min(concorrencia, int(disponivel * FRACAO_MEMORIA // memoria_por_job))
+    return max(1, concorrencia)
+
+
+async def _executar(job, timeout, pasta_logs, tentativa=1):
+    inicio = time.perf_counter()
+    log = _caminho_log(pasta_logs, job.nome)
+    # Nas novas tentativas o log continua o da anterior
+    with open(log, 'wb' if tentativa == 1 else 'ab') as arquivo_log:
+        if tentativa > 1:
+            arquivo_log.write(f"\n--- Tentativa {tentativa} ---\n".encode())
+        try:
+            if job.antes:
+                try:
+                    await asyncio.to_thread(job.antes)
+                except (OSError, ValueError, EOFError) as erro:
+                    arquivo_log.write(f"Falha na preparação de {job.nome}: {erro}\n".encode())
+                    return Resultado(job, CODIGO_FALHA_PREPARACAO, time.perf_counter() - inicio, log, False,
+                                     tentativa)
+            codigo, estourou, memoria = await _rodar_processo(job, job.timeout or timeout, arquivo_log)
+        finally:
+            if job.depois:
+                await asyncio.to_thread(job.depois)
+    return Resultado(job, codigo, time.perf_counter() - inicio, log, estourou, tentativa, memoria)
+
+
+async def _medir_memoria(pid, pico):
+    """Acompanha o pico de memória do processo até ser cancelada; `pico` é uma lista [valor]."""
+    while True:
+        memoria = _memoria_processo(pid)
+        if memoria is not None:
+            pico[0] = max(pico[0] or 0, memoria)
+        await asyncio.sleep(INTERVALO_MEMORIA)
+
+
+async def _rodar_processo(job, timeout, arquivo_log):
+    """Roda o comando do job. Retorna (código de saída, estourou o timeout, pico de memória ou None)."""
+    estourou = False
+    pico = [None]
+    saida = arquivo_log
+    try:
+        if job.stdout:
+            saida = open(job.stdout, 'wb')
+        processo = await asyncio.create_subprocess_exec(
+            *[str(arg) for arg in job.comando],
+            cwd=job.cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=saida,
+            stderr=arquivo_log if job.stdout else asyncio.subprocess.STDOUT,
+        )
+        medidor = asyncio.create_task(_medir_memoria(processo.pid, pico))
+        try:
+            codigo = await asyncio.wait_for(processo.wait(), timeout)
+        except asyncio.TimeoutError:
+            processo.kill()
+            await processo.wait()
+            codigo = None
+            estourou = True
+        finally:
+            medidor.cancel()
+    except OSError as erro:
+        # Executável inexistente ou sem permissão, ou Job.stdout que não pôde ser criado:
+        # registra no log como falha
+        arquivo_log.write(f"Falha ao iniciar {job.comando[0]}: {erro}\n".encode())
+        codigo = CODIGO_FALHA_INICIO
+    finally:
+        if saida is not arquivo_log:
+            saida.close()
+    return codigo, estourou, pico[0]
+
+
+def executar_jobs(jobs, pasta_logs, max_concorrencia=None, timeout=None, ao_concluir=None):
+    """
+    Executa um iterável de Job com no máximo `max_concorrencia` processos ao mesmo tempo.
+    `timeout` (s) vale para cada job sem Job.timeout; `ao_concluir(resultado)` é chamado assim que
+    cada job termina. Retorna a lista de Resultado.
+    """
+    if max_concorrencia is None:
+        max_concorrencia = os.cpu_count() or 1
+    os.makedirs(pasta_logs, exist_ok=True)
+    return asyncio.run(_executar_lote(jobs, max_concorrencia, timeout, pasta_logs, tentativas=1, espera=0,
+                                      repetir=falha_transitoria, ao_concluir=ao_concluir))
+
+
+def falha_transitoria(resultado):
+    """
+    Falhas que valem uma nova tentativa: tempo esgotado ou processo morto por sinal (ex: falta de memória).
+    Erros do próprio programa, da preparação (entrada corrompida) e executáveis que não iniciam não se repetem.
+    """
+    return resultado.codigo is None or -signal.NSIG < resultado.codigo < 0
+
+
+async def _executar_lote(jobs, max_concorrencia, timeout, pasta_logs, tentativas, espera, repetir, ao_concluir):
+    pendentes = iter(jobs)
+    resultados = []
+
+    async def trabalhador():
+        # Cada trabalhador puxa o próximo job só quando termina o anterior:
+        # o iterador nunca é consumido de uma vez (contrapressão).
+        for job in pendentes:
+            duracao = 0.0
+            for tentativa in range(1, tentativas + 1):
+                resultado = await _executar(job, timeout, pasta_logs, tentativa)
+                duracao += resultado.duracao
+                if tentativa == tentativas or not repetir(resultado):
+                    break
+                # Espera crescente antes de repetir (1x, 2x, 4x...), no mesmo trabalhador
+                await asyncio.sleep(espera * 2 ** (tentativa - 1))
+            # Duração de todas as tentativas somadas
+            resultado = resultado._replace(duracao=duracao)
+            resultados.append(resultado)
+            if ao_concluir:
+                ao_concluir(resultado)
+
+    await asyncio.gather(*(trabalhador() for _ in range(max_concorrencia)))
+    return resultados
+
+
+def executar_lote(jobs, pasta_logs, max_concorrencia=None, memoria_por_job=None, timeout=None, tentativas=1,
+                  espera=5.0, repetir=falha_transitoria, ao_concluir=None, relatorio=None):
+    """
+    Executa um lote de Job para terminar o mais cedo possível: os jobs mais caros (Job.custo)
+    começam primeiro, para que nenhum job longo fique sozinho no fim do lote. A concorrência
+    vem de concorrencia_recursos (núcleos e memória, ver `memoria_por_job`). Cada job tem o próprio
+    Job.timeout ou o `timeout` (s) do lote, e as falhas em que `repetir(resultado)` é verdadeiro são
+    repetidas até `tentativas` vezes, com espera crescente a partir de `espera` (s).
+    Com `relatorio`, grava um CSV com a duração, as tentativas e o pico de memória de cada job.
+    Retorna a lista de Resultado.
+    """
+    jobs = sorted(jobs, key=lambda job: job.custo or 0, reverse=True)
+    max_concorrencia = concorrencia_recursos(memoria_por_job, max_concorrencia)
+    os.makedirs(pasta_logs, exist_ok=True)
+    resultados = asyncio.run(_executar_lote(jobs, max_concorrencia, timeout, pasta_logs, tentativas, espera,
+                                            repetir, ao_concluir))
+    if relatorio:
+        gravar_relatorio(resultados, relatorio)
+    return resultados
+
+
+def situacao(resultado):
+    if resultado.timeout:
+        return "tempo esgotado"
+    if resultado.codigo == CODIGO_FALHA_PREPARACAO:
+        return "falha na preparação"
+    if resultado.codigo == CODIGO_FALHA_INICIO:
+        return "não iniciou"
+    return "ok" if resultado.codigo == 0 else "erro"
+
+
+def gravar_relatorio(resultados, caminho):
+    """Grava o relatório do lote (CSV, um job por linha, na ordem em que terminaram)."""
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS_RELATORIO)
+        escritor.writeheader()
+        for resultado in resultados:
+            escritor.writerow({
+                "job": resultado.job.nome,
+                "custo": resultado.job.custo if resultado.job.custo is not None else '',
+                "situacao": situacao(resultado),
+                "codigo": resultado.codigo if resultado.codigo is not None else '',
+                "tentativas": resultado.tentativas,
+                "duracao_s": round(resultado.duracao, 3),
+                "pico_memoria_mb": round(resultado.memoria / 1024 ** 2, 1) if resultado.memoria else '',
+                "log": resultado.log,
+            })
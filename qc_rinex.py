@@ -0,0 +1,291 @@
+import concurrent.futures
+import csv
+import math
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+from leitor_rinex import ler_rinex_obs
+from rinex import abrir_texto, ler_cabecalho, rotulo, tipos_observacao, versao_rinex
+
+# Controle de qualidade de RINEX de observação (parecido com o teqc +qc), vetorizado
+# sobre os arrays do leitor_rinex. Por arquivo: completude, satélites por época,
+# lacunas, perdas de ciclo (LLI e combinação geometry-free) e multicaminho (MP1/MP2).
+# O resultado vai para uma tabela CSV por pasta, que o PPP usa para pular ou marcar
+# arquivos reprovados antes de gastar CPU com o rnx2rtkp.
+
+NOME_TABELA = "qc_rinex.csv"
+
+VELOCIDADE_LUZ = 299792458.0
+
+# Frequências (Hz) por sistema e banda (2º caractere do tipo de observação)
+FREQUENCIAS = {
+    'G': {'1': 1575.42e6, '2': 1227.60e6, '5': 1176.45e6},
+    'E': {'1': 1575.42e6, '5': 1176.45e6, '7': 1207.14e6, '8': 1191.795e6, '6': 1278.75e6},
+    'C': {'1': 1575.42e6, '2': 1561.098e6, '5': 1176.45e6, '7': 1207.14e6, '6': 1268.52e6},
+    'J': {'1': 1575.42e6, '2': 1227.60e6, '5': 1176.45e6},
+}
+# GLONASS (FDMA): frequência base + canal k * passo; o canal vem do cabeçalho RINEX 3
+FREQUENCIAS_GLONASS = {'1': (1602.0e6, 0.5625e6), '2': (1246.0e6, 0.4375e6)}
+
+# Par de bandas usado no QC de cada sistema
+BANDAS_QC = {'G': ('1', '2'), 'R': ('1', '2'), 'E': ('1', '5'), 'C': ('2', '7'), 'J': ('1', '2')}
+
+# Salto da geometry-free (m) entre épocas seguidas considerado perda de ciclo
+LIMITE_GF = 0.15
+# Arcos mais curtos que isso (épocas) não entram no RMS do multicaminho
+MIN_ARCO = 10
+
+COLUNAS = [
+    "arquivo", "tamanho", "mtime_ns", "epocas", "primeira", "ultima", "intervalo_s", "duracao_h",
+    "completude_epocas", "completude_obs", "sats_medio", "sats_min", "lacunas", "maior_lacuna_s",
+    "saltos_lli", "saltos_gf", "obs_por_salto", "mp1_rms", "mp2_rms", "erro",
+]
+
+# Limites padrão de aprovação: métrica -> ('min' ou 'max', valor)
+LIMITES_PADRAO = {
+    "completude_epocas": ("min", 90.0),
+    "duracao_h": ("min", 20.0),
+    "sats_medio": ("min", 5.0),
+    "maior_lacuna_s": ("max", 3600.0),
+    "obs_por_salto": ("min", 100.0),
+    "mp1_rms": ("max", 1.0),
+    "mp2_rms": ("max", 1.5),
+}
+
+_regex_canal = re.compile(r"(R\d\d) *(-?\d+)")
+
+
+def _canais_glonass(cabecalho):
+    canais = {}
+    for linha in cabecalho:
+        if rotulo(linha) == "GLONASS SLOT / FRQ #":
+            canais.update((sat, int(k)) for sat, k in _regex_canal.findall(linha[4:60]))
+    return canais
+
+
+def _escolher_tipos(versao, tipos_por_sistema):
+    """
+    Tipos usados por sistema: {sistema: (fase banda 1, fase banda 2, código banda 1, código banda 2)}.
+    Prefere o primeiro tipo listado no cabeçalho (no RINEX 2, P antes de C).
+    """
+    escolhidos = {}
+    for sistema, (b1, b2) in BANDAS_QC.items():
+        lista = tipos_por_sistema.get('' if versao == 2 else sistema, [])
+        if versao == 2:
+            codigos = {b: [t for t in (f"P{b}", f"C{b}") if t in lista] for b in (b1, b2)}
+        else:
+            codigos = {b: [t for t in lista if t[:2] == f"C{b}"] for b in (b1, b2)}
+        fases = {b: [t for t in lista if t[:2] == f"L{b}"] for b in (b1, b2)}
+        if all(fases.values()) and all(codigos.values()):
+            escolhidos[sistema] = (fases[b1][0], fases[b2][0], codigos[b1][0], codigos[b2][0])
+    return escolhidos
+
+
+def _comprimentos_onda(sistema, banda, satelites, canais):
+    if sistema == 'R':
+        base, passo = FREQUENCIAS_GLONASS[banda]
+        return np.array([VELOCIDADE_LUZ / (base + canais[s] * passo) if s in canais else np.nan
+                         for s in satelites])
+    return np.full(len(satelites), VELOCIDADE_LUZ / FREQUENCIAS[sistema][banda])
+
+
+def _residuos_arcos(mp, quebra):
+    """Resíduos do multicaminho após tirar a média de cada arco contínuo (arcos curtos saem)."""
+    valido = ~np.isnan(mp)
+    inicio = quebra.copy()
+    inicio[0] = True
+    inicio[1:] |= ~valido[:-1]
+    arco = np.cumsum(inicio, axis=0) + np.arange(mp.shape[1]) * (mp.shape[0] + 1)
+    ids = arco[valido]
+    if not len(ids):
+        return np.zeros(0)
+    _, ids = np.unique(ids, return_inverse=True)
+    valores = mp[valido]
+    contagem = np.bincount(ids)
+    media = np.bincount(ids, valores) / contagem
+    manter = contagem[ids] >= MIN_ARCO
+    return (valores - media[ids])[manter]
+
+
+def _rms(residuos):
+    residuos = np.concatenate(residuos) if residuos else np.zeros(0)
+    return float(np.sqrt(np.mean(residuos ** 2))) if len(residuos) else math.nan
+
+
+def qc_arquivo(caminho):
+    """Calcula as métricas de qualidade de um RINEX de observação. Retorna um dict (ver COLUNAS)."""
+    caminho = Path(caminho)
+    with abrir_texto(caminho) as arquivo:
+        cabecalho = ler_cabecalho(arquivo)
+    versao = versao_rinex(cabecalho)
+    escolhidos = _escolher_tipos(versao, tipos_observacao(cabecalho))
+    canais = _canais_glonass(cabecalho)
+    intervalo = next((float(l[:10]) for l in cabecalho if rotulo(l) == "INTERVAL" and l[:10].strip()), None)
+
+    tipos = sorted({t for lista in escolhidos.values() for t in lista})
+    obs = ler_rinex_obs(caminho, tipos=tipos)
+    info = caminho.stat()
+    metricas = {"arquivo": caminho.name, "tamanho": info.st_size, "mtime_ns": info.st_mtime_ns,
+                "epocas": len(obs.tempo), "erro": ""}
+    if not len(obs.tempo):
+        metricas["erro"] = "sem épocas de observação"
+        return metricas
+
+    segundos = (obs.tempo - obs.tempo[0]) / np.timedelta64(1, 's')
+    dt = np.diff(segundos)
+    if not intervalo:
+        intervalo = float(np.median(dt)) if len(dt) else 30.0
+    continuo = dt <= 1.5 * intervalo
+    presente = ~np.isnan(obs.valores)
+    sats_por_epoca = presente.any(axis=2).sum(axis=1)
+
+    metricas.update({
+        "primeira": str(obs.tempo[0])[:19],
+        "ultima": str(obs.tempo[-1])[:19],
+        "intervalo_s": intervalo,
+        "duracao_h": (segundos[-1] + intervalo) / 3600,
+        "completude_epocas": 100.0 * len(obs.tempo) / (round(segundos[-1] / intervalo) + 1),
+        "sats_medio": float(sats_por_epoca.mean()),
+        "sats_min": int(sats_por_epoca.min()),
+        "lacunas": int((~continuo).sum()),
+        "maior_lacuna_s": float(dt[~continuo].max()) if (~continuo).any() else 0.0,
+    })
+
+    registros = completos = saltos_lli = saltos_gf = saltos = 0
+    residuos_mp1, residuos_mp2 = [], []
+    for sistema, (tipo_l1, tipo_l2, tipo_p1, tipo_p2) in escolhidos.items():
+        colunas = np.flatnonzero(np.char.startswith(obs.satelites, sistema))
+        if not len(colunas):
+            continue
+        j = [obs.tipos.index(t) for t in (tipo_l1, tipo_l2, tipo_p1, tipo_p2)]
+        dados = obs.valores[:, colunas][:, :, j]
+        presentes = ~np.isnan(dados)
+        registros += int(presentes.any(axis=2).sum())
+        completos += int(presentes.all(axis=2).sum())
+
+        # LLI bit 0 em qualquer uma das fases = perda de ciclo declarada pelo receptor
+        lli = obs.lli[:, colunas][:, :, j[:2]]
+        salto_lli = ((lli & 1) == 1).any(axis=2) & presentes[:, :, :2].any(axis=2)
+
+        b1, b2 = BANDAS_QC[sistema]
+        satelites = obs.satelites[colunas]
+        lambda1 = _comprimentos_onda(sistema, b1, satelites, canais)
+        lambda2 = _comprimentos_onda(sistema, b2, satelites, canais)
+        l1 = dados[:, :, 0] * lambda1
+        l2 = dados[:, :, 1] * lambda2
+        p1, p2 = dados[:, :, 2], dados[:, :, 3]
+
+        # Geometry-free: salto maior que LIMITE_GF entre épocas seguidas do mesmo satélite
+        salto_gf = np.zeros_like(salto_lli)
+        with np.errstate(invalid='ignore'):
+            salto_gf[1:] = (np.abs(np.diff(l1 - l2, axis=0)) > LIMITE_GF) & continuo[:, None]
+        saltos_lli += int(salto_lli.sum())
+        saltos_gf += int(salto_gf.sum())
+        saltos += int((salto_lli | salto_gf).sum())
+
+        # Multicaminho (como no teqc), com a média de cada arco removida
+        alfa = (lambda2 / lambda1) ** 2
+        mp1 = p1 - (1 + 2 / (alfa - 1)) * l1 + (2 / (alfa - 1)) * l2
+        mp2 = p2 - (2 * alfa / (alfa - 1)) * l1 + (2 * alfa / (alfa - 1) - 1) * l2
+        quebra = salto_lli | salto_gf
+        quebra[1:] |= ~continuo[:, None]
+        residuos_mp1.append(_residuos_arcos(mp1, quebra))
+        residuos_mp2.append(_residuos_arcos(mp2, quebra))
+
+    metricas.update({
+        "completude_obs": 100.0 * completos / registros if registros else math.nan,
+        "saltos_lli": saltos_lli,
+        "saltos_gf": saltos_gf,
+        "obs_por_salto": registros / max(saltos, 1),
+        "mp1_rms": _rms(residuos_mp1),
+        "mp2_rms": _rms(residuos_mp2),
+    })
+    return metricas
+
+
+def _qc_seguro(caminho):
+    """
+    Versão para os processos: um arquivo ruim vira uma linha com erro, sem derrubar o lote.
+    A linha guarda o tamanho e a data de modificação, para o arquivo não ser relido enquanto não mudar.
+    """
+    caminho = Path(caminho)
+    try:
+        return qc_arquivo(caminho)
+    except (ValueError, OSError) as erro:
+        linha = {"arquivo": caminho.name, "erro": str(erro) or type(erro).__name__}
+    try:
+        info = caminho.stat()
+    except OSError:
+        return linha
+    linha.update({"tamanho": info.st_size, "mtime_ns": info.st_mtime_ns})
+    return linha
+
+
+def ler_tabela(tabela):
+    """Lê uma tabela de QC. Retorna {arquivo: métricas} (números já convertidos)."""
+    tabela = Path(tabela)
+    if not tabela.is_file():
+        return {}
+    metricas = {}
+    with open(tabela, newline='', encoding='utf-8') as arquivo:
+        for linha in csv.DictReader(arquivo):
+            for coluna, valor in linha.items():
+                if coluna not in ("arquivo", "primeira", "ultima", "erro") and valor not in ('', None):
+                    try:
+                        linha[coluna] = int(valor)
+                    except ValueError:
+                        linha[coluna] = float(valor)
+            metricas[linha["arquivo"]] = linha
+    return metricas
+
+
+def _gravar_tabela(tabela, metricas):
+    temporario = Path(tabela).with_suffix('.tmp')
+    with open(temporario, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS, extrasaction='ignore')
+        escritor.writeheader()
+        for nome in sorted(metricas):
+            linha = {c: (round(v, 3) if isinstance(v, float) and not math.isnan(v) else
+                         ('' if isinstance(v, float) else v)) for c, v in metricas[nome].items()}
+            escritor.writerow(linha)
+    os.replace(temporario, tabela)
+
+
+def qc_arquivos(arquivos, tabela, max_workers=None):
+    """
+    Roda o QC em paralelo e grava a tabela CSV. Arquivos que já estão na tabela com o
+    mesmo tamanho e data de modificação não são recalculados. Retorna {arquivo: métricas}.
+    """
+    metricas = ler_tabela(tabela)
+    pendentes = []
+    for caminho in map(Path, arquivos):
+        anterior = metricas.get(caminho.name)
+        info = caminho.stat()
+        if not anterior or (anterior.get("tamanho"), anterior.get("mtime_ns")) != (info.st_size, info.st_mtime_ns):
+            pendentes.append(caminho)
+
+    if pendentes:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for resultado in executor.map(_qc_seguro, pendentes):
+                metricas[resultado["arquivo"]] = resultado
+        _gravar_tabela(tabela, metricas)
+    return metricas
+
+
+def avaliar(metricas, limites=None):
+    """Lista dos motivos de reprovação de um arquivo (vazia = aprovado). Métricas sem valor não reprovam."""
+    if limites is None:
+        limites = LIMITES_PADRAO
+    if metricas.get("erro"):
+        return [f"erro: {metricas['erro']}"]
+    motivos = []
+    for metrica, (sentido, limite) in limites.items():
+        valor = metricas.get(metrica)
+        if valor is None or valor == '' or (isinstance(valor, float) and math.isnan(valor)):
+            continue
+        if (sentido == "min" and valor < limite) or (sentido == "max" and valor > limite):
+            motivos.append(f"{metrica} = {valor:.4g} ({'mín.' if sentido == 'min' else 'máx.'} {limite:g})")
+    return motivos
@@ -0,0 +1,182 @@
+import concurrent.futures
+import ftplib
+import re
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+
+import gnsscal
+
+from conexoes_ftp import ERROS_CONEXAO, listar_pasta
+
+# Resolução dos nomes dos produtos IGS de um dia nos espelhos configurados.
+# Para cada tipo (órbita/relógio) há uma lista de candidatos em ordem de prioridade:
+# final, rápido e ultrarrápido, cada um com o nome longo (IGS0OPSFIN_..., padrão desde
+# a semana 2238) e o nome curto antigo (igsWWWWD.sp3.Z). A pasta da semana é listada em
+# todos os espelhos ao mesmo tempo (uma sondagem paralela por semana, não uma tentativa
+# por arquivo) e o melhor candidato encontrado é baixado do primeiro espelho que o listou.
+
+# Ordem de prioridade das soluções
+SOLUCOES = ("FIN", "RAP", "ULT")
+
+# Um espelho: nome e URL da pasta da semana ({semana} é trocado pela semana GPS).
+# Esquemas aceitos: ftp:// (login anônimo) e http(s):// (índice de pasta em HTML).
+Espelho = namedtuple('Espelho', 'nome url')
+
+ESPELHOS = [
+    Espelho("GFZ", "ftp://ftp.gfz-potsdam.de/GNSS/products/{semana}"),
+    Espelho("IGN", "ftp://igs.ign.fr/pub/igs/products/{semana}"),
+    Espelho("BKG", "https://igs.bkg.bund.de/root_ftp/IGS/products/{semana}"),
+]
+
+TIMEOUT_HTTP = 60
+
+# Prazo (s) da sondagem de uma semana: espelhos que não responderam até lá ficam de fora
+TIMEOUT_SONDAGEM = 90
+
+# Um candidato: solução (FIN/RAP/ULT) e nome do arquivo no servidor
+Candidato = namedtuple('Candidato', 'solucao nome')
+
+# Produto resolvido: candidato escolhido e as fontes [(espelho, tamanho ou None)],
+# na ordem em que os espelhos responderam (a primeira é a preferida)
+Resolucao = namedtuple('Resolucao', 'solucao nome fontes')
+
+# Horários de emissão dos ultrarrápidos, do mais novo para o mais antigo
+HORAS_ULTRA = ("18", "12", "06", "00")
+
+_regex_href = re.compile(r'href="([^"?/]+)"', re.IGNORECASE)
+
+
+def _nomes_longos(semana, dia, tipo, solucao):
+    ano, doy = gnsscal.gpswd2yrdoy(semana, dia)
+    inicio = f"{ano}{doy:03d}"
+    if solucao == "ULT":
+        # Ultrarrápido: só órbita (os relógios vêm no próprio SP3), 4 emissões por dia
+        if tipo != "sp3":
+            return []
+        return [f"IGS0OPSULT_{inicio}{hora}00_02D_15M_ORB.SP3.gz" for hora in HORAS_ULTRA]
+    if tipo == "sp3":
+        return [f"IGS0OPS{solucao}_{inicio}0000_01D_15M_ORB.SP3.gz"]
+    amostragens = ("30S", "05M") if solucao == "FIN" else ("05M",)
+    return [f"IGS0OPS{solucao}_{inicio}0000_01D_{amostragem}_CLK.CLK.gz" for amostragem in amostragens]
+
+
+def _nomes_curtos(semana, dia, tipo, solucao):
+    if solucao == "ULT":
+        return [f"igu{semana}{dia}_{hora}.sp3.Z" for hora in HORAS_ULTRA] if tipo == "sp3" else []
+    prefixo = "igs" if solucao == "FIN" else "igr"
+    if tipo == "sp3":
+        return [f"{prefixo}{semana}{dia}.sp3.Z"]
+    if solucao == "FIN":
+        return [f"igs{semana}{dia}.clk_30s.Z", f"igs{semana}{dia}.clk.Z"]  # relógio 30 s (melhor) e 5 min
+    return [f"igr{semana}{dia}.clk.Z"]
+
+
+def candidatos(semana, dia, tipo, solucoes=SOLUCOES):
+    """Nomes a procurar para um dia e tipo ('sp3' ou 'clk'), do melhor para o pior: [Candidato, ...]."""
+    return [Candidato(solucao, nome) for solucao in solucoes
+            for nome in _nomes_longos(semana, dia, tipo, solucao) + _nomes_curtos(semana, dia, tipo, solucao)]
+
+
+def local_espelho(espelho, semana):
+    """(esquema, host, porta, pasta) da pasta da semana no espelho."""
+    partes = urllib.parse.urlsplit(espelho.url.format(semana=semana))
+    porta = partes.port or {"ftp": 21, "http": 80, "https": 443}[partes.scheme]
+    return partes.scheme, partes.hostname, porta, partes.path.rstrip('/')
+
+
+def url_arquivo(espelho, semana, nome):
+    return espelho.url.format(semana=semana).rstrip('/') + '/' + nome
+
+
+def _listar_http(url):
+    """Nomes dos arquivos de um índice de pasta HTTP (tamanhos desconhecidos)."""
+    try:
+        with urllib.request.urlopen(url.rstrip('/') + '/', timeout=TIMEOUT_HTTP) as resposta:
+            html = resposta.read().decode('utf-8', 'replace')
+    except urllib.error.HTTPError as erro:
+        if erro.code == 404:
+            return None
+        raise
+    return {urllib.parse.unquote(nome): (None, None) for nome in _regex_href.findall(html)}
+
+
+def listar_espelho(espelho, semana, pools, cache, permanente=False):
+    """
+    Arquivos da pasta da semana no espelho {nome: (tamanho, mtime)}, do cache quando possível;
+    None se a pasta não existir. `pools` é um dict {(host, porta): PoolFTP}.
+    Retorna (listagem, veio do cache).
+    """
+    esquema, host, porta, pasta = local_espelho(espelho, semana)
+    listagem = cache.obter(f"{host}:{porta}", pasta)
+    if listagem is not None:
+        return listagem, True
+    if esquema == "ftp":
+        try:
+            listagem = pools[(host, porta)].executar(listar_pasta, pasta)
+        except ftplib.error_perm:
+            return None, False
+    else:
+        listagem = _listar_http(espelho.url.format(semana=semana))
+        if listagem is None:
+            return None, False
+    cache.guardar(f"{host}:{porta}", pasta, listagem, permanente=permanente)
+    return listagem, False
+
+
+def invalidar_listagem(cache, espelho, semana):
+    """Descarta a listagem da semana do espelho (ex: arquivo listado que o servidor não tinha)."""
+    _, host, porta, pasta = local_espelho(espelho, semana)
+    cache.invalidar(f"{host}:{porta}", pasta)
+
+
+def sondar_espelhos(espelhos, semana, pools, cache, executor, permanente=False, objetivos=(),
+                    timeout=TIMEOUT_SONDAGEM):
+    """
+    Lista a pasta da semana em todos os espelhos ao mesmo tempo.
+    Retorna [(espelho, listagem, veio do cache)] na ordem em que as respostas chegaram
+    (espelhos sem a pasta ou inacessíveis ficam de fora, com um aviso).
+    Com `objetivos` (nomes dos melhores candidatos), retorna assim que as respostas listam todos eles;
+    os outros espelhos só são esperados quando falta algum (e vai ser preciso um candidato pior).
+    Espelhos que não respondem em `timeout` (s) ficam de fora.
+    """
+    futuros = {executor.submit(listar_espelho, espelho, semana, pools, cache, permanente): espelho
+               for espelho in espelhos}
+    faltam = set(objetivos)
+    respostas = []
+    try:
+        for futuro in concurrent.futures.as_completed(futuros, timeout=timeout):
+            espelho = futuros[futuro]
+            try:
+                listagem, do_cache = futuro.result()
+            except ERROS_CONEXAO + (urllib.error.URLError,) as erro:
+                print(f"   ⚠️ Espelho {espelho.nome} inacessível (semana {semana}): {erro}")
+                continue
+            if listagem is None:
+                continue
+            respostas.append((espelho, listagem, do_cache))
+            faltam = {nome for nome in faltam if nome not in listagem}
+            if objetivos and not faltam:
+                break
+    except concurrent.futures.TimeoutError:
+        atrasados = [espelho.nome for futuro, espelho in futuros.items() if not futuro.done()]
+        print(f"   ⚠️ Sem resposta em {timeout} s (semana {semana}): {', '.join(atrasados)}")
+    # As sondagens que ainda não começaram são canceladas; as em andamento terminam sozinhas
+    # (e guardam a listagem no cache), sem segurar o resultado
+    for futuro in futuros:
+        futuro.cancel()
+    return respostas
+
+
+def resolver(semana, dia, tipo, respostas, solucoes=SOLUCOES):
+    """
+    Melhor candidato do dia presente em algum espelho: Resolucao ou None.
+    `respostas` vem de sondar_espelhos; as fontes seguem a ordem das respostas.
+    """
+    for candidato in candidatos(semana, dia, tipo, solucoes):
+        fontes = [(espelho, listagem[candidato.nome][0]) for espelho, listagem, _ in respostas
+                  if candidato.nome in listagem]
+        if fontes:
+            return Resolucao(candidato.solucao, candidato.nome, fontes)
+    return None
@@ -0,0 +1,67 @@
+import gzip
+from pathlib import Path
+
+# Rótulo (colunas 61-80) que encerra o cabeçalho RINEX
+FIM_CABECALHO = "END OF HEADER"
+
+
+def abrir_texto(caminho):
+    """Abre um arquivo RINEX/CRINEX em modo texto, descompactando .gz se preciso."""
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == ".gz":
+        return gzip.open(caminho, 'rt', encoding='ascii', errors='replace', newline='')
+    return open(caminho, 'r', encoding='ascii', errors='replace', newline='')
+
+
+def rotulo(linha):
+    """Retorna o rótulo de uma linha de cabeçalho RINEX (colunas 61-80)."""
+    return linha[60:80].strip()
+
+
+def ler_cabecalho(linhas):
+    """
+    Lê as linhas de cabeçalho de um iterador até o END OF HEADER (inclusive).
+    Retorna a lista de linhas, sem quebra de linha.
+    """
+    cabecalho = []
+    for linha in linhas:
+        linha = linha.rstrip('\r\n')
+        cabecalho.append(linha)
+        if rotulo(linha) == FIM_CABECALHO:
+            return cabecalho
+    raise ValueError("Cabeçalho RINEX sem END OF HEADER.")
+
+
+def versao_rinex(cabecalho):
+    """Versão principal (2 ou 3) declarada no RINEX VERSION / TYPE."""
+    for linha in cabecalho:
+        if rotulo(linha) == "RINEX VERSION / TYPE":
+            return int(float(linha[:9]))
+    raise ValueError("Cabeçalho RINEX sem RINEX VERSION / TYPE.")
+
+
+def tipos_observacao(cabecalho):
+    """
+    Lê os tipos de observação do cabeçalho.
+    RINEX 2: {'': [tipos]} (mesmos tipos para todos os sistemas).
+    RINEX 3: {'G': [tipos], 'R': [tipos], ...}.
+    """
+    tipos = {}
+    sistema = None
+    for linha in cabecalho:
+        r = rotulo(linha)
+        if r == "# / TYPES OF OBSERV":
+            lista = tipos.setdefault('', [])
+            for i in range(9):
+                tipo = linha[6 + 6 * i:12 + 6 * i].strip()
+                if tipo:
+                    lista.append(tipo)
+        elif r == "SYS / # / OBS TYPES":
+            if linha[0] != ' ':
+                sistema = linha[0]
+                tipos[sistema] = []
+            for i in range(13):
+                tipo = linha[7 + 4 * i:10 + 4 * i].strip()
+                if tipo:
+                    tipos[sistema].append(tipo)
+    return tipos
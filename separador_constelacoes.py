@@ -0,0 +1,265 @@
+import os
+from pathlib import Path
+
+from hatanaka import eh_crinex, gravar_crinex
+from rinex import abrir_texto, ler_cabecalho, rotulo, tipos_observacao, versao_rinex
+
+# Separador de constelações em Python puro (substitui as três passagens do teqc).
+# Lê cada época do RINEX de observação uma única vez e grava ao mesmo tempo
+# todas as saídas pedidas (ex: só GPS, só GLONASS, GPS+GLONASS), reescrevendo
+# o cabeçalho de cada uma. Suporta RINEX 2.11 e 3.x com qualquer subconjunto
+# de sistemas (G, R, E, C, J, S, I). Saídas com nome CRINEX (.22d, .crx, com
+# ou sem .gz) já são gravadas compactadas (Hatanaka + gzip), sem arquivo .o no disco.
+# Cada saída é gravada em <nome>.tmp e só recebe o nome final quando todas terminam sem erro.
+
+VERSAO = "1.0"
+
+SISTEMAS = {
+    'G': 'GPS',
+    'R': 'GLONASS',
+    'E': 'Galileo',
+    'C': 'BeiDou',
+    'J': 'QZSS',
+    'S': 'SBAS',
+    'I': 'IRNSS',
+}
+
+# Bandas de frequência (2º caractere do tipo de observação) de cada sistema no RINEX 2.11
+BANDAS_RINEX_2 = {
+    'G': '125',
+    'R': '12',
+    'E': '15678',
+    'S': '15',
+}
+
+# Rótulos de cabeçalho RINEX 3 que começam com o sistema na coluna 1
+ROTULOS_POR_SISTEMA = (
+    "SYS / # / OBS TYPES",
+    "SYS / PHASE SHIFT",
+    "SYS / DCBS APPLIED",
+    "SYS / PCVS APPLIED",
+    "SYS / SCALE FACTOR",
+)
+
+# Rótulos que só fazem sentido com GLONASS
+ROTULOS_GLONASS = ("GLONASS SLOT / FRQ #", "GLONASS COD/PHS/BIS")
+
+# Contagens que deixam de valer depois da separação
+ROTULOS_DESCARTADOS = ("# OF SATELLITES", "PRN / # OF OBS")
+
+
+def nome_constelacao(sistemas):
+    """Nome usado nas pastas/prefixos de saída: 'G' -> 'GPS', 'GR' -> 'GPS_GLONASS'."""
+    return '_'.join(SISTEMAS[s].upper() for s in sistemas)
+
+
+def _sistema(sat):
+    # No RINEX 2 o sistema em branco significa GPS
+    return sat[0] if sat[0] != ' ' else 'G'
+
+
+def _linha_versao(linha, sistemas):
+    """Reescreve o sistema de satélite (coluna 41) do RINEX VERSION / TYPE."""
+    if len(sistemas) == 1:
+        sistema = next(iter(sistemas))
+        tipo = f"{sistema} ({SISTEMAS.get(sistema, sistema).upper()})"
+    else:
+        tipo = "M (MIXED)"
+    return f"{linha[:40]}{tipo:<20s}{linha[60:]}"
+
+
+class _Saida:
+    """Uma saída do separador: arquivo aberto, sistemas aceitos e, no RINEX 2, colunas mantidas."""
+
+    def __init__(self, caminho, sistemas):
+        self.caminho = Path(caminho)
+        self.temporario = self.caminho.with_name(self.caminho.name + ".tmp")
+        self.sistemas = set(sistemas)
+        self.arquivo = None
+        self.colunas = None
+        self.epocas = 0
+
+    def cabecalho_rinex_2(self, cabecalho, tipos):
+        bandas = set(''.join(BANDAS_RINEX_2.get(s, '') for s in self.sistemas))
+        self.colunas = [i for i, t in enumerate(tipos) if t[1:2] in bandas]
+        if len(self.colunas) == len(tipos):
+            self.colunas = None  # todas as colunas: as linhas de dados passam sem alteração
+        mantidos = tipos if self.colunas is None else [tipos[i] for i in self.colunas]
+
+        saida = []
+        for linha in cabecalho:
+            r = rotulo(linha)
+            if r == "# / TYPES OF OBSERV":
+                if saida and rotulo(saida[-1]) == r:
+                    continue
+                for i in range(0, max(len(mantidos), 1), 9):
+                    campo = f"{len(mantidos):6d}" if i == 0 else ' ' * 6
+                    campo += ''.join(f"{t:>6s}" for t in mantidos[i:i + 9])
+                    saida.append(f"{campo:<60s}{r}")
+            elif r in ROTULOS_DESCARTADOS:
+                continue
+            elif r == "RINEX VERSION / TYPE":
+                saida.append(_linha_versao(linha, self.sistemas))
+            else:
+                saida.append(linha)
+        return saida
+
+    def cabecalho_rinex_3(self, cabecalho):
+        saida = []
+        sistema_atual = None
+        for linha in cabecalho:
+            r = rotulo(linha)
+            if r in ROTULOS_POR_SISTEMA:
+                # Linhas de continuação têm o sistema em branco e seguem a anterior
+                if linha[0] != ' ':
+                    sistema_atual = linha[0]
+                if sistema_atual in self.sistemas:
+                    saida.append(linha)
+            elif r in ROTULOS_GLONASS:
+                if 'R' in self.sistemas:
+                    saida.append(linha)
+            elif r in ROTULOS_DESCARTADOS:
+                continue
+            elif r == "RINEX VERSION / TYPE":
+                saida.append(_linha_versao(linha, self.sistemas))
+            else:
+                saida.append(linha)
+        return saida
+
+
+def _reagrupar_rinex_2(linhas, colunas):
+    """Mantém só as colunas indicadas dos dados de um satélite (5 campos de 16 colunas por linha)."""
+    campos = []
+    for linha in linhas:
+        linha = linha.ljust(80)
+        campos.extend(linha[16 * i:16 * i + 16] for i in range(5))
+    mantidos = [campos[i] for i in colunas]
+    return [''.join(mantidos[i:i + 5]).rstrip() for i in range(0, max(len(mantidos), 1), 5)]
+
+
+def _separar_rinex_2(linhas, saidas, tipos):
+    ntipos = len(tipos)
+    linhas_por_sat = max((ntipos + 4) // 5, 1)
+
+    for linha in linhas:
+        linha = linha.rstrip('\r\n')
+        if not linha.strip():
+            continue
+        flag = linha[28:29]
+        n = int(linha[29:32])
+
+        if flag in ('2', '3', '4', '5'):
+            especiais = [next(linhas).rstrip('\r\n') for _ in range(n)]
+            for saida in saidas:
+                saida.arquivo.write('\n'.join([linha] + especiais) + '\n')
+            continue
+
+        sats = linha[32:68].rstrip()
+        relogio = linha[68:80]
+        for _ in range((n - 1) // 12):
+            sats += next(linhas).rstrip('\r\n')[32:68].rstrip()
+        sats = [sats[3 * i:3 * i + 3] for i in range(n)]
+        dados = [[next(linhas).rstrip('\r\n') for _ in range(linhas_por_sat)] for _ in sats]
+
+        for saida in saidas:
+            escolhidos = [i for i, sat in enumerate(sats) if _sistema(sat) in saida.sistemas]
+            if not escolhidos:
+                continue
+            lista = ''.join(sats[i] for i in escolhidos)
+            primeira = f"{linha[:29]}{len(escolhidos):3d}{lista[:36]}"
+            if relogio.strip():
+                primeira = primeira.ljust(68) + relogio
+            bloco = [primeira]
+            for i in range(36, len(lista), 36):
+                bloco.append(' ' * 32 + lista[i:i + 36])
+            for i in escolhidos:
+                if saida.colunas is None:
+                    bloco.extend(dados[i])
+                else:
+                    bloco.extend(_reagrupar_rinex_2(dados[i], saida.colunas))
+            saida.arquivo.write('\n'.join(bloco) + '\n')
+            saida.epocas += 1
+
+
+def _separar_rinex_3(linhas, saidas):
+    for linha in linhas:
+        linha = linha.rstrip('\r\n')
+        if not linha.startswith('>'):
+            continue
+        flag = linha[31:32]
+        n = int(linha[32:35])
+
+        if flag in ('2', '3', '4', '5'):
+            especiais = [next(linhas).rstrip('\r\n') for _ in range(n)]
+            for saida in saidas:
+                saida.arquivo.write('\n'.join([linha] + especiais) + '\n')
+            continue
+
+        dados = [next(linhas).rstrip('\r\n') for _ in range(n)]
+        for saida in saidas:
+            escolhidos = [d for d in dados if d[:1] in saida.sistemas]
+            if not escolhidos:
+                continue
+            bloco = [f"{linha[:32]}{len(escolhidos):3d}{linha[35:]}"] + escolhidos
+            saida.arquivo.write('\n'.join(bloco) + '\n')
+            saida.epocas += 1
+
+
+def separar_linhas(linhas, saidas, nome="RINEX"):
+    """
+    Separa por constelação um RINEX de observação recebido como iterador de linhas
+    (ex: direto do decodificador Hatanaka, sem arquivo .o intermediário).
+    `saidas` é um dict {caminho_saida: sistemas}, ex: {"GPS_x.22o": "G", "GPS_GLONASS_x.22d.gz": "GR"}.
+    Caminhos com nome CRINEX (.22d, .crx, .22d.gz, .crx.gz) são gravados compactados.
+    Com erro, nenhuma saída é criada (nem fica pela metade com o nome final).
+    Retorna {caminho_saida: número de épocas gravadas}.
+    """
+    linhas = iter(linhas)
+    saidas = [_Saida(caminho, sistemas) for caminho, sistemas in saidas.items()]
+    cabecalho = ler_cabecalho(linhas)
+    versao = versao_rinex(cabecalho)
+    tipos = tipos_observacao(cabecalho)
+    concluido = False
+    erro_fechamento = None
+    try:
+        for saida in saidas:
+            if eh_crinex(saida.caminho):
+                saida.arquivo = gravar_crinex(saida.temporario, gz=saida.caminho.suffix.lower() == '.gz')
+            else:
+                saida.arquivo = open(saida.temporario, 'w', encoding='ascii')
+            if versao == 2:
+                novo = saida.cabecalho_rinex_2(cabecalho, tipos.get('', []))
+            else:
+                novo = saida.cabecalho_rinex_3(cabecalho)
+            saida.arquivo.write('\n'.join(novo) + '\n')
+
+        try:
+            if versao == 2:
+                _separar_rinex_2(linhas, saidas, tipos.get('', []))
+            else:
+                _separar_rinex_3(linhas, saidas)
+        except (StopIteration, ValueError) as erro:
+            raise ValueError(f"RINEX truncado ou corrompido: {nome}") from erro
+        concluido = True
+    finally:
+        # Cada saída é fechada mesmo que outra falhe ao fechar (ex: disco cheio no gzip)
+        for saida in saidas:
+            if saida.arquivo:
+                try:
+                    saida.arquivo.close()
+                except (OSError, ValueError) as erro:
+                    erro_fechamento = erro_fechamento or erro
+        for saida in saidas:
+            if concluido and erro_fechamento is None:
+                os.replace(saida.temporario, saida.caminho)
+            else:
+                saida.temporario.unlink(missing_ok=True)
+    if erro_fechamento is not None:
+        raise erro_fechamento
+    return {saida.caminho: saida.epocas for saida in saidas}
+
+
+def separar_constelacoes(arquivo_obs, saidas):
+    """Separa um arquivo RINEX de observação por constelação em uma única leitura (ver separar_linhas)."""
+    with abrir_texto(arquivo_obs) as arquivo:
+        return separar_linhas(arquivo, saidas, Path(arquivo_obs).name)
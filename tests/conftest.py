@@ -0,0 +1,191 @@
+import functools
+import http.server
+import math
+import random
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório, ao lado dos scripts numerados
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+# Tipos de observação dos arquivos sintéticos
+TIPOS_RINEX3 = {'G': "C1C L1C D1C S1C C2W L2W".split(), 'R': "C1C L1C S1C C2P L2P".split(),
+                'E': "C1C L1C S1C C5Q L5Q".split()}
+TIPOS_RINEX2 = "C1 L1 L2 P2 S1 S2".split()
+
+
+def _valor(rnd, tipo, t, fase):
+    """Observação plausível (pseudodistância, fase, Doppler ou SNR) que varia suavemente no tempo."""
+    elevacao = math.sin(t / 3000 + fase)
+    distancia = 20e6 + 5e6 * (1 - elevacao)
+    if tipo[0] in 'CP':
+        return distancia + rnd.gauss(0, 0.5)
+    if tipo[0] == 'L':
+        return distancia / 0.19 + rnd.gauss(0, 0.01)
+    if tipo[0] == 'D':
+        return -3000 * math.cos(t / 3000 + fase)
+    return 30 + 20 * elevacao
+
+
+def _campo(rnd, valor):
+    """Campo F14.3 + LLI + SSI; às vezes com perda de ciclo (LLI) ou sem dado."""
+    if rnd.random() < 0.03:
+        return ' ' * 16
+    lli = '1' if rnd.random() < 0.02 else ' '
+    return f"{valor:14.3f}{lli}{rnd.choice('5678')}"
+
+
+def gerar_rinex3(caminho, epocas=40, semente=1):
+    """RINEX 3.04 misto (G/R/E) a 30 s, com satélites entrando e saindo, dados ausentes e um evento."""
+    rnd = random.Random(semente)
+    linhas = [f"{'     3.04':<20}{'OBSERVATION DATA':<20}{'M (MIXED)':<20}RINEX VERSION / TYPE",
+              f"{'TESTE':<60}MARKER NAME",
+              f"{'':<20}{'TRM59800.00     NONE':<20}{'':<20}ANT # / TYPE"]
+    for sistema, tipos in TIPOS_RINEX3.items():
+        linhas.append(f"{sistema}  {len(tipos):3d}" + ''.join(f" {t}" for t in tipos).ljust(54) + "SYS / # / OBS TYPES")
+    linhas += [f"{'    30.000':<60}INTERVAL",
+               f"{'  2022    11     1     0     0    0.0000000     GPS':<60}TIME OF FIRST OBS",
+               f"{'':<60}END OF HEADER"]
+    satelites = [f"{s}{i:02d}" for s in "GRE" for i in range(1, 9)]
+    fases = {sat: rnd.uniform(0, 6.28) for sat in satelites}
+    for k in range(epocas):
+        t = 30 * k
+        if k == epocas // 2:
+            # Evento com registro especial (flag 4 e uma linha de comentário)
+            linhas.append(f"> 2022 11 01 00 {t // 60:02d} {t % 60:10.7f}  4  1")
+            linhas.append(f"{'EVENTO DE TESTE':<60}COMMENT")
+        visiveis = [sat for sat in satelites if math.sin(t / 3000 + fases[sat]) > -0.3]
+        relogio = f"{rnd.uniform(-1e-3, 1e-3):15.12f}" if k % 7 else ''
+        linhas.append(f"> 2022 11 01 00 {t // 60:02d} {t % 60:10.7f}  0{len(visiveis):3d}      {relogio}".rstrip())
+        for sat in visiveis:
+            campos = [_campo(rnd, _valor(rnd, tipo, t, fases[sat])) for tipo in TIPOS_RINEX3[sat[0]]]
+            linhas.append((sat + ''.join(campos)).rstrip())
+    Path(caminho).write_text('\n'.join(linhas) + '\n')
+    return Path(caminho)
+
+
+def gerar_rinex2(caminho, epocas=40, semente=2):
+    """RINEX 2.11 misto (G/R) a 30 s, com mais de 12 satélites por época (linha de continuação)."""
+    rnd = random.Random(semente)
+    linhas = [f"{'     2.11':<20}{'OBSERVATION DATA':<20}{'M (MIXED)':<20}RINEX VERSION / TYPE",
+              f"{'TESTE':<60}MARKER NAME",
+              f"{'':<20}{'TRM59800.00     NONE':<20}{'':<20}ANT # / TYPE",
+              f"{len(TIPOS_RINEX2):6d}" + ''.join(f"{t:>6}" for t in TIPOS_RINEX2).ljust(54) + "# / TYPES OF OBSERV",
+              f"{'    30.000':<60}INTERVAL",
+              f"{'  2022    11     1     0     0    0.0000000     GPS':<60}TIME OF FIRST OBS",
+              f"{'':<60}END OF HEADER"]
+    satelites = [f"G{i:02d}" for i in range(1, 11)] + [f"R{i:02d}" for i in range(1, 7)]
+    fases = {sat: rnd.uniform(0, 6.28) for sat in satelites}
+    for k in range(epocas):
+        t = 30 * k
+        visiveis = [sat for sat in satelites if math.sin(t / 3000 + fases[sat]) > -0.5]
+        sats = ''.join(visiveis)
+        relogio = f"{rnd.uniform(-1e-3, 1e-3):12.9f}" if k % 5 else ''
+        linha = f" 22 11  1  0 {t // 60:2d} {t % 60:10.7f}  0{len(visiveis):3d}{sats[:36]}"
+        linhas.append((linha.ljust(68) + relogio).rstrip())
+        for i in range(36, len(sats), 36):
+            linhas.append(' ' * 32 + sats[i:i + 36])
+        for sat in visiveis:
+            campos = [_campo(rnd, _valor(rnd, tipo, t, fases[sat])) for tipo in TIPOS_RINEX2]
+            for inicio in range(0, len(campos), 5):
+                linhas.append(''.join(campos[inicio:inicio + 5]).rstrip())
+    Path(caminho).write_text('\n'.join(linhas) + '\n')
+    return Path(caminho)
+
+
+@pytest.fixture
+def rinex3(tmp_path):
+    return gerar_rinex3(tmp_path / "TESTE00BRA_R_20223050000_01D_30S_MO.rnx")
+
+
+@pytest.fixture
+def rinex2(tmp_path):
+    return gerar_rinex2(tmp_path / "test3050.22o")
+
+
+class _ManipuladorHTTP(http.server.SimpleHTTPRequestHandler):
+    """Arquivos de uma pasta com keep-alive e Range (que o SimpleHTTPRequestHandler não tem)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        servidor = self.server
+        intervalo = self.headers.get("Range")
+        servidor.pedidos.append((self.path, intervalo))
+        caminho = Path(self.translate_path(self.path))
+        if caminho.is_dir():
+            return super().do_GET()
+        if not caminho.is_file():
+            return self.send_error(404)
+        dados = caminho.read_bytes()
+        inicio = 0
+        if intervalo and servidor.range:
+            inicio = int(intervalo.split('=')[1].split('-')[0])
+            if inicio >= len(dados):
+                return self.send_error(416)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{len(dados) - 1}/{len(dados)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(dados) - inicio))
+        self.end_headers()
+        if servidor.cortar:
+            # Conexão que cai no meio da resposta: só parte do corpo e fecha
+            self.wfile.write(dados[inicio:inicio + servidor.cortar])
+            servidor.cortar = 0
+            self.close_connection = True
+            return
+        self.wfile.write(dados[inicio:])
+
+
+@pytest.fixture
+def servidor_http(tmp_path):
+    """Servidor HTTP local sobre tmp_path/http: .pasta, .porta, .pedidos [(caminho, Range)], .range, .cortar."""
+    pasta = tmp_path / "http"
+    pasta.mkdir()
+    servidor = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                               functools.partial(_ManipuladorHTTP, directory=str(pasta)))
+    servidor.daemon_threads = True
+    servidor.pedidos, servidor.range, servidor.cortar = [], True, 0
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield SimpleNamespace(pasta=pasta, porta=servidor.server_address[1], servidor=servidor,
+                          pedidos=servidor.pedidos)
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def servidor_ftp(tmp_path):
+    """Servidor FTP local (pyftpdlib, login anônimo) sobre tmp_path/ftp: .pasta, .porta, .comandos."""
+    pytest.importorskip("pyftpdlib")
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    pasta = tmp_path / "ftp"
+    pasta.mkdir()
+    comandos = []
+    autorizador = DummyAuthorizer()
+    autorizador.add_anonymous(str(pasta))
+
+    class Manipulador(FTPHandler):
+        authorizer = autorizador
+
+        def pre_process_command(self, linha, comando, argumento):
+            comandos.append((comando, argumento))
+            super().pre_process_command(linha, comando, argumento)
+
+    servidor = ThreadedFTPServer(("127.0.0.1", 0), Manipulador)
+    # O evento de parada do ThreadedFTPServer é da classe: o close_all de um servidor anterior pararia este
+    servidor._exit = threading.Event()
+    threading.Thread(target=servidor.serve_forever, kwargs={"timeout": 0.05}, daemon=True).start()
+    yield SimpleNamespace(pasta=pasta, porta=servidor.address[1], comandos=comandos)
+    servidor.close_all()
@@ -0,0 +1,45 @@
+import datetime
+import io
+import zipfile
+
+import pytest
+
+pytest.importorskip("tqdm")
+
+from baixador_rbmc import arquivos_rbmc, baixar_rbmc  # noqa: E402
+
+
+def _zip(caminho, nome):
+    dados = io.BytesIO()
+    with zipfile.ZipFile(dados, "w") as arquivo:
+        arquivo.writestr(nome, "crinex fictício\n")
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_bytes(dados.getvalue())
+
+
+def test_arquivos_rbmc():
+    arquivos = arquivos_rbmc(["POLI", "braz"], datetime.date(2022, 12, 31), datetime.date(2023, 1, 1))
+    assert [(a.estacao, a.nome) for a in arquivos] == [("POLI", "poli3651.zip"), ("BRAZ", "braz3651.zip"),
+                                                        ("POLI", "poli0011.zip"), ("BRAZ", "braz0011.zip")]
+    assert arquivos[0].url.endswith("/rbmc/dados/2022/365/poli3651.zip")
+
+
+def test_baixar_rbmc(servidor_http, tmp_path, capsys):
+    modelo = f"http://127.0.0.1:{servidor_http.porta}/{{ano}}/{{doy:03d}}/{{estacao}}{{doy:03d}}1.zip"
+    pasta = servidor_http.pasta
+    _zip(pasta / "2022" / "305" / "poli3051.zip", "POLI3051.22d")
+    _zip(pasta / "2022" / "306" / "poli3061.zip", "POLI3061.22d")
+    # BRAZ sem o dia 306 e com um "zip" que não abre no dia 305
+    (pasta / "2022" / "305" / "braz3051.zip").write_bytes(b"<html>erro</html>")
+    zips = tmp_path / "zips"
+    _zip(zips / "poli3061.zip", "POLI3061.22d")
+
+    entregues = list(baixar_rbmc(["POLI", "BRAZ"], datetime.date(2022, 11, 1), datetime.date(2022, 11, 2), zips,
+                                 max_conexoes=2, modelo=modelo))
+    assert [caminho.name for caminho in entregues] == ["poli3061.zip", "poli3051.zip"]
+    assert sorted(caminho.name for caminho in zips.iterdir()) == ["poli3051.zip", "poli3061.zip"]
+    assert all(zipfile.is_zipfile(caminho) for caminho in entregues)
+    assert "/2022/306/poli3061.zip" not in [caminho for caminho, _ in servidor_http.pedidos]
+    saida = capsys.readouterr().out
+    assert "1 baixados, 1 já estavam na pasta, 1 inexistentes no servidor, 1 com falha" in saida
+    assert "Sem dados: BRAZ em 2022-11-02" in saida
@@ -0,0 +1,113 @@
+import datetime
+import gzip
+
+import pytest
+
+import cache_antex
+from cache_antex import CacheAntex, antena_rinex, ler_antex, tipo_antena
+
+
+def _linha(conteudo, rotulo):
+    return f"{conteudo:<60}{rotulo}"
+
+
+def _antena(tipo, serie, valido_de=None, valido_ate=None):
+    linhas = [_linha("", "START OF ANTENNA"), _linha(f"{tipo:<20}{serie:<20}", "TYPE / SERIAL NO")]
+    for data, rotulo in ((valido_de, "VALID FROM"), (valido_ate, "VALID UNTIL")):
+        if data:
+            linhas.append(_linha(f"{data.year:6d}{data.month:6d}{data.day:6d}     0     0    0.0000000", rotulo))
+    linhas += [_linha("   G01", "START OF FREQUENCY"), _linha(f"{serie or tipo:>20}", "END OF FREQUENCY"),
+               _linha("", "END OF ANTENNA")]
+    return linhas
+
+
+def _gravar_antex(caminho, antenas):
+    linhas = [_linha("     1.4            M", "ANTEX VERSION / SYST"), _linha("A", "PCV TYPE / REFANT"),
+              _linha("", "END OF HEADER")]
+    for antena in antenas:
+        linhas += _antena(*antena)
+    caminho.write_text('\n'.join(linhas) + '\n')
+    return caminho
+
+
+ANTENAS = [
+    ("BLOCK IIR-M", "G01", datetime.date(2006, 1, 1), datetime.date(2020, 12, 31)),  # SVN antigo do G01
+    ("BLOCK IIIA", "G01", datetime.date(2021, 1, 1)),
+    ("GLONASS-M", "R05", datetime.date(2010, 1, 1)),
+    ("GALILEO-1", "E11", datetime.date(2011, 1, 1), datetime.date(2015, 12, 31)),
+    ("TRM59800.00     NONE", ""),
+    ("TRM59800.00     SCIS", ""),
+    ("TRM59800.00     SCIS", "12345"),  # calibração individual: não entra
+    ("LEIAR25.R4      NONE", ""),
+    ("JAVRINGANT_DM   NONE", ""),
+]
+
+
+def _blocos(caminho):
+    _, antenas = ler_antex(caminho)
+    return [(tipo, serie) for tipo, serie, *_ in antenas]
+
+
+def test_tipo_e_antena_rinex(rinex3):
+    assert tipo_antena("TRM59800.00     SCIS") == "TRM59800.00 SCIS"
+    assert tipo_antena("TRM59800.00         ") == "TRM59800.00 NONE"
+    assert antena_rinex(rinex3) == "TRM59800.00 NONE"
+
+
+def test_subconjunto(tmp_path):
+    atx = _gravar_antex(tmp_path / "igs20.atx", ANTENAS)
+    cache = CacheAntex(tmp_path / "cache")
+    dia = datetime.date(2022, 11, 1)
+    resultado = cache.subconjunto(atx, dia, dia, {"TRM59800.00 SCIS", "LEIAR25.R4 LEIT", "ASH701945E_M SCIT"},
+                                  tmp_path / "lote" / "antex_lote.atx")
+    assert (resultado.satelites, resultado.receptores) == (2, 3)
+    # Sem calibração com o radome LEIT, o LEIAR25.R4 usa a NONE; a ASH não tem nenhuma
+    assert resultado.sem_calibracao == ["ASH701945E_M SCIT"]
+    assert _blocos(resultado.caminho) == [("BLOCK IIIA NONE", "G01"), ("GLONASS-M NONE", "R05"),
+                                          ("TRM59800.00 NONE", ""), ("TRM59800.00 SCIS", ""),
+                                          ("LEIAR25.R4 NONE", "")]
+    texto = resultado.caminho.read_text()
+    assert texto.startswith(_linha("     1.4            M", "ANTEX VERSION / SYST"))
+    assert texto.count("END OF ANTENNA") == 5 and "END OF FREQUENCY" in texto
+
+    # Período que cruza a troca de satélite: as duas antenas do G01 entram
+    antigo = cache.subconjunto(atx, datetime.date(2020, 12, 31), datetime.date(2021, 1, 1), set(),
+                               tmp_path / "antigo.atx")
+    assert (antigo.satelites, antigo.receptores) == (3, 0)
+
+
+def test_indice_reaproveitado_e_atualizado(tmp_path, monkeypatch):
+    atx = _gravar_antex(tmp_path / "igs20.atx", ANTENAS)
+    cache = CacheAntex(tmp_path / "cache")
+    sha256 = cache.indexar(atx)
+
+    # Arquivo inalterado: nem é relido
+    def falhar(caminho):
+        raise AssertionError("ANTEX relido")
+    with monkeypatch.context() as m:
+        m.setattr(cache_antex, "ler_antex", falhar)
+        assert cache.indexar(atx) == sha256
+        assert CacheAntex(tmp_path / "cache").subconjunto(atx, datetime.date(2022, 11, 1), datetime.date(2022, 11, 1),
+                                                          set(), tmp_path / "a.atx").satelites == 2
+
+    # Nova versão no mesmo caminho: a antiga sai do índice
+    _gravar_antex(atx, ANTENAS[1:3])
+    novo = cache.indexar(atx)
+    assert novo != sha256
+    with cache._indice() as conexao:
+        assert {linha[0] for linha in conexao.execute("SELECT sha256 FROM antenas")} == {novo}
+
+    # ANTEX compactado
+    compactado = tmp_path / "igs20.atx.gz"
+    compactado.write_bytes(gzip.compress(atx.read_bytes()))
+    dia = datetime.date(2022, 11, 1)
+    subconjunto = cache.subconjunto(compactado, dia, dia, set(), tmp_path / "b.atx")
+    assert _blocos(subconjunto.caminho) == [("BLOCK IIIA NONE", "G01"), ("GLONASS-M NONE", "R05")]
+
+
+@pytest.mark.parametrize("antenas, esperado", [(set(), 0), ({"JAVRINGANT_DM NONE"}, 1)])
+def test_receptores_pedidos(tmp_path, antenas, esperado):
+    atx = _gravar_antex(tmp_path / "igs20.atx", ANTENAS)
+    resultado = CacheAntex(tmp_path / "cache").subconjunto(atx, datetime.date(2022, 11, 1),
+                                                           datetime.date(2022, 11, 1), antenas, tmp_path / "s.atx")
+    assert resultado.receptores == esperado and resultado.sem_calibracao == []
@@ -0,0 +1,47 @@
+import time
+
+import cache_listagens
+from cache_listagens import CacheListagens
+
+LISTAGEM = {"igs22380.sp3.Z": (1234, "20221127120000"), "igr22380.sp3.Z": (None, None)}
+
+
+def test_guarda_e_le_de_outro_processo(tmp_path):
+    arquivo = tmp_path / "cache" / "cache_listagens.json"
+    CacheListagens(arquivo).guardar("ftp.exemplo:21", "/2238", LISTAGEM)
+    assert arquivo.is_file() and not arquivo.with_name(arquivo.name + ".tmp").exists()
+    # Uma nova instância (outro projeto ou execução) lê a mesma listagem do disco
+    novo = CacheListagens(arquivo)
+    assert novo.obter("ftp.exemplo:21", "/2238") == LISTAGEM
+    assert novo.obter("ftp.exemplo:21", "/2239") is None
+    assert novo.obter("outro:21", "/2238") is None
+
+
+def test_ttl_e_listagens_permanentes(tmp_path, monkeypatch):
+    cache = CacheListagens(tmp_path / "cache.json", ttl=3600)
+    agora = time.time()
+    monkeypatch.setattr(cache_listagens.time, "time", lambda: agora)
+    cache.guardar("host:21", "/recente", LISTAGEM)
+    cache.guardar("host:21", "/antiga", LISTAGEM, permanente=True)
+
+    monkeypatch.setattr(cache_listagens.time, "time", lambda: agora + 3599)
+    assert cache.obter("host:21", "/recente") == LISTAGEM
+    # Vencida: a listagem comum precisa ser sondada de novo; a permanente nunca vence
+    monkeypatch.setattr(cache_listagens.time, "time", lambda: agora + 3601)
+    assert cache.obter("host:21", "/recente") is None
+    assert cache.obter("host:21", "/antiga") == LISTAGEM
+    monkeypatch.setattr(cache_listagens.time, "time", lambda: agora + 10 * 365 * 86400)
+    assert CacheListagens(tmp_path / "cache.json", ttl=3600).obter("host:21", "/antiga") == LISTAGEM
+
+
+def test_invalidar_e_arquivo_corrompido(tmp_path):
+    arquivo = tmp_path / "cache.json"
+    cache = CacheListagens(arquivo)
+    cache.guardar("host:21", "/2238", LISTAGEM)
+    cache.invalidar("host:21", "/2238")
+    assert cache.obter("host:21", "/2238") is None
+    assert CacheListagens(arquivo).obter("host:21", "/2238") is None
+
+    # JSON pela metade (ex: gravado por uma versão antiga sem troca atômica): começa vazio
+    arquivo.write_text('{"host:21:/2238": {"lido_em"')
+    assert CacheListagens(arquivo).obter("host:21", "/2238") is None
@@ -0,0 +1,63 @@
+import time
+
+from cache_solucoes import CacheSolucoes
+
+
+def _solucao(pasta, nome, tamanho):
+    pos = pasta / nome
+    pos.write_bytes(b'x' * tamanho)
+    (pasta / (nome + ".stat")).write_bytes(b'y' * 10)
+    return pos
+
+
+def _conf(caminho, texto):
+    caminho.write_text(texto)
+    return caminho
+
+
+def test_chave_ignora_comentarios(tmp_path):
+    cache = CacheSolucoes(tmp_path / "cache")
+    obs = _solucao(tmp_path, "POLI3050.22o", 100)
+    conf = _conf(tmp_path / "a.conf", "pos1-posmode =ppp-static # comentário\npos1-elmask=10\n")
+    outra = _conf(tmp_path / "b.conf", "# outro comentário\npos1-posmode = ppp-static\npos1-elmask =10\n")
+    diferente = _conf(tmp_path / "c.conf", "pos1-posmode=ppp-static\npos1-elmask=15\n")
+    chave = cache.chave(obs, [], conf, "rnx2rtkp")
+    assert cache.chave(obs, [], outra, "rnx2rtkp") == chave
+    assert cache.chave(obs, [], diferente, "rnx2rtkp") != chave
+    assert cache.chave(obs, [], conf, "librtk.so") != chave
+
+
+def test_guardar_e_restaurar(tmp_path):
+    cache = CacheSolucoes(tmp_path / "cache")
+    assert not cache.restaurar("ab" * 32, tmp_path / "saida" / "POLI.pos")
+    assert cache.guardar("ab" * 32, _solucao(tmp_path, "POLI.pos", 100))
+    assert cache.restaurar("ab" * 32, tmp_path / "saida" / "POLI.pos")
+    assert (tmp_path / "saida" / "POLI.pos").stat().st_size == 100
+    assert (tmp_path / "saida" / "POLI.pos.stat").is_file()
+    assert cache.ocupado() == 110
+
+
+def test_lru_remove_as_usadas_ha_mais_tempo(tmp_path):
+    cache = CacheSolucoes(tmp_path / "cache", orcamento=350)
+    chaves = [f"{i:064x}" for i in range(3)]
+    for chave in chaves:
+        cache.guardar(chave, _solucao(tmp_path, "POLI.pos", 100))
+        time.sleep(0.01)
+    # A primeira é usada de novo: a segunda passa a ser a mais antiga
+    assert cache.restaurar(chaves[0], tmp_path / "POLI_0.pos")
+    time.sleep(0.01)
+    cache.guardar("f" * 64, _solucao(tmp_path, "POLI.pos", 100))
+    assert cache.ocupado() <= 350
+    assert not cache.restaurar(chaves[1], tmp_path / "POLI_1.pos")
+    assert not (tmp_path / "cache" / chaves[1][:2] / chaves[1]).exists()
+    assert cache.restaurar(chaves[0], tmp_path / "POLI_0.pos")
+    assert cache.restaurar("f" * 64, tmp_path / "POLI_f.pos")
+
+
+def test_indexa_cache_existente(tmp_path):
+    cache = CacheSolucoes(tmp_path / "cache")
+    cache.guardar("ab" * 32, _solucao(tmp_path, "POLI.pos", 100))
+    (tmp_path / "cache" / "indice.sqlite").unlink()
+    assert CacheSolucoes(tmp_path / "cache").ocupado() == 110
+    assert CacheSolucoes(tmp_path / "cache", orcamento=0).liberar_espaco() == 1
+    assert not (tmp_path / "cache" / "ab" / ("ab" * 32)).exists()
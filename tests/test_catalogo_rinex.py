@@ -0,0 +1,34 @@
+import hatanaka
+import separador_constelacoes
+from catalogo_rinex import atualizar_catalogo, consultar, consultar_texto, ler_metadados
+
+
+def nomes(caminhos):
+    return sorted(caminho.name for caminho in caminhos)
+
+
+def test_metadados(rinex3, rinex2):
+    dados = ler_metadados(rinex3)
+    assert dados["sistemas"] == "EGR"
+    assert dados["primeira"] == "2022-11-01 00:00:00"
+    assert dados["ultima"] == "2022-11-01 00:19:30"
+    assert dados["intervalo"] == 30.0
+    assert ler_metadados(rinex2)["sistemas"] == "GR"
+
+
+def test_consulta_por_sistemas_contidos(rinex3, tmp_path):
+    pasta = tmp_path / "dados"
+    pasta.mkdir()
+    separador_constelacoes.separar_constelacoes(rinex3, {pasta / "GPS_TEST3050.22o": "G",
+                                                         pasta / "GLONASS_TEST3050.22o": "R"})
+    hatanaka.rnx2crx(rinex3, pasta / "TEST3050.22d.gz")
+    banco = tmp_path / "catalogo.sqlite"
+    assert atualizar_catalogo(banco, [pasta]) == (3, 0, 0)
+    assert atualizar_catalogo(banco, [pasta]) == (0, 3, 0)
+
+    assert nomes(consultar_texto(banco, "TEST, GPS, 2022-11-01")) == ["GPS_TEST3050.22o", "TEST3050.22d.gz"]
+    assert nomes(consultar_texto(banco, "GPS_GLONASS")) == ["TEST3050.22d.gz"]
+    assert len(consultar(banco, sistemas="RG", inicio="2022-11-02")) == 0
+
+    (pasta / "GLONASS_TEST3050.22o").unlink()
+    assert atualizar_catalogo(banco, [pasta]) == (0, 2, 1)
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from conexoes import PoolConexoes
+from conexoes_ftp import PoolFTP, listar_pasta
+from conexoes_http import PoolHTTP
+
+
+class _Conexao:
+    def __init__(self, numero):
+        self.numero = numero
+        self.fechada = False
+
+
+class _PoolTeste(PoolConexoes):
+    erros_reconexao = (ConnectionError,)
+    erros_reaproveitar = (KeyError,)
+
+    def __init__(self, **opcoes):
+        super().__init__("teste", 0, **opcoes)
+        self.criadas = []
+
+    def _conectar(self):
+        self.criadas.append(_Conexao(len(self.criadas)))
+        return self.criadas[-1]
+
+    def _descartar(self, conexao):
+        conexao.fechada = True
+
+
+def test_reaproveita_e_troca_conexao_que_caiu(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda segundos: None)
+    pool = _PoolTeste(max_conexoes=2)
+    assert pool.executar(lambda conexao: conexao.numero) == 0
+    assert pool.executar(lambda conexao: conexao.numero) == 0
+    with pytest.raises(KeyError):
+        pool.executar(lambda conexao: {}["arquivo inexistente"])
+    assert pool.abertas == 1
+
+    quedas = []
+
+    def cai_uma_vez(conexao):
+        if not quedas:
+            quedas.append(conexao)
+            raise ConnectionError("caiu")
+        return conexao.numero
+
+    assert pool.executar(cai_uma_vez) == 1
+    assert quedas[0].fechada and pool.reconexoes == 1 and pool.abertas == 2
+    pool.fechar()
+    assert all(conexao.fechada for conexao in pool.criadas)
+
+
+def test_limite_de_conexoes_por_host():
+    pool = _PoolTeste(max_conexoes=2)
+    em_uso, maximo = [0], [0]
+    trava = threading.Lock()
+
+    def tarefa(conexao):
+        with trava:
+            em_uso[0] += 1
+            maximo[0] = max(maximo[0], em_uso[0])
+        time.sleep(0.02)
+        with trava:
+            em_uso[0] -= 1
+
+    threads = [threading.Thread(target=pool.executar, args=(tarefa,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert maximo[0] == 2 and pool.abertas == 2
+
+
+def test_pool_ftp(servidor_ftp):
+    (servidor_ftp.pasta / "2238").mkdir()
+    (servidor_ftp.pasta / "2238" / "igs22380.sp3.Z").write_bytes(b"x" * 123)
+    with PoolFTP("127.0.0.1", porta=servidor_ftp.porta) as pool:
+        assert pool.max_conexoes == 2
+        listagem = pool.executar(listar_pasta, "/2238")
+        assert listagem["igs22380.sp3.Z"][0] == 123
+        pool.executar(listar_pasta, "/2238")
+    assert pool.abertas == 1
+    assert [comando for comando, _ in servidor_ftp.comandos].count("USER") == 1
+
+
+def test_pool_http(servidor_http):
+    (servidor_http.pasta / "a.txt").write_bytes(b"conteudo")
+
+    def ler(conexao, caminho):
+        conexao.request("GET", caminho)
+        with conexao.getresponse() as resposta:
+            return resposta.status, resposta.read()
+
+    with PoolHTTP("127.0.0.1", "http", servidor_http.porta) as pool:
+        assert pool.executar(ler, "/a.txt") == (200, b"conteudo")
+        assert pool.executar(ler, "/b.txt")[0] == 404
+        assert pool.executar(ler, "/a.txt") == (200, b"conteudo")
+    # Keep-alive: a mesma conexão atende todos os pedidos
+    assert pool.abertas == 1
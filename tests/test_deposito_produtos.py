@@ -0,0 +1,85 @@
+import itertools
+
+import pytest
+
+pytest.importorskip("gnsscal")
+
+import deposito_produtos  # noqa: E402
+from deposito_produtos import ChaveProduto, DepositoProdutos, chave_produto  # noqa: E402
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """time.time do depósito avançando 1 s por chamada: a ordem de uso fica determinística."""
+    contador = itertools.count(1000)
+    monkeypatch.setattr(deposito_produtos.time, "time", lambda: float(next(contador)))
+
+
+def _produto(pasta, nome, conteudo):
+    caminho = pasta / nome
+    caminho.write_bytes(conteudo)
+    return caminho
+
+
+def test_chaves_dos_nomes():
+    assert chave_produto("igs22380.sp3.Z") == ChaveProduto("igs", "sp3", 2238, 0, "15M")
+    assert chave_produto("igs22380_30s.clk") == chave_produto("igs22380.clk_30s.Z") == \
+        ChaveProduto("igs", "clk", 2238, 0, "30S")
+    assert chave_produto("IGS0OPSFIN_20223310000_01D_15M_ORB.SP3.gz") == chave_produto("igs22380.sp3")
+    assert chave_produto("IGS0OPSRAP_20223310000_01D_05M_CLK.CLK") == ChaveProduto("igr", "clk", 2238, 0, "05M")
+    assert chave_produto("COD0OPSRAP_20223310000_01D_05M_ORB.SP3").centro == "codrap"
+    assert chave_produto("leiame.txt") is None
+
+
+def test_objeto_compartilhado_e_lru(tmp_path, relogio):
+    deposito = DepositoProdutos(tmp_path / "deposito", orcamento=10 ** 9)
+    pasta = tmp_path / "baixados"
+    pasta.mkdir()
+    # Mesmo conteúdo com duas chaves (ex: o mesmo SP3 publicado por dois centros): um objeto só
+    a1 = deposito.inserir(_produto(pasta, "igs22380.sp3", b"a" * 100))
+    a2 = deposito.inserir(_produto(pasta, "cod22380.sp3", b"a" * 100))
+    b = deposito.inserir(_produto(pasta, "igs22381.sp3", b"b" * 100))
+    c = deposito.inserir(_produto(pasta, "igs22382.sp3", b"c" * 100))
+    assert a1 == a2 and deposito.ocupado() == 300
+    assert len(list((tmp_path / "deposito" / "objetos").rglob("*.sp3"))) == 3
+
+    # O uso por qualquer uma das chaves conta para o objeto compartilhado
+    assert deposito.obter(chave_produto("igs22380.sp3")) == a1
+
+    # Sai o usado há mais tempo (b); o compartilhado, usado por último, fica
+    assert deposito.liberar_espaco(200) == 1
+    assert not b.exists() and a1.exists() and c.exists()
+    assert deposito.obter(chave_produto("igs22381.sp3")) is None
+    assert deposito.ocupado() == 200
+
+    # Dentro do orçamento: nada sai
+    assert deposito.liberar_espaco(200) == 0
+    assert deposito.liberar_espaco(100) == 1 and not c.exists()
+
+    # O objeto compartilhado só é apagado junto com a última chave que o usa
+    assert deposito.liberar_espaco(0) == 2
+    assert not a1.exists() and deposito.ocupado() == 0
+    assert deposito.chaves() == []
+
+
+def test_orcamento_na_insercao_e_substituicao(tmp_path, relogio):
+    deposito = DepositoProdutos(tmp_path / "deposito", orcamento=250)
+    pasta = tmp_path / "baixados"
+    pasta.mkdir()
+    antigo = deposito.inserir(_produto(pasta, "igs22380.sp3", b"1" * 100))
+    deposito.inserir(_produto(pasta, "igs22381.sp3", b"2" * 100))
+    # A terceira inserção passa do orçamento: o produto mais antigo sai
+    deposito.inserir(_produto(pasta, "igs22382.sp3", b"3" * 100), mover=True)
+    assert not (pasta / "igs22382.sp3").exists()
+    assert not antigo.exists() and deposito.ocupado() == 200
+    assert sorted(chave.dia for chave in deposito.chaves()) == [1, 2]
+
+    # Nova versão do mesmo produto: o objeto anterior, sem outra chave, é apagado
+    anterior = deposito.obter(chave_produto("igs22381.sp3"))
+    novo = deposito.inserir(_produto(pasta, "igs22381.sp3", b"n" * 100))
+    assert novo != anterior and not anterior.exists() and deposito.ocupado() == 200
+
+    # Objeto apagado por fora: a chave é esquecida
+    novo.unlink()
+    assert deposito.obter(chave_produto("igs22381.sp3")) is None
+    assert [chave.dia for chave in deposito.chaves()] == [2]
@@ -0,0 +1,67 @@
+import gzip
+import random
+
+import pytest
+
+from descompactacao import Descompactador, DescompactadorLZW, descompactar_arquivo
+
+
+def _texto(tamanho, semente=1):
+    """Texto parecido com um .sp3: linhas repetitivas com números que mudam."""
+    rnd = random.Random(semente)
+    linhas = []
+    while sum(map(len, linhas)) < tamanho:
+        linhas.append(f"PG{rnd.randint(1, 32):02d} {rnd.uniform(-3e4, 3e4):13.6f} {rnd.uniform(-3e4, 3e4):13.6f} "
+                      f"{rnd.uniform(-3e4, 3e4):13.6f} {rnd.uniform(-1e3, 1e3):13.6f}\n")
+    return ''.join(linhas).encode()[:tamanho]
+
+
+def _em_pedacos(descompactador, dados, tamanho):
+    saida = b''.join(descompactador.descompactar(dados[i:i + tamanho]) for i in range(0, len(dados), tamanho))
+    return saida + descompactador.finalizar()
+
+
+@pytest.fixture(scope="module")
+def ncompress():
+    return pytest.importorskip("ncompress")
+
+
+@pytest.mark.parametrize("tamanho_pedaco", [1, 7, 4096, 1 << 20])
+def test_lzw_igual_ao_compress(ncompress, tamanho_pedaco):
+    # Texto e depois bytes aleatórios: a tabela enche (16 bits) e o compress emite códigos de limpeza
+    original = _texto(400_000) + random.Random(3).randbytes(200_000) + _texto(100_000, semente=4)
+    compactado = ncompress.compress(original)
+    assert _em_pedacos(DescompactadorLZW(), compactado, tamanho_pedaco) == original
+
+
+@pytest.mark.parametrize("original", [b"", b"a", b"abababababababab", bytes(range(256)) * 40])
+def test_lzw_casos_pequenos(ncompress, original):
+    assert _em_pedacos(DescompactadorLZW(), ncompress.compress(original), 3) == original
+
+
+def test_lzw_corrompido():
+    with pytest.raises(ValueError):
+        _em_pedacos(DescompactadorLZW(), b"\x1f\x9d\x90" + b"\xff" * 30, 5)
+    with pytest.raises(ValueError):
+        DescompactadorLZW().descompactar(b"\x1f\x8b\x08\x00")
+
+
+def test_gzip_varios_membros():
+    original = _texto(300_000)
+    compactado = gzip.compress(original[:1000]) + gzip.compress(original[1000:])
+    assert _em_pedacos(Descompactador(), compactado, 777) == original
+    with pytest.raises(ValueError):
+        _em_pedacos(Descompactador(), compactado[:-20], 777)
+
+
+def test_reconhece_pelo_conteudo(ncompress, tmp_path):
+    original = _texto(50_000)
+    # Servidores com gzip chamado .Z: o formato vem dos primeiros bytes
+    (tmp_path / "igs22000.sp3.Z").write_bytes(gzip.compress(original))
+    assert descompactar_arquivo(tmp_path / "igs22000.sp3.Z", tmp_path / "a.sp3").read_bytes() == original
+    (tmp_path / "igs22001.sp3.Z").write_bytes(ncompress.compress(original))
+    assert descompactar_arquivo(tmp_path / "igs22001.sp3.Z", tmp_path / "b.sp3").read_bytes() == original
+    with pytest.raises(ValueError):
+        Descompactador().descompactar(b"PK\x03\x04")
+    with pytest.raises(ValueError):
+        Descompactador().finalizar()
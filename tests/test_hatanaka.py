@@ -0,0 +1,92 @@
+import gzip
+import re
+import shutil
+import subprocess
+
+import pytest
+
+import hatanaka
+
+
+# O CRX2RNX (e o decodificador interno) escreve números entre -1 e 1 sem o zero antes do ponto
+_regex_zero = re.compile(r" (-?)\.(?=\d)")
+
+
+def _sem_espacos_finais(caminho):
+    """Linhas sem espaços finais e com o zero antes do ponto, para comparar com o RINEX original."""
+    with open(caminho, encoding='ascii') as arquivo:
+        return [_regex_zero.sub(r"\g<1>0.", linha.rstrip()) for linha in arquivo]
+
+
+@pytest.mark.parametrize("arquivo", ["rinex2", "rinex3"])
+def test_ida_e_volta(arquivo, request, tmp_path):
+    original = request.getfixturevalue(arquivo)
+    compacto = hatanaka.rnx2crx(original, tmp_path / "saida.crx")
+    restaurado = hatanaka.crx2rnx(compacto, tmp_path / "restaurado.rnx")
+    assert _sem_espacos_finais(restaurado) == _sem_espacos_finais(original)
+
+
+def test_ida_e_volta_gzip(rinex3, tmp_path):
+    compacto = hatanaka.rnx2crx(rinex3, tmp_path / "saida.crx.gz")
+    with gzip.open(compacto, 'rt') as arquivo:
+        assert arquivo.readline().startswith("3.0")
+    restaurado = hatanaka.crx2rnx(compacto, tmp_path / "restaurado.rnx")
+    assert _sem_espacos_finais(restaurado) == _sem_espacos_finais(rinex3)
+
+
+@pytest.mark.skipif(not (shutil.which("crx2rnx") and shutil.which("rnx2crx")),
+                    reason="CRX2RNX/RNX2CRX não instalados")
+@pytest.mark.parametrize("arquivo", ["rinex2", "rinex3"])
+def test_mesma_saida_das_ferramentas_originais(arquivo, request, tmp_path):
+    original = request.getfixturevalue(arquivo)
+    referencia_crx = subprocess.run(["rnx2crx", "-"], input=original.read_bytes(), capture_output=True,
+                                    check=True).stdout
+    (tmp_path / "ref.crx").write_bytes(referencia_crx)
+    referencia_rnx = subprocess.run(["crx2rnx", "-"], input=referencia_crx, capture_output=True, check=True).stdout
+
+    hatanaka.crx2rnx(tmp_path / "ref.crx", tmp_path / "interno.rnx")
+    assert (tmp_path / "interno.rnx").read_bytes() == referencia_rnx
+
+    # O codificador só difere na linha CRINEX PROG / DATE
+    interno_crx = hatanaka.rnx2crx(original, tmp_path / "interno.crx").read_bytes().splitlines()
+    referencia = referencia_crx.splitlines()
+    assert interno_crx[0] == referencia[0]
+    assert interno_crx[2:] == referencia[2:]
+
+
+@pytest.mark.skipif(not hatanaka.VETORIZADO, reason="NumPy não instalado")
+@pytest.mark.parametrize("arquivo", ["rinex2", "rinex3"])
+@pytest.mark.parametrize("tamanho_bloco", [1, 7, 50_000])
+def test_decodificacao_vetorizada(arquivo, tamanho_bloco, request, tmp_path, monkeypatch):
+    # Blocos pequenos forçam arcos e flags que continuam de um bloco para o outro
+    compacto = hatanaka.rnx2crx(request.getfixturevalue(arquivo), tmp_path / "saida.crx")
+    monkeypatch.setattr(hatanaka, "TAMANHO_BLOCO_REGISTROS", tamanho_bloco)
+    with hatanaka.abrir_crinex(compacto) as leitor:
+        vetorizado = ''.join(leitor.blocos())
+    with hatanaka.abrir_crinex(compacto) as leitor:
+        epoca_a_epoca = ''.join(linha + '\n' for epoca in leitor.epocas() for linha in leitor.linhas_rinex(epoca))
+    assert vetorizado == epoca_a_epoca
+
+
+def test_crinex_truncado(rinex3, tmp_path):
+    compacto = hatanaka.rnx2crx(rinex3, tmp_path / "saida.crx")
+    texto = compacto.read_bytes()
+    compacto.write_bytes(texto[:len(texto) // 2].rsplit(b'\n', 3)[0] + b'\n')
+    with pytest.raises(ValueError):
+        hatanaka.crx2rnx(compacto, tmp_path / "restaurado.rnx")
+
+
+def test_sem_numpy(rinex3, tmp_path, monkeypatch):
+    monkeypatch.setattr(hatanaka, "VETORIZADO", False)
+    compacto = hatanaka.rnx2crx(rinex3, tmp_path / "saida.crx")
+    restaurado = hatanaka.crx2rnx(compacto, tmp_path / "restaurado.rnx")
+    assert _sem_espacos_finais(restaurado) == _sem_espacos_finais(rinex3)
+
+
+def test_nomes():
+    assert hatanaka.nome_rinex("POLI3050.22d").name == "POLI3050.22o"
+    assert hatanaka.nome_rinex("POLI00BRA_R_20223050000_01D_30S_MO.crx.gz").name == \
+        "POLI00BRA_R_20223050000_01D_30S_MO.rnx"
+    assert hatanaka.nome_crinex("POLI3050.22o").name == "POLI3050.22d"
+    assert hatanaka.eh_crinex("GPS_POLI3050.22d.gz")
+    assert not hatanaka.eh_crinex("POLI3050.22o")
@@ -0,0 +1,78 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("gnsscal")
+
+from deposito_produtos import DepositoProdutos, chave_produto  # noqa: E402
+from indice_produtos import IndiceProdutos, _preferencia  # noqa: E402
+
+# Semana GPS 2238: domingo 2022-11-27 (dia 0) a sábado 2022-12-03 (dia 6)
+DOMINGO = datetime.date(2022, 11, 27)
+
+
+def nomes(caminhos):
+    return [caminho.name for caminho in caminhos]
+
+
+def test_preferencia():
+    ordem = ["igs22380_30s.clk", "igs22380.clk", "cod22380.clk", "igr22380.clk",
+             "COD0OPSRAP_20223310000_01D_05M_CLK.CLK", "igu22380_00.sp3"]
+    chaves = [chave_produto(nome) for nome in ordem]
+    assert sorted(chaves, key=_preferencia) == chaves
+    # Nome longo e curto da mesma solução têm a mesma chave (e a mesma preferência)
+    assert _preferencia(chave_produto("IGS0OPSFIN_20223310000_01D_30S_CLK.CLK")) == _preferencia(chaves[0])
+
+
+@pytest.fixture
+def pasta_produtos(tmp_path):
+    pasta = tmp_path / "produtos"
+    pasta.mkdir()
+    for nome in ["igs22380.sp3", "igs22380_30s.clk",
+                 "igr22381.sp3", "igs22381.sp3", "igs22381.clk", "igs22381_30s.clk",
+                 "igr22382.sp3", "igr22382.clk",
+                 "igs22384.sp3", "igs22384.clk", "leiame.txt"]:
+        (pasta / nome).write_text(nome)
+    return pasta
+
+
+def test_seleciona_o_dia_e_os_vizinhos(pasta_produtos):
+    indice = IndiceProdutos.da_pasta(pasta_produtos)
+    assert len(indice) == 10
+    orbitas, relogios = indice.selecionar(DOMINGO + datetime.timedelta(days=1))
+    assert nomes(orbitas) == ["igs22380.sp3", "igs22381.sp3", "igr22382.sp3"]
+    assert nomes(relogios) == ["igs22380_30s.clk", "igs22381_30s.clk", "igr22382.clk"]
+
+    # Vizinho sem produto (sábado anterior, semana 2237) não impede a seleção
+    assert nomes(indice.selecionar(DOMINGO)[0]) == ["igs22380.sp3", "igs22381.sp3"]
+    # Observação de vários dias: todos os dias do período mais um de cada lado
+    assert nomes(indice.selecionar(DOMINGO, DOMINGO + datetime.timedelta(days=1))[1]) == \
+        ["igs22380_30s.clk", "igs22381_30s.clk", "igr22382.clk"]
+
+
+def test_dia_observado_sem_produto(pasta_produtos):
+    indice = IndiceProdutos.da_pasta(pasta_produtos)
+    # Quarta (dia 3) sem produtos, mesmo com os vizinhos presentes
+    assert indice.selecionar(DOMINGO + datetime.timedelta(days=3)) == ([], [])
+    assert indice.selecionar(DOMINGO + datetime.timedelta(days=2), DOMINGO + datetime.timedelta(days=4)) == ([], [])
+
+    # Produto com nome fora do padrão: entra em todas as seleções (o dia não é conhecido)
+    (pasta_produtos / "orbita_propria.sp3").write_text("x")
+    (pasta_produtos / "relogio_proprio.clk").write_text("x")
+    orbitas, relogios = IndiceProdutos.da_pasta(pasta_produtos).selecionar(DOMINGO + datetime.timedelta(days=3))
+    assert nomes(orbitas) == ["igr22382.sp3", "igs22384.sp3", "orbita_propria.sp3"]
+    assert nomes(relogios) == ["igr22382.clk", "igs22384.clk", "relogio_proprio.clk"]
+
+
+def test_indice_do_deposito(pasta_produtos, tmp_path):
+    deposito = DepositoProdutos(tmp_path / "deposito")
+    for caminho in pasta_produtos.glob("*.*"):
+        if chave_produto(caminho.name):
+            deposito.inserir(caminho)
+    indice = IndiceProdutos.do_deposito(deposito)
+    assert len(indice) == 10
+    # Os caminhos são os objetos do depósito, pedidos só na seleção
+    orbitas, relogios = indice.selecionar(DOMINGO + datetime.timedelta(days=1))
+    assert all(caminho.parent.parent.name == "objetos" for caminho in orbitas + relogios)
+    assert [caminho.read_text() for caminho in orbitas] == ["igs22380.sp3", "igs22381.sp3", "igr22382.sp3"]
+    assert [caminho.read_text() for caminho in relogios] == ["igs22380_30s.clk", "igs22381_30s.clk", "igr22382.clk"]
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+import separador_constelacoes
+from indice_rinex import caminho_indice, carregar_indice, construir_indice, extrair_intervalo, indexar, ler_intervalo
+from leitor_rinex import ler_rinex_obs
+
+
+def _janela(obs, inicio, fim):
+    return (obs.tempo >= np.datetime64(inicio)) & (obs.tempo <= np.datetime64(fim))
+
+
+@pytest.mark.parametrize("arquivo", ["rinex2", "rinex3"])
+def test_indice_aponta_para_as_linhas_de_epoca(arquivo, request):
+    caminho = request.getfixturevalue(arquivo)
+    indice = construir_indice(caminho)
+    bruto = caminho.read_bytes()
+    completo = ler_rinex_obs(caminho)
+    assert np.array_equal(indice.tempo, completo.tempo)
+    assert indice.tamanho == len(bruto)
+    assert bruto[:indice.fim_cabecalho].rstrip().endswith(b"END OF HEADER")
+    marcador = b'>' if arquivo == "rinex3" else b' 22 11  1'
+    assert all(bruto[d:d + len(marcador)] == marcador for d in indice.deslocamento)
+
+
+@pytest.mark.parametrize("arquivo", ["rinex2", "rinex3"])
+def test_ler_intervalo(arquivo, request):
+    caminho = request.getfixturevalue(arquivo)
+    completo = ler_rinex_obs(caminho)
+    for inicio, fim in [("2022-11-01T00:05", "2022-11-01T00:10"), ("2022-11-01T00:00", "2022-11-01T00:00"),
+                        ("2022-11-01T00:18:10", "2022-11-01T03:00")]:
+        janela = ler_intervalo(caminho, inicio, fim, tipos=completo.tipos[:2])
+        selecao = _janela(completo, inicio, fim)
+        assert np.array_equal(janela.tempo, completo.tempo[selecao])
+        colunas = np.isin(completo.satelites, janela.satelites)
+        np.testing.assert_array_equal(janela.valores, completo.valores[selecao][:, colunas][:, :, :2])
+    # Janela sem épocas
+    assert len(ler_intervalo(caminho, "2022-11-02T00:00", "2022-11-02T01:00").tempo) == 0
+
+
+def test_extrair_intervalo(rinex3, tmp_path):
+    recorte = extrair_intervalo(rinex3, "2022-11-01T00:05", "2022-11-01T00:10", tmp_path / "recorte.rnx")
+    completo, parcial = ler_rinex_obs(rinex3), ler_rinex_obs(recorte)
+    assert parcial.cabecalho == completo.cabecalho
+    assert np.array_equal(parcial.tempo, completo.tempo[_janela(completo, "2022-11-01T00:05", "2022-11-01T00:10")])
+
+
+def test_indice_salvo_e_refeito_quando_o_arquivo_muda(rinex3, tmp_path):
+    destino = indexar(rinex3)
+    assert destino.name == rinex3.name + ".idx.npz"
+    assert len(carregar_indice(rinex3).tempo) == 40
+
+    # Arquivo reescrito só com os 10 primeiros minutos: o índice antigo é descartado
+    recorte = extrair_intervalo(rinex3, None, "2022-11-01T00:09:30", tmp_path / "recorte.rnx")
+    os.replace(recorte, rinex3)
+    assert len(carregar_indice(rinex3).tempo) == 20
+    assert len(ler_intervalo(rinex3, "2022-11-01T00:05", None).tempo) == 10
+
+
+def test_saida_compactada(rinex3, tmp_path):
+    # Separação direto em Hatanaka + gzip, como no 1IBGE-RBMC com compressão
+    compactado = tmp_path / "GPS_TESTE00BRA_R_20223050000_01D_30S_MO.crx.gz"
+    separador_constelacoes.separar_constelacoes(rinex3, {compactado: "G"})
+    assert indexar(compactado) == caminho_indice(compactado)
+
+    janela = ler_intervalo(compactado, "2022-11-01T00:05", "2022-11-01T00:10")
+    completo = ler_rinex_obs(compactado)
+    selecao = (completo.tempo >= np.datetime64("2022-11-01T00:05")) & \
+        (completo.tempo <= np.datetime64("2022-11-01T00:10"))
+    assert np.array_equal(janela.tempo, completo.tempo[selecao])
+    colunas = np.isin(completo.satelites, janela.satelites)
+    np.testing.assert_array_equal(janela.valores, completo.valores[selecao][:, colunas])
+    assert set(janela.satelites) <= {s for s in completo.satelites if s.startswith('G')}
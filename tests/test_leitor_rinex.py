@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pytest
+
+import hatanaka
+from leitor_rinex import ler_rinex_obs
+from rinex import abrir_texto, ler_cabecalho, tipos_observacao
+
+
+def _referencia_rinex3(caminho):
+    """Leitura linha a linha do RINEX 3: {(época, satélite, tipo): (valor, lli, ssi)} e as épocas."""
+    dados = {}
+    epocas = []
+    with abrir_texto(caminho) as arquivo:
+        cabecalho = ler_cabecalho(arquivo)
+        tipos = tipos_observacao(cabecalho)
+        linhas = iter(arquivo)
+        for linha in linhas:
+            linha = linha.rstrip('\n')
+            flag, n = linha[31], int(linha[32:35])
+            if flag != '0':
+                for _ in range(n):
+                    next(linhas)
+                continue
+            epocas.append(linha[2:29])
+            for _ in range(n):
+                registro = next(linhas).rstrip('\n')
+                sat = registro[:3]
+                for j, tipo in enumerate(tipos[sat[0]]):
+                    campo = registro[3 + 16 * j:3 + 16 * j + 16].ljust(16)
+                    if campo[:14].strip():
+                        dados[(len(epocas) - 1, sat, tipo)] = (float(campo[:14]), campo[14].strip() or '0',
+                                                               campo[15].strip() or '0')
+    return epocas, dados
+
+
+def _conferir(obs, epocas, dados):
+    assert len(obs.tempo) == len(epocas)
+    satelites = list(obs.satelites)
+    for (e, sat, tipo), (valor, lli, ssi) in dados.items():
+        i, j = satelites.index(sat), obs.tipos.index(tipo)
+        assert math.isclose(obs.valores[e, i, j], valor, abs_tol=5e-4)
+        assert obs.lli[e, i, j] == int(lli)
+        assert obs.ssi[e, i, j] == int(ssi)
+    assert np.count_nonzero(~np.isnan(obs.valores)) == len(dados)
+
+
+def test_rinex3_igual_a_leitura_linha_a_linha(rinex3):
+    obs = ler_rinex_obs(rinex3)
+    assert obs.versao == 3
+    assert obs.tipos[:6] == "C1C L1C D1C S1C C2W L2W".split()
+    _conferir(obs, *_referencia_rinex3(rinex3))
+    assert obs.tempo[1] - obs.tempo[0] == np.timedelta64(30, 's')
+
+
+def test_crinex_igual_ao_rinex(rinex3, tmp_path):
+    compacto = hatanaka.rnx2crx(rinex3, tmp_path / "saida.crx.gz")
+    original, lido = ler_rinex_obs(rinex3), ler_rinex_obs(compacto)
+    assert np.array_equal(original.tempo, lido.tempo)
+    assert np.array_equal(original.valores, lido.valores, equal_nan=True)
+    assert np.array_equal(original.lli, lido.lli)
+
+
+def test_selecao_de_tipos_e_sistemas(rinex3):
+    obs = ler_rinex_obs(rinex3, tipos=['L1C', 'C1C'], sistemas='R')
+    assert obs.tipos == ['L1C', 'C1C']
+    assert {sat[0] for sat in obs.satelites} == {'R'}
+    completo = ler_rinex_obs(rinex3)
+    i = list(completo.satelites).index(obs.satelites[0])
+    j = completo.tipos.index('L1C')
+    assert np.array_equal(obs.valores[:, 0, 0], completo.valores[:, i, j], equal_nan=True)
+
+
+def test_rinex2(rinex2):
+    obs = ler_rinex_obs(rinex2)
+    assert obs.versao == 2
+    assert obs.tipos == "C1 L1 L2 P2 S1 S2".split()
+    assert len(obs.tempo) == 40
+    assert obs.valores.shape == (40, len(obs.satelites), 6)
+    assert np.nanmin(obs.valores[..., 0]) > 1e7
+
+
+def test_rinex_truncado(rinex3, tmp_path):
+    truncado = tmp_path / "truncado.rnx"
+    linhas = rinex3.read_text().splitlines(True)
+    truncado.write_text(''.join(linhas[:len(linhas) // 2]) + "> 2022 11 01 00 30  0.0000000  0  5\n")
+    with pytest.raises(ValueError):
+        ler_rinex_obs(truncado)
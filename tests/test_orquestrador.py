@@ -0,0 +1,52 @@
+import sys
+
+import orquestrador
+from orquestrador import CODIGO_FALHA_INICIO, CODIGO_FALHA_PREPARACAO, Job, executar_jobs, executar_lote
+
+
+def _python(codigo):
+    return [sys.executable, "-c", codigo]
+
+
+def test_executar_jobs(tmp_path):
+    jobs = [Job("ok", _python("print('ola')")), Job("erro", _python("raise SystemExit(3)")),
+            Job("lento", _python("import time; time.sleep(30)")), Job("inexistente", ["/nao/existe"]),
+            Job("saida", _python("print('ola')"), stdout=tmp_path / "nao" / "existe.txt")]
+    resultados = {r.job.nome: r for r in executar_jobs(jobs, tmp_path / "logs", max_concorrencia=2, timeout=2)}
+    assert resultados["ok"].codigo == 0
+    assert resultados["ok"].log.read_text().strip() == "ola"
+    assert resultados["erro"].codigo == 3
+    assert resultados["lento"].codigo is None and resultados["lento"].timeout
+    assert resultados["inexistente"].codigo == CODIGO_FALHA_INICIO
+    assert resultados["saida"].codigo == CODIGO_FALHA_INICIO
+    assert "existe.txt" in resultados["saida"].log.read_text()
+
+
+def test_lote_repete_so_falhas_transitorias(tmp_path):
+    def corrompido():
+        raise EOFError("gzip truncado")
+
+    jobs = [Job("preparacao", _python("pass"), antes=corrompido, custo=1),
+            Job("sinal", _python("import os, signal; os.kill(os.getpid(), signal.SIGKILL)"), custo=2),
+            Job("erro", _python("raise SystemExit(1)"), custo=3),
+            Job("inexistente", ["/nao/existe"], custo=4)]
+    relatorio = tmp_path / "relatorio.csv"
+    resultados = executar_lote(jobs, tmp_path / "logs", max_concorrencia=1, tentativas=3, espera=0,
+                               relatorio=relatorio)
+    resultados = {r.job.nome: r for r in resultados}
+    assert resultados["preparacao"].codigo == CODIGO_FALHA_PREPARACAO
+    assert resultados["preparacao"].tentativas == 1
+    assert "gzip truncado" in resultados["preparacao"].log.read_text()
+    assert resultados["sinal"].tentativas == 3
+    assert resultados["erro"].tentativas == 1
+    assert resultados["inexistente"].tentativas == 1
+    assert orquestrador.situacao(resultados["preparacao"]) == "falha na preparação"
+    assert "falha na preparação" in relatorio.read_text(encoding='utf-8')
+
+
+def test_timeout_por_job(tmp_path):
+    jobs = [Job("curto", _python("import time; time.sleep(5)"), timeout=0.5),
+            Job("padrao", _python("import time; time.sleep(1)"))]
+    resultados = {r.job.nome: r for r in executar_lote(jobs, tmp_path / "logs", max_concorrencia=2, timeout=10)}
+    assert resultados["curto"].timeout and resultados["curto"].tentativas == 1
+    assert resultados["padrao"].codigo == 0
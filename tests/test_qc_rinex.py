@@ -0,0 +1,74 @@
+import csv
+import math
+
+import pytest
+
+from qc_rinex import FREQUENCIAS, VELOCIDADE_LUZ, avaliar, ler_tabela, qc_arquivo, qc_arquivos
+
+# Multicaminho sintético (m): amplitude no código P1 e no P2, com período de 10 épocas
+AMPLITUDE_MP1 = 0.5
+AMPLITUDE_MP2 = 0.8
+
+
+def _rinex_multicaminho(caminho, epocas=60, salto=30):
+    """
+    RINEX 2.11 GPS (L1 L2 P1 P2) com geometria, ionosfera e ambiguidades conhecidas: o MP1/MP2 de
+    cada época é só o multicaminho senoidal. O G02 tem uma perda de ciclo (100 ciclos em L1) em `salto`.
+    """
+    f1, f2 = FREQUENCIAS['G']['1'], FREQUENCIAS['G']['2']
+    lambda1, lambda2 = VELOCIDADE_LUZ / f1, VELOCIDADE_LUZ / f2
+    alfa = (f1 / f2) ** 2
+    linhas = [f"{'     2.11':<20}{'OBSERVATION DATA':<20}{'G (GPS)':<20}RINEX VERSION / TYPE",
+              f"{'     4    L1    L2    P1    P2':<60}# / TYPES OF OBSERV",
+              f"{'    30.000':<60}INTERVAL",
+              f"{'  2022    11     1     0     0    0.0000000     GPS':<60}TIME OF FIRST OBS",
+              f"{'':<60}END OF HEADER"]
+    for k in range(epocas):
+        t = 30 * k
+        linhas.append(f" 22 11  1  0 {t // 60:2d} {t % 60:10.7f}  0  2G01G02")
+        for n, sat in enumerate(("G01", "G02")):
+            rho = 2.2e7 + 300 * t + 1e6 * n
+            iono = 5 + 2 * math.sin(t / 5000 + n)
+            m1 = AMPLITUDE_MP1 * math.sin(2 * math.pi * k / 10)
+            m2 = AMPLITUDE_MP2 * math.cos(2 * math.pi * k / 10)
+            n1 = 1000 + (100 if sat == "G02" and k >= salto else 0)
+            l1 = (rho - iono) / lambda1 + n1
+            l2 = (rho - alfa * iono) / lambda2 + 2000
+            valores = (l1, l2, rho + iono + m1, rho + alfa * iono + m2)
+            linhas.append(''.join(f"{v:14.3f}  " for v in valores).rstrip())
+    caminho.write_text('\n'.join(linhas) + '\n')
+    return caminho
+
+
+def test_erro_guarda_tamanho_e_data(tmp_path):
+    ruim = tmp_path / "RUIM3050.22o"
+    ruim.write_text("nada de cabeçalho aqui\n")
+    tabela = tmp_path / "qc_rinex.csv"
+    linha = qc_arquivos([ruim], tabela, max_workers=1)[ruim.name]
+    assert linha["erro"]
+    assert (linha["tamanho"], linha["mtime_ns"]) == (ruim.stat().st_size, ruim.stat().st_mtime_ns)
+
+    # Arquivo inalterado: a linha com erro é reaproveitada em vez de o arquivo ser lido de novo
+    with open(tabela, newline='', encoding='utf-8') as arquivo:
+        linhas = list(csv.DictReader(arquivo))
+    linhas[0]["erro"] = "da tabela"
+    with open(tabela, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=list(linhas[0]))
+        escritor.writeheader()
+        escritor.writerows(linhas)
+    assert qc_arquivos([ruim], tabela, max_workers=1)[ruim.name]["erro"] == "da tabela"
+    assert ler_tabela(tabela)[ruim.name]["erro"] == "da tabela"
+
+
+def test_multicaminho_e_perda_de_ciclo(tmp_path):
+    metricas = qc_arquivo(_rinex_multicaminho(tmp_path / "mult3050.22o"))
+    assert metricas["erro"] == ""
+    assert metricas["epocas"] == 60 and metricas["sats_medio"] == 2
+    assert metricas["completude_epocas"] == 100.0 and metricas["lacunas"] == 0
+    assert (metricas["saltos_lli"], metricas["saltos_gf"]) == (0, 1)
+    assert metricas["obs_por_salto"] == 120
+    # A perda de ciclo divide o arco do G02 em dois de 3 períodos: a média de cada um é removida
+    assert metricas["mp1_rms"] == pytest.approx(AMPLITUDE_MP1 / math.sqrt(2), rel=1e-3)
+    assert metricas["mp2_rms"] == pytest.approx(AMPLITUDE_MP2 / math.sqrt(2), rel=1e-3)
+    assert avaliar(metricas) == ["duracao_h = 0.5 (mín. 20)", "sats_medio = 2 (mín. 5)"]
+    assert avaliar(metricas, {"mp1_rms": ("max", 0.3)}) == ["mp1_rms = 0.3535 (máx. 0.3)"]
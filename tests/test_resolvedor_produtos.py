@@ -0,0 +1,103 @@
+import concurrent.futures
+import socket
+import time
+
+import pytest
+
+pytest.importorskip("gnsscal")
+
+import resolvedor_produtos  # noqa: E402
+from cache_listagens import CacheListagens  # noqa: E402
+from conexoes_ftp import PoolFTP  # noqa: E402
+from resolvedor_produtos import (Espelho, candidatos, invalidar_listagem, listar_espelho, resolver,  # noqa: E402
+                                 sondar_espelhos)
+
+
+def test_candidatos_em_ordem_de_prioridade():
+    nomes = [c.nome for c in candidatos(2238, 0, "sp3")]
+    assert nomes[:3] == ["IGS0OPSFIN_20223310000_01D_15M_ORB.SP3.gz", "igs22380.sp3.Z",
+                         "IGS0OPSRAP_20223310000_01D_15M_ORB.SP3.gz"]
+    relogios = [c.nome for c in candidatos(2238, 0, "clk", solucoes=("FIN",))]
+    assert relogios == ["IGS0OPSFIN_20223310000_01D_30S_CLK.CLK.gz", "IGS0OPSFIN_20223310000_01D_05M_CLK.CLK.gz",
+                        "igs22380.clk_30s.Z", "igs22380.clk.Z"]
+    assert [c.solucao for c in candidatos(2238, 0, "clk")][-1] == "RAP"
+
+
+@pytest.fixture
+def espelhos(servidor_ftp, servidor_http, tmp_path):
+    # FTP só com o rápido (nome curto); HTTP com o final (nome longo) e o rápido
+    (servidor_ftp.pasta / "2238").mkdir()
+    (servidor_ftp.pasta / "2238" / "igr22380.sp3.Z").write_bytes(b"r" * 10)
+    (servidor_http.pasta / "2238").mkdir()
+    for nome in ("IGS0OPSFIN_20223310000_01D_15M_ORB.SP3.gz", "igr22380.sp3.Z"):
+        (servidor_http.pasta / "2238" / nome).write_bytes(b"f" * 20)
+    ftp = Espelho("FTP", f"ftp://127.0.0.1:{servidor_ftp.porta}/{{semana}}")
+    http = Espelho("HTTP", f"http://127.0.0.1:{servidor_http.porta}/{{semana}}")
+    pools = {("127.0.0.1", servidor_ftp.porta): PoolFTP("127.0.0.1", porta=servidor_ftp.porta)}
+    yield ftp, http, pools, CacheListagens(tmp_path / "cache.json")
+    for pool in pools.values():
+        pool.fechar()
+
+
+def test_resolve_o_melhor_candidato_entre_espelhos(espelhos):
+    ftp, http, pools, cache = espelhos
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        respostas = sondar_espelhos([ftp, http], 2238, pools, cache, executor)
+        assert {espelho.nome for espelho, _, _ in respostas} == {"FTP", "HTTP"}
+        resolucao = resolver(2238, 0, "sp3", respostas)
+        assert resolucao.solucao == "FIN" and [e.nome for e, _ in resolucao.fontes] == ["HTTP"]
+        rapido = resolver(2238, 0, "sp3", respostas, solucoes=("RAP",))
+        assert rapido.nome == "igr22380.sp3.Z"
+        assert {e.nome for e, _ in rapido.fontes} == {"FTP", "HTTP"}
+        assert dict((e.nome, tamanho) for e, tamanho in rapido.fontes)["FTP"] == 10
+        assert resolver(2238, 1, "sp3", respostas) is None
+        # Semana sem pasta em nenhum espelho
+        assert sondar_espelhos([ftp, http], 2239, pools, cache, executor) == []
+
+
+def test_listagem_do_cache(espelhos, servidor_ftp):
+    ftp, _, pools, cache = espelhos
+    listagem, do_cache = listar_espelho(ftp, 2238, pools, cache)
+    assert not do_cache and listagem["igr22380.sp3.Z"][0] == 10
+    assert listar_espelho(ftp, 2238, pools, cache) == (listagem, True)
+    assert [comando for comando, _ in servidor_ftp.comandos].count("MLSD") == 1
+    invalidar_listagem(cache, ftp, 2238)
+    assert listar_espelho(ftp, 2238, pools, cache)[1] is False
+    assert [comando for comando, _ in servidor_ftp.comandos].count("MLSD") == 2
+
+
+@pytest.fixture
+def espelho_mudo(monkeypatch):
+    # Aceita a conexão (pela fila do listen) e nunca responde
+    servidor = socket.socket()
+    servidor.bind(("127.0.0.1", 0))
+    servidor.listen()
+    monkeypatch.setattr(resolvedor_produtos, "TIMEOUT_HTTP", 3)
+    yield Espelho("MUDO", f"http://127.0.0.1:{servidor.getsockname()[1]}/{{semana}}")
+    servidor.close()
+
+
+def test_espelho_que_nao_responde(espelhos, espelho_mudo):
+    ftp, http, pools, cache = espelhos
+    with concurrent.futures.ThreadPoolExecutor(3) as executor:
+        inicio = time.monotonic()
+        respostas = sondar_espelhos([espelho_mudo, ftp, http], 2238, pools, cache, executor, timeout=0.5)
+        assert time.monotonic() - inicio < 2
+        assert {espelho.nome for espelho, _, _ in respostas} == {"FTP", "HTTP"}
+
+
+def test_sondagem_para_no_melhor_candidato(espelhos, espelho_mudo):
+    ftp, http, pools, cache = espelhos
+    melhor = candidatos(2238, 0, "sp3")[0].nome
+    with concurrent.futures.ThreadPoolExecutor(3) as executor:
+        inicio = time.monotonic()
+        respostas = sondar_espelhos([espelho_mudo, http], 2238, pools, cache, executor, objetivos={melhor})
+        assert time.monotonic() - inicio < 2
+        assert [espelho.nome for espelho, _, _ in respostas] == ["HTTP"]
+
+        # Só o rápido no FTP: sem o final, espera os outros espelhos (até o prazo)
+        inicio = time.monotonic()
+        respostas = sondar_espelhos([espelho_mudo, ftp], 2238, pools, cache, executor, objetivos={melhor},
+                                    timeout=1)
+        assert time.monotonic() - inicio >= 1
+        assert [espelho.nome for espelho, _, _ in respostas] == ["FTP"]
@@ -0,0 +1,75 @@
+import pytest
+
+import hatanaka
+import separador_constelacoes
+from rinex import abrir_texto, ler_cabecalho, rotulo
+
+
+def _satelites(caminho):
+    """Sistemas dos satélites nas épocas de um RINEX 3."""
+    with abrir_texto(caminho) as arquivo:
+        ler_cabecalho(arquivo)
+        return {linha[0] for linha in arquivo if linha[:1].isalpha() and linha[1:3].isdigit()}
+
+
+def test_separa_rinex3(rinex3, tmp_path):
+    saidas = {tmp_path / "GPS.rnx": "G", tmp_path / "GPS_GLONASS.rnx": "GR", tmp_path / "GALILEO.crx.gz": "E"}
+    epocas = separador_constelacoes.separar_constelacoes(rinex3, saidas)
+
+    assert _satelites(tmp_path / "GPS.rnx") == {'G'}
+    assert _satelites(tmp_path / "GPS_GLONASS.rnx") == {'G', 'R'}
+    restaurado = hatanaka.crx2rnx(tmp_path / "GALILEO.crx.gz", tmp_path / "GALILEO.rnx")
+    assert _satelites(restaurado) == {'E'}
+    assert all(epocas.values())
+    assert not list(tmp_path.glob("*.tmp"))
+
+    with abrir_texto(tmp_path / "GPS.rnx") as arquivo:
+        cabecalho = ler_cabecalho(arquivo)
+    sistemas = [linha[0] for linha in cabecalho if rotulo(linha) == "SYS / # / OBS TYPES"]
+    assert sistemas == ['G']
+    assert cabecalho[0][40:60].strip() == "G (GPS)"
+
+
+def test_separa_rinex2_mantem_colunas(rinex2, tmp_path):
+    separador_constelacoes.separar_constelacoes(rinex2, {tmp_path / "GLONASS.22o": "R"})
+    with abrir_texto(tmp_path / "GLONASS.22o") as arquivo:
+        cabecalho = ler_cabecalho(arquivo)
+        epocas = [linha for linha in arquivo if linha.startswith(" 22")]
+    tipos = next(linha for linha in cabecalho if rotulo(linha) == "# / TYPES OF OBSERV")
+    assert int(tipos[:6]) == 6
+    assert epocas and all('G' not in linha[32:68] for linha in epocas)
+
+
+def test_erro_nao_deixa_saidas(rinex3, tmp_path):
+    truncado = tmp_path / "truncado.rnx"
+    linhas = rinex3.read_text().splitlines(True)
+    truncado.write_text(''.join(linhas[:len(linhas) // 2]) + "> 2022 11 01 00 30  0.0000000  0  5\n")
+    saidas = {tmp_path / "GPS.rnx": "G", tmp_path / "GLONASS.crx.gz": "R"}
+    with pytest.raises(ValueError):
+        separador_constelacoes.separar_constelacoes(truncado, saidas)
+    assert not any(caminho.exists() for caminho in saidas)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_falha_ao_fechar_fecha_as_demais(rinex3, tmp_path, monkeypatch):
+    fechados = []
+    abrir_original = separador_constelacoes.gravar_crinex
+
+    def gravar_crinex(caminho, gz=None):
+        codificador = abrir_original(caminho, gz)
+        fechar = codificador.close
+
+        def close():
+            fechar()
+            fechados.append(caminho)
+            raise OSError("disco cheio")
+        codificador.close = close
+        return codificador
+
+    monkeypatch.setattr(separador_constelacoes, "gravar_crinex", gravar_crinex)
+    saidas = {tmp_path / "GPS.crx.gz": "G", tmp_path / "GLONASS.crx.gz": "R", tmp_path / "GALILEO.rnx": "E"}
+    with pytest.raises(OSError):
+        separador_constelacoes.separar_constelacoes(rinex3, saidas)
+    assert len(fechados) == 2
+    assert not any(caminho.exists() for caminho in saidas)
+    assert not list(tmp_path.glob("*.tmp"))
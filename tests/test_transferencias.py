@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+
+import pytest
+
+pytest.importorskip("tqdm")
+
+from conexoes_ftp import PoolFTP  # noqa: E402
+from conexoes_http import PoolHTTP  # noqa: E402
+from transferencias import SUFIXO_PARCIAL, baixar_arquivo_ftp, baixar_arquivo_http  # noqa: E402
+
+CONTEUDO = bytes(range(256)) * 4000
+
+
+def _sha256(dados):
+    return "sha256:" + hashlib.sha256(dados).hexdigest()
+
+
+@pytest.fixture
+def ftp(servidor_ftp):
+    (servidor_ftp.pasta / "2238").mkdir()
+    (servidor_ftp.pasta / "2238" / "igs22380.sp3").write_bytes(CONTEUDO)
+    (servidor_ftp.pasta / "2238" / "igs22380.sp3.gz").write_bytes(gzip.compress(CONTEUDO))
+    with PoolFTP("127.0.0.1", porta=servidor_ftp.porta) as pool:
+        yield pool, servidor_ftp
+
+
+@pytest.fixture
+def destino(tmp_path):
+    pasta = tmp_path / "baixados"
+    pasta.mkdir()
+    return pasta
+
+
+def test_ftp_baixa_e_confere(ftp, destino):
+    pool, _ = ftp
+    download = pool.executar(baixar_arquivo_ftp, "/2238", "igs22380.sp3", destino, False, None, _sha256(CONTEUDO))
+    assert download.caminho.read_bytes() == CONTEUDO
+    assert download.tamanho == len(CONTEUDO) and download.sha256 == _sha256(CONTEUDO)
+    assert not list(destino.glob("*" + SUFIXO_PARCIAL))
+
+
+def test_ftp_retoma_do_part(ftp, destino):
+    pool, servidor = ftp
+    (destino / ("igs22380.sp3" + SUFIXO_PARCIAL)).write_bytes(CONTEUDO[:300_000])
+    download = pool.executar(baixar_arquivo_ftp, "/2238", "igs22380.sp3", destino, False)
+    assert download.caminho.read_bytes() == CONTEUDO
+    # O hash cobre o arquivo inteiro, também a parte que já estava no disco
+    assert download.sha256 == _sha256(CONTEUDO)
+    assert ("REST", "300000") in servidor.comandos
+
+
+def test_ftp_part_corrompido_falha_no_sha256(ftp, destino):
+    pool, _ = ftp
+    parcial = destino / ("igs22380.sp3" + SUFIXO_PARCIAL)
+    parcial.write_bytes(b"\0" * 300_000)
+    with pytest.raises(ValueError, match="SHA-256"):
+        pool.executar(baixar_arquivo_ftp, "/2238", "igs22380.sp3", destino, False, None, _sha256(CONTEUDO))
+    assert not parcial.exists() and not (destino / "igs22380.sp3").exists()
+    # A nova tentativa começa do zero
+    assert pool.executar(baixar_arquivo_ftp, "/2238", "igs22380.sp3", destino, False, None,
+                         _sha256(CONTEUDO)).caminho.read_bytes() == CONTEUDO
+
+
+def test_ftp_tamanho_diferente_da_listagem(ftp, destino):
+    pool, _ = ftp
+    with pytest.raises(ValueError, match="tamanho"):
+        pool.executar(baixar_arquivo_ftp, "/2238", "igs22380.sp3", destino, False, len(CONTEUDO) + 10)
+    assert not list(destino.iterdir())
+
+
+def test_ftp_inexistente_e_descompactado(ftp, destino):
+    pool, servidor = ftp
+    assert pool.executar(baixar_arquivo_ftp, "/2238", "igs22381.sp3", destino, False) is None
+    download = pool.executar(baixar_arquivo_ftp, "/2238", "igs22380.sp3.gz", destino, False, None, None, True)
+    assert download.caminho.name == "igs22380.sp3"
+    assert download.caminho.read_bytes() == CONTEUDO
+    assert download.sha256 == _sha256((servidor.pasta / "2238" / "igs22380.sp3.gz").read_bytes())
+
+
+@pytest.fixture
+def http(servidor_http, monkeypatch):
+    # Sem a espera entre as tentativas do pool
+    monkeypatch.setattr("conexoes.time.sleep", lambda segundos: None)
+    (servidor_http.pasta / "igs22380.sp3").write_bytes(CONTEUDO)
+    (servidor_http.pasta / "igs22380.sp3.gz").write_bytes(gzip.compress(CONTEUDO))
+    with PoolHTTP("127.0.0.1", "http", servidor_http.porta) as pool:
+        yield pool, servidor_http
+
+
+def test_http_conexao_cai_e_retoma_com_range(http, destino):
+    pool, servidor = http
+    servidor.servidor.cortar = 300_000
+    download = pool.executar(baixar_arquivo_http, "/igs22380.sp3", "igs22380.sp3", destino, False, None,
+                             _sha256(CONTEUDO))
+    assert download.caminho.read_bytes() == CONTEUDO
+    assert download.sha256 == _sha256(CONTEUDO)
+    assert servidor.pedidos == [("/igs22380.sp3", None), ("/igs22380.sp3", "bytes=300000-")]
+    assert pool.reconexoes == 1
+
+
+def test_http_servidor_sem_range_recomeca(http, destino):
+    pool, servidor = http
+    servidor.servidor.range = False
+    (destino / ("igs22380.sp3" + SUFIXO_PARCIAL)).write_bytes(CONTEUDO[:1000])
+    download = pool.executar(baixar_arquivo_http, "/igs22380.sp3", "igs22380.sp3", destino, False)
+    assert download.caminho.read_bytes() == CONTEUDO and download.tamanho == len(CONTEUDO)
+
+
+def test_http_conferencia_e_inexistente(http, destino):
+    pool, _ = http
+    parcial = destino / ("igs22380.sp3" + SUFIXO_PARCIAL)
+    parcial.write_bytes(b"\0" * 1000)
+    with pytest.raises(ValueError, match="SHA-256"):
+        pool.executar(baixar_arquivo_http, "/igs22380.sp3", "igs22380.sp3", destino, False, None, _sha256(CONTEUDO))
+    assert not parcial.exists()
+    with pytest.raises(ValueError, match="tamanho"):
+        pool.executar(baixar_arquivo_http, "/igs22380.sp3", "igs22380.sp3", destino, False, len(CONTEUDO) - 1)
+    assert pool.executar(baixar_arquivo_http, "/igs22381.sp3", "igs22381.sp3", destino, False) is None
+    download = pool.executar(baixar_arquivo_http, "/igs22380.sp3.gz", "igs22380.sp3.gz", destino, False, None,
+                             None, True)
+    assert download.caminho.read_bytes() == CONTEUDO
+    assert not list(destino.glob("*" + SUFIXO_PARCIAL))
@@ -0,0 +1,118 @@
+import csv
+
+import pytest
+
+from varredura_ppp import (NOME_CONF_VARIANTE, NOME_TABELA_VARIANTE, Variante, confs_constelacoes, escrever_conf,
+                           gravar_resultados, ler_grade, ler_pos, opcoes_navsys, variantes)
+
+CONF_BASE = """# configuração de teste
+pos1-posmode       = ppp-static  # (0:single,...,7:ppp-static)
+pos1-elmask        = 15          # (deg)
+pos1-navsys        = 1           # (1:gps+2:sbas+4:glo)
+"""
+
+POS = """% program   : RTKLIB ver.2.4.3
+%  GPST                  latitude(deg) longitude(deg)  height(m)   Q  ns   sdn(m)   sde(m)   sdu(m)
+2022/11/01 00:00:00.000  -23.555555000  -46.730000000   730.1234   6   7   0.5000   0.5000   0.9000
+2022/11/01 00:00:30.000  -23.555556000  -46.730001000   730.2345   6   9   0.0100   0.0100   0.0200
+"""
+
+POS_DMS = """%  GPST                  latitude(d'") longitude(d'")  height(m)   Q  ns
+2022/11/01 00:00:00.000  -23 33 20.0000  -46 43 48.0000    730.1234   6   8
+"""
+
+
+def test_ler_grade_e_variantes():
+    grade = ler_grade("pos1-elmask=10, 15; pos1-tropo=saas,est-ztd;")
+    assert grade == {"pos1-elmask": ["10", "15"], "pos1-tropo": ["saas", "est-ztd"]}
+    lista = variantes(grade)
+    assert [v.nome for v in lista] == ["v01", "v02", "v03", "v04"]
+    assert lista[1].opcoes == {"pos1-elmask": "10", "pos1-tropo": "est-ztd"}
+    assert variantes({"a": [str(i) for i in range(100)]})[0].nome == "v001"
+    with pytest.raises(ValueError):
+        ler_grade("pos1-elmask")
+    with pytest.raises(ValueError):
+        ler_grade("pos1-elmask=,")
+
+
+def test_escrever_conf(tmp_path):
+    base = tmp_path / "base.conf"
+    base.write_text(CONF_BASE)
+    conf = escrever_conf(base, {"pos1-elmask": "10", "pos1-tropoopt": "est-ztd"}, tmp_path / "v01.conf")
+    linhas = conf.read_text().splitlines()
+    assert linhas[0] == "# configuração de teste"
+    assert linhas[1] == CONF_BASE.splitlines()[1]
+    assert linhas[2].split('#') == ["pos1-elmask        = 10          ", " (deg)"]
+    assert linhas[-1].startswith("pos1-tropoopt      = est-ztd") and linhas[-1].endswith("# variante")
+    assert base.read_text() == CONF_BASE
+
+
+def test_ler_pos(tmp_path):
+    (tmp_path / "a.pos").write_text(POS)
+    resumo = ler_pos(tmp_path / "a.pos")
+    assert resumo["epocas"] == 2 and resumo["ns_medio"] == 8.0
+    assert (resumo["primeira"], resumo["ultima"]) == ("2022/11/01 00:00:00.000", "2022/11/01 00:00:30.000")
+    assert (resumo["latitude_deg"], resumo["height_m"], resumo["sdu_m"]) == ("-23.555556000", "730.2345", "0.0200")
+
+    (tmp_path / "dms.pos").write_text(POS_DMS)
+    dms = ler_pos(tmp_path / "dms.pos")
+    assert dms["latitude_d"] == pytest.approx(-(23 + 33 / 60 + 20 / 3600))
+    assert dms["longitude_d"] == pytest.approx(-(46 + 43 / 60 + 48 / 3600))
+
+    (tmp_path / "vazio.pos").write_text(POS.split('\n2022')[0] + '\n')
+    assert ler_pos(tmp_path / "vazio.pos") == {}
+
+
+def test_gravar_resultados(tmp_path):
+    (tmp_path / "a.pos").write_text(POS)
+    lista = [Variante("v1", {"pos1-elmask": "10"}), Variante("v2", {"pos1-elmask": "15"})]
+    obs = [tmp_path / "POLI3050.22o", tmp_path / "SPJA3050.22o"]
+    prontos = {("v1", "GPS", obs[0]): tmp_path / "a.pos", ("v2", "GLONASS", obs[1]): tmp_path / "a.pos"}
+    # As pastas das variantes são criadas pelo script de PPP, junto com os .conf
+    for variante in lista:
+        (tmp_path / "varredura" / variante.nome).mkdir(parents=True)
+    resumo = gravar_resultados(lista, obs, prontos, tmp_path / "varredura", {"GPS": "G", "GLONASS": "R"})
+    with open(resumo, newline='', encoding='utf-8') as arquivo:
+        linhas = list(csv.DictReader(arquivo))
+    assert [(l["variante"], l["pos1-elmask"], l["solucoes"], l["arquivos"]) for l in linhas] == \
+        [("v1", "10", "1", "4"), ("v2", "15", "1", "4")]
+    with open(tmp_path / "varredura" / "v1" / NOME_TABELA_VARIANTE, newline='', encoding='utf-8') as arquivo:
+        leitor = csv.DictReader(arquivo)
+        assert leitor.fieldnames[:5] == ["variante", "pos1-elmask", "arquivo", "constelacao", "situacao"]
+        tabela = list(leitor)
+    assert [(l["arquivo"], l["constelacao"], l["situacao"]) for l in tabela] == [
+        ("POLI3050.22o", "GPS", "ok"), ("POLI3050.22o", "GLONASS", "sem solução"),
+        ("SPJA3050.22o", "GPS", "sem solução"), ("SPJA3050.22o", "GLONASS", "sem solução")]
+    assert tabela[0]["height_m"] == "730.2345" and tabela[1]["height_m"] == ""
+
+
+def _opcoes_conf(caminho):
+    return {linha.split('=')[0].strip(): linha.split('=')[1].split('#')[0].strip()
+            for linha in caminho.read_text().splitlines() if '=' in linha and not linha.startswith('#')}
+
+
+def test_mascaras_navsys():
+    assert opcoes_navsys("G") == {"pos1-navsys": "1"}
+    assert opcoes_navsys("R") == {"pos1-navsys": "4"}
+    assert opcoes_navsys("GR") == opcoes_navsys("RGG") == {"pos1-navsys": "5"}
+    assert opcoes_navsys("GREC") == {"pos1-navsys": "45"}
+    assert opcoes_navsys("GSRECJI") == {"pos1-navsys": "127"}
+    with pytest.raises(ValueError):
+        opcoes_navsys("GX")
+
+
+def test_confs_constelacoes(tmp_path):
+    base = tmp_path / "base.conf"
+    base.write_text(CONF_BASE)
+    constelacoes = {"GPS": "G", "GLONASS": "R", "GPS_GLONASS": "GR", "GALILEO_BEIDOU": "EC"}
+    confs = confs_constelacoes(base, constelacoes, tmp_path, {"pos1-elmask": "10"})
+    assert [nome for nome, _ in confs] == list(constelacoes)
+    assert [conf.name for _, conf in confs] == [f"ppp_{nome}.conf" for nome in constelacoes]
+    opcoes = {nome: _opcoes_conf(conf) for nome, conf in confs}
+    assert {nome: o["pos1-navsys"] for nome, o in opcoes.items()} == \
+        {"GPS": "1", "GLONASS": "4", "GPS_GLONASS": "5", "GALILEO_BEIDOU": "40"}
+    assert all(o["pos1-elmask"] == "10" and o["pos1-posmode"] == "ppp-static" for o in opcoes.values())
+
+    # Sem constelações: o próprio base, ou uma cópia com as opções da variante
+    assert confs_constelacoes(base, None, tmp_path) == [(None, base)]
+    assert confs_constelacoes(base, {}, tmp_path, {"pos1-elmask": "10"}) == [(None, tmp_path / NOME_CONF_VARIANTE)]
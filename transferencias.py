@@ -0,0 +1,172 @@
+import ftplib
+import hashlib
+import os
+import zlib
+from collections import namedtuple
+from pathlib import Path
+
+from tqdm import tqdm
+
+from descompactacao import Descompactador
+
+# Downloads de arquivos por FTP e HTTP(S) com retomada e conferência.
+# Os bytes vão para <arquivo>.part e só são renomeados para o nome final depois de
+# conferidos (tamanho do servidor e SHA-256 calculado durante a transferência).
+# Se a conexão cair, a próxima tentativa continua do ponto onde parou (REST no FTP,
+# Range no HTTP). As funções recebem a conexão de um pool (conexoes_ftp.PoolFTP,
+# conexoes_http.PoolHTTP), que reconecta e chama de novo em caso de queda.
+
+# Downloads em andamento ficam em <arquivo>.part até serem conferidos (tamanho/hash)
+SUFIXO_PARCIAL = ".part"
+TAMANHO_BLOCO = 1024 * 1024
+
+# Um arquivo baixado: caminho local, tamanho em bytes e SHA-256 ("sha256:...") do que veio do servidor
+# (com `descompactar`, o caminho é o do arquivo descompactado e tamanho/hash são do compactado)
+Download = namedtuple('Download', 'caminho tamanho sha256')
+
+
+class _SemRetomada(Exception):
+    """O servidor não continua a transferência do meio (sem REST / Range): recomeçar do zero."""
+
+
+def _receber(transferir, nome_arquivo, pasta_local, barra, tamanho_arquivo, sha256_esperado, descompactar):
+    """
+    Parte comum dos downloads FTP e HTTP. `transferir(callback, inicio)` entrega os bytes do arquivo
+    a partir de `inicio` ao callback e retorna o tamanho total informado pelo servidor (ou None);
+    sinaliza arquivo inexistente com FileNotFoundError e servidor sem retomada com _SemRetomada.
+    Os bytes vão para <arquivo>.part, que é conferido e renomeado no fim.
+    """
+    caminho_local = Path(pasta_local) / nome_arquivo
+    if descompactar:
+        caminho_local = caminho_local.with_suffix('')
+    caminho_parcial = caminho_local.with_name(caminho_local.name + SUFIXO_PARCIAL)
+
+    # Retomada: parte já baixada de uma tentativa anterior (maior que o arquivo remoto = inválida).
+    # O .part descompactado não diz quantos bytes compactados já vieram: recomeça do zero.
+    inicio = caminho_parcial.stat().st_size if caminho_parcial.exists() and not descompactar else 0
+    if tamanho_arquivo is not None and inicio > tamanho_arquivo:
+        inicio = 0
+
+    if barra:
+        print(f"   ⬇️ {'Retomando' if inicio else 'Baixando'}: {nome_arquivo}")
+
+    h = hashlib.sha256()
+    descompactador = Descompactador() if descompactar else None
+    recebidos = inicio
+    with open(caminho_parcial, 'r+b' if inicio else 'wb') as f:
+        # O hash cobre o arquivo inteiro: a parte já baixada entra uma única vez, antes dos bytes novos
+        if inicio:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+                h.update(bloco)
+        with tqdm(total=tamanho_arquivo or 0, initial=inicio, unit='B', unit_scale=True, desc=nome_arquivo,
+                  leave=False, disable=not barra) as pbar:
+            def callback(data):
+                nonlocal recebidos
+                f.write(descompactador.descompactar(data) if descompactador else data)
+                h.update(data)
+                recebidos += len(data)
+                pbar.update(len(data))
+
+            try:
+                if inicio != tamanho_arquivo:
+                    try:
+                        total = transferir(callback, inicio)
+                    except _SemRetomada:
+                        # Servidor sem retomada: recomeça o arquivo do zero
+                        f.seek(0)
+                        f.truncate()
+                        h = hashlib.sha256()
+                        recebidos = 0
+                        pbar.reset()
+                        total = transferir(callback, 0)
+                    tamanho_arquivo = tamanho_arquivo if tamanho_arquivo is not None else total
+                if descompactador:
+                    f.write(descompactador.finalizar())
+            except FileNotFoundError as e:
+                print(f"   ❌ Erro: Arquivo não encontrado no servidor: {e}")
+                f.close()
+                os.remove(caminho_parcial)
+                return None
+            except (ValueError, zlib.error) as e:
+                # Conteúdo que não descompacta: não adianta retomar, descarta o .part
+                f.close()
+                os.remove(caminho_parcial)
+                raise ValueError(f"Download inválido de {nome_arquivo}: {e}") from e
+
+    sha256 = "sha256:" + h.hexdigest()
+    erro = None
+    if tamanho_arquivo is not None and recebidos != tamanho_arquivo:
+        erro = f"tamanho {recebidos} B, esperado {tamanho_arquivo} B"
+    elif sha256_esperado and sha256 != sha256_esperado:
+        erro = f"SHA-256 diferente do esperado ({sha256})"
+    if erro:
+        os.remove(caminho_parcial)
+        raise ValueError(f"Download inválido de {nome_arquivo}: {erro}")
+    os.replace(caminho_parcial, caminho_local)
+    return Download(caminho_local, recebidos, sha256)
+
+
+def baixar_arquivo_ftp(ftp, pasta_remota, nome_arquivo, pasta_local, barra=True, tamanho_arquivo=None,
+                       sha256_esperado=None, descompactar=False):
+    """
+    Baixa um arquivo específico do FTP com barra de progresso (`barra=False` nos downloads em paralelo).
+    Com `tamanho_arquivo` (ex: vindo do cache de listagens) o servidor não é consultado antes do download.
+    Os bytes vão para <arquivo>.part: se a transferência cair, a próxima tentativa continua de onde
+    parou (REST). O SHA-256 é calculado durante a transferência e o tamanho final é conferido com o
+    do servidor (e o hash com `sha256_esperado`, se informado) antes de renomear o .part.
+    Com `descompactar=True` o .Z/.gz é descompactado durante a própria transferência e só o arquivo
+    descompactado é gravado; nesse modo uma transferência interrompida recomeça do início.
+    Retorna Download ou None se o arquivo não existir no servidor; ValueError se a conferência falhar.
+    """
+    remoto = f"{pasta_remota}/{nome_arquivo}"
+
+    if tamanho_arquivo is None:
+        try:
+            ftp.voidcmd("TYPE I")  # SIZE só é confiável em modo binário
+            tamanho_arquivo = ftp.size(remoto)
+        except ftplib.error_perm:
+            tamanho_arquivo = None
+
+    def transferir(callback, inicio):
+        try:
+            ftp.retrbinary(f"RETR {remoto}", callback, rest=inicio or None)
+        except ftplib.error_perm as e:
+            # Com REST, o erro pode ser só falta de suporte à retomada: tenta de novo do zero
+            raise (_SemRetomada(e) if inicio else FileNotFoundError(str(e))) from e
+
+    return _receber(transferir, nome_arquivo, pasta_local, barra, tamanho_arquivo, sha256_esperado, descompactar)
+
+
+def baixar_arquivo_http(conexao, caminho_remoto, nome_arquivo, pasta_local, barra=True, tamanho_arquivo=None,
+                        sha256_esperado=None, descompactar=False):
+    """
+    Mesmo que baixar_arquivo_ftp para um servidor HTTP(S), por uma conexão http.client reaproveitada
+    (keep-alive): retomada pelo cabeçalho Range e tamanho conferido com o Content-Length quando
+    a listagem não informa o tamanho. `caminho_remoto` é o caminho do arquivo no servidor.
+    """
+    def transferir(callback, inicio):
+        conexao.request("GET", caminho_remoto, headers={"Range": f"bytes={inicio}-"} if inicio else {})
+        with conexao.getresponse() as resposta:
+            if resposta.status >= 400:
+                resposta.read()  # esvazia a resposta: a conexão continua utilizável
+                if resposta.status == 416:
+                    raise _SemRetomada(f"HTTP {resposta.status}")
+                if resposta.status in (403, 404, 410):
+                    raise FileNotFoundError(f"{resposta.status} {resposta.reason}")
+                raise ConnectionError(f"HTTP {resposta.status} {resposta.reason}")
+            if inicio and resposta.status != 206:
+                resposta.read()
+                raise _SemRetomada(f"HTTP {resposta.status} sem Range")
+            comprimento = resposta.getheader("Content-Length")
+            lidos = 0
+            for bloco in iter(lambda: resposta.read(TAMANHO_BLOCO), b''):
+                callback(bloco)
+                lidos += len(bloco)
+        if comprimento is None:
+            return None
+        # Corpo menor que o Content-Length: a conexão caiu no meio (o .part fica para retomar)
+        if lidos < int(comprimento):
+            raise ConnectionError(f"Transferência incompleta de {nome_arquivo} ({inicio + lidos} B)")
+        return inicio + int(comprimento)
+
+    return _receber(transferir, nome_arquivo, pasta_local, barra, tamanho_arquivo, sha256_esperado, descompactar)
@@ -0,0 +1,185 @@
+import csv
+import itertools
+import re
+from collections import namedtuple
+from pathlib import Path
+
+# Varredura de configurações do PPP: a partir de um .conf base e de uma grade de opções
+# (ex: pos1-elmask=10,15; pos1-tropo=saas,est-ztd) gera um .conf por combinação, e o
+# script de PPP roda todas as combinações (observação × variante) em paralelo. Os resultados
+# de cada variante vão para uma tabela CSV (um arquivo de observação por linha), para comparar
+# as configurações sobre o mesmo conjunto de dados.
+# As variantes por constelação (GPS, GLONASS, GPS+GLONASS) também são .conf derivados do base:
+# só o pos1-navsys muda e o mesmo arquivo de observação serve a todas, sem cópias separadas.
+
+NOME_CONF_VARIANTE = "ppp.conf"
+NOME_TABELA_VARIANTE = "resultados.csv"
+NOME_TABELA_VARIANTES = "variantes.csv"
+
+# Máscara de sistemas do pos1-navsys do RTKLIB; os satélites dos sistemas fora da máscara são excluídos
+BITS_NAVSYS = {'G': 1, 'S': 2, 'R': 4, 'E': 8, 'J': 16, 'C': 32, 'I': 64}
+
+# Uma variante: nome da pasta (v01, v02...) e as opções trocadas no .conf base {opção: valor}
+Variante = namedtuple('Variante', 'nome opcoes')
+
+_regex_coluna = re.compile(r"\W+")
+
+
+def ler_grade(texto):
+    """'pos1-elmask=10,15; pos1-tropo=saas,est-ztd' -> {'pos1-elmask': ['10', '15'], 'pos1-tropo': [...]}."""
+    grade = {}
+    for parte in texto.split(';'):
+        if not parte.strip():
+            continue
+        if '=' not in parte:
+            raise ValueError(f"Opção sem valores na grade: {parte.strip()} (use opção=valor1,valor2)")
+        opcao, valores = parte.split('=', 1)
+        valores = [valor.strip() for valor in valores.split(',') if valor.strip()]
+        if not valores:
+            raise ValueError(f"Opção sem valores na grade: {opcao.strip()}")
+        grade[opcao.strip()] = valores
+    return grade
+
+
+def variantes(grade):
+    """Todas as combinações da grade, na ordem das opções: [Variante('v01', {opção: valor}), ...]."""
+    combinacoes = list(itertools.product(*grade.values()))
+    largura = max(2, len(str(len(combinacoes))))
+    return [Variante(f"v{i:0{largura}d}", dict(zip(grade, valores)))
+            for i, valores in enumerate(combinacoes, start=1)]
+
+
+def escrever_conf(base, opcoes, destino):
+    """
+    Copia o .conf base para `destino` trocando o valor das `opcoes` (os comentários das linhas
+    são mantidos); opções que não estão no base são acrescentadas no fim.
+    """
+    faltando = dict(opcoes)
+    linhas = []
+    with open(base, encoding='utf-8', errors='replace') as arquivo:
+        for linha in arquivo:
+            conteudo, separador, comentario = linha.rstrip('\n').partition('#')
+            opcao = conteudo.split('=', 1)[0].strip() if '=' in conteudo else None
+            if opcao in faltando:
+                conteudo = f"{opcao:<18} = {faltando.pop(opcao):<11} "
+                linha = conteudo + (f"{separador}{comentario}" if separador else "") + '\n'
+            linhas.append(linha)
+    if linhas and not linhas[-1].endswith('\n'):
+        linhas[-1] += '\n'
+    linhas += [f"{opcao:<18} = {valor:<11} # variante\n" for opcao, valor in faltando.items()]
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        arquivo.writelines(linhas)
+    return Path(destino)
+
+
+def opcoes_navsys(sistemas):
+    """Opções do .conf que restringem o PPP aos `sistemas`: 'GR' -> {'pos1-navsys': '5'}."""
+    desconhecidos = set(sistemas) - set(BITS_NAVSYS)
+    if desconhecidos:
+        raise ValueError(f"Sistemas desconhecidos: {''.join(sorted(desconhecidos))} (use G, R, E, C, J, S, I)")
+    return {"pos1-navsys": str(sum(BITS_NAVSYS[s] for s in set(sistemas)))}
+
+
+def confs_constelacoes(base, constelacoes, pasta, opcoes=None):
+    """
+    [(constelação, .conf)] a partir do .conf base com as `opcoes` trocadas: um ppp_<NOME>.conf
+    por constelação {nome: sistemas} em `pasta`, com o pos1-navsys dela. Sem constelações,
+    [(None, .conf)]: o próprio base, ou o ppp.conf da pasta se houver `opcoes`.
+    """
+    pasta = Path(pasta)
+    if not constelacoes:
+        if not opcoes:
+            return [(None, Path(base))]
+        return [(None, escrever_conf(base, opcoes, pasta / NOME_CONF_VARIANTE))]
+    return [(nome, escrever_conf(base, {**(opcoes or {}), **opcoes_navsys(sistemas)}, pasta / f"ppp_{nome}.conf"))
+            for nome, sistemas in constelacoes.items()]
+
+
+def _graus(campos):
+    """Graus, minutos e segundos (campos do formato dms do RTKLIB) -> graus decimais."""
+    graus, minutos, segundos = (float(c) for c in campos)
+    sinal = -1 if campos[0].startswith('-') else 1
+    return sinal * (abs(graus) + minutos / 60 + segundos / 3600)
+
+
+def ler_pos(caminho):
+    """
+    Resumo de um arquivo .pos do RTKLIB: número de épocas, primeira/última época, número médio
+    de satélites e as colunas da última época (posição final da solução), com os nomes do cabeçalho
+    (ex: latitude_deg, height_m, Q, sdu_m). Retorna {} se o arquivo não tiver épocas.
+    """
+    colunas = None
+    dms = False
+    epocas = 0
+    soma_ns = 0
+    primeira = ultima = None
+    with open(caminho, encoding='utf-8', errors='replace') as arquivo:
+        for linha in arquivo:
+            if linha.startswith('%'):
+                campos = linha[1:].split()
+                if len(campos) > 4 and campos[1].lower().startswith(("latitude", "x-ecef", "e-baseline")):
+                    dms = "d'" in campos[1]
+                    colunas = [_regex_coluna.sub('_', c).strip('_') for c in campos[1:]]
+                continue
+            campos = linha.split()
+            if colunas is None or len(campos) < 2 + len(colunas):
+                continue
+            valores = campos[2:]
+            if dms:
+                valores = [_graus(valores[0:3]), _graus(valores[3:6])] + valores[6:]
+            epocas += 1
+            if primeira is None:
+                primeira = f"{campos[0]} {campos[1]}"
+            ultima = (f"{campos[0]} {campos[1]}", valores)
+            if "ns" in colunas:
+                soma_ns += int(valores[colunas.index("ns")])
+    if not epocas:
+        return {}
+    resumo = {"epocas": epocas, "primeira": primeira, "ultima": ultima[0],
+              "ns_medio": round(soma_ns / epocas, 2) if "ns" in colunas else ''}
+    for coluna, valor in zip(colunas, ultima[1]):
+        resumo[coluna] = valor
+    return resumo
+
+
+def gravar_tabela(linhas, caminho, primeiras_colunas):
+    """Grava uma tabela CSV: `primeiras_colunas` e depois as demais colunas encontradas, na ordem em que aparecem."""
+    colunas = list(primeiras_colunas)
+    for linha in linhas:
+        colunas += [coluna for coluna in linha if coluna not in colunas]
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=colunas, restval='')
+        escritor.writeheader()
+        escritor.writerows(linhas)
+    return Path(caminho)
+
+
+def gravar_resultados(lista_variantes, arquivos_obs, prontos, pasta_varredura, constelacoes=None):
+    """
+    Grava <pasta_varredura>/vNN/resultados.csv (uma linha por arquivo de observação e constelação,
+    com as opções da variante e o resumo do .pos) e o resumo das variantes em <pasta_varredura>/variantes.csv.
+    `prontos` vem do lote: {(variante, constelação ou None, arquivo de observação): .pos}.
+    Retorna o caminho do resumo.
+    """
+    pasta_varredura = Path(pasta_varredura)
+    opcoes = list(lista_variantes[0].opcoes) if lista_variantes else []
+    nomes = list(constelacoes) if constelacoes else [None]
+    colunas_constelacao = ["constelacao"] if constelacoes else []
+    resumo = []
+    for variante in lista_variantes:
+        linhas = []
+        for obs in arquivos_obs:
+            for constelacao in nomes:
+                arquivo_pos = prontos.get((variante.nome, constelacao, obs))
+                solucao = ler_pos(arquivo_pos) if arquivo_pos else {}
+                linha = {"variante": variante.nome, **variante.opcoes, "arquivo": Path(obs).name}
+                if constelacoes:
+                    linha["constelacao"] = constelacao
+                linhas.append({**linha, "situacao": "ok" if solucao else "sem solução", **solucao})
+        gravar_tabela(linhas, pasta_varredura / variante.nome / NOME_TABELA_VARIANTE,
+                      ["variante"] + opcoes + ["arquivo"] + colunas_constelacao + ["situacao"])
+        resumo.append({"variante": variante.nome, **variante.opcoes,
+                       "solucoes": sum(1 for linha in linhas if linha["situacao"] == "ok"),
+                       "arquivos": len(linhas)})
+    return gravar_tabela(resumo, pasta_varredura / NOME_TABELA_VARIANTES,
+                         ["variante"] + opcoes + ["solucoes", "arquivos"])